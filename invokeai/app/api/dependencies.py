@@ -15,6 +15,7 @@ from invokeai.app.services.events.events_fastapievents import FastAPIEventServic
 from invokeai.app.services.image_files.image_files_disk import DiskImageFileStorage
 from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
 from invokeai.app.services.images.images_default import ImageService
+from invokeai.app.services.invocation_cache.invocation_cache_disk import DiskInvocationCache
 from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
 from invokeai.app.services.invocation_services import InvocationServices
 from invokeai.app.services.invocation_stats.invocation_stats_default import InvocationStatsService
@@ -23,6 +24,7 @@ from invokeai.app.services.model_images.model_images_default import ModelImageFi
 from invokeai.app.services.model_manager.model_manager_default import ModelManagerService
 from invokeai.app.services.model_records.model_records_sql import ModelRecordServiceSQL
 from invokeai.app.services.names.names_default import SimpleNameService
+from invokeai.app.services.noise.noise_default import NoiseService
 from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
 from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
 from invokeai.app.services.session_processor.session_processor_default import (
@@ -31,6 +33,7 @@ from invokeai.app.services.session_processor.session_processor_default import (
 )
 from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
 from invokeai.app.services.shared.sqlite.sqlite_util import init_db
+from invokeai.app.services.tensor_cache.tensor_cache_memory import MemoryTensorCache
 from invokeai.app.services.urls.urls_default import LocalUrlService
 from invokeai.app.services.workflow_records.workflow_records_sqlite import SqliteWorkflowRecordsStorage
 from invokeai.backend.stable_diffusion.diffusion.conditioning_data import ConditioningFieldData
@@ -88,7 +91,15 @@ class ApiDependencies:
         bulk_download = BulkDownloadService()
         image_records = SqliteImageRecordStorage(db=db)
         images = ImageService()
-        invocation_cache = MemoryInvocationCache(max_cache_size=config.node_cache_size)
+        invocation_cache = (
+            DiskInvocationCache(
+                max_cache_size=config.node_cache_size,
+                cache_dir=config.node_cache_path,
+                max_disk_size=config.node_cache_disk_size,
+            )
+            if config.node_cache_size > 0 and config.node_cache_disk_size > 0
+            else MemoryInvocationCache(max_cache_size=config.node_cache_size)
+        )
         tensors = ObjectSerializerForwardCache(
             ObjectSerializerDisk[torch.Tensor](output_folder / "tensors", ephemeral=True)
         )
@@ -104,9 +115,11 @@ class ApiDependencies:
             events=events,
         )
         names = SimpleNameService()
+        noise = NoiseService()
         performance_statistics = InvocationStatsService()
         session_processor = DefaultSessionProcessor(session_runner=DefaultSessionRunner())
         session_queue = SqliteSessionQueue(db=db)
+        tensor_cache = MemoryTensorCache(max_cache_size=config.tensor_cache_size)
         urls = LocalUrlService()
         workflow_records = SqliteWorkflowRecordsStorage(db=db)
 
@@ -134,6 +147,8 @@ class ApiDependencies:
             workflow_records=workflow_records,
             tensors=tensors,
             conditioning=conditioning,
+            tensor_cache=tensor_cache,
+            noise=noise,
         )
 
         ApiDependencies.invoker = Invoker(services)
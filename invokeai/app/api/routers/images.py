@@ -3,16 +3,19 @@ import traceback
 from typing import Optional
 
 from fastapi import BackgroundTasks, Body, HTTPException, Path, Query, Request, Response, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.routing import APIRouter
 from PIL import Image
 from pydantic import BaseModel, Field, JsonValue
 
 from invokeai.app.api.dependencies import ApiDependencies
 from invokeai.app.invocations.fields import MetadataField
+from invokeai.app.services.board_records.board_records_common import BoardRecordNotFoundException
+from invokeai.app.services.bulk_download.bulk_download_common import BulkDownloadParametersException
 from invokeai.app.services.image_records.image_records_common import (
     ImageCategory,
     ImageRecordChanges,
+    ImageRecordNotFoundException,
     ResourceOrigin,
 )
 from invokeai.app.services.images.images_common import ImageDTO, ImageUrlsDTO
@@ -418,6 +421,45 @@ async def download_images_from_list(
     return ImagesDownloaded(bulk_download_item_name=bulk_download_item_id + ".zip")
 
 
+@images_router.post(
+    "/download/stream",
+    operation_id="stream_images_download",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "A zip file of the images, streamed as it is created",
+            "content": {"application/zip": {}},
+        },
+        400: {"description": "No images or board id specified"},
+        404: {"description": "Board or images not found"},
+    },
+)
+async def stream_images_download(
+    image_names: Optional[list[str]] = Body(
+        default=None, description="The list of names of images to download", embed=True
+    ),
+    board_id: Optional[str] = Body(
+        default=None, description="The board from which image should be downloaded", embed=True
+    ),
+) -> StreamingResponse:
+    """Streams a zip file of images, without preparing it first"""
+    if (image_names is None or len(image_names) == 0) and board_id is None:
+        raise HTTPException(status_code=400, detail="No images or board id specified.")
+    bulk_download = ApiDependencies.invoker.services.bulk_download
+    try:
+        content = bulk_download.stream(image_names, board_id)
+        file_name = bulk_download.generate_item_id(board_id) + ".zip"
+    except BulkDownloadParametersException:
+        raise HTTPException(status_code=400, detail="No images or board id specified.")
+    except (BoardRecordNotFoundException, ImageRecordNotFoundException) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(
+        content,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
+
+
 @images_router.api_route(
     "/download/{bulk_download_item_name}",
     methods=["GET"],
@@ -17,6 +17,7 @@ from typing import (
     Iterable,
     Literal,
     Optional,
+    Sequence,
     Type,
     TypeVar,
     Union,
@@ -27,7 +28,7 @@ import semver
 from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, create_model
 from pydantic.fields import FieldInfo
 from pydantic_core import PydanticUndefined
-from typing_extensions import TypeAliasType
+from typing_extensions import Self, TypeAliasType
 
 from invokeai.app.invocations.fields import (
     FieldKind,
@@ -252,11 +253,37 @@ class BaseInvocation(ABC, BaseModel):
         """Invoke with provided context and return outputs."""
         pass
 
-    def invoke_internal(self, context: InvocationContext, services: "InvocationServices") -> BaseInvocationOutput:
+    @classmethod
+    def can_fuse(cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]) -> bool:
         """
-        Internal invoke method, calls `invoke()` after some prep.
-        Handles optional fields that are required to call `invoke()` and invocation cache.
+        Returns True if `invoke_fused()` can run these invocations, one from each of several sessions that differ
+        only by seed, together.
+
+        Invocations that can share work between such sessions (e.g. by batching) override this and `invoke_fused()`.
+        """
+        return False
+
+    @classmethod
+    def invoke_fused(
+        cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        """Invoke several invocations together, returning the output of each. Only called if `can_fuse()`."""
+        raise NotImplementedError(f"{cls.get_type()} does not support fused invocation")
+
+    @classmethod
+    def invoke_fused_internal(
+        cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        """
+        Internal fused invoke method, calls `invoke_fused()` after the same prep as `invoke_internal()`.
+        The invocation cache is not used, as every session needs its own outputs.
         """
+        for invocation in invocations:
+            invocation._prepare_inputs_for_invoke()
+        return cls.invoke_fused(invocations, contexts)
+
+    def _prepare_inputs_for_invoke(self) -> None:
+        """Handles optional fields that are required to call `invoke()`."""
         for field_name, field in self.model_fields.items():
             if not field.json_schema_extra or callable(field.json_schema_extra):
                 # something has gone terribly awry, we should always have this and it should be a dict
@@ -276,22 +303,38 @@ class BaseInvocation(ABC, BaseModel):
                 elif input_ == Input.Any:
                     raise MissingInputException(self.model_fields["type"].default, field_name)
 
+    def invoke_internal(self, context: InvocationContext, services: "InvocationServices") -> BaseInvocationOutput:
+        """
+        Internal invoke method, calls `invoke()` after some prep.
+        Handles optional fields that are required to call `invoke()` and invocation cache.
+        """
+        self._prepare_inputs_for_invoke()
+
         # skip node cache codepath if it's disabled
         if services.configuration.node_cache_size == 0:
             return self.invoke(context)
 
-        output: BaseInvocationOutput
         if self.use_cache:
             key = services.invocation_cache.create_key(self)
             cached_value = services.invocation_cache.get(key)
-            if cached_value is None:
-                services.logger.debug(f'Invocation cache miss for type "{self.get_type()}": {self.id}')
-                output = self.invoke(context)
-                services.invocation_cache.save(key, output)
-                return output
-            else:
+            if cached_value is not None:
                 services.logger.debug(f'Invocation cache hit for type "{self.get_type()}": {self.id}')
                 return cached_value
+            services.logger.debug(f'Invocation cache miss for type "{self.get_type()}": {self.id}')
+            # If another session worker is already running an identical invocation, wait for its output instead of
+            # computing it again. If that invocation fails, try again.
+            while (in_flight := services.invocation_cache.begin_invocation(key)) is not None:
+                services.logger.debug(f'Waiting for in-flight invocation of type "{self.get_type()}": {self.id}')
+                in_flight_output = in_flight.result()
+                if in_flight_output is not None:
+                    return in_flight_output
+            output: Optional[BaseInvocationOutput] = None
+            try:
+                output = self.invoke(context)
+                services.invocation_cache.save(key, output)
+            finally:
+                services.invocation_cache.end_invocation(key, output)
+            return output
         else:
             services.logger.debug(f'Skipping invocation cache for "{self.get_type()}": {self.id}')
             return self.invoke(context)
@@ -1,4 +1,4 @@
-from typing import Iterator, List, Optional, Tuple, Union, cast
+from typing import Any, Hashable, Iterator, List, Optional, Tuple, Union, cast
 
 import torch
 from compel import Compel, ReturnedEmbeddingsType
@@ -15,10 +15,10 @@ from invokeai.app.invocations.fields import (
     TensorField,
     UIComponent,
 )
-from invokeai.app.invocations.model import CLIPField
+from invokeai.app.invocations.model import CLIPField, get_lora_patch_key
 from invokeai.app.invocations.primitives import ConditioningOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
-from invokeai.app.util.ti_utils import generate_ti_list
+from invokeai.app.util.ti_utils import generate_ti_list, get_ti_hashes
 from invokeai.backend.lora import LoRAModelRaw
 from invokeai.backend.model_patcher import ModelPatcher
 from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
@@ -63,6 +63,24 @@ class CompelInvocation(BaseInvocation):
 
     @torch.no_grad()
     def invoke(self, context: InvocationContext) -> ConditioningOutput:
+        cache_key = get_clip_cache_key(context, self.clip, self.prompt)
+        c = get_cached_conditioning(context, cache_key)
+        if c is None:
+            c = self._encode_prompt(context)
+            put_cached_conditioning(context, cache_key, c)
+
+        conditioning_data = ConditioningFieldData(conditionings=[BasicConditioningInfo(embeds=c)])
+
+        conditioning_name = context.conditioning.save(conditioning_data)
+
+        return ConditioningOutput(
+            conditioning=ConditioningField(
+                conditioning_name=conditioning_name,
+                mask=self.mask,
+            )
+        )
+
+    def _encode_prompt(self, context: InvocationContext) -> torch.Tensor:
         tokenizer_info = context.models.load(self.clip.tokenizer)
         text_encoder_info = context.models.load(self.clip.text_encoder)
 
@@ -86,6 +104,7 @@ class CompelInvocation(BaseInvocation):
                 text_encoder,
                 loras=_lora_loader(),
                 cached_weights=cached_weights,
+                fused_weights=text_encoder_info.fused_weights(get_lora_patch_key(self.clip.loras, "lora_te_")),
             ),
             # Apply CLIP Skip after LoRA to prevent LoRA application from failing on skipped layers.
             ModelPatcher.apply_clip_skip(text_encoder, self.clip.skipped_layers),
@@ -112,18 +131,7 @@ class CompelInvocation(BaseInvocation):
 
             c, _options = compel.build_conditioning_tensor_for_conjunction(conjunction)
 
-        c = c.detach().to("cpu")
-
-        conditioning_data = ConditioningFieldData(conditionings=[BasicConditioningInfo(embeds=c)])
-
-        conditioning_name = context.conditioning.save(conditioning_data)
-
-        return ConditioningOutput(
-            conditioning=ConditioningField(
-                conditioning_name=conditioning_name,
-                mask=self.mask,
-            )
-        )
+        return c.detach().to("cpu")
 
 
 class SDXLPromptInvocationBase:
@@ -137,6 +145,24 @@ class SDXLPromptInvocationBase:
         get_pooled: bool,
         lora_prefix: str,
         zero_on_empty: bool,
+    ) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        cache_key = get_clip_cache_key(context, clip_field, prompt, get_pooled, lora_prefix, zero_on_empty)
+        cached = get_cached_conditioning(context, cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._run_clip_compel(context, clip_field, prompt, get_pooled, lora_prefix, zero_on_empty)
+        put_cached_conditioning(context, cache_key, result)
+        return result
+
+    def _run_clip_compel(
+        self,
+        context: InvocationContext,
+        clip_field: CLIPField,
+        prompt: str,
+        get_pooled: bool,
+        lora_prefix: str,
+        zero_on_empty: bool,
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
         tokenizer_info = context.models.load(clip_field.tokenizer)
         text_encoder_info = context.models.load(clip_field.text_encoder)
@@ -184,6 +210,7 @@ class SDXLPromptInvocationBase:
                 loras=_lora_loader(),
                 prefix=lora_prefix,
                 cached_weights=cached_weights,
+                fused_weights=text_encoder_info.fused_weights(get_lora_patch_key(clip_field.loras, lora_prefix)),
             ),
             # Apply CLIP Skip after LoRA to prevent LoRA application from failing on skipped layers.
             ModelPatcher.apply_clip_skip(text_encoder, clip_field.skipped_layers),
@@ -394,6 +421,49 @@ class CLIPSkipInvocation(BaseInvocation):
         )
 
 
+def get_clip_cache_key(
+    context: InvocationContext, clip_field: CLIPField, prompt: str, *extra: Hashable
+) -> Optional[Hashable]:
+    """Build the tensor cache key for a prompt encoded by the given CLIP field.
+
+    The key covers the text encoder, tokenizer, LoRA stack, CLIP skip, the textual inversions
+    referenced by the prompt and the prompt itself, so that a cache hit never requires loading
+    the text encoder. Model hashes are included so that replacing a model invalidates the entry.
+
+    Returns None if the cache should be bypassed (e.g. when prompt tokenization is being logged).
+    """
+    if context.config.get().log_tokenization:
+        return None
+    return (
+        "clip_conditioning",
+        clip_field.text_encoder.key,
+        clip_field.text_encoder.hash,
+        clip_field.text_encoder.submodel_type,
+        clip_field.tokenizer.key,
+        clip_field.tokenizer.hash,
+        tuple((lora.lora.key, lora.lora.hash, lora.weight) for lora in clip_field.loras),
+        clip_field.skipped_layers,
+        tuple(get_ti_hashes(prompt, clip_field.text_encoder.base, context)),
+        str(context.util.torch_dtype()),
+        prompt,
+        *extra,
+    )
+
+
+def get_cached_conditioning(context: InvocationContext, cache_key: Optional[Hashable]) -> Optional[Any]:
+    """Return the cached result for cache_key, or None on a miss."""
+    if cache_key is None:
+        return None
+    return context.tensors.cache_get(cache_key)
+
+
+def put_cached_conditioning(context: InvocationContext, cache_key: Optional[Hashable], value: Any) -> None:
+    """Store the result for cache_key in the tensor cache."""
+    if cache_key is None:
+        return
+    context.tensors.cache_put(cache_key, value)
+
+
 def get_max_token_count(
     tokenizer: CLIPTokenizer,
     prompt: Union[FlattenedPrompt, Blend, Conjunction],
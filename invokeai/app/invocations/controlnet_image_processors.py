@@ -2,11 +2,13 @@
 # initial implementation by Gregg Helt, 2023
 # heavily leverages controlnet_aux package: https://github.com/patrickvonplaten/controlnet_aux
 from builtins import bool, float
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Literal, Union
+from typing import Callable, Dict, Iterator, List, Literal, Union
 
 import cv2
 import numpy as np
+import torch
 from controlnet_aux import (
     ContentShuffleDetector,
     LeresDetector,
@@ -18,6 +20,12 @@ from controlnet_aux import (
     SamDetector,
     ZoeDetector,
 )
+from controlnet_aux.leres.leres.multi_depth_model_woauxi import RelDepthModel
+from controlnet_aux.leres.leres.net_tools import strip_prefix_if_present
+from controlnet_aux.leres.pix2pix.models.pix2pix4depth_model import Pix2Pix4DepthModel
+from controlnet_aux.leres.pix2pix.options.test_options import TestOptions
+from controlnet_aux.segment_anything import SamAutomaticMaskGenerator
+from controlnet_aux.segment_anything.build_sam import sam_model_registry
 from controlnet_aux.util import HWC3, ade_palette
 from PIL import Image
 from pydantic import BaseModel, Field, field_validator, model_validator
@@ -50,8 +58,20 @@ from invokeai.backend.image_util.hed import HEDProcessor
 from invokeai.backend.image_util.lineart import LineartProcessor
 from invokeai.backend.image_util.lineart_anime import LineartAnimeProcessor
 from invokeai.backend.image_util.util import np_to_pil, pil_to_np
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
 from invokeai.backend.util.devices import TorchDevice
 
+ANNOTATOR_MODELS = {
+    "midas": "https://huggingface.co/lllyasviel/Annotators/resolve/main/dpt_hybrid-midas-501f0c75.pt?download=true",
+    "normalbae": "https://huggingface.co/lllyasviel/Annotators/resolve/main/scannet.pt?download=true",
+    "mlsd": "https://huggingface.co/lllyasviel/Annotators/resolve/main/mlsd_large_512_fp32.pth?download=true",
+    "pidi": "https://huggingface.co/lllyasviel/Annotators/resolve/main/table5_pidinet.pth?download=true",
+    "zoe": "https://huggingface.co/lllyasviel/Annotators/resolve/main/ZoeD_M12_N.pt?download=true",
+    "leres": "https://huggingface.co/lllyasviel/Annotators/resolve/main/res101.pth?download=true",
+    "leres_pix2pix": "https://huggingface.co/lllyasviel/Annotators/resolve/main/latest_net_G.pth?download=true",
+    "sam": "https://huggingface.co/ybelkada/segment-anything/resolve/main/checkpoints/sam_vit_h_4b8939.pth?download=true",
+}
+
 
 class ControlField(BaseModel):
     image: ImageField = Field(description="The control image")
@@ -145,6 +165,19 @@ class ImageProcessorInvocation(BaseInvocation, WithMetadata, WithBoard):
         # allows override for any special formatting specific to the preprocessor
         return context.images.get_pil(self.image.image_name, "RGB")
 
+    @contextmanager
+    def load_annotator(self, source: str, loader: Callable[[Path], torch.nn.Module]) -> Iterator[torch.nn.Module]:
+        """Load an annotator model through the model cache, and lock a copy of it on the execution device.
+
+        The weights are deserialized once into the RAM cache and reused by later invocations.
+        """
+        loaded_model = self._context.models.load_remote_model(source=source, loader=loader)
+        # The model cache casts models to the precision of the execution device, but the controlnet_aux
+        # detectors always feed float32 tensors to their models. The annotators are stored in float32, so the
+        # variant is locked as is, without a round trip through the device precision.
+        with loaded_model.model_in_precision(PrecisionVariant(torch.float32)) as model:
+            yield model
+
     def invoke(self, context: InvocationContext) -> ImageOutput:
         self._context = context
         raw_image = self.load_image(context)
@@ -293,17 +326,20 @@ class MidasDepthImageProcessorInvocation(ImageProcessorInvocation):
     # depth_and_normal: bool = InputField(default=False, description="whether to use depth and normal mode")
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        # TODO: replace from_pretrained() calls with context.models.download_and_cache() (or similar)
-        midas_processor = MidasDetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = midas_processor(
-            image,
-            a=np.pi * self.a_mult,
-            bg_th=self.bg_th,
-            image_resolution=self.image_resolution,
-            detect_resolution=self.detect_resolution,
-            # dept_and_normal not supported in controlnet_aux v0.0.3
-            # depth_and_normal=self.depth_and_normal,
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            return MidasDetector.from_pretrained(str(model_path.parent), filename=model_path.name).model
+
+        with self.load_annotator(ANNOTATOR_MODELS["midas"], loader) as model:
+            midas_processor = MidasDetector(model)
+            processed_image = midas_processor(
+                image,
+                a=np.pi * self.a_mult,
+                bg_th=self.bg_th,
+                image_resolution=self.image_resolution,
+                detect_resolution=self.detect_resolution,
+                # dept_and_normal not supported in controlnet_aux v0.0.3
+                # depth_and_normal=self.depth_and_normal,
+            )
         return processed_image
 
 
@@ -321,10 +357,14 @@ class NormalbaeImageProcessorInvocation(ImageProcessorInvocation):
     image_resolution: int = InputField(default=512, ge=1, description=FieldDescriptions.image_res)
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        normalbae_processor = NormalBaeDetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = normalbae_processor(
-            image, detect_resolution=self.detect_resolution, image_resolution=self.image_resolution
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            return NormalBaeDetector.from_pretrained(str(model_path.parent), filename=model_path.name).model
+
+        with self.load_annotator(ANNOTATOR_MODELS["normalbae"], loader) as model:
+            normalbae_processor = NormalBaeDetector(model)
+            processed_image = normalbae_processor(
+                image, detect_resolution=self.detect_resolution, image_resolution=self.image_resolution
+            )
         return processed_image
 
 
@@ -340,14 +380,18 @@ class MlsdImageProcessorInvocation(ImageProcessorInvocation):
     thr_d: float = InputField(default=0.1, ge=0, description="MLSD parameter `thr_d`")
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        mlsd_processor = MLSDdetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = mlsd_processor(
-            image,
-            detect_resolution=self.detect_resolution,
-            image_resolution=self.image_resolution,
-            thr_v=self.thr_v,
-            thr_d=self.thr_d,
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            return MLSDdetector.from_pretrained(str(model_path.parent), filename=model_path.name).model
+
+        with self.load_annotator(ANNOTATOR_MODELS["mlsd"], loader) as model:
+            mlsd_processor = MLSDdetector(model)
+            processed_image = mlsd_processor(
+                image,
+                detect_resolution=self.detect_resolution,
+                image_resolution=self.image_resolution,
+                thr_v=self.thr_v,
+                thr_d=self.thr_d,
+            )
         return processed_image
 
 
@@ -363,14 +407,18 @@ class PidiImageProcessorInvocation(ImageProcessorInvocation):
     scribble: bool = InputField(default=False, description=FieldDescriptions.scribble_mode)
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        pidi_processor = PidiNetDetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = pidi_processor(
-            image,
-            detect_resolution=self.detect_resolution,
-            image_resolution=self.image_resolution,
-            safe=self.safe,
-            scribble=self.scribble,
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            return PidiNetDetector.from_pretrained(str(model_path.parent), filename=model_path.name).netNetwork
+
+        with self.load_annotator(ANNOTATOR_MODELS["pidi"], loader) as model:
+            pidi_processor = PidiNetDetector(model)
+            processed_image = pidi_processor(
+                image,
+                detect_resolution=self.detect_resolution,
+                image_resolution=self.image_resolution,
+                safe=self.safe,
+                scribble=self.scribble,
+            )
         return processed_image
 
 
@@ -415,8 +463,12 @@ class ZoeDepthImageProcessorInvocation(ImageProcessorInvocation):
     """Applies Zoe depth processing to image"""
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        zoe_depth_processor = ZoeDetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = zoe_depth_processor(image)
+        def loader(model_path: Path) -> torch.nn.Module:
+            return ZoeDetector.from_pretrained(str(model_path.parent), filename=model_path.name).model
+
+        with self.load_annotator(ANNOTATOR_MODELS["zoe"], loader) as model:
+            zoe_depth_processor = ZoeDetector(model)
+            processed_image = zoe_depth_processor(image)
         return processed_image
 
 
@@ -464,17 +516,37 @@ class LeresImageProcessorInvocation(ImageProcessorInvocation):
     image_resolution: int = InputField(default=512, ge=1, description=FieldDescriptions.image_res)
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        leres_processor = LeresDetector.from_pretrained("lllyasviel/Annotators")
-        processed_image = leres_processor(
-            image,
-            thr_a=self.thr_a,
-            thr_b=self.thr_b,
-            boost=self.boost,
-            detect_resolution=self.detect_resolution,
-            image_resolution=self.image_resolution,
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            checkpoint = torch.load(model_path, map_location=torch.device("cpu"))
+            model = RelDepthModel(backbone="resnext101")
+            model.load_state_dict(strip_prefix_if_present(checkpoint["depth_model"], "module."), strict=True)
+            return model.eval()
+
+        # The pix2pix model is only used in boost mode. It manages its own device, so it is not cached.
+        pix2pix_model = self._load_pix2pix() if self.boost else None
+        with self.load_annotator(ANNOTATOR_MODELS["leres"], loader) as model:
+            leres_processor = LeresDetector(model, pix2pix_model)
+            processed_image = leres_processor(
+                image,
+                thr_a=self.thr_a,
+                thr_b=self.thr_b,
+                boost=self.boost,
+                detect_resolution=self.detect_resolution,
+                image_resolution=self.image_resolution,
+            )
         return processed_image
 
+    def _load_pix2pix(self) -> Pix2Pix4DepthModel:
+        model_path = self._context.models.download_and_cache_model(ANNOTATOR_MODELS["leres_pix2pix"])
+        opt = TestOptions().parse()
+        if not torch.cuda.is_available():
+            opt.gpu_ids = []  # cpu mode
+        pix2pix_model = Pix2Pix4DepthModel(opt)
+        pix2pix_model.save_dir = str(model_path.parent)
+        pix2pix_model.load_networks("latest")
+        pix2pix_model.eval()
+        return pix2pix_model
+
 
 @invocation(
     "tile_image_processor",
@@ -530,14 +602,15 @@ class SegmentAnythingProcessorInvocation(ImageProcessorInvocation):
     image_resolution: int = InputField(default=512, ge=1, description=FieldDescriptions.image_res)
 
     def run_processor(self, image: Image.Image) -> Image.Image:
-        # segment_anything_processor = SamDetector.from_pretrained("ybelkada/segment-anything", subfolder="checkpoints")
-        segment_anything_processor = SamDetectorReproducibleColors.from_pretrained(
-            "ybelkada/segment-anything", subfolder="checkpoints"
-        )
-        np_img = np.array(image, dtype=np.uint8)
-        processed_image = segment_anything_processor(
-            np_img, image_resolution=self.image_resolution, detect_resolution=self.detect_resolution
-        )
+        def loader(model_path: Path) -> torch.nn.Module:
+            return sam_model_registry["vit_h"](checkpoint=str(model_path))
+
+        with self.load_annotator(ANNOTATOR_MODELS["sam"], loader) as model:
+            segment_anything_processor = SamDetectorReproducibleColors(SamAutomaticMaskGenerator(model))
+            np_img = np.array(image, dtype=np.uint8)
+            processed_image = segment_anything_processor(
+                np_img, image_resolution=self.image_resolution, detect_resolution=self.detect_resolution
+            )
         return processed_image
 
 
@@ -643,7 +716,11 @@ class DWOpenposeImageProcessorInvocation(ImageProcessorInvocation):
         onnx_det = self._context.models.download_and_cache_model(DWPOSE_MODELS["yolox_l.onnx"])
         onnx_pose = self._context.models.download_and_cache_model(DWPOSE_MODELS["dw-ll_ucoco_384.onnx"])
 
-        dw_openpose = DWOpenposeDetector(onnx_det=onnx_det, onnx_pose=onnx_pose)
+        # Reuse the ONNX sessions of the current execution device across invocations.
+        dw_openpose = DWOpenposeDetector(
+            session_det=self._context.models.load_onnx_session(onnx_det),
+            session_pose=self._context.models.load_onnx_session(onnx_pose),
+        )
         processed_image = dw_openpose(
             image,
             draw_face=self.draw_face,
@@ -1,9 +1,11 @@
 # Copyright (c) 2023 Kyle Schouviller (https://github.com/kyle0654)
 import copy
+import dataclasses
 import inspect
 import os
 from contextlib import ExitStack
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import torch
 import torchvision
@@ -17,21 +19,23 @@ from diffusers.schedulers.scheduling_utils import SchedulerMixin as Scheduler
 from pydantic import field_validator
 from torchvision.transforms.functional import resize as tv_resize
 from transformers import CLIPVisionModelWithProjection
+from typing_extensions import Self
 
-from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput, invocation
 from invokeai.app.invocations.constants import LATENT_SCALE_FACTOR
 from invokeai.app.invocations.controlnet_image_processors import ControlField
 from invokeai.app.invocations.fields import (
     ConditioningField,
     DenoiseMaskField,
     FieldDescriptions,
+    ImageField,
     Input,
     InputField,
     LatentsField,
     UIType,
 )
 from invokeai.app.invocations.ip_adapter import IPAdapterField
-from invokeai.app.invocations.model import ModelIdentifierField, UNetField
+from invokeai.app.invocations.model import ModelIdentifierField, UNetField, get_lora_patch_key
 from invokeai.app.invocations.primitives import LatentsOutput
 from invokeai.app.invocations.t2i_adapter import T2IAdapterField
 from invokeai.app.services.shared.invocation_context import InvocationContext
@@ -39,6 +43,7 @@ from invokeai.app.util.controlnet_utils import prepare_control_image
 from invokeai.backend.ip_adapter.ip_adapter import IPAdapter
 from invokeai.backend.lora import LoRAModelRaw
 from invokeai.backend.model_manager import BaseModelType, ModelVariantType
+from invokeai.backend.model_manager.load.model_cache.scheduler_cache import SchedulerCache
 from invokeai.backend.model_patcher import ModelPatcher
 from invokeai.backend.stable_diffusion import PipelineIntermediateState
 from invokeai.backend.stable_diffusion.denoise_context import DenoiseContext, DenoiseInputs
@@ -69,7 +74,7 @@ from invokeai.backend.stable_diffusion.extensions.rescale_cfg import RescaleCFGE
 from invokeai.backend.stable_diffusion.extensions.seamless import SeamlessExt
 from invokeai.backend.stable_diffusion.extensions.t2i_adapter import T2IAdapterExt
 from invokeai.backend.stable_diffusion.extensions_manager import ExtensionsManager
-from invokeai.backend.stable_diffusion.schedulers import SCHEDULER_MAP
+from invokeai.backend.stable_diffusion.schedulers import SCHEDULER_MAP, STOCHASTIC_SCHEDULERS
 from invokeai.backend.stable_diffusion.schedulers.schedulers import SCHEDULER_NAME_VALUES
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.hotfixes import ControlNetModel
@@ -87,29 +92,55 @@ def get_scheduler(
     # TODO(ryand): Silently falling back to ddim seems like a bad idea. Look into why this was added and remove if
     # possible.
     scheduler_class, scheduler_extra_config = SCHEDULER_MAP.get(scheduler_name, SCHEDULER_MAP["ddim"])
-    orig_scheduler_info = context.models.load(scheduler_info)
-    with orig_scheduler_info as orig_scheduler:
-        scheduler_config = orig_scheduler.config
-
-    if "_backup" in scheduler_config:
-        scheduler_config = scheduler_config["_backup"]
-    scheduler_config = {
-        **scheduler_config,
-        **scheduler_extra_config,  # FIXME
-        "_backup": scheduler_config,
-    }
-
     # make dpmpp_sde reproducable(seed can be passed only in initializer)
-    if scheduler_class is DPMSolverSDEScheduler:
-        scheduler_config["noise_sampler_seed"] = seed
-
-    scheduler = scheduler_class.from_config(scheduler_config)
-
-    # hack copied over from generate.py
-    if not hasattr(scheduler, "uses_inpainting_model"):
-        scheduler.uses_inpainting_model = lambda: False
-    assert isinstance(scheduler, Scheduler)
-    return scheduler
+    noise_sampler_seed = seed if scheduler_class is DPMSolverSDEScheduler else None
+
+    def build_scheduler() -> Scheduler:
+        orig_scheduler_info = context.models.load(scheduler_info)
+        with orig_scheduler_info as orig_scheduler:
+            scheduler_config = orig_scheduler.config
+
+        if "_backup" in scheduler_config:
+            scheduler_config = scheduler_config["_backup"]
+        scheduler_config = {
+            **scheduler_config,
+            **scheduler_extra_config,  # FIXME
+            "_backup": scheduler_config,
+        }
+
+        if noise_sampler_seed is not None:
+            scheduler_config["noise_sampler_seed"] = noise_sampler_seed
+
+        scheduler = scheduler_class.from_config(scheduler_config)
+
+        # hack copied over from generate.py
+        if not hasattr(scheduler, "uses_inpainting_model"):
+            scheduler.uses_inpainting_model = lambda: False
+        assert isinstance(scheduler, Scheduler)
+        return scheduler
+
+    # Schedulers only depend on the scheduler model and name, so they are built once and copied for later runs.
+    cache_key = (scheduler_info.key, scheduler_info.hash, scheduler_name, noise_sampler_seed)
+    return context.models.get_scheduler_cache().get(cache_key, build_scheduler)
+
+
+def get_ip_adapter_image_cache_key(
+    context: InvocationContext, ip_adapter: IPAdapterField, image_fields: List[ImageField]
+) -> Hashable:
+    """Build the tensor cache key for the image prompt embeddings of an IP-Adapter.
+
+    Images are immutable, so they are identified by name. Model hashes are included so that replacing a model
+    invalidates the entry.
+    """
+    return (
+        "ip_adapter_image_embeds",
+        ip_adapter.ip_adapter_model.key,
+        ip_adapter.ip_adapter_model.hash,
+        ip_adapter.image_encoder_model.key,
+        ip_adapter.image_encoder_model.hash,
+        str(context.util.torch_dtype()),
+        tuple(image.image_name for image in image_fields),
+    )
 
 
 @invocation(
@@ -535,26 +566,42 @@ class DenoiseLatentsInvocation(BaseInvocation):
         self,
         context: InvocationContext,
         ip_adapters: List[IPAdapterField],
+        ip_adapter_models: List[IPAdapter],
     ) -> List[Tuple[torch.Tensor, torch.Tensor]]:
-        """Run the IPAdapter CLIPVisionModel, returning image prompt embeddings."""
+        """Run the IPAdapter CLIPVisionModel, returning image prompt embeddings.
+
+        The embeddings are kept in the tensor cache, so the image encoder is only loaded for images that have not been
+        encoded with the same image encoder and IP-Adapter before.
+        """
         image_prompts = []
-        for single_ip_adapter in ip_adapters:
-            with context.models.load(single_ip_adapter.ip_adapter_model) as ip_adapter_model:
-                assert isinstance(ip_adapter_model, IPAdapter)
-                image_encoder_model_info = context.models.load(single_ip_adapter.image_encoder_model)
-                # `single_ip_adapter.image` could be a list or a single ImageField. Normalize to a list here.
-                single_ipa_image_fields = single_ip_adapter.image
-                if not isinstance(single_ipa_image_fields, list):
-                    single_ipa_image_fields = [single_ipa_image_fields]
-
-                single_ipa_images = [context.images.get_pil(image.image_name) for image in single_ipa_image_fields]
-                with image_encoder_model_info as image_encoder_model:
-                    assert isinstance(image_encoder_model, CLIPVisionModelWithProjection)
-                    # Get image embeddings from CLIP and ImageProjModel.
-                    image_prompt_embeds, uncond_image_prompt_embeds = ip_adapter_model.get_image_embeds(
-                        single_ipa_images, image_encoder_model
+        for single_ip_adapter, ip_adapter_model in zip(ip_adapters, ip_adapter_models, strict=True):
+            # `single_ip_adapter.image` could be a list or a single ImageField. Normalize to a list here.
+            single_ipa_image_fields = single_ip_adapter.image
+            if not isinstance(single_ipa_image_fields, list):
+                single_ipa_image_fields = [single_ipa_image_fields]
+
+            cache_key = get_ip_adapter_image_cache_key(context, single_ip_adapter, single_ipa_image_fields)
+            cached = context.tensors.cache_get(cache_key)
+            if cached is not None:
+                image_prompt_embeds, uncond_image_prompt_embeds = cached
+                image_prompts.append(
+                    (
+                        image_prompt_embeds.to(ip_adapter_model.device, dtype=ip_adapter_model.dtype),
+                        uncond_image_prompt_embeds.to(ip_adapter_model.device, dtype=ip_adapter_model.dtype),
                     )
-                    image_prompts.append((image_prompt_embeds, uncond_image_prompt_embeds))
+                )
+                continue
+
+            single_ipa_images = [context.images.get_pil(image.image_name) for image in single_ipa_image_fields]
+            with context.models.load(single_ip_adapter.image_encoder_model) as image_encoder_model:
+                assert isinstance(image_encoder_model, CLIPVisionModelWithProjection)
+                # Get image embeddings from CLIP and ImageProjModel.
+                image_prompt_embeds, uncond_image_prompt_embeds = ip_adapter_model.get_image_embeds(
+                    single_ipa_images, image_encoder_model
+                )
+            image_prompts.append((image_prompt_embeds, uncond_image_prompt_embeds))
+            # The cache outlives the execution device, so it keeps CPU copies.
+            context.tensors.cache_put(cache_key, (image_prompt_embeds.to("cpu"), uncond_image_prompt_embeds.to("cpu")))
 
         return image_prompts
 
@@ -562,19 +609,17 @@ class DenoiseLatentsInvocation(BaseInvocation):
         self,
         context: InvocationContext,
         ip_adapters: List[IPAdapterField],
+        ip_adapter_models: List[IPAdapter],
         image_prompts: List[Tuple[torch.Tensor, torch.Tensor]],
-        exit_stack: ExitStack,
         latent_height: int,
         latent_width: int,
         dtype: torch.dtype,
     ) -> Optional[List[IPAdapterData]]:
-        """If IP-Adapter is enabled, then this function loads the requisite models and adds the image prompt conditioning data."""
+        """If IP-Adapter is enabled, then this function adds the image prompt conditioning data to the loaded models."""
         ip_adapter_data_list = []
-        for single_ip_adapter, (image_prompt_embeds, uncond_image_prompt_embeds) in zip(
-            ip_adapters, image_prompts, strict=True
+        for single_ip_adapter, ip_adapter_model, (image_prompt_embeds, uncond_image_prompt_embeds) in zip(
+            ip_adapters, ip_adapter_models, image_prompts, strict=True
         ):
-            ip_adapter_model = exit_stack.enter_context(context.models.load(single_ip_adapter.ip_adapter_model))
-
             mask_field = single_ip_adapter.mask
             mask = context.tensors.load(mask_field.tensor_name) if mask_field is not None else None
             mask = self._preprocess_regional_prompt_mask(mask, latent_height, latent_width, dtype=dtype)
@@ -678,13 +723,14 @@ class DenoiseLatentsInvocation(BaseInvocation):
         denoising_start: float,
         denoising_end: float,
         seed: int,
+        scheduler_cache: SchedulerCache,
     ) -> Tuple[torch.Tensor, torch.Tensor, Dict[str, Any]]:
         assert isinstance(scheduler, ConfigMixin)
         if scheduler.config.get("cpu_only", False):
-            scheduler.set_timesteps(steps, device="cpu")
+            scheduler_cache.set_timesteps(scheduler, steps, device="cpu")
             timesteps = scheduler.timesteps.to(device=device)
         else:
-            scheduler.set_timesteps(steps, device=device)
+            scheduler_cache.set_timesteps(scheduler, steps, device=device)
             timesteps = scheduler.timesteps
 
         # skip greater order timesteps
@@ -760,7 +806,8 @@ class DenoiseLatentsInvocation(BaseInvocation):
         """
         noise = None
         if noise_field is not None:
-            noise = context.tensors.load(noise_field.latents_name)
+            # Noise from the noise node is generated (or taken from the noise service's cache) on the execution device.
+            noise = context.tensors.load_noise(noise_field.latents_name, TorchDevice.choose_torch_device())
 
         if latents_field is not None:
             latents = context.tensors.load(latents_field.latents_name)
@@ -828,6 +875,7 @@ class DenoiseLatentsInvocation(BaseInvocation):
             steps=self.steps,
             denoising_start=self.denoising_start,
             denoising_end=self.denoising_end,
+            scheduler_cache=context.models.get_scheduler_cache(),
         )
 
         # get the unet's config so that we can pass the base to sd_step_callback()
@@ -924,11 +972,102 @@ class DenoiseLatentsInvocation(BaseInvocation):
         name = context.tensors.save(tensor=result_latents)
         return LatentsOutput.build(latents_name=name, latents=result_latents, seed=None)
 
+    @classmethod
+    def can_fuse(cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]) -> bool:
+        # Only plain text-to-image and image-to-image denoising with a deterministic scheduler is batched, so that the
+        # results match those of separate runs.
+        first = invocations[0]
+        if (
+            os.environ.get("USE_MODULAR_DENOISE", False)
+            or first.scheduler in STOCHASTIC_SCHEDULERS
+            or first.control
+            or first.ip_adapter
+            or first.t2i_adapter
+            or first.denoise_mask
+        ):
+            return False
+        exclude = {"id", "noise", "latents", "positive_conditioning", "negative_conditioning"}
+        settings = first.model_dump(exclude=exclude)
+        context = contexts[0]
+        for other in invocations:
+            if other.noise is None or other.model_dump(exclude=exclude) != settings:
+                return False
+            if not _same_latents(context, first.latents, other.latents):
+                return False
+            for field_name in ("positive_conditioning", "negative_conditioning"):
+                if not _same_conditioning(context, getattr(first, field_name), getattr(other, field_name)):
+                    return False
+        return True
+
+    @classmethod
+    def invoke_fused(
+        cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        seeds: list[int] = []
+        noises: list[torch.Tensor] = []
+        for item, context in zip(invocations, contexts, strict=True):
+            seed, noise, latents = cls.prepare_noise_and_latents(context, item.noise, item.latents)
+            assert noise is not None
+            seeds.append(seed)
+            noises.append(noise.to(device=latents.device))
+        batch_size = len(invocations)
+        noise = torch.cat(noises)
+        latents = latents.repeat(batch_size, 1, 1, 1)
+
+        # get the unet's config so that we can pass the base to sd_step_callback()
+        unet_config = contexts[0].models.get_config(invocations[0].unet.unet.key)
+
+        def step_callback(state: PipelineIntermediateState) -> None:
+            # Each session gets the progress of its own latents.
+            for i, context in enumerate(contexts):
+                predicted_original = state.predicted_original
+                context.util.sd_step_callback(
+                    dataclasses.replace(
+                        state,
+                        latents=state.latents[i : i + 1],
+                        predicted_original=None if predicted_original is None else predicted_original[i : i + 1],
+                    ),
+                    unet_config.base,
+                )
+
+        # The scheduler is deterministic, so the seed is only used to name the noise.
+        result_latents = invocations[0]._old_denoise(contexts[0], seeds[0], noise, latents, step_callback)
+
+        outputs: list[BaseInvocationOutput] = []
+        for i, context in enumerate(contexts):
+            # Clone, so that the saved latents don't keep the whole batch alive.
+            item_latents = result_latents[i : i + 1].clone()
+            name = context.tensors.save(tensor=item_latents)
+            outputs.append(LatentsOutput.build(latents_name=name, latents=item_latents, seed=None))
+        return outputs
+
     @torch.no_grad()
     @SilenceWarnings()  # This quenches the NSFW nag from diffusers.
     def _old_invoke(self, context: InvocationContext) -> LatentsOutput:
         seed, noise, latents = self.prepare_noise_and_latents(context, self.noise, self.latents)
 
+        # get the unet's config so that we can pass the base to sd_step_callback()
+        unet_config = context.models.get_config(self.unet.unet.key)
+
+        def step_callback(state: PipelineIntermediateState) -> None:
+            context.util.sd_step_callback(state, unet_config.base)
+
+        result_latents = self._old_denoise(context, seed, noise, latents, step_callback)
+
+        name = context.tensors.save(tensor=result_latents)
+        return LatentsOutput.build(latents_name=name, latents=result_latents, seed=None)
+
+    @torch.no_grad()
+    @SilenceWarnings()  # This quenches the NSFW nag from diffusers.
+    def _old_denoise(
+        self,
+        context: InvocationContext,
+        seed: int,
+        noise: Optional[torch.Tensor],
+        latents: torch.Tensor,
+        step_callback: Callable[[PipelineIntermediateState], None],
+    ) -> torch.Tensor:
+        """Denoise a batch of latents, all with this invocation's conditioning, and return them on the CPU."""
         mask, masked_latents, gradient_mask = self.prep_inpaint_mask(context, latents)
         # At this point, the mask ranges from 0 (leave unchanged) to 1 (inpaint).
         # We invert the mask here for compatibility with the old backend implementation.
@@ -952,18 +1091,6 @@ class DenoiseLatentsInvocation(BaseInvocation):
             else:
                 ip_adapters = [self.ip_adapter]
 
-        # If there are IP adapters, the following line runs the adapters' CLIPVision image encoders to return
-        # a series of image conditioning embeddings. This is being done here rather than in the
-        # big model context below in order to use less VRAM on low-VRAM systems.
-        # The image prompts are then passed to prep_ip_adapter_data().
-        image_prompts = self.prep_ip_adapter_image_prompts(context=context, ip_adapters=ip_adapters)
-
-        # get the unet's config so that we can pass the base to sd_step_callback()
-        unet_config = context.models.get_config(self.unet.unet.key)
-
-        def step_callback(state: PipelineIntermediateState) -> None:
-            context.util.sd_step_callback(state, unet_config.base)
-
         def _lora_loader() -> Iterator[Tuple[LoRAModelRaw, float]]:
             for lora in self.unet.loras:
                 lora_info = context.models.load(lora.lora)
@@ -974,98 +1101,159 @@ class DenoiseLatentsInvocation(BaseInvocation):
 
         unet_info = context.models.load(self.unet.unet)
         assert isinstance(unet_info.model, UNet2DConditionModel)
-        with (
-            ExitStack() as exit_stack,
-            unet_info.model_on_device() as (cached_weights, unet),
-            ModelPatcher.apply_freeu(unet, self.unet.freeu_config),
-            SeamlessExt.static_patch_model(unet, self.unet.seamless_axes),  # FIXME
-            # Apply the LoRA after unet has been moved to its target device for faster patching.
-            ModelPatcher.apply_lora_unet(
-                unet,
-                loras=_lora_loader(),
-                cached_weights=cached_weights,
-            ),
-        ):
-            assert isinstance(unet, UNet2DConditionModel)
-            latents = latents.to(device=unet.device, dtype=unet.dtype)
-            if noise is not None:
-                noise = noise.to(device=unet.device, dtype=unet.dtype)
-            if mask is not None:
-                mask = mask.to(device=unet.device, dtype=unet.dtype)
-            if masked_latents is not None:
-                masked_latents = masked_latents.to(device=unet.device, dtype=unet.dtype)
-
-            scheduler = get_scheduler(
-                context=context,
-                scheduler_info=self.unet.scheduler,
-                scheduler_name=self.scheduler,
-                seed=seed,
+        with ExitStack() as exit_stack:
+            # Each IP-Adapter is placed on the execution device once, and used for both the image encoding and the
+            # denoising.
+            ip_adapter_models: List[IPAdapter] = []
+            for single_ip_adapter in ip_adapters:
+                ip_adapter_model = exit_stack.enter_context(context.models.load(single_ip_adapter.ip_adapter_model))
+                assert isinstance(ip_adapter_model, IPAdapter)
+                ip_adapter_models.append(ip_adapter_model)
+
+            # If there are IP adapters, the following line runs the adapters' CLIPVision image encoders to return
+            # a series of image conditioning embeddings. This is being done here rather than in the
+            # unet context below in order to use less VRAM on low-VRAM systems.
+            # The image prompts are then passed to prep_ip_adapter_data().
+            image_prompts = self.prep_ip_adapter_image_prompts(
+                context=context, ip_adapters=ip_adapters, ip_adapter_models=ip_adapter_models
             )
 
-            pipeline = self.create_pipeline(unet, scheduler)
-
-            _, _, latent_height, latent_width = latents.shape
-            conditioning_data = self.get_conditioning_data(
-                context=context,
-                positive_conditioning_field=self.positive_conditioning,
-                negative_conditioning_field=self.negative_conditioning,
-                device=unet.device,
-                dtype=unet.dtype,
-                latent_height=latent_height,
-                latent_width=latent_width,
-                cfg_scale=self.cfg_scale,
-                steps=self.steps,
-                cfg_rescale_multiplier=self.cfg_rescale_multiplier,
-            )
+            with (
+                unet_info.model_on_device() as (cached_weights, unet),
+                ModelPatcher.apply_freeu(unet, self.unet.freeu_config),
+                SeamlessExt.static_patch_model(unet, self.unet.seamless_axes),  # FIXME
+                # Apply the LoRA after unet has been moved to its target device for faster patching.
+                ModelPatcher.apply_lora_unet(
+                    unet,
+                    loras=_lora_loader(),
+                    cached_weights=cached_weights,
+                    fused_weights=unet_info.fused_weights(get_lora_patch_key(self.unet.loras, "lora_unet_")),
+                ),
+            ):
+                assert isinstance(unet, UNet2DConditionModel)
+                latents = latents.to(device=unet.device, dtype=unet.dtype)
+                if noise is not None:
+                    noise = noise.to(device=unet.device, dtype=unet.dtype)
+                if mask is not None:
+                    mask = mask.to(device=unet.device, dtype=unet.dtype)
+                if masked_latents is not None:
+                    masked_latents = masked_latents.to(device=unet.device, dtype=unet.dtype)
+
+                scheduler = get_scheduler(
+                    context=context,
+                    scheduler_info=self.unet.scheduler,
+                    scheduler_name=self.scheduler,
+                    seed=seed,
+                )
 
-            controlnet_data = self.prep_control_data(
-                context=context,
-                control_input=self.control,
-                latents_shape=latents.shape,
-                # do_classifier_free_guidance=(self.cfg_scale >= 1.0))
-                do_classifier_free_guidance=True,
-                exit_stack=exit_stack,
-            )
+                pipeline = self.create_pipeline(unet, scheduler)
+                # FreeU and seamless tiling patch the locked copy itself, which the compiled UNet does not see.
+                if context.config.get().compile_unet and not self.unet.freeu_config and not self.unet.seamless_axes:
+                    pipeline.unet_compiler = partial(unet_info.compiled_model, unet)
+
+                _, _, latent_height, latent_width = latents.shape
+                conditioning_data = self.get_conditioning_data(
+                    context=context,
+                    positive_conditioning_field=self.positive_conditioning,
+                    negative_conditioning_field=self.negative_conditioning,
+                    device=unet.device,
+                    dtype=unet.dtype,
+                    latent_height=latent_height,
+                    latent_width=latent_width,
+                    cfg_scale=self.cfg_scale,
+                    steps=self.steps,
+                    cfg_rescale_multiplier=self.cfg_rescale_multiplier,
+                )
+                if latents.shape[0] > 1:
+                    conditioning_data = conditioning_data.repeat(latents.shape[0])
+
+                controlnet_data = self.prep_control_data(
+                    context=context,
+                    control_input=self.control,
+                    latents_shape=latents.shape,
+                    # do_classifier_free_guidance=(self.cfg_scale >= 1.0))
+                    do_classifier_free_guidance=True,
+                    exit_stack=exit_stack,
+                )
 
-            ip_adapter_data = self.prep_ip_adapter_data(
-                context=context,
-                ip_adapters=ip_adapters,
-                image_prompts=image_prompts,
-                exit_stack=exit_stack,
-                latent_height=latent_height,
-                latent_width=latent_width,
-                dtype=unet.dtype,
-            )
+                ip_adapter_data = self.prep_ip_adapter_data(
+                    context=context,
+                    ip_adapters=ip_adapters,
+                    ip_adapter_models=ip_adapter_models,
+                    image_prompts=image_prompts,
+                    latent_height=latent_height,
+                    latent_width=latent_width,
+                    dtype=unet.dtype,
+                )
 
-            timesteps, init_timestep, scheduler_step_kwargs = self.init_scheduler(
-                scheduler,
-                device=unet.device,
-                steps=self.steps,
-                denoising_start=self.denoising_start,
-                denoising_end=self.denoising_end,
-                seed=seed,
-            )
+                timesteps, init_timestep, scheduler_step_kwargs = self.init_scheduler(
+                    scheduler,
+                    device=unet.device,
+                    steps=self.steps,
+                    denoising_start=self.denoising_start,
+                    denoising_end=self.denoising_end,
+                    seed=seed,
+                    scheduler_cache=context.models.get_scheduler_cache(),
+                )
 
-            result_latents = pipeline.latents_from_embeddings(
-                latents=latents,
-                timesteps=timesteps,
-                init_timestep=init_timestep,
-                noise=noise,
-                seed=seed,
-                mask=mask,
-                masked_latents=masked_latents,
-                is_gradient_mask=gradient_mask,
-                scheduler_step_kwargs=scheduler_step_kwargs,
-                conditioning_data=conditioning_data,
-                control_data=controlnet_data,
-                ip_adapter_data=ip_adapter_data,
-                t2i_adapter_data=t2i_adapter_data,
-                callback=step_callback,
-            )
+                result_latents: torch.Tensor = pipeline.latents_from_embeddings(
+                    latents=latents,
+                    timesteps=timesteps,
+                    init_timestep=init_timestep,
+                    noise=noise,
+                    seed=seed,
+                    mask=mask,
+                    masked_latents=masked_latents,
+                    is_gradient_mask=gradient_mask,
+                    scheduler_step_kwargs=scheduler_step_kwargs,
+                    conditioning_data=conditioning_data,
+                    control_data=controlnet_data,
+                    ip_adapter_data=ip_adapter_data,
+                    t2i_adapter_data=t2i_adapter_data,
+                    callback=step_callback,
+                )
 
         # https://discuss.huggingface.co/t/memory-usage-by-later-pipeline-stages/23699
         result_latents = result_latents.to("cpu")
         TorchDevice.empty_cache()
+        return result_latents
+
+
+def _same_latents(
+    context: InvocationContext, latents_field: Optional[LatentsField], other_latents_field: Optional[LatentsField]
+) -> bool:
+    if latents_field is None or other_latents_field is None:
+        return latents_field is other_latents_field
+    if latents_field.latents_name == other_latents_field.latents_name:
+        return True
+    return torch.equal(
+        context.tensors.load(latents_field.latents_name), context.tensors.load(other_latents_field.latents_name)
+    )
 
-        name = context.tensors.save(tensor=result_latents)
-        return LatentsOutput.build(latents_name=name, latents=result_latents, seed=None)
+
+def _same_conditioning(
+    context: InvocationContext,
+    conditioning_field: Union[ConditioningField, list[ConditioningField]],
+    other_conditioning_field: Union[ConditioningField, list[ConditioningField]],
+) -> bool:
+    """Returns True if both conditioning fields have the same text conditioning, without regional masks."""
+    cond_list = conditioning_field if isinstance(conditioning_field, list) else [conditioning_field]
+    other_cond_list = (
+        other_conditioning_field if isinstance(other_conditioning_field, list) else [other_conditioning_field]
+    )
+    if len(cond_list) != len(other_cond_list):
+        return False
+    for cond, other_cond in zip(cond_list, other_cond_list, strict=True):
+        if cond.mask is not None or other_cond.mask is not None:
+            return False
+        if cond.conditioning_name == other_cond.conditioning_name:
+            continue
+        # The same prompt encoded by different sessions, unless the outputs were shared through the invocation cache.
+        info = context.conditioning.load(cond.conditioning_name).conditionings[0]
+        other_info = context.conditioning.load(other_cond.conditioning_name).conditionings[0]
+        if type(info) is not type(other_info):
+            return False
+        for field in dataclasses.fields(info):
+            if not torch.equal(getattr(info, field.name), getattr(other_info, field.name)):
+                return False
+    return True
@@ -514,7 +514,10 @@ class ImageNSFWBlurInvocation(BaseInvocation, WithMetadata, WithBoard):
 
         logger = context.logger
         logger.debug("Running NSFW checker")
-        image = SafetyChecker.blur_if_nsfw(image)
+        model_path = SafetyChecker.get_model_path()
+        if model_path is not None:
+            with context.models.load_local_model(model_path, loader=SafetyChecker.load_checker) as checker:
+                image = SafetyChecker.blur_if_nsfw(checker, image)
 
         image_dto = context.images.save(image=image)
 
@@ -1,31 +1,50 @@
-from contextlib import nullcontext
+import hashlib
 from functools import singledispatchmethod
+from typing import Hashable
 
-import einops
 import torch
-from diffusers.models.attention_processor import (
-    AttnProcessor2_0,
-    LoRAAttnProcessor2_0,
-    LoRAXFormersAttnProcessor,
-    XFormersAttnProcessor,
-)
 from diffusers.models.autoencoders.autoencoder_kl import AutoencoderKL
 from diffusers.models.autoencoders.autoencoder_tiny import AutoencoderTiny
+from PIL import Image
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
-from invokeai.app.invocations.constants import DEFAULT_PRECISION, LATENT_SCALE_FACTOR
+from invokeai.app.invocations.constants import DEFAULT_PRECISION
 from invokeai.app.invocations.fields import (
     FieldDescriptions,
     ImageField,
     Input,
     InputField,
 )
+from invokeai.app.invocations.latents_to_image import get_vae_precision_variant
 from invokeai.app.invocations.model import VAEField
 from invokeai.app.invocations.primitives import LatentsOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
 from invokeai.backend.model_manager import LoadedModel
-from invokeai.backend.stable_diffusion.diffusers_pipeline import image_resized_to_grid_as_tensor
-from invokeai.backend.stable_diffusion.vae_tiling import patch_vae_tiling_params
+from invokeai.backend.stable_diffusion.diffusers_pipeline import image_resized_to_grid_as_uint8, uint8_image_to_tensor
+from invokeai.backend.stable_diffusion.vae_tiling import calc_vae_tile_size, encode_image_tiled
+from invokeai.backend.util.devices import TorchDevice
+
+
+def get_vae_encode_cache_key(
+    context: InvocationContext, vae_field: VAEField, image: Image.Image, tiled: bool, tile_size: int, fp32: bool
+) -> Hashable:
+    """Build the tensor cache key for the latents of an image encoded by the given VAE.
+
+    The image is identified by a hash of its pixels, so that the same picture saved under different names still hits.
+    The model hash is included so that replacing a model invalidates the entry.
+    """
+    return (
+        "vae_encode",
+        vae_field.vae.key,
+        vae_field.vae.hash,
+        image.mode,
+        image.size,
+        hashlib.blake2b(image.tobytes(), digest_size=16).hexdigest(),
+        tiled,
+        tile_size if tiled else 0,
+        fp32,
+        str(context.util.torch_dtype()),
+    )
 
 
 @invocation(
@@ -53,54 +72,46 @@ class ImageToLatentsInvocation(BaseInvocation):
 
     @staticmethod
     def vae_encode(
-        vae_info: LoadedModel, upcast: bool, tiled: bool, image_tensor: torch.Tensor, tile_size: int = 0
+        vae_info: LoadedModel,
+        upcast: bool,
+        tiled: bool,
+        image_tensor: torch.Tensor,
+        tile_size: int = 0,
+        tile_batch_size: int = 1,
+        max_devices: int = 1,
     ) -> torch.Tensor:
-        with vae_info as vae:
+        assert isinstance(vae_info.model, (AutoencoderKL, AutoencoderTiny))
+        # The dtype the model cache runs the VAE in, and in which the latents are returned.
+        orig_dtype = TorchDevice.choose_torch_dtype()
+        variant = get_vae_precision_variant(vae_info.model, upcast, orig_dtype)
+        with vae_info.model_in_precision(variant) as vae:
             assert isinstance(vae, (AutoencoderKL, AutoencoderTiny))
-            orig_dtype = vae.dtype
-            if upcast:
-                vae.to(dtype=torch.float32)
-
-                use_torch_2_0_or_xformers = hasattr(vae.decoder, "mid_block") and isinstance(
-                    vae.decoder.mid_block.attentions[0].processor,
-                    (
-                        AttnProcessor2_0,
-                        XFormersAttnProcessor,
-                        LoRAXFormersAttnProcessor,
-                        LoRAAttnProcessor2_0,
-                    ),
-                )
-                # if xformers or torch_2_0 is used attention block does not need
-                # to be in float32 which can save lots of memory
-                if use_torch_2_0_or_xformers:
-                    vae.post_quant_conv.to(orig_dtype)
-                    vae.decoder.conv_in.to(orig_dtype)
-                    vae.decoder.mid_block.to(orig_dtype)
-                # else:
-                #    latents = latents.float()
-
-            else:
-                vae.to(dtype=torch.float16)
-                # latents = latents.half()
+            vae.disable_tiling()
 
             if tiled:
-                vae.enable_tiling()
+                # Encode overlapping tiles, spread over any idle devices.
+                tile_size, overlap = calc_vae_tile_size(vae, tile_size)
+                with vae_info.models_on_idle_devices(max_devices - 1, variant) as idle_device_vaes:
+                    if image_tensor.dtype == torch.uint8:
+                        # The tiles are spread over several devices, so scale the whole image on the CPU.
+                        image_tensor = uint8_image_to_tensor(image_tensor)
+                    latents = encode_image_tiled(
+                        [vae, *idle_device_vaes],
+                        image_tensor,
+                        tile_size,
+                        overlap,
+                        ImageToLatentsInvocation._encode_to_tensor,
+                        tile_batch_size,
+                    ).to(device=vae.device, dtype=vae.dtype)
             else:
-                vae.disable_tiling()
-
-            tiling_context = nullcontext()
-            if tile_size > 0:
-                tiling_context = patch_vae_tiling_params(
-                    vae,
-                    tile_sample_min_size=tile_size,
-                    tile_latent_min_size=tile_size // LATENT_SCALE_FACTOR,
-                    tile_overlap_factor=0.25,
-                )
-
-            # non_noised_latents_from_image
-            image_tensor = image_tensor.to(device=vae.device, dtype=vae.dtype)
-            with torch.inference_mode(), tiling_context:
-                latents = ImageToLatentsInvocation._encode_to_tensor(vae, image_tensor)
+                # non_noised_latents_from_image
+                if image_tensor.dtype == torch.uint8:
+                    # Move the raw pixels and scale them on the execution device.
+                    image_tensor = uint8_image_to_tensor(image_tensor, device=vae.device, dtype=vae.dtype)
+                else:
+                    image_tensor = image_tensor.to(device=vae.device, dtype=vae.dtype)
+                with torch.inference_mode():
+                    latents = ImageToLatentsInvocation._encode_to_tensor(vae, image_tensor)
 
             latents = vae.config.scaling_factor * latents
             latents = latents.to(dtype=orig_dtype)
@@ -109,19 +120,29 @@ class ImageToLatentsInvocation(BaseInvocation):
 
     @torch.no_grad()
     def invoke(self, context: InvocationContext) -> LatentsOutput:
-        image = context.images.get_pil(self.image.image_name)
-
-        vae_info = context.models.load(self.vae.vae)
-
-        image_tensor = image_resized_to_grid_as_tensor(image.convert("RGB"))
-        if image_tensor.dim() == 3:
-            image_tensor = einops.rearrange(image_tensor, "c h w -> 1 c h w")
-
-        latents = self.vae_encode(
-            vae_info=vae_info, upcast=self.fp32, tiled=self.tiled, image_tensor=image_tensor, tile_size=self.tile_size
-        )
+        image = context.images.get_pil(self.image.image_name, mode="RGB")
+
+        # Batches that only vary the seed or prompt encode the same init image over and over. The cache keeps CPU
+        # copies of the latents, so a hit skips loading the VAE altogether.
+        cache_key = get_vae_encode_cache_key(context, self.vae, image, self.tiled, self.tile_size, self.fp32)
+        latents = context.tensors.cache_get(cache_key)
+        if latents is None:
+            vae_info = context.models.load(self.vae.vae)
+
+            config = context.config.get()
+            latents = self.vae_encode(
+                vae_info=vae_info,
+                upcast=self.fp32,
+                tiled=self.tiled,
+                image_tensor=image_resized_to_grid_as_uint8(image),
+                tile_size=self.tile_size,
+                tile_batch_size=config.tiled_vae_batch_size,
+                max_devices=config.tiled_vae_devices,
+            )
+
+            latents = latents.to("cpu")
+            context.tensors.cache_put(cache_key, latents)
 
-        latents = latents.to("cpu")
         name = context.tensors.save(tensor=latents)
         return LatentsOutput.build(latents_name=name, latents=latents, seed=None)
 
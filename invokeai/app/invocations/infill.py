@@ -165,6 +165,14 @@ class MosaicInfillInvocation(InfillImageProcessorInvocation):
         default=ColorField(r=255, g=255, b=255, a=255),
         description="The max threshold for color",
     )
+    seed: int = InputField(
+        default=0,
+        ge=0,
+        le=SEED_MAX,
+        description="The seed to use for the mosaic colors",
+    )
 
     def infill(self, image: Image.Image):
-        return infill_mosaic(image, (self.tile_width, self.tile_height), self.min_color.tuple(), self.max_color.tuple())
+        return infill_mosaic(
+            image, (self.tile_width, self.tile_height), self.min_color.tuple(), self.max_color.tuple(), seed=self.seed
+        )
@@ -1,7 +1,7 @@
-from contextlib import nullcontext
+from contextlib import ExitStack
+from typing import Sequence
 
 import torch
-from diffusers.image_processor import VaeImageProcessor
 from diffusers.models.attention_processor import (
     AttnProcessor2_0,
     LoRAAttnProcessor2_0,
@@ -10,9 +10,11 @@ from diffusers.models.attention_processor import (
 )
 from diffusers.models.autoencoders.autoencoder_kl import AutoencoderKL
 from diffusers.models.autoencoders.autoencoder_tiny import AutoencoderTiny
+from PIL import Image
+from typing_extensions import Self
 
-from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
-from invokeai.app.invocations.constants import DEFAULT_PRECISION, LATENT_SCALE_FACTOR
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput, invocation
+from invokeai.app.invocations.constants import DEFAULT_PRECISION
 from invokeai.app.invocations.fields import (
     FieldDescriptions,
     Input,
@@ -24,11 +26,46 @@ from invokeai.app.invocations.fields import (
 from invokeai.app.invocations.model import VAEField
 from invokeai.app.invocations.primitives import ImageOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
 from invokeai.backend.stable_diffusion.extensions.seamless import SeamlessExt
-from invokeai.backend.stable_diffusion.vae_tiling import patch_vae_tiling_params
+from invokeai.backend.stable_diffusion.vae_tiling import (
+    calc_vae_tile_size,
+    decode_latents_tiled,
+    vae_output_to_uint8,
+)
 from invokeai.backend.util.devices import TorchDevice
 
 
+def get_vae_precision_variant(
+    vae: AutoencoderKL | AutoencoderTiny, fp32: bool, attention_dtype: torch.dtype
+) -> PrecisionVariant:
+    """Return the precision to run the VAE in.
+
+    An fp32 VAE that uses torch 2.0 or xformers attention keeps its attention block, and the layers between it and
+    the latents, in attention_dtype, which saves lots of memory.
+    """
+    if not fp32:
+        return PrecisionVariant(torch.float16)
+
+    use_torch_2_0_or_xformers = hasattr(vae.decoder, "mid_block") and isinstance(
+        vae.decoder.mid_block.attentions[0].processor,
+        (
+            AttnProcessor2_0,
+            XFormersAttnProcessor,
+            LoRAXFormersAttnProcessor,
+            LoRAAttnProcessor2_0,
+        ),
+    )
+    if not use_torch_2_0_or_xformers or attention_dtype == torch.float32:
+        return PrecisionVariant(torch.float32)
+    return PrecisionVariant(
+        torch.float32,
+        overrides=tuple(
+            (submodule, attention_dtype) for submodule in ("post_quant_conv", "decoder.conv_in", "decoder.mid_block")
+        ),
+    )
+
+
 @invocation(
     "l2i",
     title="Latents to Image",
@@ -56,66 +93,92 @@ class LatentsToImageInvocation(BaseInvocation, WithMetadata, WithBoard):
     @torch.no_grad()
     def invoke(self, context: InvocationContext) -> ImageOutput:
         latents = context.tensors.load(self.latents.latents_name)
+        config = context.config.get()
 
         vae_info = context.models.load(self.vae.vae)
         assert isinstance(vae_info.model, (AutoencoderKL, AutoencoderTiny))
-        with SeamlessExt.static_patch_model(vae_info.model, self.vae.seamless_axes), vae_info as vae:
+        variant = get_vae_precision_variant(vae_info.model, self.fp32, latents.dtype)
+        with ExitStack() as exit_stack:
+            vae = exit_stack.enter_context(vae_info.model_in_precision(variant))
             assert isinstance(vae, (AutoencoderKL, AutoencoderTiny))
-            latents = latents.to(vae.device)
-            if self.fp32:
-                vae.to(dtype=torch.float32)
-
-                use_torch_2_0_or_xformers = hasattr(vae.decoder, "mid_block") and isinstance(
-                    vae.decoder.mid_block.attentions[0].processor,
-                    (
-                        AttnProcessor2_0,
-                        XFormersAttnProcessor,
-                        LoRAXFormersAttnProcessor,
-                        LoRAAttnProcessor2_0,
-                    ),
-                )
-                # if xformers or torch_2_0 is used attention block does not need
-                # to be in float32 which can save lots of memory
-                if use_torch_2_0_or_xformers:
-                    vae.post_quant_conv.to(latents.dtype)
-                    vae.decoder.conv_in.to(latents.dtype)
-                    vae.decoder.mid_block.to(latents.dtype)
-                else:
-                    latents = latents.float()
-
-            else:
-                vae.to(dtype=torch.float16)
-                latents = latents.half()
-
-            if self.tiled or context.config.get().force_tiled_decode:
-                vae.enable_tiling()
-            else:
-                vae.disable_tiling()
-
-            tiling_context = nullcontext()
-            if self.tile_size > 0:
-                tiling_context = patch_vae_tiling_params(
-                    vae,
-                    tile_sample_min_size=self.tile_size,
-                    tile_latent_min_size=self.tile_size // LATENT_SCALE_FACTOR,
-                    tile_overlap_factor=0.25,
-                )
+            # Patch the locked copy rather than the cached model, which other sessions share.
+            exit_stack.enter_context(SeamlessExt.static_patch_model(vae, self.vae.seamless_axes))
+            # The latents go straight into post_quant_conv, which the variant may have left in their dtype.
+            latents = latents.to(device=vae.device, dtype=latents.dtype if variant.overrides else variant.dtype)
+            vae.disable_tiling()
 
             # clear memory as vae decode can request a lot
             TorchDevice.empty_cache()
 
-            with torch.inference_mode(), tiling_context:
-                # copied from diffusers pipeline
-                latents = latents / vae.config.scaling_factor
-                image = vae.decode(latents, return_dict=False)[0]
-                image = (image / 2 + 0.5).clamp(0, 1)  # denormalize
-                # we always cast to float32 as this does not cause significant overhead and is compatible with bfloat16
-                np_image = image.cpu().permute(0, 2, 3, 1).float().numpy()
+            if self.tiled or config.force_tiled_decode:
+                # Decode overlapping tiles, spread over any idle devices, straight into a uint8 image.
+                tile_size, overlap = calc_vae_tile_size(vae, self.tile_size)
+                idle_device_vaes = exit_stack.enter_context(
+                    vae_info.models_on_idle_devices(config.tiled_vae_devices - 1, variant)
+                )
+                for idle_device_vae in idle_device_vaes:
+                    exit_stack.enter_context(SeamlessExt.static_patch_model(idle_device_vae, self.vae.seamless_axes))
+                np_image = decode_latents_tiled(
+                    [vae, *idle_device_vaes], latents, tile_size, overlap, config.tiled_vae_batch_size
+                )
+            else:
+                with torch.inference_mode():
+                    # copied from diffusers pipeline
+                    latents = latents / vae.config.scaling_factor
+                    np_image = vae_output_to_uint8(vae.decode(latents, return_dict=False)[0])[0]
 
-                image = VaeImageProcessor.numpy_to_pil(np_image)[0]
+            image = Image.fromarray(np_image)
 
         TorchDevice.empty_cache()
 
         image_dto = context.images.save(image=image)
 
         return ImageOutput.build(image_dto)
+
+    @classmethod
+    def can_fuse(cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]) -> bool:
+        # Tiled decodes already spread the work over the tiles, so only whole-image decodes are batched.
+        first = invocations[0]
+        if first.tiled or contexts[0].config.get().force_tiled_decode:
+            return False
+        # Each image is saved with its own session's metadata.
+        exclude = {"id", "latents", "metadata"}
+        settings = first.model_dump(exclude=exclude)
+        return all(invocation.model_dump(exclude=exclude) == settings for invocation in invocations)
+
+    @classmethod
+    @torch.no_grad()
+    def invoke_fused(
+        cls, invocations: Sequence[Self], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        first = invocations[0]
+        latents = torch.cat(
+            [
+                context.tensors.load(invocation.latents.latents_name)
+                for invocation, context in zip(invocations, contexts, strict=True)
+            ]
+        )
+
+        vae_info = contexts[0].models.load(first.vae.vae)
+        assert isinstance(vae_info.model, (AutoencoderKL, AutoencoderTiny))
+        variant = get_vae_precision_variant(vae_info.model, first.fp32, latents.dtype)
+        with ExitStack() as exit_stack:
+            vae = exit_stack.enter_context(vae_info.model_in_precision(variant))
+            assert isinstance(vae, (AutoencoderKL, AutoencoderTiny))
+            exit_stack.enter_context(SeamlessExt.static_patch_model(vae, first.vae.seamless_axes))
+            latents = latents.to(device=vae.device, dtype=latents.dtype if variant.overrides else variant.dtype)
+            vae.disable_tiling()
+
+            # clear memory as vae decode can request a lot
+            TorchDevice.empty_cache()
+
+            with torch.inference_mode():
+                latents = latents / vae.config.scaling_factor
+                np_images = vae_output_to_uint8(vae.decode(latents, return_dict=False)[0])
+
+        TorchDevice.empty_cache()
+
+        return [
+            ImageOutput.build(context.images.save(image=Image.fromarray(np_image)))
+            for np_image, context in zip(np_images, contexts, strict=True)
+        ]
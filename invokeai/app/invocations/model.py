@@ -1,5 +1,5 @@
 import copy
-from typing import List, Optional
+from typing import Hashable, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -45,6 +45,11 @@ class LoRAField(BaseModel):
     weight: float = Field(description="Weight to apply to lora model")
 
 
+def get_lora_patch_key(loras: List[LoRAField], prefix: str) -> Hashable:
+    """Identify a stack of LoRAs applied to a model, for looking up the model's fused weights in the model cache."""
+    return (prefix, tuple((lora.lora.key, lora.lora.hash, lora.weight) for lora in loras))
+
+
 class UNetField(BaseModel):
     unet: ModelIdentifierField = Field(description="Info to load unet submodel")
     scheduler: ModelIdentifierField = Field(description="Info to load scheduler submodel")
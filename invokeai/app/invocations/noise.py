@@ -7,6 +7,7 @@ from pydantic import field_validator
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput, invocation, invocation_output
 from invokeai.app.invocations.constants import LATENT_SCALE_FACTOR
 from invokeai.app.invocations.fields import FieldDescriptions, InputField, LatentsField, OutputField
+from invokeai.app.services.noise.noise_common import NoiseSpec
 from invokeai.app.services.shared.invocation_context import InvocationContext
 from invokeai.app.util.misc import SEED_MAX
 from invokeai.backend.util.devices import TorchDevice
@@ -16,7 +17,7 @@ Utilities
 """
 
 
-def get_noise(
+def get_noise_spec(
     width: int,
     height: int,
     device: torch.device,
@@ -24,28 +25,18 @@ def get_noise(
     latent_channels: int = 4,
     downsampling_factor: int = 8,
     use_cpu: bool = True,
-    perlin: float = 0.0,
-):
-    """Generate noise for a given image size."""
-    noise_device_type = "cpu" if use_cpu else device.type
-
-    # limit noise to only the diffusion image channels, not the mask channels
-    input_channels = min(latent_channels, 4)
-    generator = torch.Generator(device=noise_device_type).manual_seed(seed)
-
-    noise_tensor = torch.randn(
-        [
-            1,
-            input_channels,
-            height // downsampling_factor,
-            width // downsampling_factor,
-        ],
+) -> NoiseSpec:
+    """Describe the noise for a given image size."""
+    return NoiseSpec(
+        seed=seed,
+        # limit noise to only the diffusion image channels, not the mask channels
+        channels=min(latent_channels, 4),
+        height=height // downsampling_factor,
+        width=width // downsampling_factor,
+        # CPU noise is reproducible across platforms. Philox noise is too, and is generated on the device itself.
+        generator="cpu" if use_cpu else "philox",
         dtype=TorchDevice.choose_torch_dtype(device=device),
-        device=noise_device_type,
-        generator=generator,
-    ).to("cpu")
-
-    return noise_tensor
+    )
 
 
 """
@@ -109,12 +100,17 @@ class NoiseInvocation(BaseInvocation):
         return v % (SEED_MAX + 1)
 
     def invoke(self, context: InvocationContext) -> NoiseOutput:
-        noise = get_noise(
+        spec = get_noise_spec(
             width=self.width,
             height=self.height,
             device=TorchDevice.choose_torch_device(),
             seed=self.seed,
             use_cpu=self.use_cpu,
         )
-        name = context.tensors.save(tensor=noise)
-        return NoiseOutput.build(latents_name=name, latents=noise, seed=self.seed)
+        # The noise is generated when it is loaded, on the device that uses it, instead of being saved here.
+        name = context.tensors.save_noise(spec)
+        return NoiseOutput(
+            noise=LatentsField(latents_name=name, seed=self.seed),
+            width=spec.width * LATENT_SCALE_FACTOR,
+            height=spec.height * LATENT_SCALE_FACTOR,
+        )
@@ -1,7 +1,7 @@
+import hashlib
 from pathlib import Path
 from typing import Literal
 
-import numpy as np
 import torch
 from PIL import Image
 from transformers import AutoModelForMaskGeneration, AutoProcessor
@@ -12,7 +12,7 @@ from invokeai.app.invocations.baseinvocation import BaseInvocation, invocation
 from invokeai.app.invocations.fields import BoundingBoxField, ImageField, InputField, TensorField
 from invokeai.app.invocations.primitives import MaskOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
-from invokeai.backend.image_util.segment_anything.mask_refinement import mask_to_polygon, polygon_to_mask
+from invokeai.backend.image_util.segment_anything.mask_refinement import refine_masks_with_polygons
 from invokeai.backend.image_util.segment_anything.segment_anything_pipeline import SegmentAnythingPipeline
 
 SegmentAnythingModelKey = Literal["segment-anything-base", "segment-anything-large", "segment-anything-huge"]
@@ -98,7 +98,21 @@ class SegmentAnythingInvocation(BaseInvocation):
             ) as sam_pipeline,
         ):
             assert isinstance(sam_pipeline, SegmentAnythingPipeline)
-            masks = sam_pipeline.segment(image=image, bounding_boxes=sam_bounding_boxes)
+            # The image embeddings only depend on the model and the image, so they are reused across prompts and
+            # invocations. The cache keeps CPU copies.
+            cache_key = (
+                "sam_image_embeddings",
+                SEGMENT_ANYTHING_MODEL_IDS[self.model],
+                image.size,
+                hashlib.blake2b(image.tobytes(), digest_size=16).hexdigest(),
+            )
+            image_embeddings = context.tensors.cache_get(cache_key)
+            if image_embeddings is None:
+                image_embeddings = sam_pipeline.get_image_embeddings(image)
+                context.tensors.cache_put(cache_key, image_embeddings.to("cpu"))
+            masks = sam_pipeline.segment(
+                image=image, bounding_boxes=sam_bounding_boxes, image_embeddings=image_embeddings
+            )
 
         masks = self._process_masks(masks)
         if self.apply_polygon_refinement:
@@ -125,21 +139,8 @@ class SegmentAnythingInvocation(BaseInvocation):
             - Removes small mask pieces.
             - Removes holes from the mask.
         """
-        # Convert tensor masks to np masks.
-        np_masks = [mask.cpu().numpy().astype(np.uint8) for mask in masks]
-
-        # Apply polygon refinement.
-        for idx, mask in enumerate(np_masks):
-            shape = mask.shape
-            assert len(shape) == 2  # Assert length to satisfy type checker.
-            polygon = mask_to_polygon(mask)
-            mask = polygon_to_mask(polygon, shape)
-            np_masks[idx] = mask
-
-        # Convert np masks back to tensor masks.
-        masks = [torch.tensor(mask, dtype=torch.bool) for mask in np_masks]
-
-        return masks
+        np_masks = torch.stack(masks).cpu().numpy()
+        return list(torch.from_numpy(refine_masks_with_polygons(np_masks)).unbind(dim=0))
 
     def _filter_masks(self, masks: list[torch.Tensor], bounding_boxes: list[BoundingBoxField]) -> list[torch.Tensor]:
         """Filter the detected masks based on the specified mask filter."""
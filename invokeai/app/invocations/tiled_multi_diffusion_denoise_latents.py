@@ -19,7 +19,7 @@ from invokeai.app.invocations.fields import (
     LatentsField,
     UIType,
 )
-from invokeai.app.invocations.model import UNetField
+from invokeai.app.invocations.model import UNetField, get_lora_patch_key
 from invokeai.app.invocations.primitives import LatentsOutput
 from invokeai.app.services.shared.invocation_context import InvocationContext
 from invokeai.backend.lora import LoRAModelRaw
@@ -204,7 +204,15 @@ class TiledMultiDiffusionDenoiseLatents(BaseInvocation):
         # Load the UNet model.
         unet_info = context.models.load(self.unet.unet)
 
-        with ExitStack() as exit_stack, unet_info as unet, ModelPatcher.apply_lora_unet(unet, _lora_loader()):
+        with (
+            ExitStack() as exit_stack,
+            unet_info as unet,
+            ModelPatcher.apply_lora_unet(
+                unet,
+                _lora_loader(),
+                fused_weights=unet_info.fused_weights(get_lora_patch_key(self.unet.loras, "lora_unet_")),
+            ),
+        ):
             assert isinstance(unet, UNet2DConditionModel)
             latents = latents.to(device=unet.device, dtype=unet.dtype)
             if noise is not None:
@@ -265,6 +273,7 @@ class TiledMultiDiffusionDenoiseLatents(BaseInvocation):
                 denoising_start=self.denoising_start,
                 denoising_end=self.denoising_end,
                 seed=seed,
+                scheduler_cache=context.models.get_scheduler_cache(),
             )
 
             # Run Multi-Diffusion denoising.
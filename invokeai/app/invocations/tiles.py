@@ -18,10 +18,10 @@ from invokeai.backend.tiles.tiles import (
     calc_tiles_even_split,
     calc_tiles_min_overlap,
     calc_tiles_with_overlap,
-    merge_tiles_with_linear_blending,
     merge_tiles_with_seam_blending,
 )
 from invokeai.backend.tiles.utils import Tile
+from invokeai.backend.tiles.weighted_merge import merge_tiles_with_weighted_blending
 
 
 class TileWithImage(BaseModel):
@@ -274,7 +274,7 @@ class MergeTilesToImageInvocation(BaseInvocation, WithMetadata, WithBoard):
         dtype = tile_np_images[0].dtype
         np_image = np.zeros(shape=(height, width, channels), dtype=dtype)
         if self.blend_mode == "Linear":
-            merge_tiles_with_linear_blending(
+            merge_tiles_with_weighted_blending(
                 dst_image=np_image, tiles=tiles, tile_images=tile_np_images, blend_amount=self.blend_amount
             )
         elif self.blend_mode == "Seam":
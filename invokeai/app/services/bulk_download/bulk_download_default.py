@@ -1,7 +1,12 @@
+import io
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Optional, Union
-from zipfile import ZipFile
+from typing import Iterator, Optional, Union
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
+
+from typing_extensions import Buffer
 
 from invokeai.app.services.board_records.board_records_common import BoardRecordNotFoundException
 from invokeai.app.services.bulk_download.bulk_download_base import BulkDownloadBase
@@ -11,11 +16,14 @@ from invokeai.app.services.bulk_download.bulk_download_common import (
     BulkDownloadParametersException,
     BulkDownloadTargetException,
 )
-from invokeai.app.services.image_records.image_records_common import ImageRecordNotFoundException
+from invokeai.app.services.image_records.image_records_common import ImageCategory, ImageRecordNotFoundException
 from invokeai.app.services.images.images_common import ImageDTO
 from invokeai.app.services.invoker import Invoker
 from invokeai.app.util.misc import uuid_string
 
+# The number of images read ahead of the one being written to a zip file.
+READ_AHEAD = 8
+
 
 class BulkDownloadService(BulkDownloadBase):
     def start(self, invoker: Invoker) -> None:
@@ -66,6 +74,19 @@ class BulkDownloadService(BulkDownloadBase):
         image_names = self._invoker.services.board_image_records.get_all_board_image_names_for_board(board_id)
         return self._image_handler(image_names)
 
+    def stream(self, image_names: Optional[list[str]], board_id: Optional[str]) -> Iterator[bytes]:
+        if board_id:
+            image_names = self._invoker.services.board_image_records.get_all_board_image_names_for_board(board_id)
+        elif not image_names:
+            raise BulkDownloadParametersException()
+
+        records = self._invoker.services.image_records.get_many_by_names(image_names)
+        if len(records) != len(image_names):
+            found = {r.image_name for r in records}
+            missing = [image_name for image_name in image_names if image_name not in found]
+            raise ImageRecordNotFoundException(f"Images not found: {', '.join(missing[:10])}")
+        return self._stream_zip([(r.image_category, r.image_name) for r in records])
+
     def generate_item_id(self, board_id: Optional[str]) -> str:
         return uuid_string() if board_id is None else self._get_clean_board_name(board_id) + "_" + uuid_string()
 
@@ -85,14 +106,42 @@ class BulkDownloadService(BulkDownloadBase):
         zip_file_name = bulk_download_item_id + ".zip"
         zip_file_path = self._bulk_downloads_folder / (zip_file_name)
 
-        with ZipFile(zip_file_path, "w") as zip_file:
-            for image_dto in image_dtos:
-                image_zip_path = Path(image_dto.image_category.value) / image_dto.image_name
-                image_disk_path = self._invoker.services.images.get_path(image_dto.image_name)
-                zip_file.write(image_disk_path, arcname=image_zip_path)
+        with open(zip_file_path, "wb") as zip_file:
+            for chunk in self._stream_zip([(d.image_category, d.image_name) for d in image_dtos]):
+                zip_file.write(chunk)
 
         return str(zip_file_name)
 
+    def _stream_zip(self, images: list[tuple[ImageCategory, str]]) -> Iterator[bytes]:
+        """
+        Produce a zip file of the given (category, name) images, yielding its bytes after each entry.
+
+        Images are already compressed, so the entries are stored rather than deflated. The next few images are read
+        from disk in background threads while the current one is written.
+        """
+        buffer = _ZipBuffer()
+        with ThreadPoolExecutor(max_workers=READ_AHEAD, thread_name_prefix="bulk_download") as executor:
+            pending: deque[Future[tuple[ZipInfo, bytes]]] = deque()
+            images_iter = iter(images)
+            with ZipFile(buffer, "w", compression=ZIP_STORED) as zip_file:
+                while True:
+                    for category, image_name in images_iter:
+                        pending.append(executor.submit(self._read_image, category, image_name))
+                        if len(pending) >= READ_AHEAD:
+                            break
+                    if not pending:
+                        break
+                    zip_info, data = pending.popleft().result()
+                    zip_file.writestr(zip_info, data)
+                    yield buffer.take()
+            yield buffer.take()
+
+    def _read_image(self, category: ImageCategory, image_name: str) -> tuple[ZipInfo, bytes]:
+        image_disk_path = self._invoker.services.images.get_path(image_name)
+        zip_info = ZipInfo.from_file(image_disk_path, arcname=f"{category.value}/{image_name}")
+        zip_info.compress_type = ZIP_STORED
+        return zip_info, Path(image_disk_path).read_bytes()
+
     # from https://stackoverflow.com/questions/7406102/create-sane-safe-filename-from-any-unsafe-string
     def _clean_string_to_path_safe(self, s: str) -> str:
         """Clean a string to be path safe."""
@@ -147,3 +196,23 @@ class BulkDownloadService(BulkDownloadBase):
         """Validates the path given for a bulk download."""
         path = path if isinstance(path, Path) else Path(path)
         return path.exists()
+
+
+class _ZipBuffer(io.RawIOBase):
+    """A write-only, unseekable stream that collects the bytes written by a ZipFile until they are taken."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Buffer) -> int:
+        data = bytes(b)
+        self._chunks.append(data)
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
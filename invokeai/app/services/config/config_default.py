@@ -26,6 +26,8 @@ DB_FILE = Path("invokeai.db")
 LEGACY_INIT_FILE = Path("invokeai.init")
 DEFAULT_RAM_CACHE = 10.0
 DEFAULT_VRAM_CACHE = 0.25
+DEFAULT_FUSED_LORA_CACHE = 2.0
+DEFAULT_SCHEDULER_CACHE = 32
 DEVICE = Literal["auto", "cpu", "cuda:0", "cuda:1", "cuda:2", "cuda:3", "cuda:4", "cuda:5", "cuda:6", "cuda:7", "mps"]
 PRECISION = Literal["auto", "float16", "bfloat16", "float32"]
 ATTENTION_TYPE = Literal["auto", "normal", "xformers", "sliced", "torch-sdp"]
@@ -91,6 +93,7 @@ class InvokeAIAppConfig(BaseSettings):
         db_dir: Path to InvokeAI databases directory.
         outputs_dir: Path to directory for outputs.
         custom_nodes_dir: Path to directory for custom nodes.
+        node_cache_dir: Path to the directory of the persistent node cache.
         log_handlers: Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".
         log_format: Log format. Use "plain" for text-only, "color" for colorized output, "legacy" for 2.3-style logging and "syslog" for syslog-style.<br>Valid values: `plain`, `color`, `syslog`, `legacy`
         log_level: Emit logging messages at this level or higher.<br>Valid values: `debug`, `info`, `warning`, `error`, `critical`
@@ -104,18 +107,26 @@ class InvokeAIAppConfig(BaseSettings):
         vram: Amount of VRAM reserved for model storage (GB).
         lazy_offload: Keep models in VRAM until their space is needed.
         log_memory_usage: If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.
+        tensor_cache_size: Maximum memory used to cache reusable intermediate tensors, such as prompt embeddings, across sessions (GB). Set to 0 to disable.
+        fused_lora_cache_size: Amount of VRAM used on each execution device to keep copies of model weights with LoRAs already applied, so that repeat generations with the same LoRAs skip patching (GB). The default holds an SDXL UNet patched by LoRAs that target its attention layers. The weights are dropped when VRAM is needed to load a model. Set to 0 to disable.
+        scheduler_cache_size: Number of built schedulers, and separately of timestep schedules, kept so that later sessions with the same scheduler and step count only copy them. Set to 0 to disable.
         devices: List of execution devices for rendering. Default will choose all available devices.
         precision: Floating point precision. `float16` will consume half the memory of `float32` but produce slightly lower-quality images. The `auto` setting will guess the proper precision based on your video card and operating system.<br>Valid values: `auto`, `float16`, `bfloat16`, `float32`
         sequential_guidance: Whether to calculate guidance in serial instead of in parallel, lowering memory requirements.
         attention_type: Attention type.<br>Valid values: `auto`, `normal`, `xformers`, `sliced`, `torch-sdp`
         attention_slice_size: Slice size, valid when attention_type=="sliced".<br>Valid values: `auto`, `balanced`, `max`, `1`, `2`, `3`, `4`, `5`, `6`, `7`, `8`
+        compile_unet: Whether to run the UNet through torch.compile. The first generation at each new image size or batch size is slow while the UNet is compiled; the compiled UNet is kept for later generations. Generations with IP-Adapters, regional prompts, FreeU or seamless tiling run uncompiled.
         force_tiled_decode: Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).
+        tiled_vae_batch_size: Number of tiles decoded or encoded at once by tiled VAE decode and encode. Larger batches are faster but use more VRAM.
+        tiled_vae_devices: Maximum number of execution devices used by tiled VAE decode and encode. Devices other than the session's own are only used while they are idle.
         pil_compress_level: The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.
         max_queue_size: Maximum number of items in the session queue.
         clear_queue_on_startup: Empties session queue on startup.
+        max_fused_runs: Maximum number of queue items from the same batch that differ only by seed to run together, as one batched generation. Set to 1 to run every queue item on its own.
         allow_nodes: List of nodes to allow. Omit to allow all.
         deny_nodes: List of nodes to deny. Omit to deny none.
         node_cache_size: How many cached nodes to keep in memory.
+        node_cache_disk_size: Maximum disk space used to persist cached node outputs, so that they survive restarts and are shared by processes on the same host (GB). Requires `node_cache_size` > 0. Set to 0 to disable.
         hashing_algorithm: Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.<br>Valid values: `blake3_multi`, `blake3_single`, `random`, `md5`, `sha1`, `sha224`, `sha256`, `sha384`, `sha512`, `blake2b`, `blake2s`, `sha3_224`, `sha3_256`, `sha3_384`, `sha3_512`, `shake_128`, `shake_256`
         remote_api_tokens: List of regular expression and token pairs used when downloading models from URLs. The download URL is tested against the regex, and if it matches, the token is provided in as a Bearer token.
         scan_models_on_startup: Scan the models directory on startup, registering orphaned models. This is typically only used in conjunction with `use_memory_db` for testing purposes.
@@ -153,6 +164,7 @@ class InvokeAIAppConfig(BaseSettings):
     db_dir:                        Path = Field(default=Path("databases"),  description="Path to InvokeAI databases directory.")
     outputs_dir:                   Path = Field(default=Path("outputs"),    description="Path to directory for outputs.")
     custom_nodes_dir:              Path = Field(default=Path("nodes"),      description="Path to directory for custom nodes.")
+    node_cache_dir:                Path = Field(default=Path("node_cache"), description="Path to the directory of the persistent node cache.")
 
     # LOGGING
     log_handlers:             list[str] = Field(default=["console"],        description='Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".')
@@ -173,6 +185,9 @@ class InvokeAIAppConfig(BaseSettings):
     vram:                          float = Field(default=DEFAULT_VRAM_CACHE, ge=0, description="Amount of VRAM reserved for model storage (GB).")
     lazy_offload:                  bool = Field(default=True,               description="Keep models in VRAM until their space is needed.")
     log_memory_usage:              bool = Field(default=False,              description="If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.")
+    tensor_cache_size:             float = Field(default=0.5, ge=0,          description="Maximum memory used to cache reusable intermediate tensors, such as prompt embeddings, across sessions (GB). Set to 0 to disable.")
+    fused_lora_cache_size:         float = Field(default=DEFAULT_FUSED_LORA_CACHE, ge=0, description="Amount of VRAM used on each execution device to keep copies of model weights with LoRAs already applied, so that repeat generations with the same LoRAs skip patching (GB). The default holds an SDXL UNet patched by LoRAs that target its attention layers. The weights are dropped when VRAM is needed to load a model. Set to 0 to disable.")
+    scheduler_cache_size:           int = Field(default=DEFAULT_SCHEDULER_CACHE, ge=0, description="Number of built schedulers, and separately of timestep schedules, kept so that later sessions with the same scheduler and step count only copy them. Set to 0 to disable.")
 
     # DEVICE
     devices:      Optional[list[DEVICE]] = Field(default=None,              description="List of execution devices for rendering. Default will choose all available devices.")
@@ -182,15 +197,20 @@ class InvokeAIAppConfig(BaseSettings):
     sequential_guidance:           bool = Field(default=False,              description="Whether to calculate guidance in serial instead of in parallel, lowering memory requirements.")
     attention_type:      ATTENTION_TYPE = Field(default="auto",             description="Attention type.")
     attention_slice_size: ATTENTION_SLICE_SIZE = Field(default="auto",      description='Slice size, valid when attention_type=="sliced".')
+    compile_unet:                  bool = Field(default=False,              description="Whether to run the UNet through torch.compile. The first generation at each new image size or batch size is slow while the UNet is compiled; the compiled UNet is kept for later generations. Generations with IP-Adapters, regional prompts, FreeU or seamless tiling run uncompiled.")
     force_tiled_decode:            bool = Field(default=False,              description="Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).")
+    tiled_vae_batch_size:           int = Field(default=1, gt=0,            description="Number of tiles decoded or encoded at once by tiled VAE decode and encode. Larger batches are faster but use more VRAM.")
+    tiled_vae_devices:              int = Field(default=1, gt=0,            description="Maximum number of execution devices used by tiled VAE decode and encode. Devices other than the session's own are only used while they are idle.")
     pil_compress_level:             int = Field(default=1,                  description="The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.")
     max_queue_size:                 int = Field(default=10000, gt=0,        description="Maximum number of items in the session queue.")
     clear_queue_on_startup:        bool = Field(default=False,              description="Empties session queue on startup.")
+    max_fused_runs:                 int = Field(default=1, ge=1,            description="Maximum number of queue items from the same batch that differ only by seed to run together, as one batched generation. Set to 1 to run every queue item on its own.")
 
     # NODES
     allow_nodes:    Optional[list[str]] = Field(default=None,               description="List of nodes to allow. Omit to allow all.")
     deny_nodes:     Optional[list[str]] = Field(default=None,               description="List of nodes to deny. Omit to deny none.")
     node_cache_size:                int = Field(default=512,                description="How many cached nodes to keep in memory.")
+    node_cache_disk_size:         float = Field(default=0.0, ge=0,          description="Maximum disk space used to persist cached node outputs, so that they survive restarts and are shared by processes on the same host (GB). Requires `node_cache_size` > 0. Set to 0 to disable.")
 
     # MODEL INSTALL
     hashing_algorithm: HASHING_ALGORITHMS = Field(default="blake3_single",  description="Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.")
@@ -290,6 +310,11 @@ class InvokeAIAppConfig(BaseSettings):
         assert db_dir is not None
         return db_dir / DB_FILE
 
+    @property
+    def node_cache_path(self) -> Path:
+        """Path to the persistent node cache directory, resolved to an absolute path.."""
+        return self._resolve(self.node_cache_dir)
+
     @property
     def legacy_conf_path(self) -> Path:
         """Path to directory of legacy configuration files (e.g. v1-inference.yaml), resolved to an absolute path.."""
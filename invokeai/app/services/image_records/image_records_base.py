@@ -28,6 +28,14 @@ class ImageRecordStorageBase(ABC):
         """Gets an image's metadata'."""
         pass
 
+    @abstractmethod
+    def get_many_by_names(self, image_names: list[str]) -> list[ImageRecord]:
+        """Gets the image records with the given names, in the same order, with a single query.
+
+        Names without a record are skipped.
+        """
+        pass
+
     @abstractmethod
     def update(
         self,
@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import threading
 from datetime import datetime
@@ -56,6 +57,29 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
 
         return deserialize_image_record(dict(result))
 
+    def get_many_by_names(self, image_names: list[str]) -> list[ImageRecord]:
+        try:
+            self._lock.acquire()
+
+            # The names are passed as one JSON array, so there is no limit on the number of names.
+            self._cursor.execute(
+                f"""--sql
+                SELECT {IMAGE_DTO_COLS} FROM images
+                WHERE image_name IN (SELECT value FROM json_each(?));
+                """,
+                (json.dumps(image_names),),
+            )
+
+            result = cast(list[sqlite3.Row], self._cursor.fetchall())
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            raise ImageRecordNotFoundException from e
+        finally:
+            self._lock.release()
+
+        records = {r.image_name: r for r in (deserialize_image_record(dict(row)) for row in result)}
+        return [records[image_name] for image_name in image_names if image_name in records]
+
     def get_metadata(self, image_name: str) -> Optional[MetadataField]:
         try:
             self._lock.acquire()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from typing import Optional, Union
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
@@ -19,6 +20,10 @@ class InvocationCacheBase(ABC):
 
     Implementations should respect the `node_cache_size` configuration value, and skip all
     cache logic if the value is set to 0.
+
+    Implementations also track invocations that are in flight, so that when several
+    session workers run identical invocations at the same time, only the first one
+    executes and the others wait for its output.
     """
 
     @abstractmethod
@@ -31,6 +36,21 @@ class InvocationCacheBase(ABC):
         """Stores an invocation output in the cache"""
         pass
 
+    @abstractmethod
+    def begin_invocation(self, key: Union[int, str]) -> Optional["Future[Optional[BaseInvocationOutput]]"]:
+        """Marks the invocation as in flight, unless it is cached or already in flight.
+
+        Returns None if the caller should execute the invocation, and then call `end_invocation()`.
+        Otherwise returns a future of the cached or in-flight output. The future resolves to
+        None if the in-flight invocation failed, in which case the caller should try again.
+        """
+        pass
+
+    @abstractmethod
+    def end_invocation(self, key: Union[int, str], invocation_output: Optional[BaseInvocationOutput]) -> None:
+        """Marks the invocation as no longer in flight, passing its output (None on failure) to any waiters"""
+        pass
+
     @abstractmethod
     def delete(self, key: Union[int, str]) -> None:
         """Deletes an invocation output from the cache"""
@@ -43,7 +63,7 @@ class InvocationCacheBase(ABC):
 
     @staticmethod
     @abstractmethod
-    def create_key(invocation: BaseInvocation) -> int:
+    def create_key(invocation: BaseInvocation) -> Union[int, str]:
         """Gets the key for the invocation's cache item"""
         pass
 
@@ -0,0 +1,260 @@
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterator, Literal, Optional, Union
+
+import torch
+from pydantic import BaseModel
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
+from invokeai.app.invocations.fields import (
+    ConditioningField,
+    DenoiseMaskField,
+    ImageField,
+    LatentsField,
+    TensorField,
+)
+from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
+from invokeai.app.services.invoker import Invoker
+from invokeai.version.invokeai_version import __version__
+
+# actual size of a gig
+GIG = 1073741824
+
+ObjectKind = Literal["tensors", "conditioning"]
+
+# The fields of invocation outputs that reference objects in the `tensors` and `conditioning` services.
+OBJECT_REFERENCES: dict[type[BaseModel], dict[str, ObjectKind]] = {
+    LatentsField: {"latents_name": "tensors"},
+    TensorField: {"tensor_name": "tensors"},
+    DenoiseMaskField: {"mask_name": "tensors", "masked_latents_name": "tensors"},
+    ConditioningField: {"conditioning_name": "conditioning"},
+}
+
+
+class DiskInvocationCache(MemoryInvocationCache):
+    """An invocation cache that keeps outputs in memory, and also persists them on disk.
+
+    Saved outputs are written to a SQLite index in `cache_dir`, together with copies of the tensors and
+    conditioning that they reference, so that they can be served after a restart, or by other processes on
+    the same host. On a memory miss the disk is checked, and on a disk hit the referenced objects are saved
+    to the `tensors` and `conditioning` services again under new names. Noise names describe the noise, which
+    is generated again when it is loaded, so they are kept as they are.
+
+    Keys are a hash of the invocation (which includes the hashes of the models it references), its version
+    and the InvokeAI version, so they are stable across restarts. The least recently used entries are
+    deleted when the disk cache grows past `max_disk_size`.
+
+    :param max_cache_size: Maximum number of outputs kept in memory
+    :param cache_dir: Directory of the disk cache
+    :param max_disk_size: Maximum size of the disk cache (GB)
+    """
+
+    def __init__(self, max_cache_size: int, cache_dir: Path, max_disk_size: float) -> None:
+        super().__init__(max_cache_size=max_cache_size)
+        self._cache_dir = cache_dir
+        self._entries_dir = cache_dir / "entries"
+        self._entries_dir.mkdir(parents=True, exist_ok=True)
+        self._max_disk_bytes = int(max_disk_size * GIG)
+        self._disk_lock = Lock()
+        self._conn = sqlite3.connect(cache_dir / "index.db", check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute(
+            """--sql
+            CREATE TABLE IF NOT EXISTS invocation_cache (
+                key TEXT NOT NULL PRIMARY KEY,
+                output_json TEXT NOT NULL,
+                object_kinds TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS invocation_cache_last_access ON invocation_cache(last_access);")
+        self._conn.commit()
+
+    def stop(self, invoker: Invoker) -> None:
+        with self._disk_lock:
+            self._conn.close()
+
+    @staticmethod
+    def create_key(invocation: BaseInvocation) -> str:
+        invocation_json = invocation.model_dump_json(exclude={"id"}, warnings=False)
+        version = invocation.UIConfig.version
+        return hashlib.sha256(f"{__version__}:{version}:{invocation_json}".encode("utf-8")).hexdigest()
+
+    def get(self, key: Union[int, str]) -> Optional[BaseInvocationOutput]:
+        output = super().get(key)
+        if output is not None or self._max_cache_size == 0 or self._disabled:
+            return output
+        output = self._load(str(key))
+        if output is not None:
+            with self._lock:
+                # Count this as a hit, not as the memory miss above.
+                self._hits += 1
+                self._misses -= 1
+            super().save(key, output)
+        return output
+
+    def save(self, key: Union[int, str], invocation_output: BaseInvocationOutput) -> None:
+        super().save(key, invocation_output)
+        if self._max_cache_size == 0 or self._disabled:
+            return
+        try:
+            self._store(str(key), invocation_output)
+        except Exception as e:
+            self._invoker.services.logger.warning(f"Failed to save invocation output to the disk cache: {e}")
+
+    def delete(self, key: Union[int, str]) -> None:
+        super().delete(key)
+        with self._disk_lock:
+            self._delete_entries([str(key)])
+
+    def clear(self) -> None:
+        super().clear()
+        with self._disk_lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM invocation_cache;")]
+            self._delete_entries(keys)
+
+    def _delete_by_match(self, to_match: str) -> None:
+        super()._delete_by_match(to_match)
+        # Referenced tensors and conditioning are copied into the disk cache, so only images need to be matched.
+        with self._disk_lock:
+            keys = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT key FROM invocation_cache WHERE instr(output_json, ?) > 0;", (f'"{to_match}"',)
+                )
+            ]
+            self._delete_entries(keys)
+
+    def disk_size(self) -> int:
+        """Returns the number of bytes used by the disk cache"""
+        with self._disk_lock:
+            size: int = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM invocation_cache;").fetchone()[0]
+            return size
+
+    def _store(self, key: str, invocation_output: BaseInvocationOutput) -> None:
+        # Replace the names of referenced objects with placeholders, and copy the objects into the entry.
+        output = invocation_output.model_copy(deep=True)
+        services = self._invoker.services
+        references = [
+            (field, attr, kind)
+            for field, attr, kind in _iter_object_references(output)
+            if not services.noise.is_noise(getattr(field, attr))
+        ]
+        with tempfile.TemporaryDirectory(dir=self._entries_dir, ignore_cleanup_errors=True) as tmp_dir:
+            object_kinds: list[str] = []
+            for index, (field, attr, kind) in enumerate(references):
+                obj = (services.tensors if kind == "tensors" else services.conditioning).load(getattr(field, attr))
+                torch.save(obj, Path(tmp_dir) / str(index))
+                setattr(field, attr, str(index))
+                object_kinds.append(kind)
+            output_json = output.model_dump_json(warnings=False)
+            size = len(output_json) + sum(f.stat().st_size for f in Path(tmp_dir).iterdir())
+            if size > self._max_disk_bytes:
+                return
+
+            with self._disk_lock:
+                if self._conn.execute("SELECT 1 FROM invocation_cache WHERE key = ?;", (key,)).fetchone():
+                    return
+                entry_dir = self._entry_dir(key)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                Path(tmp_dir).rename(entry_dir)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO invocation_cache (key, output_json, object_kinds, size, last_access) VALUES (?, ?, ?, ?, ?);",
+                    (key, output_json, ",".join(object_kinds), size, time.time()),
+                )
+                self._conn.commit()
+                self._evict()
+
+    def _load(self, key: str) -> Optional[BaseInvocationOutput]:
+        with self._disk_lock:
+            row = self._conn.execute(
+                "SELECT output_json, object_kinds FROM invocation_cache WHERE key = ?;", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE invocation_cache SET last_access = ? WHERE key = ?;", (time.time(), key))
+            self._conn.commit()
+        output_json, object_kinds = row
+        services = self._invoker.services
+        try:
+            output: BaseInvocationOutput = BaseInvocationOutput.get_typeadapter().validate_json(output_json)
+            # Images are not copied, so the output is only usable if they still exist.
+            for image_name in _iter_image_names(output):
+                if not services.image_files.get_path(image_name).exists():
+                    raise FileNotFoundError(image_name)
+            entry_dir = self._entry_dir(key)
+            kinds = object_kinds.split(",") if object_kinds else []
+            for field, attr, _ in _iter_object_references(output):
+                if services.noise.is_noise(getattr(field, attr)):
+                    continue
+                index = int(getattr(field, attr))
+                obj = torch.load(entry_dir / str(index))
+                storage = services.tensors if kinds[index] == "tensors" else services.conditioning
+                setattr(field, attr, storage.save(obj))
+        except Exception as e:
+            services.logger.debug(f"Dropping unusable disk cache entry {key}: {e}")
+            with self._disk_lock:
+                self._delete_entries([key])
+            return None
+        return output
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries until the disk cache fits in its budget. Call with the lock held."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM invocation_cache;").fetchone()[0]
+        if total <= self._max_disk_bytes:
+            return
+        keys: list[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM invocation_cache ORDER BY last_access;"):
+            if total <= self._max_disk_bytes:
+                break
+            keys.append(key)
+            total -= size
+        self._delete_entries(keys)
+
+    def _delete_entries(self, keys: list[str]) -> None:
+        """Deletes entries from the index and from disk. Call with the lock held."""
+        if not keys:
+            return
+        self._conn.executemany("DELETE FROM invocation_cache WHERE key = ?;", [(key,) for key in keys])
+        self._conn.commit()
+        for key in keys:
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _entry_dir(self, key: str) -> Path:
+        return self._entries_dir / key
+
+
+def _iter_fields(value: Any) -> Iterator[BaseModel]:
+    """Yields the pydantic models in a value, recursively."""
+    if isinstance(value, BaseModel):
+        yield value
+        for field_name in value.model_fields:
+            yield from _iter_fields(getattr(value, field_name))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_fields(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_fields(item)
+
+
+def _iter_object_references(output: BaseInvocationOutput) -> Iterator[tuple[BaseModel, str, ObjectKind]]:
+    """Yields the (field, attribute, kind) of every reference to a tensor or conditioning object in an output."""
+    for field in _iter_fields(output):
+        for attr, kind in OBJECT_REFERENCES.get(type(field), {}).items():
+            if getattr(field, attr) is not None:
+                yield field, attr, kind
+
+
+def _iter_image_names(output: BaseInvocationOutput) -> Iterator[str]:
+    """Yields the names of the images referenced by an output."""
+    for field in _iter_fields(output):
+        if isinstance(field, ImageField):
+            yield field.image_name
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from concurrent.futures import Future
 from dataclasses import dataclass, field
 from threading import Lock
 from typing import Optional, Union
@@ -23,9 +24,11 @@ class MemoryInvocationCache(InvocationCacheBase):
     _misses: int
     _invoker: Invoker
     _lock: Lock
+    _in_flight: dict[Union[int, str], "Future[Optional[BaseInvocationOutput]]"]
 
     def __init__(self, max_cache_size: int = 0) -> None:
         self._cache = OrderedDict()
+        self._in_flight = {}
         self._max_cache_size = max_cache_size
         self._disabled = False
         self._hits = 0
@@ -64,6 +67,29 @@ class MemoryInvocationCache(InvocationCacheBase):
                 invocation_output.model_dump_json(warnings=False, exclude_defaults=True, exclude_unset=True),
             )
 
+    def begin_invocation(self, key: Union[int, str]) -> Optional["Future[Optional[BaseInvocationOutput]]"]:
+        with self._lock:
+            if self._max_cache_size == 0 or self._disabled:
+                return None
+            # The output may have been saved since the caller's cache miss.
+            item = self._cache.get(key, None)
+            if item is not None:
+                self._cache.move_to_end(key)
+                future: Future[Optional[BaseInvocationOutput]] = Future()
+                future.set_result(item.invocation_output)
+                return future
+            in_flight = self._in_flight.get(key, None)
+            if in_flight is not None:
+                return in_flight
+            self._in_flight[key] = Future()
+            return None
+
+    def end_invocation(self, key: Union[int, str], invocation_output: Optional[BaseInvocationOutput]) -> None:
+        with self._lock:
+            in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None:
+            in_flight.set_result(invocation_output)
+
     def _delete_oldest_access(self, number_to_delete: int) -> None:
         number_to_delete = min(number_to_delete, len(self._cache))
         for _ in range(number_to_delete):
@@ -88,7 +114,7 @@ class MemoryInvocationCache(InvocationCacheBase):
             self._hits = 0
 
     @staticmethod
-    def create_key(invocation: BaseInvocation) -> int:
+    def create_key(invocation: BaseInvocation) -> Union[int, str]:
         return hash(invocation.model_dump_json(exclude={"id"}, warnings=False))
 
     def disable(self) -> None:
@@ -78,6 +78,8 @@ class ModelManagerService(ModelManagerServiceBase):
         ram_cache = ModelCache(
             max_cache_size=app_config.ram,
             max_vram_cache_size=app_config.vram,
+            max_fused_lora_cache_size=app_config.fused_lora_cache_size,
+            max_scheduler_cache_entries=app_config.scheduler_cache_size,
             logger=logger,
         )
         loader = ModelLoadService(
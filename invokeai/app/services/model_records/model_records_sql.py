@@ -68,7 +68,12 @@ from invokeai.backend.model_manager.config import (
 
 
 class ModelRecordServiceSQL(ModelRecordServiceBase):
-    """Implementation of the ModelConfigStore ABC using a SQL database."""
+    """Implementation of the ModelConfigStore ABC using a SQL database.
+
+    Configs fetched by key or by hash are cached in memory, so that repeat lookups skip the database lock, the
+    query and the parsing of the config. The cache is invalidated whenever a model is added, updated or deleted.
+    Cached configs are never handed out directly: callers get a copy, which they are free to modify.
+    """
 
     def __init__(self, db: SqliteDatabase, logger: logging.Logger):
         """
@@ -80,6 +85,8 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
         self._db = db
         self._cursor = db.conn.cursor()
         self._logger = logger
+        self._configs: dict[str, AnyModelConfig] = {}
+        self._keys_by_hash: dict[str, str] = {}
 
     @property
     def db(self) -> SqliteDatabase:
@@ -112,6 +119,7 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
                     ),
                 )
                 self._db.conn.commit()
+                self._invalidate(config.key)
 
             except sqlite3.IntegrityError as e:
                 self._db.conn.rollback()
@@ -151,6 +159,7 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
                 if self._cursor.rowcount == 0:
                     raise UnknownModelException("model not found")
                 self._db.conn.commit()
+                self._invalidate(key)
             except sqlite3.Error as e:
                 self._db.conn.rollback()
                 raise e
@@ -178,6 +187,7 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
                 if self._cursor.rowcount == 0:
                     raise UnknownModelException("model not found")
                 self._db.conn.commit()
+                self._invalidate(key)
             except sqlite3.Error as e:
                 self._db.conn.rollback()
                 raise e
@@ -192,34 +202,48 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
 
         Exceptions: UnknownModelException
         """
-        with self._db.lock:
-            self._cursor.execute(
-                """--sql
-                SELECT config, strftime('%s',updated_at) FROM models
-                WHERE id=?;
-                """,
-                (key,),
-            )
-            rows = self._cursor.fetchone()
-            if not rows:
-                raise UnknownModelException("model not found")
-            model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
-        return model
+        model = self._configs.get(key)
+        if model is None:
+            with self._db.lock:
+                self._cursor.execute(
+                    """--sql
+                    SELECT config, strftime('%s',updated_at) FROM models
+                    WHERE id=?;
+                    """,
+                    (key,),
+                )
+                rows = self._cursor.fetchone()
+                if not rows:
+                    raise UnknownModelException("model not found")
+                model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
+                self._configs[key] = model
+        return model.model_copy()
 
     def get_model_by_hash(self, hash: str) -> AnyModelConfig:
-        with self._db.lock:
-            self._cursor.execute(
-                """--sql
-                SELECT config, strftime('%s',updated_at) FROM models
-                WHERE hash=?;
-                """,
-                (hash,),
-            )
-            rows = self._cursor.fetchone()
-            if not rows:
-                raise UnknownModelException("model not found")
-            model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
-        return model
+        key = self._keys_by_hash.get(hash)
+        model = self._configs.get(key) if key is not None else None
+        if model is None:
+            with self._db.lock:
+                self._cursor.execute(
+                    """--sql
+                    SELECT config, strftime('%s',updated_at) FROM models
+                    WHERE hash=?;
+                    """,
+                    (hash,),
+                )
+                rows = self._cursor.fetchone()
+                if not rows:
+                    raise UnknownModelException("model not found")
+                model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
+                self._configs[model.key] = model
+                self._keys_by_hash[hash] = model.key
+        return model.model_copy()
+
+    def _invalidate(self, key: str) -> None:
+        """Drop the cached config of a model that was added, updated or deleted. Call with the database lock held."""
+        self._configs.pop(key, None)
+        # Which model a hash resolves to can change with any write, so the hash index is rebuilt on demand.
+        self._keys_by_hash.clear()
 
     def exists(self, key: str) -> bool:
         """
@@ -0,0 +1,36 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import torch
+
+from invokeai.app.services.noise.noise_common import NoiseSpec
+
+
+class NoiseServiceBase(ABC):
+    """
+    Base class for the noise service.
+
+    Noise is fully determined by its `NoiseSpec`, so instead of being saved with the other tensors,
+    it is named after its spec and generated again whenever it is loaded. Implementations may keep
+    recently used noise in memory. Loaded noise must be treated as read-only.
+    """
+
+    @abstractmethod
+    def save(self, spec: NoiseSpec) -> str:
+        """Returns the name of the noise described by spec, which can be passed to `load()`."""
+        pass
+
+    @abstractmethod
+    def is_noise(self, name: str) -> bool:
+        """Returns True if name is the name of noise from this service."""
+        pass
+
+    @abstractmethod
+    def load(self, name: str, device: Optional[torch.device] = None) -> torch.Tensor:
+        """Returns the noise with the given name on device, or on the CPU if device is None."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Forgets all recently used noise."""
+        pass
@@ -0,0 +1,59 @@
+import re
+from dataclasses import dataclass
+from typing import Literal, Tuple
+
+import torch
+
+from invokeai.backend.util.devices import NAME_TO_PRECISION, PRECISION_TO_NAME
+
+NOISE_GENERATOR = Literal["cpu", "philox"]
+
+_NOISE_NAME_PATTERN = re.compile(
+    r"^noise_(?P<seed>\d+)_(?P<channels>\d+)x(?P<height>\d+)x(?P<width>\d+)_(?P<generator>cpu|philox)_(?P<dtype>\w+)$"
+)
+
+
+class InvalidNoiseNameError(ValueError):
+    """Raised when a name does not describe noise."""
+
+
+@dataclass(frozen=True)
+class NoiseSpec:
+    """Everything that determines a noise tensor.
+
+    `cpu` noise is drawn with torch's CPU generator. `philox` noise is drawn with the counter-based
+    Philox generator, which gives the same noise on every device.
+    """
+
+    seed: int
+    channels: int
+    height: int
+    width: int
+    generator: NOISE_GENERATOR
+    dtype: torch.dtype
+
+    @property
+    def shape(self) -> Tuple[int, int, int, int]:
+        return (1, self.channels, self.height, self.width)
+
+    @property
+    def name(self) -> str:
+        """The name of the noise, from which the spec can be recovered."""
+        return (
+            f"noise_{self.seed}_{self.channels}x{self.height}x{self.width}_{self.generator}_"
+            f"{PRECISION_TO_NAME[self.dtype]}"
+        )
+
+    @classmethod
+    def from_name(cls, name: str) -> "NoiseSpec":
+        match = _NOISE_NAME_PATTERN.match(name)
+        if match is None or match["dtype"] not in NAME_TO_PRECISION:
+            raise InvalidNoiseNameError(f"'{name}' is not a noise name")
+        return cls(
+            seed=int(match["seed"]),
+            channels=int(match["channels"]),
+            height=int(match["height"]),
+            width=int(match["width"]),
+            generator=match["generator"],  # type: ignore
+            dtype=NAME_TO_PRECISION[match["dtype"]],  # type: ignore
+        )
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+import torch
+
+from invokeai.app.services.noise.noise_base import NoiseServiceBase
+from invokeai.app.services.noise.noise_common import InvalidNoiseNameError, NoiseSpec
+from invokeai.backend.util.philox import philox_randn
+
+
+class NoiseService(NoiseServiceBase):
+    """Generates noise on demand and keeps the most recently used noise tensors, per device, in an LRU."""
+
+    def __init__(self, max_entries: int = 32) -> None:
+        """
+        Initialize the noise service.
+
+        :param max_entries: Maximum number of noise tensors to keep. Set to 0 to always generate noise again.
+        """
+        self._cache: OrderedDict[Tuple[NoiseSpec, torch.device], torch.Tensor] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = Lock()
+
+    def save(self, spec: NoiseSpec) -> str:
+        return spec.name
+
+    def is_noise(self, name: str) -> bool:
+        try:
+            NoiseSpec.from_name(name)
+        except InvalidNoiseNameError:
+            return False
+        return True
+
+    def load(self, name: str, device: Optional[torch.device] = None) -> torch.Tensor:
+        return self._get(NoiseSpec.from_name(name), torch.device(device or "cpu"))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _get(self, spec: NoiseSpec, device: torch.device) -> torch.Tensor:
+        key = (spec, device)
+        with self._lock:
+            noise = self._cache.get(key)
+            if noise is not None:
+                self._cache.move_to_end(key)
+                return noise
+
+        if spec.generator == "philox":
+            # Philox noise does not depend on the device, so it is generated where it is needed.
+            noise = philox_randn(spec.shape, seed=spec.seed, device=device, dtype=spec.dtype)
+        elif device.type != "cpu":
+            noise = self._get(spec, torch.device("cpu")).to(device)
+        else:
+            generator = torch.Generator(device="cpu").manual_seed(spec.seed)
+            noise = torch.randn(spec.shape, dtype=spec.dtype, device="cpu", generator=generator)
+
+        with self._lock:
+            if self._max_entries > 0:
+                self._cache[key] = noise
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._max_entries:
+                    self._cache.popitem(last=False)
+        return noise
@@ -35,6 +35,17 @@ class SessionRunnerBase(ABC):
         """
         pass
 
+    def run_fused(self, queue_items: list[SessionQueueItem]) -> None:
+        """Runs several sessions from the same batch that differ only by seed.
+
+        Runners that can share work between such sessions override this. By default, the sessions are run one by one.
+
+        Args:
+            queue_items: The sessions to run.
+        """
+        for queue_item in queue_items:
+            self.run(queue_item=queue_item)
+
     @abstractmethod
     def run_node(self, invocation: BaseInvocation, queue_item: SessionQueueItem) -> None:
         """Run a single node in the graph.
@@ -1,5 +1,5 @@
 import traceback
-from contextlib import suppress
+from contextlib import ExitStack, suppress
 from queue import Queue
 from threading import BoundedSemaphore, Lock, Thread
 from threading import Event as ThreadEvent
@@ -29,7 +29,11 @@ from invokeai.app.services.session_processor.session_processor_base import (
 from invokeai.app.services.session_processor.session_processor_common import CanceledException, SessionProcessorStatus
 from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem, SessionQueueItemNotFoundError
 from invokeai.app.services.shared.graph import NodeInputError
-from invokeai.app.services.shared.invocation_context import InvocationContextData, build_invocation_context
+from invokeai.app.services.shared.invocation_context import (
+    InvocationContext,
+    InvocationContextData,
+    build_invocation_context,
+)
 from invokeai.app.util.profiler import Profiler
 from invokeai.backend.util.devices import TorchDevice
 
@@ -120,16 +124,7 @@ class DefaultSessionRunner(SessionRunnerBase):
             with self._services.performance_statistics.collect_stats(invocation, queue_item.session_id):
                 self._on_before_run_node(invocation, queue_item)
 
-                data = InvocationContextData(
-                    invocation=invocation,
-                    source_invocation_id=queue_item.session.prepared_source_mapping[invocation.id],
-                    queue_item=queue_item,
-                )
-                context = build_invocation_context(
-                    data=data,
-                    services=self._services,
-                    is_canceled=self._is_canceled,
-                )
+                context = self._build_invocation_context(invocation, queue_item)
 
                 # Invoke the node
                 output = invocation.invoke_internal(context=context, services=self._services)
@@ -161,6 +156,137 @@ class DefaultSessionRunner(SessionRunnerBase):
                 error_traceback=error_traceback,
             )
 
+    def run_fused(self, queue_items: list[SessionQueueItem]) -> None:
+        # cProfile can only profile one session at a time, so profiled sessions are run one by one.
+        if len(queue_items) == 1 or self._profiler is not None:
+            return super().run_fused(queue_items)
+
+        for queue_item in queue_items:
+            self._on_before_run_session(queue_item=queue_item)
+
+        # The sessions have the same graph, so they are advanced in lockstep and get the same invocation on each step.
+        active_queue_items = list(queue_items)
+        while active_queue_items:
+            steps: list[tuple[BaseInvocation, SessionQueueItem]] = []
+            for queue_item in active_queue_items:
+                try:
+                    with self._process_lock:
+                        invocation = queue_item.session.next()
+                except NodeInputError as e:
+                    self._on_node_error(
+                        invocation=e.node,
+                        queue_item=queue_item,
+                        error_type=e.__class__.__name__,
+                        error_message=str(e),
+                        error_traceback=traceback.format_exc(),
+                    )
+                    continue
+                if invocation is not None:
+                    steps.append((invocation, queue_item))
+
+            if not steps or self._is_canceled():
+                break
+
+            self.run_fused_nodes(steps)
+
+            if self._is_canceled():
+                break
+            active_queue_items = [
+                queue_item
+                for _, queue_item in steps
+                if not queue_item.session.is_complete() and queue_item.status not in ["failed", "canceled", "completed"]
+            ]
+
+        if self._is_canceled():
+            # Canceling one session interrupts the nodes it shares with the others. Their sessions cannot be resumed, so
+            # they are canceled too, instead of being completed without their outputs.
+            for queue_item in queue_items:
+                if not queue_item.session.is_complete():
+                    self._cancel_unfinished_queue_item(queue_item)
+
+        for queue_item in queue_items:
+            self._on_after_run_session(queue_item=queue_item)
+
+    def _cancel_unfinished_queue_item(self, queue_item: SessionQueueItem) -> None:
+        with suppress(SessionQueueItemNotFoundError):
+            status = self._services.session_queue.get_queue_item(queue_item.item_id).status
+            if status not in ["canceled", "failed", "completed"]:
+                self._services.session_queue.cancel_queue_item(queue_item.item_id)
+
+    def run_fused_nodes(self, steps: list[tuple[BaseInvocation, SessionQueueItem]]) -> None:
+        """Run the next node of several sessions that differ only by seed, together if the node supports it.
+
+        Args:
+            steps: The invocation to run in each session, with the session queue item.
+        """
+        invocations = [invocation for invocation, _ in steps]
+        queue_items = [queue_item for _, queue_item in steps]
+        source_invocation_ids = {
+            queue_item.session.prepared_source_mapping[invocation.id] for invocation, queue_item in steps
+        }
+        invocation_type = type(invocations[0])
+        contexts = [self._build_invocation_context(invocation, queue_item) for invocation, queue_item in steps]
+
+        can_fuse = False
+        if len(steps) > 1 and len(source_invocation_ids) == 1:
+            try:
+                can_fuse = invocation_type.can_fuse(invocations, contexts)
+            except Exception as e:
+                # The invocations are run one by one instead, which reports any real problem with their inputs.
+                self._services.logger.debug(f"Not fusing {invocation_type.get_type()}: {e}")
+
+        if not can_fuse:
+            for invocation, queue_item in steps:
+                self.run_node(invocation, queue_item)
+            return
+
+        try:
+            # Any unhandled exception in this scope is an invocation error & will fail all of the graphs
+            with ExitStack() as exit_stack:
+                for invocation, queue_item in steps:
+                    exit_stack.enter_context(
+                        self._services.performance_statistics.collect_stats(invocation, queue_item.session_id)
+                    )
+                for invocation, queue_item in steps:
+                    self._on_before_run_node(invocation, queue_item)
+
+                # Invoke the nodes
+                outputs = invocation_type.invoke_fused_internal(invocations, contexts)
+                # Save outputs and history
+                for invocation, queue_item, output in zip(invocations, queue_items, outputs, strict=True):
+                    queue_item.session.complete(invocation.id, output)
+                    self._on_after_run_node(invocation, queue_item, output)
+
+        except KeyboardInterrupt:
+            pass
+        except CanceledException:
+            # See `run_node()`.
+            pass
+        except Exception as e:
+            error_type = e.__class__.__name__
+            error_message = str(e)
+            error_traceback = traceback.format_exc()
+            for invocation, queue_item in steps:
+                self._on_node_error(
+                    invocation=invocation,
+                    queue_item=queue_item,
+                    error_type=error_type,
+                    error_message=error_message,
+                    error_traceback=error_traceback,
+                )
+
+    def _build_invocation_context(self, invocation: BaseInvocation, queue_item: SessionQueueItem) -> InvocationContext:
+        data = InvocationContextData(
+            invocation=invocation,
+            source_invocation_id=queue_item.session.prepared_source_mapping[invocation.id],
+            queue_item=queue_item,
+        )
+        return build_invocation_context(
+            data=data,
+            services=self._services,
+            is_canceled=self._is_canceled,
+        )
+
     def _on_before_run_session(self, queue_item: SessionQueueItem) -> None:
         """Called before a session is run.
 
@@ -358,7 +484,7 @@ class DefaultSessionProcessor(SessionProcessorBase):
 
         self._worker_thread_count = len(TorchDevice.execution_devices())
 
-        self._session_worker_queue: Queue[SessionQueueItem] = Queue()
+        self._session_worker_queue: Queue[list[SessionQueueItem]] = Queue()
 
         self.session_runner.start(services=invoker.services, cancel_event=self._cancel_event, profiler=self._profiler)
         # Session processor - singlethreaded
@@ -457,8 +583,18 @@ class DefaultSessionProcessor(SessionProcessorBase):
                         poll_now_event.wait(self._polling_interval)
                         continue
 
-                    self._session_worker_queue.put(queue_item)
-                    self._invoker.services.logger.debug(f"Scheduling queue item {queue_item.item_id} to run")
+                    # Queue items that differ only by seed are run together, so that they can share work.
+                    queue_items = [queue_item]
+                    max_fused_runs = self._invoker.services.configuration.max_fused_runs
+                    if max_fused_runs > 1:
+                        queue_items.extend(
+                            self._invoker.services.session_queue.dequeue_seed_variants(queue_item, max_fused_runs - 1)
+                        )
+
+                    self._session_worker_queue.put(queue_items)
+                    self._invoker.services.logger.debug(
+                        f"Scheduling queue items {', '.join(str(q.item_id) for q in queue_items)} to run"
+                    )
                     cancel_event.clear()
 
                     # Run the graph
@@ -484,19 +620,22 @@ class DefaultSessionProcessor(SessionProcessorBase):
     def _process_next_session(self) -> None:
         while True:
             self._resume_event.wait()
-            queue_item = self._session_worker_queue.get()
-            if queue_item.status == "canceled":
+            queue_items = [q for q in self._session_worker_queue.get() if q.status != "canceled"]
+            if not queue_items:
                 continue
             try:
-                self._active_queue_items.add(queue_item)
+                self._active_queue_items.update(queue_items)
                 # reserve a GPU for this session - may block
                 with self._invoker.services.model_manager.load.ram_cache.reserve_execution_device():
                     # Run the session on the reserved GPU
-                    self.session_runner.run(queue_item=queue_item)
+                    if len(queue_items) == 1:
+                        self.session_runner.run(queue_item=queue_items[0])
+                    else:
+                        self.session_runner.run_fused(queue_items=queue_items)
             except Exception:
                 continue
             finally:
-                self._active_queue_items.remove(queue_item)
+                self._active_queue_items.difference_update(queue_items)
 
     def _on_non_fatal_processor_error(
         self,
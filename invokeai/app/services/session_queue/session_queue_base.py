@@ -28,6 +28,14 @@ class SessionQueueBase(ABC):
         """Dequeues the next session queue item."""
         pass
 
+    @abstractmethod
+    def dequeue_seed_variants(self, queue_item: SessionQueueItem, max_items: int) -> list[SessionQueueItem]:
+        """
+        Dequeues up to `max_items` session queue items that directly follow `queue_item` in the queue, and that come
+        from the same batch and differ from it only by seed.
+        """
+        pass
+
     @abstractmethod
     def enqueue_batch(self, queue_id: str, batch: Batch, prepend: bool) -> EnqueueBatchResult:
         """Enqueues all permutations of a batch for execution."""
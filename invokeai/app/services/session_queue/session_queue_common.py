@@ -425,6 +425,25 @@ def calc_session_count(batch: Batch) -> int:
     return len(data_product) * batch.runs
 
 
+def differ_only_by_seed(
+    field_values: Optional[list[NodeFieldValue]], other_field_values: Optional[list[NodeFieldValue]]
+) -> bool:
+    """
+    Returns True if two sessions from the same batch were populated with the same field values, other than
+    values of `seed` fields.
+    """
+    field_values = field_values or []
+    other_field_values = other_field_values or []
+    if len(field_values) != len(other_field_values):
+        return False
+    for value, other_value in zip(field_values, other_field_values, strict=True):
+        if value.node_path != other_value.node_path or value.field_name != other_value.field_name:
+            return False
+        if value.field_name != "seed" and value.value != other_value.value:
+            return False
+    return True
+
+
 class SessionQueueValueToInsert(NamedTuple):
     """A tuple of values to insert into the session_queue table"""
 
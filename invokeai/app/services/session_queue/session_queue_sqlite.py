@@ -21,6 +21,7 @@ from invokeai.app.services.session_queue.session_queue_common import (
     SessionQueueItemNotFoundError,
     SessionQueueStatus,
     calc_session_count,
+    differ_only_by_seed,
     prepare_values_to_insert,
 )
 from invokeai.app.services.shared.graph import GraphExecutionState
@@ -174,6 +175,42 @@ class SqliteSessionQueue(SessionQueueBase):
         queue_item = self._set_queue_item_status(item_id=queue_item.item_id, status="in_progress")
         return queue_item
 
+    def dequeue_seed_variants(self, queue_item: SessionQueueItem, max_items: int) -> list[SessionQueueItem]:
+        if max_items <= 0:
+            return []
+        try:
+            self.__lock.acquire()
+            self.__cursor.execute(
+                """--sql
+                SELECT *
+                FROM session_queue
+                WHERE status = 'pending'
+                ORDER BY
+                  priority DESC,
+                  item_id ASC
+                LIMIT ?
+                """,
+                (max_items,),
+            )
+            results = cast(list[sqlite3.Row], self.__cursor.fetchall())
+        except Exception:
+            self.__conn.rollback()
+            raise
+        finally:
+            self.__lock.release()
+        variants: list[SessionQueueItem] = []
+        for result in results:
+            candidate = SessionQueueItem.queue_item_from_dict(dict(result))
+            # Only the items directly after queue_item are taken, so that the queue order is kept.
+            if (
+                candidate.queue_id != queue_item.queue_id
+                or candidate.batch_id != queue_item.batch_id
+                or not differ_only_by_seed(queue_item.field_values, candidate.field_values)
+            ):
+                break
+            variants.append(self._set_queue_item_status(item_id=candidate.item_id, status="in_progress"))
+        return variants
+
     def get_next(self, queue_id: str) -> Optional[SessionQueueItem]:
         try:
             self.__lock.acquire()
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Callable, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Optional, Union
 
 import torch
 from PIL.Image import Image
@@ -15,6 +15,7 @@ from invokeai.app.services.image_records.image_records_common import ImageCatego
 from invokeai.app.services.images.images_common import ImageDTO
 from invokeai.app.services.invocation_services import InvocationServices
 from invokeai.app.services.model_records.model_records_base import UnknownModelException
+from invokeai.app.services.noise.noise_common import NoiseSpec
 from invokeai.app.util.step_callback import stable_diffusion_step_callback
 from invokeai.backend.model_manager.config import (
     AnyModel,
@@ -30,10 +31,13 @@ from invokeai.backend.stable_diffusion.diffusion.conditioning_data import Condit
 from invokeai.backend.util.devices import TorchDevice
 
 if TYPE_CHECKING:
+    import onnxruntime as ort
+
     from invokeai.app.invocations.baseinvocation import BaseInvocation
     from invokeai.app.invocations.model import ModelIdentifierField
     from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem
     from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelCacheBase
+    from invokeai.backend.model_manager.load.model_cache.scheduler_cache import SchedulerCache
 
 """
 The InvocationContext provides access to various services and data about the current invocation.
@@ -300,8 +304,64 @@ class TensorsInterface(InvocationContextInterface):
         Returns:
             The loaded tensor.
         """
+        if self._services.noise.is_noise(name):
+            # The noise service shares its tensors between sessions, so callers get their own copy to modify.
+            return self._services.noise.load(name).clone()
         return self._services.tensors.load(name)
 
+    def save_noise(self, spec: NoiseSpec) -> str:
+        """Saves noise, returning its name.
+
+        The noise is not generated here. Its name describes it, and it is generated whenever it is loaded.
+
+        Args:
+            spec: The spec of the noise to save.
+
+        Returns:
+            The name of the noise, which can be passed to `load()` and `load_noise()`.
+        """
+        return self._services.noise.save(spec)
+
+    def load_noise(self, name: str, device: Optional[torch.device] = None) -> Tensor:
+        """Loads noise by name onto a device.
+
+        Noise saved with `save_noise()` is generated directly on the device. Other tensors, such as noise that was
+        saved with `save()`, are loaded and moved to the device.
+
+        Args:
+            name: The name of the noise to load.
+            device: The device to load the noise onto. Defaults to the CPU.
+
+        Returns:
+            The loaded noise. It must be treated as read-only.
+        """
+        if self._services.noise.is_noise(name):
+            return self._services.noise.load(name, device)
+        return self._services.tensors.load(name).to(device or "cpu")
+
+    def cache_get(self, key: Hashable) -> Optional[Any]:
+        """Gets a value from the shared tensor cache.
+
+        The tensor cache holds intermediate results, such as prompt embeddings, that any session can reuse. Cached
+        values must be treated as read-only.
+
+        Args:
+            key: The cache key. It must capture every input that affects the value, including model hashes.
+
+        Returns:
+            The cached value, or None if it is not in the cache.
+        """
+        return self._services.tensor_cache.get(key)
+
+    def cache_put(self, key: Hashable, value: Any) -> None:
+        """Puts a value in the shared tensor cache.
+
+        Args:
+            key: The cache key. It must capture every input that affects the value, including model hashes.
+            value: The value to cache. It must not be modified afterwards.
+        """
+        self._services.tensor_cache.put(key, value)
+
 
 class ConditioningInterface(InvocationContextInterface):
     def save(self, conditioning_data: ConditioningFieldData) -> str:
@@ -512,6 +572,32 @@ class ModelsInterface(InvocationContextInterface):
         model_path = self._services.model_manager.install.download_and_cache_model(source=str(source))
         return self._services.model_manager.load.load_model_from_path(model_path=model_path, loader=loader)
 
+    def load_onnx_session(self, model_path: Path) -> "ort.InferenceSession":
+        """
+        Return an ONNX Runtime inference session for the ONNX model file located at the indicated path.
+
+        Sessions are kept by the model cache and shared between invocations on the same execution
+        device, so they must not be modified.
+
+        Args:
+            model_path: Path to the .onnx file, e.g. as returned by `download_and_cache_model()`.
+
+        Returns:
+            An InferenceSession running on the current execution device.
+        """
+        ram_cache: "ModelCacheBase[AnyModel]" = self._services.model_manager.load.ram_cache
+        return ram_cache.onnx_sessions.get(model_path, ram_cache.get_execution_device())
+
+    def get_scheduler_cache(self) -> "SchedulerCache":
+        """
+        Return the cache of built schedulers and their timestep schedules, which is kept by the model cache.
+
+        Returns:
+            The SchedulerCache shared by all invocations. It hands out copies, which callers are free to step.
+        """
+        ram_cache: "ModelCacheBase[AnyModel]" = self._services.model_manager.load.ram_cache
+        return ram_cache.schedulers
+
 
 class ConfigInterface(InvocationContextInterface):
     def get(self) -> InvokeAIAppConfig:
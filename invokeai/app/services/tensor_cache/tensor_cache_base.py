@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Any, Hashable, Optional
+
+from invokeai.app.services.tensor_cache.tensor_cache_common import TensorCacheStatus
+
+
+class TensorCacheBase(ABC):
+    """
+    Base class for tensor caches.
+
+    The tensor cache holds intermediate results that are expensive to compute but cheap to key, such
+    as prompt embeddings. Unlike the invocation cache, entries are not tied to a particular node or
+    session, so any invocation on any execution device can reuse them.
+
+    Callers are responsible for building keys that capture every input that affects the result,
+    including the hashes of any models involved. Cached values must be treated as read-only.
+
+    Implementations should respect the `tensor_cache_size` configuration value, and skip all
+    cache logic if the value is set to 0.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retrieves a value from the cache, or None if it is not present"""
+        pass
+
+    @abstractmethod
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores a value in the cache, evicting the least recently used entries as needed"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Deletes a value from the cache"""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Clears the cache"""
+        pass
+
+    @abstractmethod
+    def get_status(self) -> TensorCacheStatus:
+        """Returns the status of the cache"""
+        pass
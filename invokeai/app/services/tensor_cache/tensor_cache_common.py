@@ -0,0 +1,30 @@
+from dataclasses import fields, is_dataclass
+from typing import Any
+
+import torch
+from pydantic import BaseModel, Field
+
+
+class TensorCacheStatus(BaseModel):
+    size: int = Field(description="The number of entries in the tensor cache")
+    bytes: int = Field(description="The total size of the cached tensors, in bytes")
+    max_bytes: int = Field(description="The maximum size of the tensor cache, in bytes")
+    hits: int = Field(description="The number of cache hits")
+    misses: int = Field(description="The number of cache misses")
+    enabled: bool = Field(description="Whether the tensor cache is enabled")
+
+
+def calc_tensor_size(obj: Any) -> int:
+    """Return the size, in bytes, of all tensors referenced by obj.
+
+    Tensors may be nested inside lists, tuples, dicts and dataclasses. Anything else is counted as 0 bytes.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.nelement() * obj.element_size()
+    if isinstance(obj, (list, tuple)):
+        return sum(calc_tensor_size(x) for x in obj)
+    if isinstance(obj, dict):
+        return sum(calc_tensor_size(x) for x in obj.values())
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return sum(calc_tensor_size(getattr(obj, f.name)) for f in fields(obj))
+    return 0
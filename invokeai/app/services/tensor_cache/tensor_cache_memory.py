@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+from invokeai.app.services.tensor_cache.tensor_cache_base import TensorCacheBase
+from invokeai.app.services.tensor_cache.tensor_cache_common import TensorCacheStatus, calc_tensor_size
+
+# actual size of a gig
+GIG = 1073741824
+
+
+@dataclass
+class CachedTensors:
+    value: Any
+    size: int
+
+
+class MemoryTensorCache(TensorCacheBase):
+    """An in-memory, byte-budgeted LRU implementation of TensorCacheBase.
+
+    A single instance is shared by all session processor threads, so a value computed on one
+    execution device can be reused by every other device.
+    """
+
+    def __init__(self, max_cache_size: float = 0.0) -> None:
+        """
+        Initialize the tensor cache.
+
+        :param max_cache_size: Maximum size of the cache, in GB. Set to 0 to disable the cache.
+        """
+        self._cache: OrderedDict[Hashable, CachedTensors] = OrderedDict()
+        self._max_bytes = int(max_cache_size * GIG)
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if self._max_bytes == 0:
+                return None
+            item = self._cache.get(key, None)
+            if item is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._cache.move_to_end(key)
+            return item.value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = calc_tensor_size(value)
+        with self._lock:
+            if self._max_bytes == 0 or key in self._cache or size > self._max_bytes:
+                return
+            while self._cache and self._current_bytes + size > self._max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._current_bytes -= evicted.size
+            self._cache[key] = CachedTensors(value=value, size=size)
+            self._current_bytes += size
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            item = self._cache.pop(key, None)
+            if item is not None:
+                self._current_bytes -= item.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._current_bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def get_status(self) -> TensorCacheStatus:
+        with self._lock:
+            return TensorCacheStatus(
+                size=len(self._cache),
+                bytes=self._current_bytes,
+                max_bytes=self._max_bytes,
+                hits=self._hits,
+                misses=self._misses,
+                enabled=self._max_bytes > 0,
+            )
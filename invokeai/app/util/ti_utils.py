@@ -45,3 +45,24 @@ def generate_ti_list(
         except Exception:
             logger.warning(f'Failed to load TI model for trigger: "{trigger}"')
     return ti_list
+
+
+def get_ti_hashes(prompt: str, base: BaseModelType, context: InvocationContext) -> List[Tuple[str, str]]:
+    """Resolve the TI triggers in a prompt to (trigger, model hash) pairs without loading any models.
+
+    Triggers are resolved the same way as in `generate_ti_list()`. Triggers that do not resolve to a
+    single installed textual inversion model are omitted.
+    """
+    ti_hashes: List[Tuple[str, str]] = []
+    for trigger in extract_ti_triggers_from_prompt(prompt):
+        name_or_key = trigger[1:-1]
+        if context.models.exists(name_or_key):
+            config = context.models.get_config(name_or_key)
+        else:
+            configs = context.models.search_by_attrs(name=name_or_key, base=base, type=ModelType.TextualInversion)
+            if len(configs) != 1:
+                continue
+            config = configs[0]
+        if config.type == ModelType.TextualInversion and config.base == base:
+            ti_hashes.append((name_or_key, config.hash))
+    return ti_hashes
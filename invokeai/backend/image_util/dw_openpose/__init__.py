@@ -1,7 +1,7 @@
-from pathlib import Path
 from typing import Dict
 
 import numpy as np
+import onnxruntime as ort
 import torch
 from controlnet_aux.util import resize_image
 from PIL import Image
@@ -62,8 +62,8 @@ class DWOpenposeDetector:
     Credits: https://github.com/IDEA-Research/DWPose
     """
 
-    def __init__(self, onnx_det: Path, onnx_pose: Path) -> None:
-        self.pose_estimation = Wholebody(onnx_det=onnx_det, onnx_pose=onnx_pose)
+    def __init__(self, session_det: ort.InferenceSession, session_pose: ort.InferenceSession) -> None:
+        self.pose_estimation = Wholebody(session_det=session_det, session_pose=session_pose)
 
     def __call__(
         self,
@@ -3,6 +3,8 @@
 import cv2
 import numpy as np
 
+from invokeai.backend.model_manager.load.model_cache.onnx_session_cache import run_onnx_session
+
 
 def nms(boxes, scores, nms_thr):
     """Single class NMS implemented in Numpy."""
@@ -103,7 +105,7 @@ def inference_detector(session, oriImg):
     img, ratio = preprocess(oriImg, input_shape)
 
     ort_inputs = {session.get_inputs()[0].name: img[None, :, :, :]}
-    output = session.run(None, ort_inputs)
+    output = run_onnx_session(session, ort_inputs)
     predictions = demo_postprocess(output[0], input_shape)[0]
 
     boxes = predictions[:, :4]
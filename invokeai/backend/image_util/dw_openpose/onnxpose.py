@@ -6,6 +6,8 @@ import cv2
 import numpy as np
 import onnxruntime as ort
 
+from invokeai.backend.model_manager.load.model_cache.onnx_session_cache import run_onnx_session
+
 
 def preprocess(
     img: np.ndarray, out_bbox, input_size: Tuple[int, int] = (192, 256)
@@ -14,86 +16,87 @@ def preprocess(
 
     Args:
         img (np.ndarray): Input image in shape.
+        out_bbox: Person bounding boxes (x0, y0, x1, y1). The whole image is
+            used if there are none.
         input_size (tuple): Input image size in shape (w, h).
 
     Returns:
         tuple:
-        - resized_img (np.ndarray): Preprocessed image.
-        - center (np.ndarray): Center of image.
-        - scale (np.ndarray): Scale of image.
+        - resized_img (np.ndarray[float32]): Batch of preprocessed crops in
+            shape (N, 3, h, w).
+        - center (np.ndarray): Centers of the crops in shape (N, 2).
+        - scale (np.ndarray): Scales of the crops in shape (N, 2).
     """
     # get shape of image
     img_shape = img.shape[:2]
-    out_img, out_center, out_scale = [], [], []
     if len(out_bbox) == 0:
         out_bbox = [[0, 0, img_shape[1], img_shape[0]]]
-    for i in range(len(out_bbox)):
-        x0 = out_bbox[i][0]
-        y0 = out_bbox[i][1]
-        x1 = out_bbox[i][2]
-        y1 = out_bbox[i][3]
-        bbox = np.array([x0, y0, x1, y1])
-
-        # get center and scale
-        center, scale = bbox_xyxy2cs(bbox, padding=1.25)
+    bboxes = np.asarray(out_bbox, dtype=np.float64)[:, :4]
 
-        # do affine transformation
-        resized_img, scale = top_down_affine(input_size, scale, center, img)
+    # get center and scale
+    centers, scales = bbox_xyxy2cs(bboxes, padding=1.25)
 
-        # normalize image
-        mean = np.array([123.675, 116.28, 103.53])
-        std = np.array([58.395, 57.12, 57.375])
-        resized_img = (resized_img - mean) / std
+    # do affine transformation into a single preallocated batch
+    w, h = input_size
+    out_img = np.empty((len(bboxes), h, w, 3), dtype=np.float32)
+    out_scale = np.empty_like(scales)
+    for i in range(len(bboxes)):
+        out_img[i], out_scale[i] = top_down_affine(input_size, scales[i], centers[i], img)
 
-        out_img.append(resized_img)
-        out_center.append(center)
-        out_scale.append(scale)
+    # normalize image
+    mean = np.array([123.675, 116.28, 103.53], dtype=np.float32)
+    std = np.array([58.395, 57.12, 57.375], dtype=np.float32)
+    out_img -= mean
+    out_img /= std
 
-    return out_img, out_center, out_scale
+    return np.ascontiguousarray(out_img.transpose(0, 3, 1, 2)), centers, out_scale
 
 
-def inference(sess: ort.InferenceSession, img: np.ndarray) -> np.ndarray:
+def inference(sess: ort.InferenceSession, img: np.ndarray) -> List[np.ndarray]:
     """Inference RTMPose model.
 
+    All crops are run in a single call if the model has a dynamic batch
+    dimension, otherwise in chunks of the model's fixed batch size.
+
     Args:
         sess (ort.InferenceSession): ONNXRuntime session.
-        img (np.ndarray): Input image in shape.
+        img (np.ndarray): Batch of crops in shape (N, 3, h, w).
 
     Returns:
-        outputs (np.ndarray): Output of RTMPose model.
+        outputs (list[np.ndarray]): Outputs of RTMPose model, each with the
+            batch of N crops as the first dimension.
     """
-    all_out = []
-    # build input
-    for i in range(len(img)):
-        input = [img[i].transpose(2, 0, 1)]
-
-        # build output
-        sess_input = {sess.get_inputs()[0].name: input}
-        sess_output = []
-        for out in sess.get_outputs():
-            sess_output.append(out.name)
+    model_input = sess.get_inputs()[0]
+    batch_size = model_input.shape[0]
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        batch_size = len(img)
 
-        # run model
-        outputs = sess.run(sess_output, sess_input)
-        all_out.append(outputs)
+    chunks = []
+    for i in range(0, len(img), batch_size):
+        batch = img[i : i + batch_size]
+        if len(batch) < batch_size:
+            # pad the last chunk of a fixed batch size model
+            padding = np.zeros((batch_size - len(batch), *batch.shape[1:]), dtype=batch.dtype)
+            batch = np.concatenate([batch, padding])
+        chunks.append(run_onnx_session(sess, {model_input.name: batch}))
 
-    return all_out
+    return [np.concatenate([c[k] for c in chunks])[: len(img)] for k in range(len(chunks[0]))]
 
 
 def postprocess(
     outputs: List[np.ndarray],
     model_input_size: Tuple[int, int],
-    center: Tuple[int, int],
-    scale: Tuple[int, int],
+    center: np.ndarray,
+    scale: np.ndarray,
     simcc_split_ratio: float = 2.0,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Postprocess for RTMPose model output.
 
     Args:
-        outputs (np.ndarray): Output of RTMPose model.
+        outputs (list[np.ndarray]): Batched output of RTMPose model.
         model_input_size (tuple): RTMPose model Input image size.
-        center (tuple): Center of bbox in shape (x, y).
-        scale (tuple): Scale of bbox in shape (w, h).
+        center (np.ndarray): Centers of the bboxes in shape (N, 2).
+        scale (np.ndarray): Scales of the bboxes in shape (N, 2).
         simcc_split_ratio (float): Split ratio of simcc.
 
     Returns:
@@ -101,19 +104,15 @@ def postprocess(
         - keypoints (np.ndarray): Rescaled keypoints.
         - scores (np.ndarray): Model predict scores.
     """
-    all_key = []
-    all_score = []
-    for i in range(len(outputs)):
-        # use simcc to decode
-        simcc_x, simcc_y = outputs[i]
-        keypoints, scores = decode(simcc_x, simcc_y, simcc_split_ratio)
-
-        # rescale keypoints
-        keypoints = keypoints / model_input_size * scale[i] + center[i] - scale[i] / 2
-        all_key.append(keypoints[0])
-        all_score.append(scores[0])
-
-    return np.array(all_key), np.array(all_score)
+    # use simcc to decode
+    simcc_x, simcc_y = outputs
+    keypoints, scores = decode(simcc_x, simcc_y, simcc_split_ratio)
+
+    # rescale keypoints
+    scale = scale[:, None, :]
+    keypoints = keypoints / model_input_size * scale + center[:, None, :] - scale / 2
+
+    return keypoints, scores
 
 
 def bbox_xyxy2cs(bbox: np.ndarray, padding: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
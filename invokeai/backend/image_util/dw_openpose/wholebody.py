@@ -2,27 +2,19 @@
 # Modified pathing to suit Invoke
 
 
-from pathlib import Path
-
 import numpy as np
 import onnxruntime as ort
 
-from invokeai.app.services.config.config_default import get_config
 from invokeai.backend.image_util.dw_openpose.onnxdet import inference_detector
 from invokeai.backend.image_util.dw_openpose.onnxpose import inference_pose
-from invokeai.backend.util.devices import TorchDevice
-
-config = get_config()
 
 
 class Wholebody:
-    def __init__(self, onnx_det: Path, onnx_pose: Path):
-        device = TorchDevice.choose_torch_device()
-
-        providers = ["CUDAExecutionProvider"] if device.type == "cuda" else ["CPUExecutionProvider"]
-
-        self.session_det = ort.InferenceSession(path_or_bytes=onnx_det, providers=providers)
-        self.session_pose = ort.InferenceSession(path_or_bytes=onnx_pose, providers=providers)
+    def __init__(self, session_det: ort.InferenceSession, session_pose: ort.InferenceSession):
+        # The sessions are owned by the model cache's per-device ONNX session pool, so that
+        # they are created once per execution device rather than once per invocation.
+        self.session_det = session_det
+        self.session_pose = session_pose
 
     def __call__(self, oriImg):
         det_result = inference_detector(self.session_det, oriImg)
@@ -5,7 +5,7 @@ import numpy as np
 from PIL import Image
 
 
-def create_tile_pool(img_array: np.ndarray, tile_size: tuple[int, int]) -> list[np.ndarray]:
+def create_tile_pool(img_array: np.ndarray, tile_size: tuple[int, int]) -> np.ndarray:
     """
     Create a pool of tiles from non-transparent areas of the image by systematically walking through the image.
 
@@ -14,22 +14,27 @@ def create_tile_pool(img_array: np.ndarray, tile_size: tuple[int, int]) -> list[
         tile_size: tuple (tile_width, tile_height) specifying the size of each tile.
 
     Returns:
-        A list of numpy arrays, each representing a tile.
+        A numpy array of shape (num_tiles, tile_height, tile_width, channels), with the tiles in row-major order.
     """
-    tiles: list[np.ndarray] = []
-    rows, cols = img_array.shape[:2]
+    rows, cols, channels = img_array.shape
     tile_width, tile_height = tile_size
-
-    for y in range(0, rows - tile_height + 1, tile_height):
-        for x in range(0, cols - tile_width + 1, tile_width):
-            tile = img_array[y : y + tile_height, x : x + tile_width]
-            # Check if the image has an alpha channel and the tile is completely opaque
-            if img_array.shape[2] == 4 and np.all(tile[:, :, 3] == 255):
-                tiles.append(tile)
-            elif img_array.shape[2] == 3:  # If no alpha channel, append the tile
-                tiles.append(tile)
-
-    if not tiles:
+    grid_rows, grid_cols = rows // tile_height, cols // tile_width
+
+    # View the image as a grid of tiles: (grid_rows, grid_cols, tile_height, tile_width, channels)
+    tiles = (
+        img_array[: grid_rows * tile_height, : grid_cols * tile_width]
+        .reshape(grid_rows, tile_height, grid_cols, tile_width, channels)
+        .swapaxes(1, 2)
+        .reshape(grid_rows * grid_cols, tile_height, tile_width, channels)
+    )
+
+    # If the image has an alpha channel, only completely opaque tiles are used
+    if channels == 4:
+        tiles = tiles[np.all(tiles[:, :, :, 3] == 255, axis=(1, 2))]
+    elif channels != 3:
+        tiles = tiles[:0]
+
+    if len(tiles) == 0:
         raise ValueError(
             "Not enough opaque pixels to generate any tiles. Use a smaller tile size or a different image."
         )
@@ -38,15 +43,16 @@ def create_tile_pool(img_array: np.ndarray, tile_size: tuple[int, int]) -> list[
 
 
 def create_filled_image(
-    img_array: np.ndarray, tile_pool: list[np.ndarray], tile_size: tuple[int, int], seed: int
+    img_array: np.ndarray, tile_pool: np.ndarray | list[np.ndarray], tile_size: tuple[int, int], seed: int
 ) -> np.ndarray:
     """
     Create an image of the same dimensions as the original, filled entirely with tiles from the pool.
 
     Args:
         img_array: numpy array of the original image.
-        tile_pool: A list of numpy arrays, each representing a tile.
+        tile_pool: The tiles to fill with, as returned by `create_tile_pool`.
         tile_size: tuple (tile_width, tile_height) specifying the size of each tile.
+        seed: The seed for the random tile selection.
 
     Returns:
         A numpy array representing the filled image.
@@ -54,29 +60,22 @@ def create_filled_image(
 
     rows, cols, _ = img_array.shape
     tile_width, tile_height = tile_size
+    tile_pool = np.asarray(tile_pool)[:, :, :, :3]
+    grid_rows, grid_cols = -(-rows // tile_height), -(-cols // tile_width)
 
-    # Prep an empty RGB image
-    filled_img_array = np.zeros((rows, cols, 3), dtype=img_array.dtype)
-
-    # Make the random tile selection reproducible
+    # Make the random tile selection reproducible. The tiles are picked in row-major order, one draw per tile.
     rng = np.random.default_rng(seed)
+    tile_indices = rng.integers(len(tile_pool), size=(grid_rows, grid_cols))
 
-    for y in range(0, rows, tile_height):
-        for x in range(0, cols, tile_width):
-            # Pick a random tile from the pool
-            tile = tile_pool[rng.integers(len(tile_pool))]
-
-            # Calculate the space available (may be less than tile size near the edges)
-            space_y = min(tile_height, rows - y)
-            space_x = min(tile_width, cols - x)
-
-            # Crop the tile if necessary to fit into the available space
-            cropped_tile = tile[:space_y, :space_x, :3]
-
-            # Fill the available space with the (possibly cropped) tile
-            filled_img_array[y : y + space_y, x : x + space_x, :3] = cropped_tile
+    # Gather the picked tiles into a grid, then crop the tiles at the right and bottom edges to fit
+    filled_img_array = (
+        tile_pool[tile_indices]
+        .swapaxes(1, 2)
+        .reshape(grid_rows * tile_height, grid_cols * tile_width, 3)[:rows, :cols]
+        .astype(img_array.dtype, copy=False)
+    )
 
-    return filled_img_array
+    return np.ascontiguousarray(filled_img_array)
 
 
 @dataclass
@@ -1,19 +1,23 @@
 """
-This module defines a singleton object, "safety_checker" that
-wraps the safety_checker model. It respects the global "nsfw_checker"
-configuration variable, that allows the checker to be supressed.
+This module defines the SafetyChecker class, which wraps the NSFW
+safety checker model. The model itself is held in the model cache:
+callers load it with `SafetyChecker.load_checker()` (for example via
+`context.models.load_local_model()`), so that each execution device
+gets its own locked copy.
 """
 
+import threading
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
+import torch
 from diffusers.pipelines.stable_diffusion.safety_checker import StableDiffusionSafetyChecker
 from PIL import Image, ImageFilter
 from transformers import AutoFeatureExtractor
 
 import invokeai.backend.util.logging as logger
 from invokeai.app.services.config.config_default import get_config
-from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.silence_warnings import SilenceWarnings
 
 repo_id = "CompVis/stable-diffusion-safety-checker"
@@ -25,46 +29,48 @@ class SafetyChecker:
     Wrapper around SafetyChecker model.
     """
 
+    # The feature extractor only resizes and normalizes images, so a single instance is shared by all threads.
     feature_extractor = None
-    safety_checker = None
+    _lock = threading.Lock()
 
     @classmethod
-    def _load_safety_checker(cls):
-        if cls.safety_checker is not None and cls.feature_extractor is not None:
-            return
+    def get_model_path(cls) -> Optional[Path]:
+        """Return the path of the safety checker model, downloading it on first use. Returns None if unavailable."""
+        model_path = get_config().models_path / CHECKER_PATH
+        with cls._lock:
+            try:
+                if not (model_path / "config.json").exists():
+                    model_path.mkdir(parents=True, exist_ok=True)
+                    AutoFeatureExtractor.from_pretrained(repo_id).save_pretrained(model_path, safe_serialization=True)
+                    StableDiffusionSafetyChecker.from_pretrained(repo_id).save_pretrained(
+                        model_path, safe_serialization=True
+                    )
+                if cls.feature_extractor is None:
+                    cls.feature_extractor = AutoFeatureExtractor.from_pretrained(model_path)
+            except Exception as e:
+                logger.warning(f"Could not load NSFW checker: {str(e)}")
+                return None
+        return model_path
 
-        try:
-            model_path = get_config().models_path / CHECKER_PATH
-            if model_path.exists():
-                cls.feature_extractor = AutoFeatureExtractor.from_pretrained(model_path)
-                cls.safety_checker = StableDiffusionSafetyChecker.from_pretrained(model_path)
-            else:
-                model_path.mkdir(parents=True, exist_ok=True)
-                cls.feature_extractor = AutoFeatureExtractor.from_pretrained(repo_id)
-                cls.feature_extractor.save_pretrained(model_path, safe_serialization=True)
-                cls.safety_checker = StableDiffusionSafetyChecker.from_pretrained(repo_id)
-                cls.safety_checker.save_pretrained(model_path, safe_serialization=True)
-        except Exception as e:
-            logger.warning(f"Could not load NSFW checker: {str(e)}")
+    @staticmethod
+    def load_checker(model_path: Path) -> StableDiffusionSafetyChecker:
+        """Load the safety checker model. Used as the model cache loader."""
+        return StableDiffusionSafetyChecker.from_pretrained(model_path)
 
     @classmethod
-    def has_nsfw_concept(cls, image: Image.Image) -> bool:
-        cls._load_safety_checker()
-        if cls.safety_checker is None or cls.feature_extractor is None:
-            return False
-        device = TorchDevice.choose_torch_device()
-        features = cls.feature_extractor([image], return_tensors="pt")
-        features.to(device)
-        cls.safety_checker.to(device)
-        x_image = np.array(image).astype(np.float32) / 255.0
-        x_image = x_image[None].transpose(0, 3, 1, 2)
-        with SilenceWarnings():
-            checked_image, has_nsfw_concept = cls.safety_checker(images=x_image, clip_input=features.pixel_values)
-        return has_nsfw_concept[0]
+    def has_nsfw_concept(cls, checker: StableDiffusionSafetyChecker, image: Image.Image) -> bool:
+        assert cls.feature_extractor is not None, "get_model_path() must be called before checking images"
+        features = cls.feature_extractor([image.convert("RGB")], return_tensors="pt")
+        clip_input = features.pixel_values.to(device=checker.device, dtype=checker.dtype)
+        # The checker blacks out the flagged entries of `images`. Only the flag is used, so a placeholder is passed
+        # instead of converting the image to a float array.
+        with SilenceWarnings(), torch.no_grad():
+            _, has_nsfw_concepts = checker(images=[np.zeros(1)], clip_input=clip_input)
+        return bool(has_nsfw_concepts[0])
 
     @classmethod
-    def blur_if_nsfw(cls, image: Image.Image) -> Image.Image:
-        if cls.has_nsfw_concept(image):
+    def blur_if_nsfw(cls, checker: StableDiffusionSafetyChecker, image: Image.Image) -> Image.Image:
+        if cls.has_nsfw_concept(checker, image):
             logger.warning("A potentially NSFW image has been detected. Image will be blurred.")
             blurry_image = image.filter(filter=ImageFilter.GaussianBlur(radius=32))
             caution = cls._get_caution_img()
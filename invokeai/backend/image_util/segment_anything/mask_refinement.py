@@ -48,3 +48,34 @@ def polygon_to_mask(
     cv2.fillPoly(mask, [pts], color=(fill_value,))
 
     return mask
+
+
+def refine_masks_with_polygons(masks: npt.NDArray[np.bool_]) -> npt.NDArray[np.bool_]:
+    """Replace each mask with the filled largest external contour of the mask.
+
+    This is equivalent to `polygon_to_mask(mask_to_polygon(mask), mask.shape)` for each mask, but the contours are
+    found within the bounding box of each mask rather than the whole image, and they are drawn straight into the
+    output without round-tripping through Python lists. Empty masks are left empty.
+
+    Args:
+        masks (np.ndarray): Binary masks. Shape: (num_masks, height, width).
+
+    Returns:
+        np.ndarray: The refined masks. Shape: (num_masks, height, width).
+    """
+    refined = np.zeros(masks.shape, dtype=np.uint8)
+    # The rows and columns that contain any part of each mask.
+    rows = masks.any(axis=2)
+    cols = masks.any(axis=1)
+    for idx in np.flatnonzero(rows.any(axis=1)):
+        y_indices = np.flatnonzero(rows[idx])
+        x_indices = np.flatnonzero(cols[idx])
+        y_min, y_max = y_indices[0], y_indices[-1] + 1
+        x_min, x_max = x_indices[0], x_indices[-1] + 1
+        crop = masks[idx, y_min:y_max, x_min:x_max].astype(np.uint8)
+        contours, _ = cv2.findContours(
+            crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(int(x_min), int(y_min))
+        )
+        largest_contour = max(contours, key=cv2.contourArea)
+        cv2.fillPoly(refined[idx], [largest_contour], color=(1,))
+    return refined.astype(bool)
@@ -27,13 +27,33 @@ class SegmentAnythingPipeline(RawModel):
 
         return calc_module_size(self._sam_model)
 
-    def segment(self, image: Image.Image, bounding_boxes: list[list[int]]) -> torch.Tensor:
+    def get_image_embeddings(self, image: Image.Image) -> torch.Tensor:
+        """Run the SAM image encoder.
+
+        The embeddings depend only on the image, so they can be reused by `segment(...)` for any number of prompts.
+
+        Args:
+            image (Image.Image): The image to encode.
+
+        Returns:
+            torch.Tensor: The image embeddings, on the model's device.
+        """
+        inputs = self._sam_processor(images=image, return_tensors="pt").to(self._sam_model.device)
+        return self._sam_model.get_image_embeddings(inputs.pixel_values)
+
+    def segment(
+        self, image: Image.Image, bounding_boxes: list[list[int]], image_embeddings: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
         """Run the SAM model.
 
+        All of the bounding boxes are decoded in a single mask decoder call.
+
         Args:
             image (Image.Image): The image to segment.
             bounding_boxes (list[list[int]]): The bounding box prompts. Each bounding box is in the format
                 [xmin, ymin, xmax, ymax].
+            image_embeddings (Optional[torch.Tensor]): The image embeddings from `get_image_embeddings(image)`. If
+                provided, the image encoder is skipped.
 
         Returns:
             torch.Tensor: The segmentation masks. dtype: torch.bool. shape: [num_masks, channels, height, width].
@@ -41,6 +61,10 @@ class SegmentAnythingPipeline(RawModel):
         # Add batch dimension of 1 to the bounding boxes.
         boxes = [bounding_boxes]
         inputs = self._sam_processor(images=image, input_boxes=boxes, return_tensors="pt").to(self._sam_model.device)
+        if image_embeddings is not None:
+            # The pixel values are still needed by the processor for the image sizes, but not by the model.
+            pixel_values = inputs.pop("pixel_values")
+            inputs["image_embeddings"] = image_embeddings.to(device=pixel_values.device, dtype=pixel_values.dtype)
         outputs = self._sam_model(**inputs)
         masks = self._sam_processor.post_process_masks(
             masks=outputs.pred_masks,
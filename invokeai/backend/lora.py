@@ -2,10 +2,14 @@
 """LoRA model support."""
 
 import bisect
+import copy
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple, Union
 
 import torch
+from safetensors import safe_open
 from safetensors.torch import load_file
 from typing_extensions import Self
 
@@ -375,14 +379,90 @@ class IA3Layer(LoRALayerBase):
 AnyLoRALayer = Union[LoRALayer, LoHALayer, LoKRLayer, FullLayer, IA3Layer]
 
 
+class LazyLoRALayers(Mapping[str, AnyLoRALayer]):
+    """Read-only mapping of the layers of a LoRA stored in a .safetensors file.
+
+    Only the tensor names are read when the LoRA is loaded. Each layer is built when it is looked up, from tensors read
+    through a memory map of the file, and is not retained afterwards. The file is only kept open while layers are
+    being read (see `open()`).
+    """
+
+    def __init__(self, file_path: Path, tensor_names: Dict[str, Dict[str, str]], dtype: torch.dtype):
+        """
+        :param file_path: Path to the .safetensors file.
+        :param tensor_names: Maps each layer key to a dict of {value name: tensor name in the file}.
+        :param dtype: The dtype to cast the layer tensors to.
+        """
+        self._file_path = file_path
+        self._tensor_names = tensor_names
+        self.dtype = dtype
+        self._file: Any = None
+        self._file_users = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_file"], state["_file_users"], state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._file = None
+        self._file_users = 0
+        self._lock = threading.Lock()
+
+    @property
+    def file_size(self) -> int:
+        """Return the size of the .safetensors file in bytes."""
+        return self._file_path.stat().st_size
+
+    @contextmanager
+    def open(self) -> Iterator[None]:
+        """Keep the file open for the duration of the context.
+
+        Nested and concurrent contexts share one handle, which is closed, along with its memory map, when the last of
+        them exits.
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = safe_open(self._file_path.absolute().as_posix(), framework="pt", device="cpu")
+            self._file_users += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._file_users -= 1
+                if self._file_users == 0:
+                    self._file.__exit__(None, None, None)
+                    self._file = None
+
+    def __getitem__(self, layer_key: str) -> AnyLoRALayer:
+        return LoRAModelRaw._make_layer(layer_key, self.read_values(layer_key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tensor_names)
+
+    def __len__(self) -> int:
+        return len(self._tensor_names)
+
+    def read_values(self, layer_key: str) -> Dict[str, torch.Tensor]:
+        """Read the tensors of a layer from the file, cast to this LoRA's dtype."""
+        values: Dict[str, torch.Tensor] = {}
+        with self.open():
+            for name, tensor_name in self._tensor_names[layer_key].items():
+                value = self._file.get_tensor(tensor_name)
+                values[name] = value.to(dtype=self.dtype) if value.is_floating_point() else value
+        return values
+
+
 class LoRAModelRaw(RawModel):  # (torch.nn.Module):
     _name: str
-    layers: Dict[str, AnyLoRALayer]
+    layers: Mapping[str, AnyLoRALayer]
 
     def __init__(
         self,
         name: str,
-        layers: Dict[str, AnyLoRALayer],
+        layers: Mapping[str, AnyLoRALayer],
     ):
         self._name = name
         self.layers = layers
@@ -391,17 +471,63 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
     def name(self) -> str:
         return self._name
 
+    @property
+    def is_lazy(self) -> bool:
+        """Return True if the layers are read from disk on demand."""
+        return isinstance(self.layers, LazyLoRALayers)
+
     def to(self, device: Optional[torch.device] = None, dtype: Optional[torch.dtype] = None) -> None:
+        if isinstance(self.layers, LazyLoRALayers):
+            # Lazy layers are built in CPU memory and copied to their target device in get_layers_on_device().
+            if dtype is not None:
+                self.layers.dtype = dtype
+            return
         # TODO: try revert if exception?
         for _key, layer in self.layers.items():
             layer.to(device=device, dtype=dtype)
 
     def calc_size(self) -> int:
+        if isinstance(self.layers, LazyLoRALayers):
+            # The tensors of a lazy LoRA are read from the file when it is used, and take about as much memory.
+            return self.layers.file_size
         model_size = 0
         for _, layer in self.layers.items():
             model_size += layer.calc_size()
         return model_size
 
+    def get_layers_on_device(self, prefix: str, device: torch.device) -> Dict[str, AnyLoRALayer]:
+        """Return private copies of the layers whose keys start with prefix, with their tensors on device.
+
+        The LoRA itself is not modified, so it can be shared by several threads. The layers of a lazy LoRA are read
+        from the file and all of their tensors are copied to the device in a single transfer.
+        """
+        if not isinstance(self.layers, LazyLoRALayers):
+            device_layers: Dict[str, AnyLoRALayer] = {}
+            for layer_key, layer in self.layers.items():
+                if not layer_key.startswith(prefix):
+                    continue
+                device_layer = copy.copy(layer)
+                device_layer.to(device=device)
+                device_layers[layer_key] = device_layer
+            return device_layers
+
+        with self.layers.open():
+            layer_values = {
+                layer_key: self.layers.read_values(layer_key)
+                for layer_key in self.layers
+                if layer_key.startswith(prefix)
+            }
+            if device.type != "cpu":
+                _bulk_transfer(layer_values, device)
+
+        device_layers = {}
+        for layer_key, values in layer_values.items():
+            layer = self._make_layer(layer_key, values)
+            # Move anything that was left out of the bulk transfer, such as sparse biases.
+            layer.to(device=device)
+            device_layers[layer_key] = layer
+        return device_layers
+
     @classmethod
     def _convert_sdxl_keys_to_diffusers_format(cls, state_dict: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
         """Convert the keys of an SDXL LoRA state_dict to diffusers format.
@@ -467,17 +593,31 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
         device: Optional[torch.device] = None,
         dtype: Optional[torch.dtype] = None,
         base_model: Optional[BaseModelType] = None,
+        lazy: bool = False,
     ) -> Self:
+        """Load a LoRA from a checkpoint file.
+
+        If lazy is True and the file is a .safetensors file, only the tensor names are read now, and layers are read from
+        a memory map of the file when they are used (see `LazyLoRALayers`). `device` is ignored in that case.
+        """
         device = device or torch.device("cpu")
         dtype = dtype or torch.float32
 
         if isinstance(file_path, str):
             file_path = Path(file_path)
 
+        if lazy and file_path.suffix == ".safetensors":
+            with safe_open(file_path.absolute().as_posix(), framework="pt", device="cpu") as f:
+                tensor_names = cls._group_state({key: key for key in f.keys()})
+            if base_model == BaseModelType.StableDiffusionXL:
+                tensor_names = cls._convert_sdxl_keys_to_diffusers_format(tensor_names)
+            return cls(name=file_path.stem, layers=LazyLoRALayers(file_path, tensor_names, dtype))
+
         model = cls(
             name=file_path.stem,
             layers={},
         )
+        assert isinstance(model.layers, dict)
 
         if file_path.suffix == ".safetensors":
             sd = load_file(file_path.absolute().as_posix(), device="cpu")
@@ -490,30 +630,9 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
             state_dict = cls._convert_sdxl_keys_to_diffusers_format(state_dict)
 
         for layer_key, values in state_dict.items():
-            # Detect layers according to LyCORIS detection logic(`weight_list_det`)
-            # https://github.com/KohakuBlueleaf/LyCORIS/tree/8ad8000efb79e2b879054da8c9356e6143591bad/lycoris/modules
-
-            # lora and locon
-            if "lora_up.weight" in values:
-                layer: AnyLoRALayer = LoRALayer(layer_key, values)
-
-            # loha
-            elif "hada_w1_a" in values:
-                layer = LoHALayer(layer_key, values)
-
-            # lokr
-            elif "lokr_w1" in values or "lokr_w1_a" in values:
-                layer = LoKRLayer(layer_key, values)
-
-            # diff
-            elif "diff" in values:
-                layer = FullLayer(layer_key, values)
-
-            # ia3
-            elif "on_input" in values:
-                layer = IA3Layer(layer_key, values)
-
-            else:
+            try:
+                layer = cls._make_layer(layer_key, values)
+            except ValueError:
                 print(f">> Encountered unknown lora layer module in {model.name}: {layer_key} - {list(values.keys())}")
                 raise Exception("Unknown lora format!")
 
@@ -525,6 +644,34 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
 
         return model
 
+    @staticmethod
+    def _make_layer(layer_key: str, values: Dict[str, torch.Tensor]) -> AnyLoRALayer:
+        """Build the layer object for the values of one LoRA layer."""
+        # Detect layers according to LyCORIS detection logic(`weight_list_det`)
+        # https://github.com/KohakuBlueleaf/LyCORIS/tree/8ad8000efb79e2b879054da8c9356e6143591bad/lycoris/modules
+
+        # lora and locon
+        if "lora_up.weight" in values:
+            return LoRALayer(layer_key, values)
+
+        # loha
+        elif "hada_w1_a" in values:
+            return LoHALayer(layer_key, values)
+
+        # lokr
+        elif "lokr_w1" in values or "lokr_w1_a" in values:
+            return LoKRLayer(layer_key, values)
+
+        # diff
+        elif "diff" in values:
+            return FullLayer(layer_key, values)
+
+        # ia3
+        elif "on_input" in values:
+            return IA3Layer(layer_key, values)
+
+        raise ValueError(f"Unknown lora layer module {layer_key}: {list(values.keys())}")
+
     @staticmethod
     def _group_state(state_dict: Dict[str, torch.Tensor]) -> Dict[str, Dict[str, torch.Tensor]]:
         state_dict_groupped: Dict[str, Dict[str, torch.Tensor]] = {}
@@ -538,6 +685,27 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
         return state_dict_groupped
 
 
+def _bulk_transfer(layer_values: Dict[str, Dict[str, torch.Tensor]], device: torch.device) -> None:
+    """Move the floating point tensors in layer_values to device in place, with a single host-to-device copy.
+
+    The tensors are packed into one flat buffer per dtype, copied, and replaced by views into the copy. Scalars (e.g.
+    alpha, which is read with `.item()`) and the parts of sparse biases stay where they are.
+    """
+    by_dtype: Dict[torch.dtype, List[Tuple[Dict[str, torch.Tensor], str]]] = {}
+    for values in layer_values.values():
+        for name, value in values.items():
+            if value.is_floating_point() and value.dim() > 0 and not name.startswith("bias_"):
+                by_dtype.setdefault(value.dtype, []).append((values, name))
+
+    for entries in by_dtype.values():
+        flat = torch.cat([values[name].reshape(-1) for values, name in entries]).to(device=device)
+        offset = 0
+        for values, name in entries:
+            value = values[name]
+            values[name] = flat[offset : offset + value.nelement()].view(value.shape)
+            offset += value.nelement()
+
+
 # code from
 # https://github.com/bmaltais/kohya_ss/blob/2accb1305979ba62f5077a23aabac23b4c37e935/networks/lora_diffusers.py#L15C1-L97C32
 def make_sdxl_unet_conversion_map() -> List[Tuple[str, str]]:
@@ -549,36 +717,36 @@ def make_sdxl_unet_conversion_map() -> List[Tuple[str, str]]:
         for j in range(2):
             # loop over resnets/attentions for downblocks
             hf_down_res_prefix = f"down_blocks.{i}.resnets.{j}."
-            sd_down_res_prefix = f"input_blocks.{3*i + j + 1}.0."
+            sd_down_res_prefix = f"input_blocks.{3 * i + j + 1}.0."
             unet_conversion_map_layer.append((sd_down_res_prefix, hf_down_res_prefix))
 
             if i < 3:
                 # no attention layers in down_blocks.3
                 hf_down_atn_prefix = f"down_blocks.{i}.attentions.{j}."
-                sd_down_atn_prefix = f"input_blocks.{3*i + j + 1}.1."
+                sd_down_atn_prefix = f"input_blocks.{3 * i + j + 1}.1."
                 unet_conversion_map_layer.append((sd_down_atn_prefix, hf_down_atn_prefix))
 
         for j in range(3):
             # loop over resnets/attentions for upblocks
             hf_up_res_prefix = f"up_blocks.{i}.resnets.{j}."
-            sd_up_res_prefix = f"output_blocks.{3*i + j}.0."
+            sd_up_res_prefix = f"output_blocks.{3 * i + j}.0."
             unet_conversion_map_layer.append((sd_up_res_prefix, hf_up_res_prefix))
 
             # if i > 0: commentout for sdxl
             # no attention layers in up_blocks.0
             hf_up_atn_prefix = f"up_blocks.{i}.attentions.{j}."
-            sd_up_atn_prefix = f"output_blocks.{3*i + j}.1."
+            sd_up_atn_prefix = f"output_blocks.{3 * i + j}.1."
             unet_conversion_map_layer.append((sd_up_atn_prefix, hf_up_atn_prefix))
 
         if i < 3:
             # no downsample in down_blocks.3
             hf_downsample_prefix = f"down_blocks.{i}.downsamplers.0.conv."
-            sd_downsample_prefix = f"input_blocks.{3*(i+1)}.0.op."
+            sd_downsample_prefix = f"input_blocks.{3 * (i + 1)}.0.op."
             unet_conversion_map_layer.append((sd_downsample_prefix, hf_downsample_prefix))
 
             # no upsample in up_blocks.3
             hf_upsample_prefix = f"up_blocks.{i}.upsamplers.0."
-            sd_upsample_prefix = f"output_blocks.{3*i + 2}.{2}."  # change for sdxl
+            sd_upsample_prefix = f"output_blocks.{3 * i + 2}.{2}."  # change for sdxl
             unet_conversion_map_layer.append((sd_upsample_prefix, hf_upsample_prefix))
 
     hf_mid_atn_prefix = "mid_block.attentions.0."
@@ -587,7 +755,7 @@ def make_sdxl_unet_conversion_map() -> List[Tuple[str, str]]:
 
     for j in range(2):
         hf_mid_res_prefix = f"mid_block.resnets.{j}."
-        sd_mid_res_prefix = f"middle_block.{2*j}."
+        sd_mid_res_prefix = f"middle_block.{2 * j}."
         unet_conversion_map_layer.append((sd_mid_res_prefix, hf_mid_res_prefix))
 
     unet_conversion_map_resnet = [
@@ -609,13 +777,13 @@ def make_sdxl_unet_conversion_map() -> List[Tuple[str, str]]:
             unet_conversion_map.append((sd, hf))
 
     for j in range(2):
-        hf_time_embed_prefix = f"time_embedding.linear_{j+1}."
-        sd_time_embed_prefix = f"time_embed.{j*2}."
+        hf_time_embed_prefix = f"time_embedding.linear_{j + 1}."
+        sd_time_embed_prefix = f"time_embed.{j * 2}."
         unet_conversion_map.append((sd_time_embed_prefix, hf_time_embed_prefix))
 
     for j in range(2):
-        hf_label_embed_prefix = f"add_embedding.linear_{j+1}."
-        sd_label_embed_prefix = f"label_emb.0.{j*2}."
+        hf_label_embed_prefix = f"add_embedding.linear_{j + 1}."
+        sd_label_embed_prefix = f"label_emb.0.{j * 2}."
         unet_conversion_map.append((sd_label_embed_prefix, hf_label_embed_prefix))
 
     unet_conversion_map.append(("input_blocks.0.0.", "conv_in."))
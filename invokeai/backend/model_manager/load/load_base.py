@@ -8,7 +8,7 @@ from contextlib import contextmanager
 from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
-from typing import Any, Dict, Generator, Optional, Tuple
+from typing import Any, Dict, Generator, Hashable, List, Optional, Tuple
 
 import torch
 
@@ -18,7 +18,10 @@ from invokeai.backend.model_manager.config import (
     AnyModelConfig,
     SubModelType,
 )
+from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModel
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeights
 from invokeai.backend.model_manager.load.model_cache.model_cache_base import ModelCacheBase, ModelLockerBase
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
 
 
 @dataclass
@@ -80,6 +83,56 @@ class LoadedModelWithoutConfig:
         finally:
             self._locker.unlock()
 
+    @contextmanager
+    def model_in_precision(self, variant: PrecisionVariant) -> Generator[AnyModel, None, None]:
+        """
+        Lock a copy of the model laid out in the given precision on the current execution device.
+
+        The model cache keeps the converted model in RAM, so repeated calls with the same variant
+        only move it to the device, without converting any weights.
+        """
+        locked_model = self._locker.lock(variant)
+        try:
+            yield locked_model
+        finally:
+            self._locker.unlock()
+
+    def fused_weights(self, patch_key: Hashable) -> Optional[FusedWeights]:
+        """
+        Return a handle to the model's cached LoRA-patched weights on the current execution device.
+
+        `patch_key` must identify the patches applied, e.g. the keys, hashes and weights of the LoRAs.
+        Returns None if the fused weights cache is disabled.
+        """
+        return self._locker.get_fused_weights(patch_key)
+
+    def compiled_model(self, model: AnyModel, variant: Hashable) -> CompiledModel:
+        """
+        Return the model cache's torch.compile'd template of this model on the current execution device.
+
+        `model` is a locked copy of this model; only its architecture is used. `variant` must describe
+        anything that changes the traced graph but is not a model input, e.g. the attention processors.
+        Use `CompiledModel.bind(model)` to run the compiled template with the locked copy's weights.
+        """
+        return self._locker.get_compiled_model(model, variant)
+
+    @contextmanager
+    def models_on_idle_devices(
+        self, max_devices: int, variant: Optional[PrecisionVariant] = None
+    ) -> Generator[List[AnyModel], None, None]:
+        """
+        Return copies of the model on up to max_devices execution devices that are currently idle.
+
+        This is for spreading independent work, such as VAE tiles, over devices that no
+        other session is using. The list is empty if there are no idle devices. If variant
+        is given, the copies are of that precision variant of the model.
+        """
+        if max_devices <= 0:
+            yield []
+            return
+        with self._locker.lock_on_idle_devices(max_devices, variant) as models:
+            yield models
+
     @property
     def model(self) -> AnyModel:
         """Return the model without locking it."""
@@ -0,0 +1,149 @@
+# Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Development team
+"""
+Keep torch.compile'd models alive between sessions.
+
+Every lock of a model returns a fresh copy on the execution device, and
+TorchDynamo guards compiled code on the identity of the module it was
+compiled for, so compiling the locked copy would recompile in every
+session. Instead, each compiled entry owns a weightless "template" of the
+model (a copy whose parameters and buffers are empty) and compiles that
+once. A session binds its own copy to the template, which points the data
+of the template's tensors at the copy's tensors for the duration of the
+call. The compiled code captures the template's tensor objects, not their
+data, so in-place weight changes on the copy, such as LoRA patches, are
+seen by the compiled code.
+
+Entries are keyed by the model cache key, the execution device and a
+description of anything else that changes the traced graph, such as the
+attention processors. Each entry compiles at most `max_signatures` input
+signatures (e.g. latent sizes and batch sizes); calls with further
+signatures should run the model eagerly rather than trigger yet another
+compilation.
+"""
+
+import copy
+import threading
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Dict, Generator, Hashable, List, Optional, Set, Tuple
+
+import torch
+
+# Same as TorchDynamo's default recompilation limit.
+DEFAULT_MAX_SIGNATURES = 8
+
+
+class CompiledModel:
+    """A torch.compile'd weightless template of a model, which runs any bound copy of that model."""
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        mode: Optional[str] = None,
+        backend: str = "inductor",
+        max_signatures: int = DEFAULT_MAX_SIGNATURES,
+    ):
+        """
+        Initialize the compiled model.
+
+        :param model: The model to take the architecture from. Its weights are not copied.
+        :param mode: The torch.compile mode. CUDA graph modes are not supported, as bound copies
+            do not keep their tensors at fixed addresses.
+        :param backend: The torch.compile backend.
+        :param max_signatures: Maximum number of input signatures to compile.
+        """
+        # Deep-copy the model with every parameter and buffer replaced by an empty tensor of the same device and dtype.
+        memo: Dict[int, Any] = {}
+        for tensor in chain(model.parameters(), model.buffers()):
+            empty = tensor.new_empty(0)
+            if isinstance(tensor, torch.nn.Parameter):
+                empty = torch.nn.Parameter(empty, requires_grad=tensor.requires_grad)
+            memo[id(tensor)] = empty
+        self._template = copy.deepcopy(model, memo)
+        self._template_tensors = self._tensors(self._template)
+        self._compiled = torch.compile(self._template, mode=mode, backend=backend, dynamic=False)
+        self._max_signatures = max_signatures
+        self._signatures: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._bind_lock = threading.Lock()
+
+    @staticmethod
+    def _tensors(model: torch.nn.Module) -> List[torch.Tensor]:
+        """Return the parameters and buffers of every submodule of model, in a stable order and including shared ones."""
+        tensors: List[torch.Tensor] = []
+        for _, module in model.named_modules(remove_duplicate=False):
+            tensors.extend(t for t in module._parameters.values() if t is not None)
+            tensors.extend(t for t in module._buffers.values() if t is not None)
+        return tensors
+
+    @contextmanager
+    def bind(self, model: torch.nn.Module) -> Generator["CompiledModel", None, None]:
+        """Run the compiled template with the parameters and buffers of model, which must have the same architecture."""
+        with self._bind_lock:
+            pairs = list(zip(self._template_tensors, self._tensors(model), strict=True))
+            try:
+                for template_tensor, tensor in pairs:
+                    template_tensor.data = tensor
+                yield self
+            finally:
+                for template_tensor, _ in pairs:
+                    template_tensor.data = template_tensor.new_empty(0)
+
+    def accepts(self, signature: Hashable) -> bool:
+        """
+        Return True if calls with this input signature should use the compiled model.
+
+        Signatures that have already been compiled are always accepted. New ones are accepted
+        until `max_signatures` is reached.
+        """
+        with self._lock:
+            if signature in self._signatures:
+                return True
+            if len(self._signatures) >= self._max_signatures:
+                return False
+            self._signatures.add(signature)
+            return True
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        """Call the compiled model. Only valid while a model is bound."""
+        return self._compiled(*args, **kwargs)
+
+
+class CompiledModelCache:
+    """Store of compiled models, keyed by model cache key, execution device and graph variant."""
+
+    def __init__(self, mode: Optional[str] = None, backend: str = "inductor"):
+        """
+        Initialize the store.
+
+        :param mode: The torch.compile mode to use.
+        :param backend: The torch.compile backend to use.
+        """
+        self._mode = mode
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, torch.device, Hashable], CompiledModel] = {}
+
+    def get(self, model_key: str, device: torch.device, variant: Hashable, model: torch.nn.Module) -> CompiledModel:
+        """Return the compiled model for model_key, device and variant, compiling model if there is none yet."""
+        key = (model_key, device, variant)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = CompiledModel(model, mode=self._mode, backend=self._backend)
+            return self._entries[key]
+
+    def discard_model(self, model_key: str) -> None:
+        """Drop the compiled models of the model with the given cache key on all devices."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == model_key]:
+                del self._entries[key]
+
+    def clear(self, device: Optional[torch.device] = None) -> None:
+        """Drop the compiled models on device, or on all devices if device is None."""
+        with self._lock:
+            for key in [k for k in self._entries if device is None or k[1] == device]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,132 @@
+# Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Development team
+"""
+Keep copies of model weights with a stack of LoRAs already fused in, so that
+repeat generations with the same LoRA combination can skip patching.
+
+Each execution device has its own least-recently-used store, bounded by the
+`fused_lora_cache_size` configuration setting. Entries are keyed by the model cache key plus
+a description of the LoRA stack (LoRA keys, hashes and weights), and hold
+only the parameters that the LoRAs changed.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Optional
+
+import torch
+
+# actual size of a gig
+GIG = 1073741824
+
+
+class FusedWeightsCache:
+    """Per-device LRU store of LoRA-patched model parameters."""
+
+    def __init__(self, max_size: float):
+        """
+        Initialize the store.
+
+        :param max_size: Maximum size of the fused weights kept on each execution device (GB).
+        """
+        self._max_bytes = int(max_size * GIG)
+        self._lock = threading.Lock()
+        self._entries: Dict[torch.device, OrderedDict[Hashable, Dict[str, torch.Tensor]]] = {}
+        self._sizes: Dict[torch.device, Dict[Hashable, int]] = {}
+
+    @property
+    def max_size(self) -> float:
+        """Return the maximum size of the fused weights kept on each device (GB)."""
+        return self._max_bytes / GIG
+
+    def get(self, key: Hashable, device: torch.device) -> Optional[Dict[str, torch.Tensor]]:
+        """Return the fused parameters stored under key on device, or None."""
+        with self._lock:
+            entries = self._entries.get(device)
+            if entries is None or key not in entries:
+                return None
+            entries.move_to_end(key)
+            return entries[key]
+
+    def put(self, key: Hashable, device: torch.device, weights: Dict[str, torch.Tensor]) -> bool:
+        """
+        Store the fused parameters under key on device.
+
+        The least recently used entries on the device are evicted to make room.
+        Returns False if the weights do not fit within the per-device budget.
+        """
+        size = sum(w.nelement() * w.element_size() for w in weights.values())
+        if size > self._max_bytes:
+            return False
+        with self._lock:
+            entries = self._entries.setdefault(device, OrderedDict())
+            sizes = self._sizes.setdefault(device, {})
+            if key in entries:
+                entries.move_to_end(key)
+                return True
+            while entries and sum(sizes.values()) + size > self._max_bytes:
+                evicted_key, _ = entries.popitem(last=False)
+                del sizes[evicted_key]
+            entries[key] = weights
+            sizes[key] = size
+        return True
+
+    def cache_size(self, device: torch.device) -> int:
+        """Return the number of bytes of fused weights stored on device."""
+        with self._lock:
+            return sum(self._sizes.get(device, {}).values())
+
+    def evict(self, bytes_needed: int, device: torch.device) -> int:
+        """Drop the least recently used entries on device until at least bytes_needed bytes are freed. Returns the bytes freed."""
+        freed = 0
+        with self._lock:
+            entries = self._entries.get(device, OrderedDict())
+            sizes = self._sizes.get(device, {})
+            while entries and freed < bytes_needed:
+                evicted_key, _ = entries.popitem(last=False)
+                freed += sizes.pop(evicted_key)
+        return freed
+
+    def discard_model(self, model_key: str) -> None:
+        """Drop the fused weights of the model with the given cache key on all devices."""
+        with self._lock:
+            for device, entries in self._entries.items():
+                for key in [k for k in entries if isinstance(k, tuple) and k[0] == model_key]:
+                    del entries[key]
+                    del self._sizes[device][key]
+
+    def clear(self, device: Optional[torch.device] = None) -> None:
+        """Drop the fused weights on device, or on all devices if device is None."""
+        with self._lock:
+            devices = list(self._entries.keys()) if device is None else [device]
+            for d in devices:
+                self._entries.pop(d, None)
+                self._sizes.pop(d, None)
+
+
+@dataclass
+class FusedWeights:
+    """Handle to the fused weights of one model and LoRA stack on one execution device."""
+
+    cache: FusedWeightsCache
+    key: Hashable
+    device: torch.device
+
+    @torch.no_grad()
+    def load_into(self, model: torch.nn.Module) -> bool:
+        """Copy the stored fused parameters into model. Returns False if none are stored."""
+        weights = self.cache.get(self.key, self.device)
+        if weights is None:
+            return False
+        for param_key, weight in weights.items():
+            model.get_parameter(param_key).copy_(weight)
+        return True
+
+    @torch.no_grad()
+    def save_from(self, model: torch.nn.Module, param_keys: Iterable[str]) -> bool:
+        """Store copies of the named (already patched) parameters of model. Returns False if they do not fit."""
+        params = {param_key: model.get_parameter(param_key) for param_key in param_keys}
+        size = sum(p.nelement() * p.element_size() for p in params.values())
+        if not params or size > self.cache.max_size * GIG:
+            return False
+        return self.cache.put(self.key, self.device, {k: p.detach().clone() for k, p in params.items()})
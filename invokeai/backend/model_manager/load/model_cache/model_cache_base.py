@@ -11,19 +11,24 @@ from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from logging import Logger
-from typing import Dict, Generator, Generic, Optional, Set, TypeVar
+from typing import Dict, Generator, Generic, Hashable, List, Optional, Set, TypeVar
 
 import torch
 
 from invokeai.backend.model_manager.config import AnyModel, SubModelType
+from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModel, CompiledModelCache
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeights, FusedWeightsCache
+from invokeai.backend.model_manager.load.model_cache.onnx_session_cache import OnnxSessionCache
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
+from invokeai.backend.model_manager.load.model_cache.scheduler_cache import SchedulerCache
 
 
 class ModelLockerBase(ABC):
     """Base class for the model locker used by the loader."""
 
     @abstractmethod
-    def lock(self) -> AnyModel:
-        """Lock the contained model and move it into VRAM."""
+    def lock(self, variant: Optional[PrecisionVariant] = None) -> AnyModel:
+        """Lock the contained model, or its precision variant if given, and move it into VRAM."""
         pass
 
     @abstractmethod
@@ -36,6 +41,24 @@ class ModelLockerBase(ABC):
         """Return the state dict (if any) for the cached model."""
         pass
 
+    @abstractmethod
+    def get_fused_weights(self, patch_key: Hashable) -> Optional[FusedWeights]:
+        """Return a handle to this model's fused weights for the given patches on the current execution device."""
+        pass
+
+    @abstractmethod
+    def get_compiled_model(self, model: AnyModel, variant: Hashable) -> CompiledModel:
+        """Return the compiled template of this model for the given graph variant on the current execution device."""
+        pass
+
+    @contextmanager
+    @abstractmethod
+    def lock_on_idle_devices(
+        self, max_devices: int, variant: Optional[PrecisionVariant] = None
+    ) -> Generator[List[AnyModel], None, None]:
+        """Borrow up to max_devices idle execution devices and return a copy of the model on each of them."""
+        pass
+
     @property
     @abstractmethod
     def model(self) -> AnyModel:
@@ -54,11 +77,13 @@ class CacheRecord(Generic[T]):
     key: Unique key for each model, same as used in the models database.
     model: Read-only copy of the model *without weights* residing in the "meta device"
     size: Size of the model
+    variant: The precision variant of the model held by this record, if any
     """
 
     key: str
     size: int
     model: T
+    variant: Optional[PrecisionVariant] = None
 
 
 @dataclass
@@ -95,6 +120,12 @@ class ModelCacheBase(ABC, Generic[T]):
         """Reserve an execution device (GPU) under the current thread id."""
         pass
 
+    @contextmanager
+    @abstractmethod
+    def borrow_idle_execution_devices(self, max_devices: int) -> Generator[List[torch.device], None, None]:
+        """Temporarily reserve up to max_devices execution devices that no other thread is using, without waiting."""
+        pass
+
     @abstractmethod
     def get_execution_device(self) -> torch.device:
         """
@@ -108,6 +139,30 @@ class ModelCacheBase(ABC, Generic[T]):
         """
         pass
 
+    @property
+    @abstractmethod
+    def fused_weights(self) -> FusedWeightsCache:
+        """Return the per-device store of LoRA-patched model weights."""
+        pass
+
+    @property
+    @abstractmethod
+    def compiled_models(self) -> CompiledModelCache:
+        """Return the store of torch.compile'd models."""
+        pass
+
+    @property
+    @abstractmethod
+    def onnx_sessions(self) -> OnnxSessionCache:
+        """Return the per-device pool of ONNX Runtime inference sessions."""
+        pass
+
+    @property
+    @abstractmethod
+    def schedulers(self) -> SchedulerCache:
+        """Return the store of built schedulers and their timestep schedules."""
+        pass
+
     @property
     @abstractmethod
     def max_cache_size(self) -> float:
@@ -180,6 +235,13 @@ class ModelCacheBase(ABC, Generic[T]):
         """Move a copy of the model into the indicated device and return it."""
         pass
 
+    @abstractmethod
+    def get_precision_variant(
+        self, cache_entry: CacheRecord[AnyModel], variant: PrecisionVariant
+    ) -> CacheRecord[AnyModel]:
+        """Return the cache record holding the given precision variant of a cached model, creating it if needed."""
+        pass
+
     @abstractmethod
     def cache_size(self) -> int:
         """Get the total size of the models currently cached."""
@@ -31,6 +31,8 @@ import torch
 
 from invokeai.backend.model_manager import AnyModel, SubModelType
 from invokeai.backend.model_manager.load.memory_snapshot import MemorySnapshot
+from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModelCache
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeightsCache
 from invokeai.backend.model_manager.load.model_cache.model_cache_base import (
     CacheRecord,
     CacheStats,
@@ -38,6 +40,12 @@ from invokeai.backend.model_manager.load.model_cache.model_cache_base import (
     ModelLockerBase,
 )
 from invokeai.backend.model_manager.load.model_cache.model_locker import ModelLocker
+from invokeai.backend.model_manager.load.model_cache.onnx_session_cache import OnnxSessionCache
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
+from invokeai.backend.model_manager.load.model_cache.scheduler_cache import (
+    DEFAULT_MAX_SCHEDULER_CACHE_ENTRIES,
+    SchedulerCache,
+)
 from invokeai.backend.model_manager.load.model_util import calc_model_size_by_data
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.logging import InvokeAILogger
@@ -46,6 +54,7 @@ from invokeai.backend.util.logging import InvokeAILogger
 # Default is roughly enough to hold three fp16 diffusers models in RAM simultaneously
 DEFAULT_MAX_CACHE_SIZE = 6.0
 DEFAULT_MAX_VRAM_CACHE_SIZE = 0.25
+DEFAULT_MAX_FUSED_LORA_CACHE_SIZE = 2.0
 
 # actual size of a gig
 GIG = 1073741824
@@ -61,6 +70,8 @@ class ModelCache(ModelCacheBase[AnyModel]):
         self,
         max_cache_size: float = DEFAULT_MAX_CACHE_SIZE,
         max_vram_cache_size: float = DEFAULT_MAX_VRAM_CACHE_SIZE,
+        max_fused_lora_cache_size: float = DEFAULT_MAX_FUSED_LORA_CACHE_SIZE,
+        max_scheduler_cache_entries: int = DEFAULT_MAX_SCHEDULER_CACHE_ENTRIES,
         storage_device: torch.device = torch.device("cpu"),
         precision: torch.dtype = torch.float16,
         log_memory_usage: bool = False,
@@ -70,6 +81,8 @@ class ModelCache(ModelCacheBase[AnyModel]):
         Initialize the model RAM cache.
 
         :param max_cache_size: Maximum size of the RAM cache [6.0 GB]
+        :param max_fused_lora_cache_size: Maximum size of the LoRA-patched weights kept on each execution device [2.0 GB]
+        :param max_scheduler_cache_entries: Maximum number of built schedulers, and of timestep schedules, to keep [32]
         :param storage_device: Torch device to save inactive model in [torch.device('cpu')]
         :param precision: Precision for loaded models [torch.float16]
         :param sequential_offload: Conserve VRAM by loading and unloading each stage of the pipeline sequentially
@@ -89,6 +102,10 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
         self._cached_models: Dict[str, CacheRecord[AnyModel]] = {}
         self._cache_stack: List[str] = []
+        self._fused_weights = FusedWeightsCache(max_size=max_fused_lora_cache_size)
+        self._onnx_sessions = OnnxSessionCache()
+        self._compiled_models = CompiledModelCache()
+        self._schedulers = SchedulerCache(max_entries=max_scheduler_cache_entries)
 
         # device to thread id
         self._device_lock = threading.Lock()
@@ -172,6 +189,54 @@ class ModelCache(ModelCacheBase[AnyModel]):
                 self._free_execution_device.release()
                 torch.cuda.empty_cache()
 
+    @contextmanager
+    def borrow_idle_execution_devices(self, max_devices: int) -> Generator[List[torch.device], None, None]:
+        """Temporarily reserve up to max_devices execution devices that no other thread is using, without waiting.
+
+        The borrowed devices are not returned by get_execution_device(), so the current
+        thread keeps its own reserved device for everything else it does.
+        """
+        borrowed: List[torch.device] = []
+        current_thread = threading.current_thread().ident
+        assert current_thread is not None
+        with self._device_lock:
+            for device, tid in self._execution_devices.items():
+                if len(borrowed) >= max_devices:
+                    break
+                if tid == 0 and self._free_execution_device.acquire(blocking=False):
+                    # negative tids mark devices borrowed on behalf of a thread
+                    self._execution_devices[device] = -current_thread
+                    borrowed.append(device)
+        if borrowed:
+            self.logger.debug(f"{current_thread} Borrowed idle torch device(s) {', '.join(str(x) for x in borrowed)}")
+        try:
+            yield borrowed
+        finally:
+            with self._device_lock:
+                for device in borrowed:
+                    self._execution_devices[device] = 0
+                    self._free_execution_device.release()
+
+    @property
+    def fused_weights(self) -> FusedWeightsCache:
+        """Return the per-device store of LoRA-patched model weights."""
+        return self._fused_weights
+
+    @property
+    def compiled_models(self) -> CompiledModelCache:
+        """Return the store of torch.compile'd models."""
+        return self._compiled_models
+
+    @property
+    def onnx_sessions(self) -> OnnxSessionCache:
+        """Return the per-device pool of ONNX Runtime inference sessions."""
+        return self._onnx_sessions
+
+    @property
+    def schedulers(self) -> SchedulerCache:
+        """Return the store of built schedulers and their timestep schedules."""
+        return self._schedulers
+
     @property
     def max_cache_size(self) -> float:
         """Return the cap on cache size."""
@@ -298,13 +363,54 @@ class ModelCache(ModelCacheBase[AnyModel]):
             # Some models don't have a state dictionary, in which case the
             # stored model will still reside in CPU
             if hasattr(cache_entry.model, "to"):
+                self._free_vram_caches(target_device, cache_entry.size)
                 model_in_gpu = copy.deepcopy(cache_entry.model)
                 assert hasattr(model_in_gpu, "to")
-                model_in_gpu.to(device=target_device, dtype=TorchDevice.choose_torch_dtype(target_device))
+                # Precision variants are already laid out in their dtypes, so they are only moved.
+                dtype = TorchDevice.choose_torch_dtype(target_device) if cache_entry.variant is None else None
+                model_in_gpu.to(device=target_device, dtype=dtype)
                 return model_in_gpu
             else:
                 return cache_entry.model  # what happens in CPU stays in CPU
 
+    def get_precision_variant(
+        self, cache_entry: CacheRecord[AnyModel], variant: PrecisionVariant
+    ) -> CacheRecord[AnyModel]:
+        """
+        Return the cache record holding the given precision variant of a cached model, creating it if needed.
+
+        The variant is a converted copy of the model in RAM. It is stored under its own key, counts
+        towards the cache size like any other model and is evicted along with the model it was made from.
+        If the model is already laid out in the variant's precision, no copy is made: the returned record
+        shares the cached model and only tells `model_to_device()` to keep its dtypes.
+
+        :param cache_entry: The CacheRecord of the model in its default precision
+        :param variant: The precision to convert the model to
+        """
+        key = f"{cache_entry.key}@{variant.name}"
+        with self._ram_lock:
+            if key in self._cached_models:
+                with suppress(Exception):
+                    self._cache_stack.remove(key)
+                self._cache_stack.append(key)
+                return self._cached_models[key]
+
+            assert isinstance(cache_entry.model, torch.nn.Module)
+            if variant.matches(cache_entry.model):
+                return CacheRecord(key=cache_entry.key, model=cache_entry.model, size=cache_entry.size, variant=variant)
+
+            self.logger.debug(f"Creating precision variant {key}")
+            model = copy.deepcopy(cache_entry.model)
+            variant.apply(model)
+            size = calc_model_size_by_data(logger=self.logger, model=model)
+            # Keep the base model, which the variant is evicted along with.
+            self._make_room(size, pinned={cache_entry.key})
+
+            variant_entry = CacheRecord(key=key, model=model, size=size, variant=variant)
+            self._cached_models[key] = variant_entry
+            self._cache_stack.append(key)
+            return variant_entry
+
     def print_cuda_stats(self) -> None:
         """Log CUDA diagnostics."""
         vram = "%4.2fG" % (torch.cuda.memory_allocated() / GIG)
@@ -315,24 +421,34 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
     def make_room(self, size: int) -> None:
         """Make enough room in the cache to accommodate a new model of indicated size."""
+        self._make_room(size)
+
+    def _make_room(self, size: int, pinned: Optional[Set[str]] = None) -> None:
+        """Make room for a new model of indicated size, without evicting the models whose keys are in pinned."""
         # calculate how much memory this model will require
         # multiplier = 2 if self.precision==torch.float32 else 1
         bytes_needed = size
         maximum_size = self.max_cache_size * GIG  # stored in GB, convert to bytes
-        current_size = self.cache_size()
+        # ONNX sessions on all non-CUDA devices hold their weights in RAM, too
+        current_size = self.cache_size() + self._onnx_sessions.size("cpu")
 
         if current_size + bytes_needed > maximum_size:
             self.logger.debug(
-                f"Max cache size exceeded: {(current_size/GIG):.2f}/{self.max_cache_size:.2f} GB, need an additional"
-                f" {(bytes_needed/GIG):.2f} GB"
+                f"Max cache size exceeded: {(current_size / GIG):.2f}/{self.max_cache_size:.2f} GB, need an additional"
+                f" {(bytes_needed / GIG):.2f} GB"
             )
 
         self.logger.debug(f"Before making_room: cached_models={len(self._cached_models)}")
 
         pos = 0
         models_cleared = 0
+        # Precision variants of evicted models are deleted after the loop, so that the stack doesn't shift under it.
+        orphaned_variants: Set[str] = set()
         while current_size + bytes_needed > maximum_size and pos < len(self._cache_stack):
             model_key = self._cache_stack[pos]
+            if (pinned is not None and model_key in pinned) or model_key in orphaned_variants:
+                pos += 1
+                continue
             cache_entry = self._cached_models[model_key]
 
             refs = sys.getrefcount(cache_entry.model)
@@ -343,16 +459,30 @@ class ModelCache(ModelCacheBase[AnyModel]):
             # 1 from onnx runtime object
             if refs <= (3 if "onnx" in model_key else 2):
                 self.logger.debug(
-                    f"Removing {model_key} from RAM cache to free at least {(size/GIG):.2f} GB (-{(cache_entry.size/GIG):.2f} GB)"
+                    f"Removing {model_key} from RAM cache to free at least {(size / GIG):.2f} GB (-{(cache_entry.size / GIG):.2f} GB)"
                 )
                 current_size -= cache_entry.size
                 models_cleared += 1
+                for variant_key in self._variant_keys(model_key):
+                    if variant_key not in orphaned_variants:
+                        orphaned_variants.add(variant_key)
+                        current_size -= self._cached_models[variant_key].size
                 self._delete_cache_entry(cache_entry)
                 del cache_entry
 
             else:
                 pos += 1
 
+        for variant_key in orphaned_variants:
+            models_cleared += 1
+            self._delete_cache_entry(self._cached_models[variant_key])
+
+        if current_size + bytes_needed > maximum_size:
+            freed = self._onnx_sessions.evict(current_size + bytes_needed - maximum_size, device=torch.device("cpu"))
+            if freed > 0:
+                self.logger.debug(f"Dropped ONNX sessions from RAM to free {(freed / GIG):.2f} GB")
+                current_size -= freed
+
         if models_cleared > 0:
             # There would likely be some 'garbage' to be collected regardless of whether a model was cleared or not, but
             # there is a significant time cost to calling `gc.collect()`, so we want to use it sparingly. (The time cost
@@ -381,12 +511,34 @@ class ModelCache(ModelCacheBase[AnyModel]):
         if needed_size > free_mem:
             raise torch.cuda.OutOfMemoryError
 
+    def _free_vram_caches(self, target_device: torch.device, needed_size: int) -> None:
+        """Drop ONNX sessions, then fused LoRA weights, on target_device until needed_size bytes of VRAM are free."""
+        if target_device.type != "cuda":
+            return
+        if self._onnx_sessions.size("cuda") == 0 and self._fused_weights.cache_size(target_device) == 0:
+            return
+        vram_device = (  # mem_get_info() needs an indexed device
+            target_device if target_device.index is not None else torch.device(str(target_device), index=0)
+        )
+        free_mem, _ = torch.cuda.mem_get_info(vram_device)
+        if needed_size > free_mem:
+            # ONNX Runtime releases a session's GPU memory arena when the session is destroyed
+            freed = self._onnx_sessions.evict(needed_size - free_mem, device=target_device)
+            if needed_size > free_mem + freed:
+                self._fused_weights.evict(needed_size - free_mem - freed, target_device)
+
     def _delete_cache_entry(self, cache_entry: CacheRecord[AnyModel]) -> None:
         try:
             self._cache_stack.remove(cache_entry.key)
             del self._cached_models[cache_entry.key]
         except ValueError:
             pass
+        self._fused_weights.discard_model(cache_entry.key)
+        self._compiled_models.discard_model(cache_entry.key)
+
+    def _variant_keys(self, key: str) -> List[str]:
+        """Return the keys of the cached precision variants made from the model with the given key."""
+        return [k for k in self._cached_models if k.startswith(f"{key}@")]
 
     @staticmethod
     def _device_name(device: torch.device) -> str:
@@ -2,16 +2,20 @@
 Base class and implementation of a class that moves models in and out of VRAM.
 """
 
-from typing import Dict, Optional
+from contextlib import contextmanager
+from typing import Dict, Generator, Hashable, List, Optional
 
 import torch
 
 from invokeai.backend.model_manager import AnyModel
+from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModel
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeights
 from invokeai.backend.model_manager.load.model_cache.model_cache_base import (
     CacheRecord,
     ModelCacheBase,
     ModelLockerBase,
 )
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
 
 MAX_GPU_WAIT = 600  # wait up to 10 minutes for a GPU to become free
 
@@ -34,11 +38,11 @@ class ModelLocker(ModelLockerBase):
         """Return the model without moving it around."""
         return self._cache_entry.model
 
-    def lock(self) -> AnyModel:
-        """Move the model into the execution device (GPU) and lock it."""
+    def lock(self, variant: Optional[PrecisionVariant] = None) -> AnyModel:
+        """Move the model, or its precision variant if given, into the execution device (GPU) and lock it."""
         try:
             device = self._cache.get_execution_device()
-            model_on_device = self._cache.model_to_device(self._cache_entry, device)
+            model_on_device = self._cache.model_to_device(self._get_cache_entry(variant), device)
             self._cache.logger.debug(f"Moved {self._cache_entry.key} to {device}")
             self._cache.print_cuda_stats()
         except torch.cuda.OutOfMemoryError:
@@ -60,3 +64,37 @@ class ModelLocker(ModelLockerBase):
     def get_state_dict(self) -> Optional[Dict[str, torch.Tensor]]:
         """Return the state dict (if any) for the cached model."""
         return None
+
+    def get_fused_weights(self, patch_key: Hashable) -> Optional[FusedWeights]:
+        """Return a handle to this model's fused weights for the given patches on the current execution device."""
+        if self._cache.fused_weights.max_size <= 0:
+            return None
+        return FusedWeights(
+            cache=self._cache.fused_weights,
+            key=(self._cache_entry.key, patch_key),
+            device=self._cache.get_execution_device(),
+        )
+
+    def get_compiled_model(self, model: AnyModel, variant: Hashable) -> CompiledModel:
+        """Return the compiled template of this model for the given graph variant on the current execution device."""
+        assert isinstance(model, torch.nn.Module)
+        return self._cache.compiled_models.get(
+            model_key=self._cache_entry.key,
+            device=self._cache.get_execution_device(),
+            variant=variant,
+            model=model,
+        )
+
+    @contextmanager
+    def lock_on_idle_devices(
+        self, max_devices: int, variant: Optional[PrecisionVariant] = None
+    ) -> Generator[List[AnyModel], None, None]:
+        """Borrow up to max_devices idle execution devices and return a copy of the model on each of them."""
+        with self._cache.borrow_idle_execution_devices(max_devices) as devices:
+            cache_entry = self._get_cache_entry(variant) if devices else self._cache_entry
+            yield [self._cache.model_to_device(cache_entry, device) for device in devices]
+
+    def _get_cache_entry(self, variant: Optional[PrecisionVariant]) -> CacheRecord[AnyModel]:
+        if variant is None:
+            return self._cache_entry
+        return self._cache.get_precision_variant(self._cache_entry, variant)
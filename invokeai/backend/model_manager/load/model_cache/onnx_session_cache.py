@@ -0,0 +1,164 @@
+# Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Development team
+"""
+Keep ONNX Runtime inference sessions alive between invocations.
+
+ONNX sessions cannot be deep-copied onto an execution device the way the
+model cache handles torch models, and creating one means re-reading and
+re-optimizing the whole graph. Instead, each (model file, execution device)
+pair gets a single session that is built on first use and then shared by
+every invocation running on that device. `InferenceSession.run()` is
+thread-safe, so no locking is needed once a session exists.
+
+Each session holds the model's weights, in a GPU memory arena for CUDA
+sessions or in RAM for all others, which run on the CPU execution provider
+whatever their execution device. The pool is bounded, and the model cache
+counts the sessions against its budgets and drops the least recently used
+ones when it needs room.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+if TYPE_CHECKING:
+    import onnxruntime as ort
+
+DEFAULT_MAX_SESSIONS = 8
+
+
+@dataclass
+class _OnnxSessionRecord:
+    session: "ort.InferenceSession"
+    size: int
+    memory_device: torch.device
+
+
+class OnnxSessionCache:
+    """Per-device pool of ONNX Runtime inference sessions."""
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS) -> None:
+        """
+        Initialize the session pool.
+
+        :param max_sessions: Maximum number of sessions to keep over all devices. The least
+            recently used session is dropped when a new one would exceed it.
+        """
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[Tuple[Path, torch.device], _OnnxSessionRecord] = OrderedDict()
+        self._building: Dict[Tuple[Path, torch.device], threading.Lock] = {}
+        self._max_sessions = max_sessions
+
+    def get(self, model_path: Path, device: torch.device) -> "ort.InferenceSession":
+        """
+        Return the session for the ONNX model at model_path on device, creating it if needed.
+
+        :param model_path: Path to the .onnx file
+        :param device: Execution device. CUDA devices use the CUDA execution provider on the
+            matching GPU, all other devices run on the CPU.
+        """
+        key = (Path(model_path), device)
+        with self._lock:
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+                return self._sessions[key].session
+            build_lock = self._building.setdefault(key, threading.Lock())
+        # Build outside of the pool lock, so that other models and devices are not held up,
+        # while making sure that the same session is only built once.
+        with build_lock:
+            with self._lock:
+                if key in self._sessions:
+                    self._sessions.move_to_end(key)
+                    return self._sessions[key].session
+            session = self._create_session(key[0], device)
+            with self._lock:
+                # The session holds the model's weights, so their size stands in for the session's.
+                self._sessions[key] = _OnnxSessionRecord(
+                    session=session, size=key[0].stat().st_size, memory_device=self._memory_device(device)
+                )
+                self._building.pop(key, None)
+                while len(self._sessions) > max(self._max_sessions, 1):
+                    self._sessions.popitem(last=False)
+        return session
+
+    def size(self, device_type: Optional[str] = None) -> int:
+        """
+        Return the approximate memory held by the sessions on devices of device_type, or on all devices, in bytes.
+
+        Sessions count towards the device that holds their memory, so "cpu" covers the sessions of all
+        non-CUDA execution devices.
+        """
+        with self._lock:
+            return sum(
+                r.size for r in self._sessions.values() if device_type is None or r.memory_device.type == device_type
+            )
+
+    def evict(self, bytes_needed: int, device: Optional[torch.device] = None) -> int:
+        """
+        Drop the least recently used sessions whose memory is held on device, or any sessions if device is None,
+        until at least bytes_needed bytes are freed or no sessions are left.
+
+        Sessions that are still running keep working, and are freed once they finish.
+
+        :return: The number of bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            for key in list(self._sessions):
+                if freed >= bytes_needed:
+                    break
+                if device is None or self._sessions[key].memory_device == device:
+                    freed += self._sessions.pop(key).size
+        return freed
+
+    def clear(self, device: Optional[torch.device] = None) -> None:
+        """Drop the sessions on device, or on all devices if device is None."""
+        with self._lock:
+            for key in [k for k in self._sessions if device is None or k[1] == device]:
+                del self._sessions[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    @staticmethod
+    def _memory_device(device: torch.device) -> torch.device:
+        # Mirrors the execution providers chosen by _create_session().
+        return device if device.type == "cuda" else torch.device("cpu")
+
+    @staticmethod
+    def _create_session(model_path: Path, device: torch.device) -> "ort.InferenceSession":
+        import onnxruntime as ort
+
+        if device.type == "cuda":
+            providers = [("CUDAExecutionProvider", {"device_id": device.index or 0}), "CPUExecutionProvider"]
+        else:
+            providers = ["CPUExecutionProvider"]
+        return ort.InferenceSession(path_or_bytes=model_path, providers=providers)
+
+
+def run_onnx_session(session: "ort.InferenceSession", inputs: Dict[str, np.ndarray]) -> List[np.ndarray]:
+    """
+    Run session on inputs and return all of its outputs as numpy arrays.
+
+    Sessions on the CUDA execution provider use IO binding: the inputs are uploaded to the
+    session's GPU once, the outputs are allocated there, and only the final outputs are copied
+    back to the host. Other sessions use a plain `run()`.
+    """
+    if "CUDAExecutionProvider" not in session.get_providers():
+        return session.run(None, inputs)
+
+    import onnxruntime as ort
+
+    device_id = int(session.get_provider_options()["CUDAExecutionProvider"].get("device_id", 0))
+    binding = session.io_binding()
+    for name, value in inputs.items():
+        binding.bind_ortvalue_input(name, ort.OrtValue.ortvalue_from_numpy(value, "cuda", device_id))
+    for output in session.get_outputs():
+        binding.bind_output(output.name, "cuda", device_id)
+    session.run_with_iobinding(binding)
+    return binding.copy_outputs_to_cpu()
@@ -0,0 +1,53 @@
+# Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Development team
+"""
+Describe the dtype layout of a cached model.
+
+Some callers, such as the VAE invocations, need a model in a precision that
+differs from the one the cache loads it in, sometimes with a few submodules
+left in another dtype. Rather than converting the locked copy on every call,
+the model cache keeps one RAM copy of the model per `PrecisionVariant` and
+locks that copy without changing its dtypes.
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Tuple
+
+import torch
+
+from invokeai.backend.util.devices import PRECISION_TO_NAME
+
+
+@dataclass(frozen=True)
+class PrecisionVariant:
+    """A model precision: `dtype` for the model as a whole, and `overrides` for named submodules."""
+
+    dtype: torch.dtype
+    overrides: Tuple[Tuple[str, torch.dtype], ...] = ()
+
+    @property
+    def name(self) -> str:
+        """Return a short string that identifies the variant, e.g. 'float32+decoder.mid_block:float16'."""
+        parts = [PRECISION_TO_NAME[self.dtype]]
+        parts.extend(f"{submodule}:{PRECISION_TO_NAME[dtype]}" for submodule, dtype in self.overrides)
+        return "+".join(parts)
+
+    def apply(self, model: torch.nn.Module) -> None:
+        """Convert model in place to this precision."""
+        model.to(dtype=self.dtype)
+        for submodule, dtype in self.overrides:
+            model.get_submodule(submodule).to(dtype=dtype)
+
+    def matches(self, model: torch.nn.Module) -> bool:
+        """Return True if the floating point tensors of model are already laid out in this precision."""
+        overrides = [(f"{submodule}.", dtype) for submodule, dtype in self.overrides]
+        for name, tensor in chain(model.named_parameters(), model.named_buffers()):
+            if not tensor.is_floating_point():
+                continue
+            expected = self.dtype
+            for prefix, dtype in overrides:
+                if name.startswith(prefix):
+                    expected = dtype
+            if tensor.dtype != expected:
+                return False
+        return True
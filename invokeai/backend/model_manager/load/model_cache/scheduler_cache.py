@@ -0,0 +1,93 @@
+# Copyright (c) 2024 Lincoln D. Stein and the InvokeAI Development team
+"""
+Keep built diffusers schedulers and their timestep schedules between sessions.
+
+The model cache owns a `SchedulerCache`, so that it is sized through the app
+config and shared by every invocation, like the other caches kept next to
+the models.
+"""
+
+import copy
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional, Protocol, Tuple, TypeVar, Union
+
+import torch
+
+DEFAULT_MAX_SCHEDULER_CACHE_ENTRIES = 32
+
+
+class CachedScheduler(Protocol):
+    """The parts of a diffusers scheduler that the cache relies on."""
+
+    def to_json_string(self) -> str: ...
+
+    def set_timesteps(self, num_inference_steps: int, device: Union[str, torch.device]) -> None: ...
+
+
+TScheduler = TypeVar("TScheduler")
+
+
+class SchedulerCache:
+    """Keeps built schedulers and their timestep schedules, so that repeated denoising runs only copy them.
+
+    Building a scheduler loads the scheduler model and parses its config, and `set_timesteps()` computes the timestep
+    and sigma tables for the number of steps. Neither depends on anything but the config, the number of steps and the
+    device. Callers always get their own copy, which they are free to step.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_SCHEDULER_CACHE_ENTRIES) -> None:
+        """
+        Initialize the scheduler cache.
+
+        :param max_entries: Maximum number of schedulers, and separately of timestep schedules, to keep.
+        """
+        self._schedulers: OrderedDict[Hashable, Any] = OrderedDict()
+        self._timesteps: OrderedDict[Tuple[str, int, str], dict[str, Any]] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = Lock()
+
+    def get(self, key: Hashable, build: Callable[[], TScheduler]) -> TScheduler:
+        """Return a copy of the scheduler cached under key, calling build() to create it on a miss."""
+        with self._lock:
+            scheduler: Optional[TScheduler] = self._get(self._schedulers, key)
+        if scheduler is None:
+            scheduler = build()
+            with self._lock:
+                self._put(self._schedulers, key, scheduler)
+        return copy.deepcopy(scheduler)
+
+    def set_timesteps(
+        self, scheduler: CachedScheduler, num_inference_steps: int, device: Union[str, torch.device]
+    ) -> None:
+        """Call scheduler.set_timesteps(), or restore the state it left a scheduler with the same config in."""
+        key = (scheduler.to_json_string(), num_inference_steps, str(device))
+        with self._lock:
+            state = self._get(self._timesteps, key)
+        if state is None:
+            scheduler.set_timesteps(num_inference_steps, device=device)
+            # The config is part of the key, so it is left out of the state.
+            state = {k: v for k, v in scheduler.__dict__.items() if k != "_internal_dict"}
+            with self._lock:
+                self._put(self._timesteps, key, copy.deepcopy(state))
+        else:
+            scheduler.__dict__.update(copy.deepcopy(state))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schedulers.clear()
+            self._timesteps.clear()
+
+    def _get(self, entries: OrderedDict[Any, Any], key: Hashable) -> Any:
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+        return value
+
+    def _put(self, entries: OrderedDict[Any, Any], key: Hashable, value: Any) -> None:
+        if self._max_entries <= 0:
+            return
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self._max_entries:
+            entries.popitem(last=False)
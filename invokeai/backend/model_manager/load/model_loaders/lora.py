@@ -49,6 +49,7 @@ class LoRALoader(ModelLoader):
             file_path=model_path,
             dtype=self._torch_dtype,
             base_model=self._model_base,
+            lazy=True,
         )
         return model
 
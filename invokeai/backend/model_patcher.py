@@ -6,7 +6,7 @@ from __future__ import annotations
 import pickle
 import threading
 from contextlib import contextmanager
-from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple, Type, Union
+from typing import Any, Dict, Generator, Iterator, List, Optional, Set, Tuple, Type, Union
 
 import numpy as np
 import torch
@@ -16,6 +16,7 @@ from transformers import CLIPTextModel, CLIPTextModelWithProjection, CLIPTokeniz
 from invokeai.app.shared.models import FreeUConfig
 from invokeai.backend.lora import LoRAModelRaw
 from invokeai.backend.model_manager import AnyModel
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeights
 from invokeai.backend.model_manager.load.optimizations import skip_torch_weight_init
 from invokeai.backend.onnx.onnx_runtime import IAIOnnxRuntimeModel
 from invokeai.backend.stable_diffusion.extensions.lora import LoRAExt
@@ -34,6 +35,17 @@ with LoRAHelper.apply_lora_unet(unet, loras):
 """
 
 
+class _ChangedWeightsTracker(OriginalWeightsStorage):
+    """Records which parameters were patched without keeping copies of the original weights."""
+
+    def __init__(self):
+        super().__init__()
+        self.changed_keys: Set[str] = set()
+
+    def save(self, key: str, weight: torch.Tensor, copy: bool = True):
+        self.changed_keys.add(key)
+
+
 class ModelPatcher:
     _thread_lock = threading.Lock()
 
@@ -90,12 +102,14 @@ class ModelPatcher:
         unet: UNet2DConditionModel,
         loras: Iterator[Tuple[LoRAModelRaw, float]],
         cached_weights: Optional[Dict[str, torch.Tensor]] = None,
+        fused_weights: Optional[FusedWeights] = None,
     ) -> Generator[None, None, None]:
         with cls.apply_lora(
             unet,
             loras=loras,
             prefix="lora_unet_",
             cached_weights=cached_weights,
+            fused_weights=fused_weights,
         ):
             yield
 
@@ -106,8 +120,15 @@ class ModelPatcher:
         text_encoder: CLIPTextModel,
         loras: Iterator[Tuple[LoRAModelRaw, float]],
         cached_weights: Optional[Dict[str, torch.Tensor]] = None,
+        fused_weights: Optional[FusedWeights] = None,
     ) -> Generator[None, None, None]:
-        with cls.apply_lora(text_encoder, loras=loras, prefix="lora_te_", cached_weights=cached_weights):
+        with cls.apply_lora(
+            text_encoder,
+            loras=loras,
+            prefix="lora_te_",
+            cached_weights=cached_weights,
+            fused_weights=fused_weights,
+        ):
             yield
 
     @classmethod
@@ -118,6 +139,7 @@ class ModelPatcher:
         loras: Iterator[Tuple[LoRAModelRaw, float]],
         prefix: str,
         cached_weights: Optional[Dict[str, torch.Tensor]] = None,
+        fused_weights: Optional[FusedWeights] = None,
     ) -> Generator[None, None, None]:
         """
         Apply one or more LoRAs to a model.
@@ -126,7 +148,27 @@ class ModelPatcher:
         :param loras: An iterator that returns the LoRA to patch in and its patch weight.
         :param prefix: A string prefix that precedes keys used in the LoRAs weight layers.
         :cached_weights: Read-only copy of the model's state dict in CPU, for unpatching purposes.
+        :fused_weights: Handle to the model cache's copy of this model's weights with the same LoRAs already fused in.
+            If present, the fused weights are copied into the model and `loras` is never consumed. Otherwise the model
+            is patched and the fused weights are saved for next time. Only pass this for a private copy of the model
+            on its execution device (as returned by `LoadedModel.model_on_device()`): the patch is not undone.
         """
+        if fused_weights is not None:
+            if not fused_weights.load_into(model):
+                changed_weights = _ChangedWeightsTracker()
+                for lora_model, lora_weight in loras:
+                    LoRAExt.patch_model(
+                        model=model,
+                        prefix=prefix,
+                        lora=lora_model,
+                        lora_weight=lora_weight,
+                        original_weights=changed_weights,
+                    )
+                    del lora_model
+                fused_weights.save_from(model, changed_weights.changed_keys)
+            yield
+            return
+
         original_weights = OriginalWeightsStorage(cached_weights)
         try:
             for lora_model, lora_weight in loras:
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 import math
-from contextlib import nullcontext
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Callable, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Generator, Hashable, List, Optional, Union
 
 import einops
+import numpy as np
 import PIL.Image
 import psutil
 import torch
@@ -21,6 +22,7 @@ from transformers import CLIPFeatureExtractor, CLIPTextModel, CLIPTokenizer
 
 from invokeai.app.services.config.config_default import get_config
 from invokeai.backend.stable_diffusion.diffusion.conditioning_data import IPAdapterData, TextConditioningData
+from invokeai.backend.stable_diffusion.diffusion.prepared_conditioning import PreparedConditioning
 from invokeai.backend.stable_diffusion.diffusion.shared_invokeai_diffusion import InvokeAIDiffuserComponent
 from invokeai.backend.stable_diffusion.diffusion.unet_attention_patcher import UNetAttentionPatcher, UNetIPAdapterData
 from invokeai.backend.stable_diffusion.extensions.preview import PipelineIntermediateState
@@ -28,6 +30,9 @@ from invokeai.backend.util.attention import auto_detect_slice_size
 from invokeai.backend.util.devices import TorchDevice
 from invokeai.backend.util.hotfixes import ControlNetModel
 
+if TYPE_CHECKING:
+    from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModel
+
 
 @dataclass
 class AddsMaskGuidance:
@@ -86,6 +91,39 @@ def image_resized_to_grid_as_tensor(image: PIL.Image.Image, normalize: bool = Tr
     return tensor
 
 
+def image_resized_to_grid_as_uint8(image: PIL.Image.Image, multiple_of=8) -> torch.Tensor:
+    """
+    Resize an RGB image like `image_resized_to_grid_as_tensor`, but return the raw uint8 pixels.
+
+    The result has shape [1, 3, H, W] and is a quarter of the size of the float tensor, so it is cheaper to move to
+    the execution device. Use `uint8_image_to_tensor` there to scale it.
+
+    :param image: input RGB image
+    :param multiple_of: resize the input so both dimensions are a multiple of this
+    """
+    w, h = trim_to_multiple_of(*image.size, multiple_of=multiple_of)
+    resized = image.resize((w, h), resample=PIL.Image.Resampling.LANCZOS)
+    return einops.rearrange(torch.from_numpy(np.array(resized, dtype=np.uint8)), "h w c -> 1 c h w")
+
+
+def uint8_image_to_tensor(
+    image_tensor: torch.Tensor,
+    device: Optional[torch.device] = None,
+    dtype: torch.dtype = torch.float32,
+    normalize: bool = True,
+) -> torch.Tensor:
+    """
+    Move a uint8 image tensor to device and scale it to [0, 1], or [-1, 1] if normalize is set.
+
+    The scaling is done in float32 on the target device before casting to dtype, which gives the same values as
+    `image_resized_to_grid_as_tensor` followed by `.to(device, dtype)`.
+    """
+    tensor = image_tensor.to(device=device, non_blocking=True).to(torch.float32) / 255.0
+    if normalize:
+        tensor = tensor * 2.0 - 1.0
+    return tensor.to(dtype=dtype)
+
+
 def is_inpainting_model(unet: UNet2DConditionModel):
     return unet.conv_in.in_channels == 9
 
@@ -111,6 +149,12 @@ class T2IAdapterData:
     end_step_percent: float = Field(default=1.0)
 
 
+def unet_graph_variant(unet: UNet2DConditionModel) -> Hashable:
+    """Describe the parts of a UNet that change its compiled graph but are not weights: the attention processors and dtype."""
+    processors = {(type(p).__name__, getattr(p, "slice_size", None)) for p in unet.attn_processors.values()}
+    return (tuple(sorted(processors, key=str)), unet.dtype)
+
+
 class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
     r"""
     Pipeline for text-to-image generation using Stable Diffusion.
@@ -166,6 +210,9 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
         )
 
         self.invokeai_diffuser = InvokeAIDiffuserComponent(self.unet, self._unet_forward)
+        # Returns the compiled UNet for a graph variant (see unet_graph_variant()); None to always run eagerly.
+        self.unet_compiler: Optional[Callable[[Hashable], CompiledModel]] = None
+        self._compiled_unet: Optional[CompiledModel] = None
 
     def _adjust_memory_efficient_attention(self, latents: torch.Tensor):
         """
@@ -363,7 +410,15 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
             unet_attention_patcher = UNetAttentionPatcher(ip_adapters)
             attn_ctx = unet_attention_patcher.apply_ip_adapter_attention(self.invokeai_diffuser.model)
 
-        with attn_ctx:
+        # The text, regional prompt and IP-Adapter conditioning do not change between steps, so prepare it once.
+        prepared_conditioning = PreparedConditioning.from_latents(conditioning_data, ip_adapter_data, latents)
+
+        # The compiled UNet does not see the attention processors swapped in for IP-Adapters and regional prompts.
+        compiled_ctx = nullcontext()
+        if self.unet_compiler is not None and unet_attention_patcher is None:
+            compiled_ctx = self._use_compiled_unet(self.unet_compiler(unet_graph_variant(self.unet)))
+
+        with attn_ctx, compiled_ctx:
             callback(
                 PipelineIntermediateState(
                     step=-1,
@@ -389,6 +444,7 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
                     control_data=control_data,
                     ip_adapter_data=ip_adapter_data,
                     t2i_adapter_data=t2i_adapter_data,
+                    prepared_conditioning=prepared_conditioning,
                 )
                 latents = step_output.prev_sample
                 predicted_original = getattr(step_output, "pred_original_sample", None)
@@ -431,6 +487,7 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
         control_data: list[ControlNetData] | None = None,
         ip_adapter_data: Optional[list[IPAdapterData]] = None,
         t2i_adapter_data: Optional[list[T2IAdapterData]] = None,
+        prepared_conditioning: Optional[PreparedConditioning] = None,
     ):
         # invokeai_diffuser has batched timesteps, but diffusers schedulers expect a single value
         timestep = t[0]
@@ -455,6 +512,7 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
                 step_index=step_index,
                 total_step_count=total_step_count,
                 conditioning_data=conditioning_data,
+                prepared_conditioning=prepared_conditioning,
             )
 
         # Handle T2I-Adapter(s)
@@ -521,6 +579,7 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
             down_block_additional_residuals=down_block_additional_residuals,  # for ControlNet
             mid_block_additional_residual=mid_block_additional_residual,  # for ControlNet
             down_intrablock_additional_residuals=down_intrablock_additional_residuals,  # for T2I-Adapter
+            prepared_conditioning=prepared_conditioning,
         )
 
         guidance_scale = conditioning_data.guidance_scale
@@ -564,6 +623,16 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
         x_final = multiplier * x_rescaled + (1.0 - multiplier) * total_noise_pred
         return x_final
 
+    @contextmanager
+    def _use_compiled_unet(self, compiled_unet: CompiledModel) -> Generator[None, None, None]:
+        """Run the UNet through compiled_unet, where it supports the call, while the context is active."""
+        with compiled_unet.bind(self.unet):
+            self._compiled_unet = compiled_unet
+            try:
+                yield
+            finally:
+                self._compiled_unet = None
+
     def _unet_forward(
         self,
         latents,
@@ -573,8 +642,14 @@ class StableDiffusionGeneratorPipeline(StableDiffusionPipeline):
         **kwargs,
     ):
         """predict the noise residual"""
+        unet = self.unet
+        if self._compiled_unet is not None and not any(v is not None for v in (cross_attention_kwargs or {}).values()):
+            # Each new latent shape or set of optional inputs is a new graph; past the limit, run eagerly.
+            signature = (tuple(latents.shape), tuple(sorted(k for k, v in kwargs.items() if v is not None)))
+            if self._compiled_unet.accepts(signature):
+                unet = self._compiled_unet
         # First three args should be positional, not keywords, so torch hooks can see them.
-        return self.unet(
+        return unet(
             latents,
             t,
             text_embeddings,
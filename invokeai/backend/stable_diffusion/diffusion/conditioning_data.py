@@ -24,6 +24,10 @@ class BasicConditioningInfo:
         self.embeds = self.embeds.to(device=device, dtype=dtype)
         return self
 
+    def repeat(self, batch_size: int) -> BasicConditioningInfo:
+        """Return a copy of this conditioning for a batch of `batch_size` latents."""
+        return BasicConditioningInfo(embeds=self.embeds.repeat_interleave(batch_size, dim=0))
+
 
 @dataclass
 class ConditioningFieldData:
@@ -45,6 +49,13 @@ class SDXLConditioningInfo(BasicConditioningInfo):
         assert self.embeds.device == device
         return result
 
+    def repeat(self, batch_size: int) -> SDXLConditioningInfo:
+        return SDXLConditioningInfo(
+            embeds=self.embeds.repeat_interleave(batch_size, dim=0),
+            pooled_embeds=self.pooled_embeds.repeat_interleave(batch_size, dim=0),
+            add_time_ids=self.add_time_ids.repeat_interleave(batch_size, dim=0),
+        )
+
 
 @dataclass
 class IPAdapterConditioningInfo:
@@ -139,6 +150,18 @@ class TextConditioningData:
         assert isinstance(self.uncond_text, SDXLConditioningInfo) == isinstance(self.cond_text, SDXLConditioningInfo)
         return isinstance(self.cond_text, SDXLConditioningInfo)
 
+    def repeat(self, batch_size: int) -> TextConditioningData:
+        """Return a copy of this conditioning for a batch of `batch_size` latents that share it."""
+        assert self.uncond_regions is None and self.cond_regions is None, "Regional prompts can not be batched"
+        return TextConditioningData(
+            uncond_text=self.uncond_text.repeat(batch_size),
+            cond_text=self.cond_text.repeat(batch_size),
+            uncond_regions=None,
+            cond_regions=None,
+            guidance_scale=self.guidance_scale,
+            guidance_rescale_multiplier=self.guidance_rescale_multiplier,
+        )
+
     def to_unet_kwargs(self, unet_kwargs: UNetKwargs, conditioning_mode: ConditioningMode):
         """Fills unet arguments with data from provided conditionings.
 
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import torch
+
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    ConditioningMode,
+    IPAdapterData,
+    Range,
+    SDXLConditioningInfo,
+    TextConditioningData,
+    TextConditioningRegions,
+)
+from invokeai.backend.stable_diffusion.diffusion.regional_ip_data import RegionalIPData
+from invokeai.backend.stable_diffusion.diffusion.regional_prompt_data import RegionalPromptData
+
+
+@dataclass
+class PreparedUNetConditioning:
+    """The step-independent UNet conditioning inputs for a single forward pass."""
+
+    embeds: torch.Tensor
+    encoder_attention_mask: Optional[torch.Tensor] = None
+    added_cond_kwargs: Optional[dict[str, torch.Tensor]] = None
+    regional_prompt_data: Optional[RegionalPromptData] = None
+    regional_ip_data: Optional[RegionalIPData] = None
+
+
+class PreparedConditioning:
+    """Text, regional prompt and IP-Adapter conditioning prepared once per denoising run.
+
+    None of the concatenated embeddings, SDXL added conditioning kwargs, padded attention masks, regional prompt masks or
+    IP-Adapter embedding stacks change from step to step, so they are built on first use for each `ConditioningMode` and
+    reused for the rest of the run. Only the IP-Adapter scales and `percent_through` are computed per step, in
+    `cross_attention_kwargs(...)`.
+    """
+
+    def __init__(
+        self,
+        conditioning_data: TextConditioningData,
+        ip_adapter_data: Optional[list[IPAdapterData]],
+        latent_height: int,
+        latent_width: int,
+        device: torch.device,
+        dtype: torch.dtype,
+    ):
+        self.conditioning_data = conditioning_data
+        self.ip_adapter_data = ip_adapter_data
+        self._latent_height = latent_height
+        self._latent_width = latent_width
+        self._device = device
+        self._dtype = dtype
+        self._prepared: dict[ConditioningMode, PreparedUNetConditioning] = {}
+
+    @classmethod
+    def from_latents(
+        cls,
+        conditioning_data: TextConditioningData,
+        ip_adapter_data: Optional[list[IPAdapterData]],
+        latents: torch.Tensor,
+    ) -> PreparedConditioning:
+        """Prepare conditioning for denoising latents with the shape, device and dtype of `latents`."""
+        _, _, h, w = latents.shape
+        return cls(conditioning_data, ip_adapter_data, h, w, latents.device, latents.dtype)
+
+    def get(self, mode: ConditioningMode) -> PreparedUNetConditioning:
+        """Get the prepared conditioning for the given mode, building it on first use."""
+        prepared = self._prepared.get(mode)
+        if prepared is None:
+            prepared = self._prepare(mode)
+            self._prepared[mode] = prepared
+        return prepared
+
+    def cross_attention_kwargs(self, mode: ConditioningMode, step_index: int, total_step_count: int) -> dict[str, Any]:
+        """Build the cross-attention kwargs for one denoising step."""
+        prepared = self.get(mode)
+        cross_attention_kwargs: dict[str, Any] = {}
+        if prepared.regional_ip_data is not None:
+            assert self.ip_adapter_data is not None
+            scales = [ipa.scale_for_step(step_index, total_step_count) for ipa in self.ip_adapter_data]
+            cross_attention_kwargs["regional_ip_data"] = prepared.regional_ip_data.with_scales(scales)
+        if prepared.regional_prompt_data is not None:
+            cross_attention_kwargs["regional_prompt_data"] = prepared.regional_prompt_data
+            cross_attention_kwargs["percent_through"] = step_index / total_step_count
+        return cross_attention_kwargs
+
+    def _prepare(self, mode: ConditioningMode) -> PreparedUNetConditioning:
+        conditioning_data = self.conditioning_data
+        if mode == ConditioningMode.Both:
+            texts = [conditioning_data.uncond_text, conditioning_data.cond_text]
+            regions = [conditioning_data.uncond_regions, conditioning_data.cond_regions]
+        elif mode == ConditioningMode.Negative:
+            texts = [conditioning_data.uncond_text]
+            regions = [conditioning_data.uncond_regions]
+        elif mode == ConditioningMode.Positive:
+            texts = [conditioning_data.cond_text]
+            regions = [conditioning_data.cond_regions]
+        else:
+            raise ValueError(f"Unexpected conditioning mode: {mode}")
+
+        if len(texts) == 1:
+            embeds, encoder_attention_mask = texts[0].embeds, None
+        else:
+            embeds, encoder_attention_mask = TextConditioningData._concat_conditionings_for_batch(
+                [c.embeds for c in texts]
+            )
+        prepared = PreparedUNetConditioning(embeds=embeds, encoder_attention_mask=encoder_attention_mask)
+
+        if conditioning_data.is_sdxl():
+            sdxl_texts = [c for c in texts if isinstance(c, SDXLConditioningInfo)]
+            prepared.added_cond_kwargs = {
+                "text_embeds": torch.cat([c.pooled_embeds for c in sdxl_texts], dim=0),
+                "time_ids": torch.cat([c.add_time_ids for c in sdxl_texts], dim=0),
+            }
+
+        if len(texts) == 1:
+            # When running the passes sequentially, only a pass that has its own regions is masked.
+            if regions[0] is not None:
+                prepared.regional_prompt_data = RegionalPromptData(
+                    regions=[regions[0]], device=self._device, dtype=self._dtype
+                )
+        elif any(r is not None for r in regions):
+            batch_regions: list[TextConditioningRegions] = []
+            for c, r in zip(texts, regions, strict=True):
+                if r is None:
+                    # Create a dummy mask and range for text conditioning that doesn't have region masks.
+                    r = TextConditioningRegions(
+                        masks=torch.ones((1, 1, self._latent_height, self._latent_width), dtype=self._dtype),
+                        ranges=[Range(start=0, end=c.embeds.shape[1])],
+                    )
+                batch_regions.append(r)
+            prepared.regional_prompt_data = RegionalPromptData(
+                regions=batch_regions, device=self._device, dtype=self._dtype
+            )
+
+        if self.ip_adapter_data is not None:
+            ip_adapter_conditioning = [ipa.ip_adapter_conditioning for ipa in self.ip_adapter_data]
+            if mode == ConditioningMode.Both:
+                # Note that we 'stack' to produce tensors of shape (batch_size, num_ip_images, seq_len, token_len).
+                image_prompt_embeds = [
+                    torch.stack(
+                        [ipa_conditioning.uncond_image_prompt_embeds, ipa_conditioning.cond_image_prompt_embeds]
+                    )
+                    for ipa_conditioning in ip_adapter_conditioning
+                ]
+            else:
+                # Note that we 'unsqueeze' to produce tensors of shape (batch_size=1, num_ip_images, seq_len, token_len).
+                image_prompt_embeds = [
+                    torch.unsqueeze(
+                        ipa_conditioning.uncond_image_prompt_embeds
+                        if mode == ConditioningMode.Negative
+                        else ipa_conditioning.cond_image_prompt_embeds,
+                        dim=0,
+                    )
+                    for ipa_conditioning in ip_adapter_conditioning
+                ]
+            # The scales are replaced on every step by cross_attention_kwargs().
+            prepared.regional_ip_data = RegionalIPData(
+                image_prompt_embeds=image_prompt_embeds,
+                scales=[0.0] * len(self.ip_adapter_data),
+                masks=[ipa.mask for ipa in self.ip_adapter_data],
+                dtype=self._dtype,
+                device=self._device,
+            )
+
+        return prepared
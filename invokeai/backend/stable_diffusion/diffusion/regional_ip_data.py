@@ -1,3 +1,5 @@
+import copy
+
 import torch
 
 
@@ -70,3 +72,14 @@ class RegionalIPData:
     def get_masks(self, query_seq_len: int) -> torch.Tensor:
         """Get the mask for the given query sequence length."""
         return self._masks_by_seq_len[query_seq_len]
+
+    def with_scales(self, scales: list[float]) -> "RegionalIPData":
+        """Return a shallow copy of this object with different IP-Adapter scales.
+
+        The image prompt embeddings and the prepared masks are shared with the original, so this is cheap enough to call
+        on every denoising step.
+        """
+        assert len(scales) == len(self.scales)
+        regional_ip_data = copy.copy(self)
+        regional_ip_data.scales = scales
+        return regional_ip_data
@@ -39,6 +39,9 @@ class RegionalPromptData:
             regions, max_downscale_factor
         )
         self._negative_cross_attn_mask_score = -10000.0
+        # The cross-attention masks only depend on the query and key sequence lengths, so they are built on first use
+        # and then shared by every attention layer (and every denoising step) at that resolution.
+        self._cross_attn_masks: dict[tuple[int, int], torch.Tensor] = {}
 
     def _prepare_spatial_masks(
         self, regions: list[TextConditioningRegions], max_downscale_factor: int = 8
@@ -86,6 +89,10 @@ class RegionalPromptData:
                 shape: (batch_size, query_seq_len, key_seq_len).
                 dtype: float
         """
+        cached_mask = self._cross_attn_masks.get((query_seq_len, key_seq_len))
+        if cached_mask is not None:
+            return cached_mask
+
         batch_size = len(self._spatial_masks_by_seq_len)
         batch_spatial_masks = [self._spatial_masks_by_seq_len[b][query_seq_len] for b in range(batch_size)]
 
@@ -107,4 +114,5 @@ class RegionalPromptData:
                 batch_sample_query_scores[~batch_sample_query_mask] = self._negative_cross_attn_mask_score
                 attn_mask[batch_idx, :, embedding_range.start : embedding_range.end] = batch_sample_query_scores
 
+        self._cross_attn_masks[(query_seq_len, key_seq_len)] = attn_mask
         return attn_mask
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import math
-import threading
 from typing import Any, Callable, Optional, Union
 
 import torch
@@ -9,13 +8,11 @@ from typing_extensions import TypeAlias
 
 from invokeai.app.services.config.config_default import get_config
 from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    ConditioningMode,
     IPAdapterData,
-    Range,
     TextConditioningData,
-    TextConditioningRegions,
 )
-from invokeai.backend.stable_diffusion.diffusion.regional_ip_data import RegionalIPData
-from invokeai.backend.stable_diffusion.diffusion.regional_prompt_data import RegionalPromptData
+from invokeai.backend.stable_diffusion.diffusion.prepared_conditioning import PreparedConditioning
 
 ModelForwardCallback: TypeAlias = Union[
     # x, t, conditioning, Optional[cross-attention kwargs]
@@ -63,13 +60,40 @@ class InvokeAIDiffuserComponent:
         step_index: int,
         total_step_count: int,
         conditioning_data: TextConditioningData,
+        prepared_conditioning: Optional[PreparedConditioning] = None,
     ):
-        down_block_res_samples, mid_block_res_sample = None, None
+        if prepared_conditioning is None:
+            # Callers that denoise over many steps should prepare the conditioning once and pass it in.
+            prepared_conditioning = PreparedConditioning.from_latents(conditioning_data, None, sample)
+
+        # Residuals of ControlNets applied to both the unconditional and conditional batches, and of those applied to
+        # the conditional batch only. Each ControlNet's output is added in place to the first one's.
+        both_down_samples: Optional[list[torch.Tensor]] = None
+        both_mid_sample: Optional[torch.Tensor] = None
+        cond_down_samples: Optional[list[torch.Tensor]] = None
+        cond_mid_sample: Optional[torch.Tensor] = None
+        doubled_sample: Optional[torch.Tensor] = None
 
         # control_data should be type List[ControlNetData]
         # this loop covers both ControlNet (one ControlNetData in list)
         #      and MultiControlNet (multiple ControlNetData in list)
-        for _i, control_datum in enumerate(control_data):
+        for control_datum in control_data:
+            first_control_step = math.floor(control_datum.begin_step_percent * total_step_count)
+            last_control_step = math.ceil(control_datum.end_step_percent * total_step_count)
+            # only apply controlnet if current step is within the controlnet's begin/end step range
+            if step_index < first_control_step or step_index > last_control_step:
+                continue
+
+            if isinstance(control_datum.weight, list):
+                # if controlnet has multiple weights, use the weight for the current step
+                controlnet_weight = control_datum.weight[step_index]
+            else:
+                # if controlnet has a single weight, use it for all steps
+                controlnet_weight = control_datum.weight
+            # The residuals are scaled by the weight, so a zero-weight ControlNet has no effect.
+            if controlnet_weight == 0:
+                continue
+
             control_mode = control_datum.control_mode
             # soft_injection and cfg_injection are the two ControlNet control_mode booleans
             #     that are combined at higher level to make control_mode enum
@@ -80,91 +104,64 @@ class InvokeAIDiffuserComponent:
             #      or the default both conditional and unconditional (if False)
             cfg_injection = control_mode == "more_control" or control_mode == "unbalanced"
 
-            first_control_step = math.floor(control_datum.begin_step_percent * total_step_count)
-            last_control_step = math.ceil(control_datum.end_step_percent * total_step_count)
-            # only apply controlnet if current step is within the controlnet's begin/end step range
-            if step_index >= first_control_step and step_index <= last_control_step:
-                if cfg_injection:
-                    sample_model_input = sample
-                else:
-                    # expand the latents input to control model if doing classifier free guidance
-                    #    (which I think for now is always true, there is conditional elsewhere that stops execution if
-                    #     classifier_free_guidance is <= 1.0 ?)
-                    sample_model_input = torch.cat([sample] * 2)
-
-                added_cond_kwargs = None
-
-                if cfg_injection:  # only applying ControlNet to conditional instead of in unconditioned
-                    if conditioning_data.is_sdxl():
-                        added_cond_kwargs = {
-                            "text_embeds": conditioning_data.cond_text.pooled_embeds,
-                            "time_ids": conditioning_data.cond_text.add_time_ids,
-                        }
-                    encoder_hidden_states = conditioning_data.cond_text.embeds
-                    encoder_attention_mask = None
-                else:
-                    if conditioning_data.is_sdxl():
-                        added_cond_kwargs = {
-                            "text_embeds": torch.cat(
-                                [
-                                    # TODO: how to pad? just by zeros? or even truncate?
-                                    conditioning_data.uncond_text.pooled_embeds,
-                                    conditioning_data.cond_text.pooled_embeds,
-                                ],
-                                dim=0,
-                            ),
-                            "time_ids": torch.cat(
-                                [
-                                    conditioning_data.uncond_text.add_time_ids,
-                                    conditioning_data.cond_text.add_time_ids,
-                                ],
-                                dim=0,
-                            ),
-                        }
-                    (
-                        encoder_hidden_states,
-                        encoder_attention_mask,
-                    ) = self._concat_conditionings_for_batch(
-                        conditioning_data.uncond_text.embeds,
-                        conditioning_data.cond_text.embeds,
-                    )
-                if isinstance(control_datum.weight, list):
-                    # if controlnet has multiple weights, use the weight for the current step
-                    controlnet_weight = control_datum.weight[step_index]
+            if cfg_injection:
+                # only applying ControlNet to conditional instead of in unconditioned
+                sample_model_input = sample
+                conditioning = prepared_conditioning.get(ConditioningMode.Positive)
+            else:
+                # expand the latents input to control model if doing classifier free guidance
+                #    (which I think for now is always true, there is conditional elsewhere that stops execution if
+                #     classifier_free_guidance is <= 1.0 ?)
+                if doubled_sample is None:
+                    doubled_sample = torch.cat([sample] * 2)
+                sample_model_input = doubled_sample
+                conditioning = prepared_conditioning.get(ConditioningMode.Both)
+
+            # controlnet(s) inference
+            down_samples, mid_sample = control_datum.model(
+                sample=sample_model_input,
+                timestep=timestep,
+                encoder_hidden_states=conditioning.embeds,
+                controlnet_cond=control_datum.image_tensor,
+                conditioning_scale=controlnet_weight,  # controlnet specific, NOT the guidance scale
+                encoder_attention_mask=conditioning.encoder_attention_mask,
+                added_cond_kwargs=conditioning.added_cond_kwargs,
+                guess_mode=soft_injection,  # this is still called guess_mode in diffusers ControlNetModel
+                return_dict=False,
+            )
+
+            # add controlnet outputs together if have multiple controlnets
+            if cfg_injection:
+                if cond_down_samples is None:
+                    cond_down_samples, cond_mid_sample = list(down_samples), mid_sample
                 else:
-                    # if controlnet has a single weight, use it for all steps
-                    controlnet_weight = control_datum.weight
-
-                # controlnet(s) inference
-                down_samples, mid_sample = control_datum.model(
-                    sample=sample_model_input,
-                    timestep=timestep,
-                    encoder_hidden_states=encoder_hidden_states,
-                    controlnet_cond=control_datum.image_tensor,
-                    conditioning_scale=controlnet_weight,  # controlnet specific, NOT the guidance scale
-                    encoder_attention_mask=encoder_attention_mask,
-                    added_cond_kwargs=added_cond_kwargs,
-                    guess_mode=soft_injection,  # this is still called guess_mode in diffusers ControlNetModel
-                    return_dict=False,
-                )
-                if cfg_injection:
-                    # Inferred ControlNet only for the conditional batch.
-                    # To apply the output of ControlNet to both the unconditional and conditional batches,
-                    #    prepend zeros for unconditional batch
-                    down_samples = [torch.cat([torch.zeros_like(d), d]) for d in down_samples]
-                    mid_sample = torch.cat([torch.zeros_like(mid_sample), mid_sample])
-
-                if down_block_res_samples is None and mid_block_res_sample is None:
-                    down_block_res_samples, mid_block_res_sample = down_samples, mid_sample
+                    for acc, d in zip(cond_down_samples, down_samples, strict=True):
+                        acc.add_(d)
+                    cond_mid_sample.add_(mid_sample)
+            else:
+                if both_down_samples is None:
+                    both_down_samples, both_mid_sample = list(down_samples), mid_sample
                 else:
-                    # add controlnet outputs together if have multiple controlnets
-                    down_block_res_samples = [
-                        samples_prev + samples_curr
-                        for samples_prev, samples_curr in zip(down_block_res_samples, down_samples, strict=True)
-                    ]
-                    mid_block_res_sample += mid_sample
-
-        return down_block_res_samples, mid_block_res_sample
+                    for acc, d in zip(both_down_samples, down_samples, strict=True):
+                        acc.add_(d)
+                    both_mid_sample.add_(mid_sample)
+
+        if cond_down_samples is None:
+            return both_down_samples, both_mid_sample
+
+        # Apply the conditional-only residuals to the conditional half of the batch.
+        if both_down_samples is None:
+            # Inferred ControlNet only for the conditional batch.
+            # To apply the output of ControlNet to both the unconditional and conditional batches,
+            #    prepend zeros for unconditional batch
+            both_down_samples = [torch.cat([torch.zeros_like(d), d]) for d in cond_down_samples]
+            both_mid_sample = torch.cat([torch.zeros_like(cond_mid_sample), cond_mid_sample])
+        else:
+            batch_size = sample.shape[0]
+            for acc, d in zip(both_down_samples, cond_down_samples, strict=True):
+                acc[batch_size:].add_(d)
+            both_mid_sample[batch_size:].add_(cond_mid_sample)
+        return both_down_samples, both_mid_sample
 
     def do_unet_step(
         self,
@@ -177,7 +174,12 @@ class InvokeAIDiffuserComponent:
         down_block_additional_residuals: Optional[torch.Tensor] = None,  # for ControlNet
         mid_block_additional_residual: Optional[torch.Tensor] = None,  # for ControlNet
         down_intrablock_additional_residuals: Optional[torch.Tensor] = None,  # for T2I-Adapter
+        prepared_conditioning: Optional[PreparedConditioning] = None,
     ):
+        if prepared_conditioning is None:
+            # Callers that denoise over many steps should prepare the conditioning once and pass it in.
+            prepared_conditioning = PreparedConditioning.from_latents(conditioning_data, ip_adapter_data, sample)
+
         if self.sequential_guidance:
             (
                 unconditioned_next_x,
@@ -185,8 +187,7 @@ class InvokeAIDiffuserComponent:
             ) = self._apply_standard_conditioning_sequentially(
                 x=sample,
                 sigma=timestep,
-                conditioning_data=conditioning_data,
-                ip_adapter_data=ip_adapter_data,
+                prepared_conditioning=prepared_conditioning,
                 step_index=step_index,
                 total_step_count=total_step_count,
                 down_block_additional_residuals=down_block_additional_residuals,
@@ -200,8 +201,7 @@ class InvokeAIDiffuserComponent:
             ) = self._apply_standard_conditioning(
                 x=sample,
                 sigma=timestep,
-                conditioning_data=conditioning_data,
-                ip_adapter_data=ip_adapter_data,
+                prepared_conditioning=prepared_conditioning,
                 step_index=step_index,
                 total_step_count=total_step_count,
                 down_block_additional_residuals=down_block_additional_residuals,
@@ -211,61 +211,13 @@ class InvokeAIDiffuserComponent:
 
         return unconditioned_next_x, conditioned_next_x
 
-    def _concat_conditionings_for_batch(self, unconditioning, conditioning):
-        def _pad_conditioning(cond, target_len, encoder_attention_mask):
-            conditioning_attention_mask = torch.ones(
-                (cond.shape[0], cond.shape[1]), device=cond.device, dtype=cond.dtype
-            )
-
-            if cond.shape[1] < max_len:
-                conditioning_attention_mask = torch.cat(
-                    [
-                        conditioning_attention_mask,
-                        torch.zeros((cond.shape[0], max_len - cond.shape[1]), device=cond.device, dtype=cond.dtype),
-                    ],
-                    dim=1,
-                )
-
-                cond = torch.cat(
-                    [
-                        cond,
-                        torch.zeros(
-                            (cond.shape[0], max_len - cond.shape[1], cond.shape[2]),
-                            device=cond.device,
-                            dtype=cond.dtype,
-                        ),
-                    ],
-                    dim=1,
-                )
-
-            if encoder_attention_mask is None:
-                encoder_attention_mask = conditioning_attention_mask
-            else:
-                encoder_attention_mask = torch.cat(
-                    [
-                        encoder_attention_mask,
-                        conditioning_attention_mask,
-                    ]
-                )
-
-            return cond, encoder_attention_mask
-
-        encoder_attention_mask = None
-        if unconditioning.shape[1] != conditioning.shape[1]:
-            max_len = max(unconditioning.shape[1], conditioning.shape[1])
-            unconditioning, encoder_attention_mask = _pad_conditioning(unconditioning, max_len, encoder_attention_mask)
-            conditioning, encoder_attention_mask = _pad_conditioning(conditioning, max_len, encoder_attention_mask)
-
-        return torch.cat([unconditioning, conditioning]), encoder_attention_mask
-
     # methods below are called from do_diffusion_step and should be considered private to this class.
 
     def _apply_standard_conditioning(
         self,
         x: torch.Tensor,
         sigma: torch.Tensor,
-        conditioning_data: TextConditioningData,
-        ip_adapter_data: Optional[list[IPAdapterData]],
+        prepared_conditioning: PreparedConditioning,
         step_index: int,
         total_step_count: int,
         down_block_additional_residuals: Optional[torch.Tensor] = None,  # for ControlNet
@@ -278,86 +230,21 @@ class InvokeAIDiffuserComponent:
         x_twice = torch.cat([x] * 2)
         sigma_twice = torch.cat([sigma] * 2)
 
-        cross_attention_kwargs = {}
-        if ip_adapter_data is not None:
-            ip_adapter_conditioning = [ipa.ip_adapter_conditioning for ipa in ip_adapter_data]
-            # Note that we 'stack' to produce tensors of shape (batch_size, num_ip_images, seq_len, token_len).
-            image_prompt_embeds = [
-                torch.stack([ipa_conditioning.uncond_image_prompt_embeds, ipa_conditioning.cond_image_prompt_embeds])
-                for ipa_conditioning in ip_adapter_conditioning
-            ]
-            scales = [ipa.scale_for_step(step_index, total_step_count) for ipa in ip_adapter_data]
-            ip_masks = [ipa.mask for ipa in ip_adapter_data]
-            regional_ip_data = RegionalIPData(
-                image_prompt_embeds=image_prompt_embeds, scales=scales, masks=ip_masks, dtype=x.dtype, device=x.device
-            )
-            cross_attention_kwargs["regional_ip_data"] = regional_ip_data
-
-        added_cond_kwargs = None
-        try:
-            if conditioning_data.is_sdxl():
-                # tid = threading.current_thread().ident
-                # print(f'DEBUG {tid} {conditioning_data.uncond_text.pooled_embeds.device=} {conditioning_data.cond_text.pooled_embeds.device=}', flush=True),
-                added_cond_kwargs = {
-                    "text_embeds": torch.cat(
-                        [
-                            # TODO: how to pad? just by zeros? or even truncate?
-                            conditioning_data.uncond_text.pooled_embeds,
-                            conditioning_data.cond_text.pooled_embeds,
-                        ],
-                        dim=0,
-                    ),
-                    "time_ids": torch.cat(
-                        [
-                            conditioning_data.uncond_text.add_time_ids,
-                            conditioning_data.cond_text.add_time_ids,
-                        ],
-                        dim=0,
-                    ),
-                }
-        except Exception as e:
-            tid = threading.current_thread().ident
-            print(f"DEBUG: {tid} {str(e)}")
-            raise e
-
-        if conditioning_data.cond_regions is not None or conditioning_data.uncond_regions is not None:
-            # TODO(ryand): We currently initialize RegionalPromptData for every denoising step. The text conditionings
-            # and masks are not changing from step-to-step, so this really only needs to be done once. While this seems
-            # painfully inefficient, the time spent is typically negligible compared to the forward inference pass of
-            # the UNet. The main reason that this hasn't been moved up to eliminate redundancy is that it is slightly
-            # awkward to handle both standard conditioning and sequential conditioning further up the stack.
-            regions = []
-            for c, r in [
-                (conditioning_data.uncond_text, conditioning_data.uncond_regions),
-                (conditioning_data.cond_text, conditioning_data.cond_regions),
-            ]:
-                if r is None:
-                    # Create a dummy mask and range for text conditioning that doesn't have region masks.
-                    _, _, h, w = x.shape
-                    r = TextConditioningRegions(
-                        masks=torch.ones((1, 1, h, w), dtype=x.dtype),
-                        ranges=[Range(start=0, end=c.embeds.shape[1])],
-                    )
-                regions.append(r)
-
-            cross_attention_kwargs["regional_prompt_data"] = RegionalPromptData(
-                regions=regions, device=x.device, dtype=x.dtype
-            )
-            cross_attention_kwargs["percent_through"] = step_index / total_step_count
-
-        both_conditionings, encoder_attention_mask = self._concat_conditionings_for_batch(
-            conditioning_data.uncond_text.embeds, conditioning_data.cond_text.embeds
+        both = prepared_conditioning.get(ConditioningMode.Both)
+        cross_attention_kwargs = prepared_conditioning.cross_attention_kwargs(
+            ConditioningMode.Both, step_index, total_step_count
         )
+
         both_results = self.model_forward_callback(
             x_twice,
             sigma_twice,
-            both_conditionings,
+            both.embeds,
             cross_attention_kwargs=cross_attention_kwargs,
-            encoder_attention_mask=encoder_attention_mask,
+            encoder_attention_mask=both.encoder_attention_mask,
             down_block_additional_residuals=down_block_additional_residuals,
             mid_block_additional_residual=mid_block_additional_residual,
             down_intrablock_additional_residuals=down_intrablock_additional_residuals,
-            added_cond_kwargs=added_cond_kwargs,
+            added_cond_kwargs=both.added_cond_kwargs,
         )
         unconditioned_next_x, conditioned_next_x = both_results.chunk(2)
         return unconditioned_next_x, conditioned_next_x
@@ -366,8 +253,7 @@ class InvokeAIDiffuserComponent:
         self,
         x: torch.Tensor,
         sigma,
-        conditioning_data: TextConditioningData,
-        ip_adapter_data: Optional[list[IPAdapterData]],
+        prepared_conditioning: PreparedConditioning,
         step_index: int,
         total_step_count: int,
         down_block_additional_residuals: Optional[torch.Tensor] = None,  # for ControlNet
@@ -399,101 +285,34 @@ class InvokeAIDiffuserComponent:
         if mid_block_additional_residual is not None:
             uncond_mid_block, cond_mid_block = mid_block_additional_residual.chunk(2)
 
-        #####################
-        # Unconditioned pass
-        #####################
-
-        cross_attention_kwargs = {}
-
-        # Prepare IP-Adapter cross-attention kwargs for the unconditioned pass.
-        if ip_adapter_data is not None:
-            ip_adapter_conditioning = [ipa.ip_adapter_conditioning for ipa in ip_adapter_data]
-            # Note that we 'unsqueeze' to produce tensors of shape (batch_size=1, num_ip_images, seq_len, token_len).
-            image_prompt_embeds = [
-                torch.unsqueeze(ipa_conditioning.uncond_image_prompt_embeds, dim=0)
-                for ipa_conditioning in ip_adapter_conditioning
-            ]
-
-            scales = [ipa.scale_for_step(step_index, total_step_count) for ipa in ip_adapter_data]
-            ip_masks = [ipa.mask for ipa in ip_adapter_data]
-            regional_ip_data = RegionalIPData(
-                image_prompt_embeds=image_prompt_embeds, scales=scales, masks=ip_masks, dtype=x.dtype, device=x.device
-            )
-            cross_attention_kwargs["regional_ip_data"] = regional_ip_data
-
-        # Prepare SDXL conditioning kwargs for the unconditioned pass.
-        added_cond_kwargs = None
-        if conditioning_data.is_sdxl():
-            added_cond_kwargs = {
-                "text_embeds": conditioning_data.uncond_text.pooled_embeds,
-                "time_ids": conditioning_data.uncond_text.add_time_ids,
-            }
-
-        # Prepare prompt regions for the unconditioned pass.
-        if conditioning_data.uncond_regions is not None:
-            cross_attention_kwargs["regional_prompt_data"] = RegionalPromptData(
-                regions=[conditioning_data.uncond_regions], device=x.device, dtype=x.dtype
-            )
-            cross_attention_kwargs["percent_through"] = step_index / total_step_count
-
         # Run unconditioned UNet denoising (i.e. negative prompt).
+        uncond = prepared_conditioning.get(ConditioningMode.Negative)
         unconditioned_next_x = self.model_forward_callback(
             x,
             sigma,
-            conditioning_data.uncond_text.embeds,
-            cross_attention_kwargs=cross_attention_kwargs,
+            uncond.embeds,
+            cross_attention_kwargs=prepared_conditioning.cross_attention_kwargs(
+                ConditioningMode.Negative, step_index, total_step_count
+            ),
             down_block_additional_residuals=uncond_down_block,
             mid_block_additional_residual=uncond_mid_block,
             down_intrablock_additional_residuals=uncond_down_intrablock,
-            added_cond_kwargs=added_cond_kwargs,
+            added_cond_kwargs=uncond.added_cond_kwargs,
         )
 
-        ###################
-        # Conditioned pass
-        ###################
-
-        cross_attention_kwargs = {}
-
-        if ip_adapter_data is not None:
-            ip_adapter_conditioning = [ipa.ip_adapter_conditioning for ipa in ip_adapter_data]
-            # Note that we 'unsqueeze' to produce tensors of shape (batch_size=1, num_ip_images, seq_len, token_len).
-            image_prompt_embeds = [
-                torch.unsqueeze(ipa_conditioning.cond_image_prompt_embeds, dim=0)
-                for ipa_conditioning in ip_adapter_conditioning
-            ]
-
-            scales = [ipa.scale_for_step(step_index, total_step_count) for ipa in ip_adapter_data]
-            ip_masks = [ipa.mask for ipa in ip_adapter_data]
-            regional_ip_data = RegionalIPData(
-                image_prompt_embeds=image_prompt_embeds, scales=scales, masks=ip_masks, dtype=x.dtype, device=x.device
-            )
-            cross_attention_kwargs["regional_ip_data"] = regional_ip_data
-
-        # Prepare SDXL conditioning kwargs for the conditioned pass.
-        added_cond_kwargs = None
-        if conditioning_data.is_sdxl():
-            added_cond_kwargs = {
-                "text_embeds": conditioning_data.cond_text.pooled_embeds,
-                "time_ids": conditioning_data.cond_text.add_time_ids,
-            }
-
-        # Prepare prompt regions for the conditioned pass.
-        if conditioning_data.cond_regions is not None:
-            cross_attention_kwargs["regional_prompt_data"] = RegionalPromptData(
-                regions=[conditioning_data.cond_regions], device=x.device, dtype=x.dtype
-            )
-            cross_attention_kwargs["percent_through"] = step_index / total_step_count
-
         # Run conditioned UNet denoising (i.e. positive prompt).
+        cond = prepared_conditioning.get(ConditioningMode.Positive)
         conditioned_next_x = self.model_forward_callback(
             x,
             sigma,
-            conditioning_data.cond_text.embeds,
-            cross_attention_kwargs=cross_attention_kwargs,
+            cond.embeds,
+            cross_attention_kwargs=prepared_conditioning.cross_attention_kwargs(
+                ConditioningMode.Positive, step_index, total_step_count
+            ),
             down_block_additional_residuals=cond_down_block,
             mid_block_additional_residual=cond_mid_block,
             down_intrablock_additional_residuals=cond_down_intrablock,
-            added_cond_kwargs=added_cond_kwargs,
+            added_cond_kwargs=cond.added_cond_kwargs,
         )
         return unconditioned_next_x, conditioned_next_x
 
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import threading
 from contextlib import contextmanager
 from typing import TYPE_CHECKING, Tuple
 
@@ -8,18 +7,15 @@ import torch
 from diffusers import UNet2DConditionModel
 
 from invokeai.backend.stable_diffusion.extensions.base import ExtensionBase
-from invokeai.backend.util.devices import TorchDevice
 
 if TYPE_CHECKING:
     from invokeai.app.invocations.model import ModelIdentifierField
     from invokeai.app.services.shared.invocation_context import InvocationContext
-    from invokeai.backend.lora import LoRAModelRaw
+    from invokeai.backend.lora import AnyLoRALayer, LoRAModelRaw
     from invokeai.backend.util.original_weights_storage import OriginalWeightsStorage
 
 
 class LoRAExt(ExtensionBase):
-    _lock = threading.Lock()
-
     def __init__(
         self,
         node_context: InvocationContext,
@@ -67,11 +63,15 @@ class LoRAExt(ExtensionBase):
         if lora_weight == 0:
             return
 
-        # assert lora.device.type == "cpu"
-        for layer_key, layer in lora.layers.items():
-            if not layer_key.startswith(prefix):
-                continue
+        assert isinstance(model, torch.nn.Module)
 
+        # Get private copies of the LoRA layers on the model's device. The LoRA object is shared through the model cache
+        # by all session threads, so it is never modified here: patching does not need to be serialized across devices,
+        # and nothing has to be copied back to the CPU afterwards. The tensors of lazily-loaded LoRAs are read from disk
+        # and copied to the device in a single transfer.
+        model_device = next(model.parameters()).device
+        device_layers: list[tuple[str, torch.nn.Module, AnyLoRALayer]] = []
+        for layer_key, layer in lora.get_layers_on_device(prefix, model_device).items():
             # TODO(ryand): A non-negligible amount of time is currently spent resolving LoRA keys. This
             # should be improved in the following ways:
             # 1. The key mapping could be more-efficiently pre-computed. This would save time every time a
@@ -79,40 +79,40 @@ class LoRAExt(ExtensionBase):
             # 2. From an API perspective, there's no reason that the `ModelPatcher` should be aware of the
             #    intricacies of Stable Diffusion key resolution. It should just expect the input LoRA
             #    weights to have valid keys.
-            assert isinstance(model, torch.nn.Module)
             module_key, module = cls._resolve_lora_key(model, layer_key, prefix)
-
+            if module.weight.device != model_device:
+                layer.to(device=module.weight.device)
+            device_layers.append((module_key, module, layer))
+
+        # Each layer is converted to float32 only while its module is patched, and dropped afterwards, so that at most
+        # one float32 layer is on the device at any time. The deltas are not batched across layers: the layers have
+        # mixed types and shapes, and patching is bound by saving and updating each module's weights rather than by the
+        # delta matmuls. Repeated patching with the same LoRA stack is served by the fused weights cache instead.
+        device_layers.reverse()
+        while device_layers:
+            module_key, module, layer = device_layers.pop()
             # All of the LoRA weight calculations will be done on the same device as the module weight.
             # (Performance will be best if this is a CUDA device.)
-            device = module.weight.device
             dtype = module.weight.dtype
+            layer.to(dtype=torch.float32)
 
             layer_scale = layer.alpha / layer.rank if (layer.alpha and layer.rank) else 1.0
 
-            # We intentionally move to the target device first, then cast. Experimentally, this was found to
-            # be significantly faster for 16-bit CPU tensors being moved to a CUDA device than doing the
-            # same thing in a single call to '.to(...)'.
-            with cls._lock: # prevent another thread from moving this layer during patching
-                layer.to(device=device)
-                layer.to(dtype=torch.float32)
-
-                # TODO(ryand): Using torch.autocast(...) over explicit casting may offer a speed benefit on CUDA
-                # devices here. Experimentally, it was found to be very slow on CPU. More investigation needed.
-                for param_name, lora_param_weight in layer.get_parameters(module).items():
-                    param_key = module_key + "." + param_name
-                    module_param = module.get_parameter(param_name)
-
-                    # save original weight
-                    original_weights.save(param_key, module_param)
+            # TODO(ryand): Using torch.autocast(...) over explicit casting may offer a speed benefit on CUDA
+            # devices here. Experimentally, it was found to be very slow on CPU. More investigation needed.
+            for param_name, lora_param_weight in layer.get_parameters(module).items():
+                param_key = module_key + "." + param_name
+                module_param = module.get_parameter(param_name)
 
-                    if module_param.shape != lora_param_weight.shape:
-                        # TODO: debug on lycoris
-                        lora_param_weight = lora_param_weight.reshape(module_param.shape)
+                # save original weight
+                original_weights.save(param_key, module_param)
 
-                    lora_param_weight *= lora_weight * layer_scale
-                    module_param += lora_param_weight.to(dtype=dtype)
+                if module_param.shape != lora_param_weight.shape:
+                    # TODO: debug on lycoris
+                    lora_param_weight = lora_param_weight.reshape(module_param.shape)
 
-                layer.to(device=TorchDevice.CPU_DEVICE)
+                # Not in place: the weight may be the LoRA's own tensor, if it already was on this device in float32.
+                module_param += (lora_param_weight * (lora_weight * layer_scale)).to(dtype=dtype)
 
     @staticmethod
     def _resolve_lora_key(model: torch.nn.Module, lora_key: str, prefix: str) -> Tuple[str, torch.nn.Module]:
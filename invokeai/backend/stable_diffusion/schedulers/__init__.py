@@ -1,3 +1,3 @@
-from invokeai.backend.stable_diffusion.schedulers.schedulers import SCHEDULER_MAP  # noqa: F401
+from invokeai.backend.stable_diffusion.schedulers.schedulers import SCHEDULER_MAP, STOCHASTIC_SCHEDULERS  # noqa: F401
 
-__all__ = ["SCHEDULER_MAP"]
+__all__ = ["SCHEDULER_MAP", "STOCHASTIC_SCHEDULERS"]
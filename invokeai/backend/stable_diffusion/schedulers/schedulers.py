@@ -94,3 +94,20 @@ SCHEDULER_MAP: dict[SCHEDULER_NAME_VALUES, tuple[Type[SchedulerMixin], dict[str,
     "lcm": (LCMScheduler, {}),
     "tcd": (TCDScheduler, {}),
 }
+
+# Schedulers that add fresh noise on some steps, so that their results depend on the random state and not only on the
+# initial noise.
+STOCHASTIC_SCHEDULERS: frozenset[SCHEDULER_NAME_VALUES] = frozenset(
+    [
+        "ddpm",
+        "euler_a",
+        "kdpm_2_a",
+        "kdpm_2_a_k",
+        "dpmpp_2m_sde",
+        "dpmpp_2m_sde_k",
+        "dpmpp_sde",
+        "dpmpp_sde_k",
+        "lcm",
+        "tcd",
+    ]
+)
@@ -1,8 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from queue import Empty, Queue
+from typing import Callable, Optional, Sequence
 
+import numpy as np
+import torch
 from diffusers.models.autoencoders.autoencoder_kl import AutoencoderKL
 from diffusers.models.autoencoders.autoencoder_tiny import AutoencoderTiny
 
+from invokeai.app.invocations.constants import LATENT_SCALE_FACTOR
+from invokeai.backend.tiles.tiles import calc_tiles_with_overlap
+from invokeai.backend.tiles.utils import TBLR, Tile
+from invokeai.backend.tiles.weighted_merge import merge_tiles_with_weighted_blending
+
 
 @contextmanager
 def patch_vae_tiling_params(
@@ -33,3 +43,172 @@ def patch_vae_tiling_params(
         vae.tile_sample_min_size = orig_tile_sample_min_size
         vae.tile_latent_min_size = orig_tile_latent_min_size
         vae.tile_overlap_factor = orig_tile_overlap_factor
+
+
+def calc_vae_tile_size(vae: AutoencoderKL | AutoencoderTiny, tile_size: int = 0) -> tuple[int, int]:
+    """Choose the tile size and overlap, in image pixels, for `decode_latents_tiled(...)` and `encode_image_tiled(...)`.
+
+    A `tile_size` of 0 selects the VAE's own default tile size. The overlap is a quarter of the tile size, which matches
+    the overlap used by the diffusers tiling implementation.
+    """
+    if tile_size <= 0:
+        default_tile_size = getattr(vae, "tile_sample_min_size", None)
+        tile_size = default_tile_size if isinstance(default_tile_size, int) else 512
+    tile_size = max(LATENT_SCALE_FACTOR, tile_size - tile_size % LATENT_SCALE_FACTOR)
+    overlap = (tile_size // 4) - (tile_size // 4) % LATENT_SCALE_FACTOR
+    return tile_size, overlap
+
+
+def vae_output_to_uint8(image: torch.Tensor) -> np.ndarray:
+    """Convert a batch of VAE outputs in [-1, 1] to uint8 images of shape (N, H, W, C).
+
+    The conversion happens on the tensor's device, so only a quarter of the float32 bytes are copied to the CPU.
+    """
+    image = (image / 2 + 0.5).clamp(0, 1)  # denormalize
+    # we always cast to float32 as this does not cause significant overhead and is compatible with bfloat16
+    image = (image.float() * 255).round().to(torch.uint8)
+    return image.permute(0, 2, 3, 1).cpu().numpy()
+
+
+@torch.inference_mode()
+def decode_latents_tiled(
+    vaes: Sequence[AutoencoderKL | AutoencoderTiny],
+    latents: torch.Tensor,
+    tile_size: int,
+    overlap: int,
+    batch_size: int = 1,
+) -> np.ndarray:
+    """Decode latents with overlapping tiles, returning a uint8 image of shape (H, W, C).
+
+    The tiles are decoded in batches of `batch_size`. If more than one VAE is given (each a copy on a different
+    device), the batches are spread over them. Each decoded tile is converted to uint8 on its device, and the tiles are
+    blended with `merge_tiles_with_weighted_blending(...)` in uint16 fixed point into a single preallocated uint8 image,
+    so the full image never exists as a float tensor.
+
+    Args:
+        vaes: The VAE, on one or more execution devices.
+        latents: The latents to decode. Shape: (1, C, h, w). They are cast to each VAE's device, but keep their dtype.
+        tile_size: The tile size in image pixels. Must be a multiple of LATENT_SCALE_FACTOR.
+        overlap: The overlap between adjacent tiles in image pixels. Must be a multiple of LATENT_SCALE_FACTOR.
+        batch_size: The number of tiles to decode at once on each device.
+    """
+    assert latents.shape[0] == 1
+    _, _, latent_height, latent_width = latents.shape
+    tiles, blend_amount = _calc_latent_tiles(latent_height, latent_width, tile_size, overlap)
+
+    def decode(vae: AutoencoderKL | AutoencoderTiny, batch: list[Tile]) -> list[np.ndarray]:
+        x = torch.cat([latents[:, :, t.coords.top : t.coords.bottom, t.coords.left : t.coords.right] for t in batch])
+        x = x.to(device=vae.device) / vae.config.scaling_factor
+        return list(vae_output_to_uint8(vae.decode(x, return_dict=False)[0]))
+
+    tile_images = _run_tile_batches(vaes, tiles, batch_size, decode)
+
+    image_tiles = [_scale_tile(t, LATENT_SCALE_FACTOR) for t in tiles]
+    num_channels = tile_images[0].shape[-1]
+    image = np.zeros(
+        (latent_height * LATENT_SCALE_FACTOR, latent_width * LATENT_SCALE_FACTOR, num_channels), dtype=np.uint8
+    )
+    merge_tiles_with_weighted_blending(
+        image, image_tiles, tile_images, blend_amount * LATENT_SCALE_FACTOR, precision="uint16"
+    )
+    return image
+
+
+@torch.inference_mode()
+def encode_image_tiled(
+    vaes: Sequence[AutoencoderKL | AutoencoderTiny],
+    image_tensor: torch.Tensor,
+    tile_size: int,
+    overlap: int,
+    encode: Callable[[AutoencoderKL | AutoencoderTiny, torch.Tensor], torch.Tensor],
+    batch_size: int = 1,
+) -> torch.Tensor:
+    """Encode an image with overlapping tiles, returning unscaled latents of shape (1, C, h, w) on the CPU.
+
+    This is the counterpart of `decode_latents_tiled(...)`. The latent tiles are blended with
+    `merge_tiles_with_weighted_blending(...)` in float32.
+
+    Args:
+        vaes: The VAE, on one or more execution devices.
+        image_tensor: The image to encode, in [-1, 1]. Shape: (1, C, H, W). H and W must be multiples of
+            LATENT_SCALE_FACTOR.
+        tile_size: The tile size in image pixels. Must be a multiple of LATENT_SCALE_FACTOR.
+        overlap: The overlap between adjacent tiles in image pixels. Must be a multiple of LATENT_SCALE_FACTOR.
+        encode: Encodes a batch of image tiles, already on the VAE's device and in its dtype.
+        batch_size: The number of tiles to encode at once on each device.
+    """
+    assert image_tensor.shape[0] == 1
+    _, _, height, width = image_tensor.shape
+    assert height % LATENT_SCALE_FACTOR == 0 and width % LATENT_SCALE_FACTOR == 0
+    tiles, blend_amount = _calc_latent_tiles(
+        height // LATENT_SCALE_FACTOR, width // LATENT_SCALE_FACTOR, tile_size, overlap
+    )
+
+    def encode_batch(vae: AutoencoderKL | AutoencoderTiny, batch: list[Tile]) -> list[np.ndarray]:
+        image_tiles = [_scale_tile(t, LATENT_SCALE_FACTOR).coords for t in batch]
+        x = torch.cat([image_tensor[:, :, c.top : c.bottom, c.left : c.right] for c in image_tiles])
+        latents = encode(vae, x.to(device=vae.device, dtype=vae.dtype))
+        return list(latents.float().permute(0, 2, 3, 1).cpu().numpy())
+
+    latent_tiles = _run_tile_batches(vaes, tiles, batch_size, encode_batch)
+
+    num_channels = latent_tiles[0].shape[-1]
+    latents = np.zeros((height // LATENT_SCALE_FACTOR, width // LATENT_SCALE_FACTOR, num_channels), dtype=np.float32)
+    merge_tiles_with_weighted_blending(latents, tiles, latent_tiles, blend_amount)
+    return torch.from_numpy(latents).permute(2, 0, 1).unsqueeze(0)
+
+
+def _calc_latent_tiles(latent_height: int, latent_width: int, tile_size: int, overlap: int) -> tuple[list[Tile], int]:
+    """Calculate the latent-space tiles, and the blend amount in latents, for an image tile size and overlap."""
+    tile_height = min(tile_size // LATENT_SCALE_FACTOR, latent_height)
+    tile_width = min(tile_size // LATENT_SCALE_FACTOR, latent_width)
+    latent_overlap = min(overlap // LATENT_SCALE_FACTOR, tile_height - 1, tile_width - 1)
+    tiles = calc_tiles_with_overlap(latent_height, latent_width, tile_height, tile_width, latent_overlap)
+    return tiles, latent_overlap
+
+
+def _scale_tile(tile: Tile, scale: int) -> Tile:
+    return Tile(
+        coords=TBLR(**{k: v * scale for k, v in tile.coords.model_dump().items()}),
+        overlap=TBLR(**{k: v * scale for k, v in tile.overlap.model_dump().items()}),
+    )
+
+
+def _run_tile_batches(
+    vaes: Sequence[AutoencoderKL | AutoencoderTiny],
+    tiles: list[Tile],
+    batch_size: int,
+    process: Callable[[AutoencoderKL | AutoencoderTiny, list[Tile]], list[np.ndarray]],
+) -> list[np.ndarray]:
+    """Process the tiles in batches, spread over the VAEs, and return the results in tile order.
+
+    Each VAE runs in its own thread and takes the next pending batch when it finishes one, so faster devices
+    process more batches.
+    """
+    assert len(vaes) > 0
+    assert batch_size > 0
+    results: list[Optional[np.ndarray]] = [None] * len(tiles)
+    pending: Queue[range] = Queue()
+    for start in range(0, len(tiles), batch_size):
+        pending.put(range(start, min(start + batch_size, len(tiles))))
+
+    # inference mode is thread-local, so it is entered again in each worker thread
+    @torch.inference_mode()
+    def worker(vae: AutoencoderKL | AutoencoderTiny) -> None:
+        while True:
+            try:
+                batch = pending.get_nowait()
+            except Empty:
+                return
+            for i, result in zip(batch, process(vae, [tiles[i] for i in batch]), strict=True):
+                results[i] = result
+
+    if len(vaes) == 1:
+        worker(vaes[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(vaes), thread_name_prefix="vae_tile") as executor:
+            for future in [executor.submit(worker, vae) for vae in vaes]:
+                future.result()
+
+    assert all(r is not None for r in results)
+    return results  # type: ignore
@@ -99,16 +99,15 @@ def seam_blend(ia1: np.ndarray, ia2: np.ndarray, blend_amount: int, x_seam: bool
     energy = np.abs(np.gradient(ia, axis=0)) + np.abs(np.gradient(ia, axis=1))
 
     # Find the starting position of the seam
+    # Each row of the cumulative energy adds the minimum of the row's own energy and its neighbours, so all rows can be
+    # minimized at once and summed with a cumulative sum (which adds the rows in the same order as a row-by-row loop).
     res = np.copy(energy)
-    for y in range(1, max_y):
-        row = res[y, :]
-        rowl = shift(row, -1)
-        rowr = shift(row, 1)
-        res[y, :] = res[y - 1, :] + np.min([row, rowl, rowr], axis=0)
+    res[1:] = np.minimum(np.minimum(energy[1:], shift(energy[1:].T, -1).T), shift(energy[1:].T, 1).T)
+    res_last = np.cumsum(res, axis=0)[-1]
 
     # create an array max_y long
     lowest_energy_line = np.empty([max_y], dtype="uint16")
-    lowest_energy_line[max_y - 1] = np.argmin(res[max_y - 1, min_x : max_x - 1])
+    lowest_energy_line[max_y - 1] = np.argmin(res_last[min_x : max_x - 1])
 
     # Calc the path of the seam
     # could offer options for larger search than just 1 pixel by adjusting lpos and rpos
@@ -121,10 +120,7 @@ def seam_blend(ia1: np.ndarray, ia2: np.ndarray, blend_amount: int, x_seam: bool
         lowest_energy_line[ypos] = np.argmin(energy[ypos, lpos : rpos + 1]) + lpos
 
     # Draw the mask
-    mask = np.zeros_like(ia)
-    for ypos in range(0, max_y):
-        to_fill = lowest_energy_line[ypos]
-        mask[ypos, :to_fill] = 1
+    mask = (np.arange(ia.shape[1])[None, :] < lowest_energy_line[:, None]).astype(ia.dtype)
 
     # If the seam is on the X-axis rotate the array back
     if x_seam:
@@ -0,0 +1,239 @@
+"""Vectorized tile merging with linear blending.
+
+`merge_tiles_with_weighted_blending(...)` produces the same blend as `merge_tiles_with_linear_blending(...)`, but
+instead of pasting each tile over the previous ones with a float64 mask, it turns the blend into a per-tile weight map
+and accumulates `tile * weight` into a single weighted-sum buffer:
+
+- The linear blend is separable, so each tile's weight map is the outer product of a vertical weight (from the blend
+  between rows) and a horizontal weight (from the blend between tiles in the row). The 1D weights are computed once per
+  merge, and each distinct 2D weight map is built once and shared by all tiles with the same geometry.
+- The buffer only spans the current row of tiles. Pixels are written to the destination image as soon as no later row
+  overlaps them, so the extra memory is a band one tile high rather than a full-size float image.
+- The buffer is float32, or uint16 fixed point for uint8 images. In fixed point, the weights of the tiles covering a
+  pixel are quantized so that they always sum to exactly 256, so the sum cannot overflow.
+- The accumulation can optionally run on a torch device.
+"""
+
+from typing import Callable, Literal, Optional, Union
+
+import numpy as np
+import torch
+
+from invokeai.backend.tiles.utils import Tile
+
+MERGE_PRECISION = Literal["float32", "uint16"]
+
+# Fixed point weights are in units of 1/FIXED_POINT_SCALE. 255 * FIXED_POINT_SCALE must fit in a uint16.
+FIXED_POINT_SCALE = 256
+
+
+def merge_tiles_with_weighted_blending(
+    dst_image: np.ndarray,
+    tiles: list[Tile],
+    tile_images: list[np.ndarray],
+    blend_amount: int,
+    precision: MERGE_PRECISION = "float32",
+    device: Optional[torch.device] = None,
+) -> None:
+    """Merge a set of image tiles into `dst_image` with linear blending between the tiles.
+
+    This is a vectorized equivalent of `merge_tiles_with_linear_blending(...)`, with the same expectations of the tile
+    overlaps and `blend_amount`. The tiles must cover `dst_image`. Results are rounded to the nearest value rather than
+    truncated, so integer outputs may differ from `merge_tiles_with_linear_blending(...)` by a level or two.
+
+    Args:
+        dst_image (np.ndarray): The destination image. Shape: (H, W, C).
+        tiles (list[Tile]): The list of tiles describing the locations of the respective `tile_images`.
+        tile_images (list[np.ndarray]): The tile images to merge into `dst_image`.
+        blend_amount (int): The amount of blending (in px) between adjacent overlapping tiles.
+        precision (MERGE_PRECISION): The type of the weighted-sum buffer. "uint16" is fixed point, and requires uint8
+            images.
+        device (Optional[torch.device]): If set, accumulate with torch on this device instead of with numpy.
+    """
+    if precision == "uint16" and (dst_image.dtype != np.uint8 or any(t.dtype != np.uint8 for t in tile_images)):
+        raise ValueError("uint16 fixed point merging requires uint8 images.")
+
+    rows = _group_tiles_into_rows(list(zip(tiles, tile_images, strict=True)))
+    height, width, _ = dst_image.shape
+    for row in rows:
+        for tile, tile_image in row:
+            if tile.coords.bottom > height or tile.coords.right > width:
+                raise ValueError(f"Tile {tile.coords} overflows the destination image of shape {dst_image.shape}.")
+            if tile_image.shape[:2] != (tile.coords.bottom - tile.coords.top, tile.coords.right - tile.coords.left):
+                raise ValueError(f"Tile image of shape {tile_image.shape} does not match the tile {tile.coords}.")
+
+    # Vertical blend weights of each row, and horizontal blend weights of each tile in each row.
+    row_weights = _calc_blend_weights(
+        [(row[0][0].coords.top, row[0][0].coords.bottom, row[0][0].overlap.top) for row in rows], height, blend_amount
+    )
+    tile_weights = [
+        _calc_blend_weights(
+            [(tile.coords.left, tile.coords.right, tile.overlap.left) for tile, _ in row], width, blend_amount
+        )
+        for row in rows
+    ]
+
+    if precision == "uint16":
+        # In fixed point, the running totals of the weights are quantized rather than the weights themselves. The
+        # totals are non-decreasing and end at exactly FIXED_POINT_SCALE, so the quantized weights of the tiles covering
+        # a pixel are non-negative and sum to exactly FIXED_POINT_SCALE.
+        row_totals = [np.zeros(height)] + [np.rint(c * FIXED_POINT_SCALE) for c in _cumulative(row_weights)]
+        tile_totals = [[np.zeros(width)] + _cumulative(w) for w in tile_weights]
+
+    accumulator = _Accumulator(dst_image, precision, device)
+    band_top = rows[0][0][0].coords.top
+    for row_index, row in enumerate(rows):
+        row_tile = row[0][0]
+        row_top, row_bottom = row_tile.coords.top, row_tile.coords.bottom
+        accumulator.extend(row_bottom - band_top)
+
+        for tile_index, (tile, tile_image) in enumerate(row):
+            left, right = tile.coords.left, tile.coords.right
+            if precision == "uint16":
+                dy = (row_totals[row_index + 1] - row_totals[row_index])[row_top:row_bottom]
+                cx_before = tile_totals[row_index][tile_index][left:right]
+                cx_after = tile_totals[row_index][tile_index + 1][left:right]
+                key = (dy.tobytes(), cx_before.tobytes() + cx_after.tobytes())
+                weights = accumulator.weights(key, _fixed_point_weights, dy, cx_before, cx_after)
+            else:
+                wy = row_weights[row_index][row_top:row_bottom]
+                wx = tile_weights[row_index][tile_index][left:right]
+                key = (wy.tobytes(), wx.tobytes())
+                weights = accumulator.weights(key, np.outer, wy, wx)
+            accumulator.add(tile_image, row_top - band_top, left, weights)
+
+        # Everything above the next row is final.
+        next_top = rows[row_index + 1][0][0].coords.top if row_index + 1 < len(rows) else row_bottom
+        accumulator.flush(band_top, min(next_top, row_bottom) - band_top)
+        band_top = next_top
+
+
+def _group_tiles_into_rows(
+    tiles_and_images: list[tuple[Tile, np.ndarray]],
+) -> list[list[tuple[Tile, np.ndarray]]]:
+    """Sort the tiles left-to-right, top-to-bottom, and group them into rows with the same top and bottom."""
+    tiles_and_images = sorted(tiles_and_images, key=lambda x: (x[0].coords.top, x[0].coords.left))
+    rows: list[list[tuple[Tile, np.ndarray]]] = []
+    for tile_and_image in tiles_and_images:
+        tile, _ = tile_and_image
+        if rows and (tile.coords.top, tile.coords.bottom) == (rows[-1][0][0].coords.top, rows[-1][0][0].coords.bottom):
+            rows[-1].append(tile_and_image)
+        else:
+            rows.append([tile_and_image])
+    return rows
+
+
+def _calc_blend_weights(spans: list[tuple[int, int, int]], length: int, blend_amount: int) -> list[np.ndarray]:
+    """Calculate the 1D blend weights of a sequence of overlapping spans along one axis.
+
+    Each span is (start, end, overlap with the previous span). As in `merge_tiles_with_linear_blending(...)`, each span
+    is laid over the previous ones with a linear gradient of `blend_amount` centered in the overlap. The weight of each
+    span is its own mask times one minus the masks of all later spans. The weights are returned over the full length of
+    the axis.
+    """
+    gradient = np.linspace(start=0.0, stop=1.0, num=blend_amount)
+    weights: list[np.ndarray] = []
+    for start, end, overlap in spans:
+        mask = np.zeros(length, dtype=np.float64)
+        mask[start:end] = 1.0
+        if overlap > 0:
+            assert overlap >= blend_amount
+            # Center the blending gradient in the middle of the overlap.
+            blend_start = start + overlap // 2 - blend_amount // 2
+            mask[start:blend_start] = 0.0
+            mask[blend_start : blend_start + blend_amount] = gradient
+        for w in weights:
+            w[start:end] *= 1.0 - mask[start:end]
+        weights.append(mask)
+    return weights
+
+
+def _fixed_point_weights(dy: np.ndarray, cx_before: np.ndarray, cx_after: np.ndarray) -> np.ndarray:
+    """Calculate the fixed point 2D weight map of a tile from the quantized vertical weight of its row and the running
+    totals of the horizontal weights before and after the tile."""
+    return np.rint(np.outer(dy, cx_after)) - np.rint(np.outer(dy, cx_before))
+
+
+def _cumulative(weights: list[np.ndarray]) -> list[np.ndarray]:
+    """Calculate the running totals of a list of 1D weights, normalized so that the final total is exactly 1."""
+    totals = np.cumsum(np.stack(weights), axis=0)
+    totals /= np.where(totals[-1] > 0, totals[-1], 1.0)
+    return list(totals)
+
+
+class _Accumulator:
+    """The weighted-sum buffer for one band of rows of the destination image, in numpy or torch."""
+
+    def __init__(self, dst_image: np.ndarray, precision: MERGE_PRECISION, device: Optional[torch.device]):
+        self._dst_image = dst_image
+        self._fixed_point = precision == "uint16"
+        self._device = device
+        _, self._width, self._channels = dst_image.shape
+        self._band: Union[np.ndarray, torch.Tensor, None] = None
+        self._weights: dict[tuple[bytes, bytes], Union[np.ndarray, torch.Tensor]] = {}
+
+    def _zeros(self, height: int) -> Union[np.ndarray, torch.Tensor]:
+        shape = (height, self._width, self._channels)
+        if self._device is None:
+            return np.zeros(shape, dtype=np.uint16 if self._fixed_point else np.float32)
+        # torch has limited support for uint16 arithmetic, so fixed point uses int32 there.
+        return torch.zeros(shape, dtype=torch.int32 if self._fixed_point else torch.float32, device=self._device)
+
+    def extend(self, height: int) -> None:
+        """Grow the band to at least `height` rows, keeping its contents."""
+        if self._band is None:
+            self._band = self._zeros(height)
+        elif self._band.shape[0] < height:
+            band = self._zeros(height)
+            band[: self._band.shape[0]] = self._band
+            self._band = band
+
+    def weights(
+        self, key: tuple[bytes, bytes], build: Callable[..., np.ndarray], *args: np.ndarray
+    ) -> Union[np.ndarray, torch.Tensor]:
+        """Return the 2D weight map with the given key, building it with `build(*args)` on first use."""
+        weights = self._weights.get(key)
+        if weights is None:
+            built = build(*args)
+            if self._fixed_point:
+                built = built.astype(np.uint16 if self._device is None else np.int32)
+            else:
+                built = built.astype(np.float32)
+            weights = (
+                built[:, :, None] if self._device is None else torch.from_numpy(built[:, :, None]).to(self._device)
+            )
+            self._weights[key] = weights
+        return weights
+
+    def add(self, tile_image: np.ndarray, top: int, left: int, weights: Union[np.ndarray, torch.Tensor]) -> None:
+        """Add `tile_image * weights` to the band at (top, left)."""
+        assert self._band is not None
+        height, width = tile_image.shape[:2]
+        region = self._band[top : top + height, left : left + width]
+        if isinstance(region, torch.Tensor):
+            region += torch.from_numpy(tile_image).to(self._device, dtype=region.dtype) * weights
+        elif self._fixed_point:
+            region += tile_image * weights
+        else:
+            region += tile_image.astype(np.float32) * weights
+
+    def flush(self, dst_top: int, height: int) -> None:
+        """Write the first `height` rows of the band to the destination image, and drop them from the band."""
+        assert self._band is not None
+        done, rest = self._band[:height], self._band[height:]
+        if isinstance(done, torch.Tensor):
+            if self._fixed_point:
+                done = torch.div(done + FIXED_POINT_SCALE // 2, FIXED_POINT_SCALE, rounding_mode="floor")
+            elif not np.issubdtype(self._dst_image.dtype, np.floating):
+                done = done.round_()
+            done = done.cpu().numpy()
+        elif self._fixed_point:
+            done = (done + FIXED_POINT_SCALE // 2) // FIXED_POINT_SCALE
+        elif not np.issubdtype(self._dst_image.dtype, np.floating):
+            done = np.rint(done)
+        if np.issubdtype(self._dst_image.dtype, np.integer):
+            info = np.iinfo(self._dst_image.dtype)
+            done = np.clip(done, info.min, info.max)
+        self._dst_image[dst_top : dst_top + height] = done
+        # Copy the rest, so that the memory of the flushed rows is released.
+        self._band = rest.clone() if isinstance(rest, torch.Tensor) else rest.copy()
@@ -11,7 +11,9 @@ import locale
 import os
 import shutil
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Optional
 
 import PIL
 import PIL.ImageOps
@@ -260,14 +262,57 @@ class PhysicalFileMapper:
     def get_all_thumbnails_with_full_path(self, thumbnails_directory):  # noqa D102
         return glob.glob(thumbnails_directory + "/*.webp", recursive=False)
 
+    def get_all_filenames_in_directory(self, directory_path) -> set[str]:
+        """Get the set of file names in a directory, with a single directory scan."""
+        if not os.path.isdir(directory_path):
+            return set()
+        with os.scandir(directory_path) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+
     def generate_thumbnail_for_image_name(self, image_filename):  # noqa D102
-        # create thumbnail
-        file_path = self.get_image_path_for_image_name(image_filename)
-        thumb_path = self.get_thumbnail_path_for_image(image_filename)
-        thumb_size = 256, 256
-        with PIL.Image.open(file_path) as source_image:
-            source_image.thumbnail(thumb_size)
-            source_image.save(thumb_path, "webp")
+        generate_thumbnail(
+            self.get_image_path_for_image_name(image_filename), self.get_thumbnail_path_for_image(image_filename)
+        )
+
+    def generate_thumbnails_for_image_names(
+        self, image_filenames: list[str], workers: int = 1
+    ) -> Iterable[tuple[str, Optional[str]]]:
+        """Generate thumbnails for many images, yielding (image_filename, error) as each one completes.
+
+        With more than one worker, the images are decoded and encoded in a pool of processes.
+        """
+        jobs = [(self.get_image_path_for_image_name(f), self.get_thumbnail_path_for_image(f)) for f in image_filenames]
+        if workers <= 1:
+            yield from zip(image_filenames, (_try_generate_thumbnail(job) for job in jobs), strict=True)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+            yield from zip(
+                image_filenames, executor.map(_try_generate_thumbnail, jobs, chunksize=chunksize), strict=True
+            )
+
+
+def generate_thumbnail(image_path: str, thumb_path: str) -> None:
+    """Create the thumbnail of an image.
+
+    The thumbnail is written to a temporary file and then renamed, so an interrupted run never leaves a truncated
+    thumbnail behind, and can simply be run again.
+    """
+    thumb_size = 256, 256
+    tmp_path = thumb_path + ".tmp"
+    with PIL.Image.open(image_path) as source_image:
+        source_image.thumbnail(thumb_size)
+        source_image.save(tmp_path, "webp")
+    os.replace(tmp_path, thumb_path)
+
+
+def _try_generate_thumbnail(job: tuple[str, str]) -> Optional[str]:
+    """Process pool entry point. Returns None on success, or the error message."""
+    try:
+        generate_thumbnail(*job)
+        return None
+    except Exception as ex:
+        return str(ex)
 
 
 class MaintenanceOperation(str, enum.Enum):
@@ -285,12 +330,25 @@ class InvokeAIDatabaseMaintenanceApp:
 
     _operation: MaintenanceOperation
     _headless: bool = False
+    _workers: int = 1
     __stats: MaintenanceStats = MaintenanceStats()
 
-    def __init__(self, operation: MaintenanceOperation = MaintenanceOperation.Ask):
-        """Initialize maintenance app."""
+    # How often to report progress when working through many files.
+    PROGRESS_INTERVAL = 1000
+
+    def __init__(self, operation: MaintenanceOperation = MaintenanceOperation.Ask, workers: int = 1):
+        """Initialize maintenance app.
+
+        :param operation: The operation to perform.
+        :param workers: Number of processes used to regenerate thumbnails.
+        """
         self._operation = MaintenanceOperation(operation)
         self._headless = operation != MaintenanceOperation.Ask
+        self._workers = workers
+
+    def _print_progress(self, done: int, total: int, what: str):
+        if done % self.PROGRESS_INTERVAL == 0 or done == total:
+            print(f"Progress: {done}/{total} {what} ({MaintenanceStats.get_elapsed_time_string()})")
 
     def ask_for_operation(self) -> MaintenanceOperation:
         """Ask user to choose the operation to perform."""
@@ -370,9 +428,10 @@ class InvokeAIDatabaseMaintenanceApp:
         db_mapper.backup(config.TIMESTAMP_STRING)
         db_mapper.connect()
         db_files = db_mapper.get_all_image_files()
+        disk_files = file_mapper.get_all_filenames_in_directory(config.outputs_path)
         for db_file in db_files:
             try:
-                if not file_mapper.image_file_exists(db_file):
+                if db_file not in disk_files:
                     print(f"Found orphaned image db entry {db_file}. Cleaning ...", end="")
                     db_mapper.remove_image_file_record(db_file)
                     print("Cleaned!")
@@ -425,9 +484,11 @@ class InvokeAIDatabaseMaintenanceApp:
         db_mapper.backup(config.TIMESTAMP_STRING)
         db_mapper.connect()
         phys_files = file_mapper.get_all_png_filenames_in_directory(config.outputs_path)
+        # one query for all names, rather than one query per file
+        db_files = set(db_mapper.get_all_image_files())
         for phys_file in phys_files:
             try:
-                if not db_mapper.does_image_exist(phys_file):
+                if phys_file not in db_files:
                     print(f"Found orphaned file {phys_file}, archiving...", end="")
                     file_mapper.archive_image(phys_file)
                     print("Archived!")
@@ -444,11 +505,12 @@ class InvokeAIDatabaseMaintenanceApp:
                 self.__stats.count_errors += 1
 
         thumb_filepaths = file_mapper.get_all_thumbnails_with_full_path(config.thumbnails_path)
+        disk_files = file_mapper.get_all_filenames_in_directory(config.outputs_path)
         # archive any remaining orphaned thumbnails
         for thumb_filepath in thumb_filepaths:
             try:
                 thumb_src_image_name = file_mapper.get_image_name_from_thumbnail_path(thumb_filepath)
-                if not file_mapper.image_file_exists(thumb_src_image_name):
+                if thumb_src_image_name not in disk_files:
                     print(f"Found orphaned thumbnail {thumb_filepath}, archiving...", end="")
                     file_mapper.archive_thumbnail_by_image_filename(thumb_src_image_name)
                     print("Archived!")
@@ -488,17 +550,22 @@ class InvokeAIDatabaseMaintenanceApp:
             print()
 
         phys_files = file_mapper.get_all_png_filenames_in_directory(config.outputs_path)
-        for phys_file in phys_files:
-            try:
-                if not file_mapper.thumbnail_exists_for_filename(phys_file):
-                    print(f"Found file without thumbnail {phys_file}...Regenerating Thumbnail...", end="")
-                    file_mapper.generate_thumbnail_for_image_name(phys_file)
-                    print("Done!")
-                    self.__stats.count_thumbnails_regenerated += 1
-            except Exception as ex:
-                print("Error found trying to regenerate thumbnail, error was:")
-                print(ex)
+        thumb_files = file_mapper.get_all_filenames_in_directory(config.thumbnails_path)
+        # Thumbnails that already exist are skipped, so an interrupted run can be resumed by running it again.
+        missing = [
+            f for f in phys_files if os.path.basename(file_mapper.get_thumbnail_path_for_image(f)) not in thumb_files
+        ]
+        print(f"Found {len(missing)} of {len(phys_files)} files without thumbnails.")
+        for done, (phys_file, error) in enumerate(
+            file_mapper.generate_thumbnails_for_image_names(missing, workers=self._workers), start=1
+        ):
+            if error is None:
+                self.__stats.count_thumbnails_regenerated += 1
+            else:
+                print(f"Error found trying to regenerate thumbnail for {phys_file}, error was:")
+                print(error)
                 self.__stats.count_errors += 1
+            self._print_progress(done, len(missing), "thumbnails")
 
     def main(self):  # noqa D107
         print("\n===============================================================================")
@@ -562,10 +629,16 @@ def main():  # noqa D107
     parser.add_argument(
         "--operation", default="ask", choices=[x.value for x in MaintenanceOperation], help="Operation to perform."
     )
+    parser.add_argument(
+        "--workers",
+        default=os.cpu_count() or 1,
+        type=int,
+        help="Number of processes used to regenerate thumbnails. Defaults to the number of CPUs.",
+    )
     args = parser.parse_args()
     try:
         os.chdir(args.root)
-        app = InvokeAIDatabaseMaintenanceApp(args.operation)
+        app = InvokeAIDatabaseMaintenanceApp(args.operation, workers=args.workers)
         app.main()
     except KeyboardInterrupt:
         print("\n\nUser cancelled execution.")
@@ -0,0 +1,83 @@
+"""
+Counter-based random numbers that are the same on every device.
+
+torch.randn gives different numbers on the CPU and on CUDA or MPS for the same
+seed, so noise that has to be reproducible is usually drawn on the CPU and
+copied to the execution device. Philox4x32-10 (Salmon et al., "Parallel Random
+Numbers: As Easy as 1, 2, 3") derives each random word from its index alone, so
+it can be computed with plain integer tensor ops directly on the execution
+device and still give the same result as on the CPU.
+"""
+
+import math
+from typing import Sequence, Tuple
+
+import torch
+
+_MASK32 = 0xFFFFFFFF
+_PHILOX_M0 = 0xD2511F53
+_PHILOX_M1 = 0xCD9E8D57
+_PHILOX_W0 = 0x9E3779B9
+_PHILOX_W1 = 0xBB67AE85
+_PHILOX_ROUNDS = 10
+
+
+def _mulhilo32(a: torch.Tensor, m: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Return the high and low 32 bits of the 64-bit product of the 32-bit words in a (int64) and m."""
+    # Multiply in 16-bit halves so that no intermediate overflows int64.
+    a_hi, a_lo = a >> 16, a & 0xFFFF
+    m_hi, m_lo = m >> 16, m & 0xFFFF
+    lo_lo = a_lo * m_lo
+    mid = a_lo * m_hi + a_hi * m_lo + (lo_lo >> 16)
+    lo = ((mid & 0xFFFF) << 16) | (lo_lo & 0xFFFF)
+    hi = a_hi * m_hi + (mid >> 16)
+    return hi, lo
+
+
+def philox4x32(counters: Sequence[torch.Tensor], key: Tuple[int, int]) -> Tuple[torch.Tensor, ...]:
+    """
+    Apply the Philox4x32-10 bijection.
+
+    :param counters: The four 32-bit words of each counter, as int64 tensors of the same shape.
+    :param key: The two 32-bit words of the key.
+    :return: The four 32-bit words of each random block, as int64 tensors.
+    """
+    c0, c1, c2, c3 = counters
+    k0, k1 = key
+    for _ in range(_PHILOX_ROUNDS):
+        hi0, lo0 = _mulhilo32(c0, _PHILOX_M0)
+        hi1, lo1 = _mulhilo32(c2, _PHILOX_M1)
+        c0, c1, c2, c3 = hi1 ^ c1 ^ k0, lo1, hi0 ^ c3 ^ k1, lo0
+        k0, k1 = (k0 + _PHILOX_W0) & _MASK32, (k1 + _PHILOX_W1) & _MASK32
+    return c0, c1, c2, c3
+
+
+def philox_randn(
+    shape: Sequence[int], seed: int, device: torch.device, dtype: torch.dtype = torch.float32
+) -> torch.Tensor:
+    """
+    Return a tensor of standard normal noise that only depends on shape and seed, not on device.
+
+    Each Philox block of four words gives four normals through the Box-Muller transform, which is
+    computed in float64 so that the results agree across devices before the cast to dtype. MPS has
+    no float64, so there the transform runs on the CPU and the noise is moved to the device after.
+    """
+    numel = math.prod(shape)
+    n_blocks = (numel + 3) // 4
+    index = torch.arange(n_blocks, dtype=torch.int64, device=device)
+    zero = torch.zeros_like(index)
+    words = philox4x32((index & _MASK32, index >> 32, zero, zero), (seed & _MASK32, (seed >> 32) & _MASK32))
+
+    if torch.device(device).type == "mps":
+        words = tuple(w.cpu() for w in words)
+
+    # Map the words to uniforms in (0, 1), so that the log is finite.
+    u1, u2, u3, u4 = ((w.to(torch.float64) + 0.5) / 2.0**32 for w in words)
+    r1 = torch.sqrt(-2.0 * torch.log(u1))
+    r2 = torch.sqrt(-2.0 * torch.log(u3))
+    theta1 = 2.0 * math.pi * u2
+    theta2 = 2.0 * math.pi * u4
+    normals = torch.stack(
+        [r1 * torch.cos(theta1), r1 * torch.sin(theta1), r2 * torch.cos(theta2), r2 * torch.sin(theta2)], dim=1
+    )
+    return normals.flatten()[:numel].reshape(shape).to(device=device, dtype=dtype)
@@ -6,6 +6,7 @@
 # pylint: disable=broad-exception-caught
 """Script to import images into the new database system for 3.0.0"""
 
+import argparse
 import datetime
 import glob
 import json
@@ -14,7 +15,10 @@ import os
 import re
 import shutil
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterator, Optional
 
 import PIL
 import PIL.ImageOps
@@ -377,6 +381,10 @@ class InvokeAIMetadataParser:
         return positive_prompt, negative_prompt
 
 
+# (filename, width, height, metadata, modified_date_string, board_id)
+ImageRow = tuple[str, int, int, str, str, str]
+
+
 class DatabaseMapper:
     """Class to abstract database functionality."""
 
@@ -398,18 +406,31 @@ class DatabaseMapper:
         rows = self.cursor.fetchall()
         return [row[0] for row in rows]
 
-    def does_image_exist(self, image_name):
-        """Check database if a image name already exists and return a boolean."""
-        sql_get_image_by_name = f"SELECT image_name FROM images WHERE image_name='{image_name}'"
-        self.cursor.execute(sql_get_image_by_name)
-        rows = self.cursor.fetchall()
-        return True if len(rows) > 0 else False
+    def get_all_image_names(self) -> set[str]:
+        """Get the set of image names in the database, with a single query."""
+        assert self.cursor is not None
+        self.cursor.execute("SELECT image_name FROM images")
+        return {row[0] for row in self.cursor.fetchall()}
 
-    def add_new_image_to_database(self, filename, width, height, metadata, modified_date_string):
-        """Add an image to the database."""
-        sql_add_image = f"""INSERT INTO images (image_name, image_origin, image_category, width, height, session_id, node_id, metadata, is_intermediate, created_at, updated_at)
-VALUES ('{filename}', 'internal', 'general', {width}, {height}, null, null, '{metadata}', 0, '{modified_date_string}', '{modified_date_string}')"""
-        self.cursor.execute(sql_add_image)
+    def add_new_images_to_database(self, images: list[ImageRow]) -> None:
+        """Add a batch of images to the database, and to their boards, in a single transaction.
+
+        Each image is a tuple of (filename, width, height, metadata, modified_date_string, board_id).
+        """
+        assert self.connection is not None and self.cursor is not None
+        add_datetime_str = datetime.datetime.utcnow().isoformat()
+        self.cursor.executemany(
+            """INSERT INTO images (image_name, image_origin, image_category, width, height, session_id, node_id, metadata, is_intermediate, created_at, updated_at)
+VALUES (?, 'internal', 'general', ?, ?, null, null, ?, 0, ?, ?)""",
+            [
+                (filename, width, height, metadata, modified, modified)
+                for filename, width, height, metadata, modified, _ in images
+            ],
+        )
+        self.cursor.executemany(
+            "INSERT INTO board_images (board_id, image_name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            [(board_id, filename, add_datetime_str, add_datetime_str) for filename, *_, board_id in images],
+        )
         self.connection.commit()
 
     def get_board_id_with_create(self, board_name):
@@ -427,14 +448,6 @@ VALUES ('{filename}', 'internal', 'general', {width}, {height}, null, null, '{me
             self.connection.commit()
             return new_board_id
 
-    def add_image_to_board(self, filename, board_id):
-        """Add an image mapping to a board."""
-        add_datetime_str = datetime.datetime.utcnow().isoformat()
-        sql_add_image_to_board = f"""INSERT INTO board_images (board_id, image_name, created_at, updated_at)
-            VALUES ('{board_id}', '{filename}', '{add_datetime_str}', '{add_datetime_str}')"""
-        self.cursor.execute(sql_add_image_to_board)
-        self.connection.commit()
-
     def disconnect(self):
         """Disconnect from the db, cleaning up connections and cursors."""
         if self.cursor is not None:
@@ -457,8 +470,11 @@ VALUES ('{filename}', 'internal', 'general', {width}, {height}, null, null, '{me
 class MediaImportProcessor:
     """Containing class for script functionality."""
 
-    def __init__(self):
-        pass
+    # number of images added to the database in each transaction
+    DATABASE_BATCH_SIZE = 500
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
 
     board_name_id_map = {}
 
@@ -493,14 +509,6 @@ class MediaImportProcessor:
             else:
                 print(f"The specific path {import_dir} exists, but does not contain .png files!")
 
-    def get_file_details(self, filepath):
-        """Retrieve the embedded metedata fields and dimensions from an image file."""
-        with PIL.Image.open(filepath) as img:
-            img.load()
-            png_width, png_height = img.size
-            img_info = img.info
-        return img_info, png_width, png_height
-
     def select_board_option(self, board_names, timestamp_string):
         """Allow the user to choose how a board is selected for imported files."""
         while True:
@@ -556,130 +564,121 @@ class MediaImportProcessor:
             if option_number >= 1 and option_number <= len(items):
                 return items[option_number - 1]
 
-    def import_image(self, filepath: str, board_name_option: str, db_mapper: DatabaseMapper, config: Config):
-        """Import a single file by its path"""
-        parser = InvokeAIMetadataParser()
-        file_name = os.path.basename(filepath)
-        file_destination_path = os.path.join(config.outputs_path, file_name)
-
-        print("===============================================================================")
-        print(f"Importing {filepath}")
-
-        # check destination to see if the file was previously imported
-        if os.path.exists(file_destination_path):
-            print("File already exists in the destination, skipping!")
-            ImportStats.count_skipped_file_exists += 1
-            return
-
-        # check if file name is already referenced in the database
-        if db_mapper.does_image_exist(file_name):
-            print("A reference to a file with this name already exists in the database, skipping!")
-            ImportStats.count_skipped_db_exists += 1
-            return
-
-        # load image info and dimensions
-        img_info, png_width, png_height = self.get_file_details(filepath)
-
-        # parse metadata
-        destination_needs_meta_update = True
-        log_version_note = "(Unknown)"
-        if "invokeai_metadata" in img_info:
-            # for the latest, we will just re-emit the same json, no need to parse/modify
-            converted_field = None
-            latest_json_string = img_info.get("invokeai_metadata")
-            log_version_note = "3.0.0+"
-            destination_needs_meta_update = False
-        else:
-            if "sd-metadata" in img_info:
-                converted_field = parser.parse_meta_tag_sd_metadata(json.loads(img_info.get("sd-metadata")))
-            elif "invokeai" in img_info:
-                converted_field = parser.parse_meta_tag_invokeai(json.loads(img_info.get("invokeai")))
-            elif "dream" in img_info:
-                converted_field = parser.parse_meta_tag_dream(img_info.get("dream"))
-            elif "Dream" in img_info:
-                converted_field = parser.parse_meta_tag_dream(img_info.get("Dream"))
+    def import_images(
+        self, import_file_list: list[str], board_name_option: str, db_mapper: DatabaseMapper, config: Config
+    ) -> None:
+        """Import a list of files by their paths.
+
+        The files are decoded, their metadata converted, and their copies and thumbnails written by a pool of
+        `workers` processes. This process only writes to the database, inserting the images in batches of
+        `DATABASE_BATCH_SIZE`.
+        """
+        # check the destination and the database once, rather than once per file
+        existing_files = set(os.listdir(config.outputs_path))
+        existing_db_names = db_mapper.get_all_image_names()
+        pending: list[str] = []
+        for filepath in import_file_list:
+            file_name = os.path.basename(filepath)
+            if file_name in existing_files:
+                print(f"{filepath}: a file with this name already exists in the destination, skipping!")
+                ImportStats.count_skipped_file_exists += 1
+            elif file_name in existing_db_names:
+                print(f"{filepath}: a reference to a file with this name already exists in the database, skipping!")
+                ImportStats.count_skipped_db_exists += 1
             else:
-                converted_field = InvokeAIMetadata()
-                destination_needs_meta_update = False
-                print("File does not have metadata from known Invoke AI versions, add only, no update!")
-
-            # use the loaded img dimensions if the metadata didnt have them
-            if converted_field.width is None:
-                converted_field.width = png_width
-            if converted_field.height is None:
-                converted_field.height = png_height
-
-            log_version_note = converted_field.imported_app_version if converted_field else "NoVersion"
-            log_version_note = log_version_note or "NoVersion"
-
-            latest_json_string = converted_field.to_json()
-
-        print(f"From Invoke AI Version {log_version_note} with dimensions {png_width} x {png_height}.")
-
-        # if metadata needs update, then update metdata and copy in one shot
-        if destination_needs_meta_update:
-            print("Updating metadata while copying...", end="")
-            self.update_file_metadata_while_copying(
-                filepath, file_destination_path, "invokeai_metadata", latest_json_string
-            )
-            print("Done!")
-        else:
-            print("No metadata update necessary, copying only...", end="")
-            shutil.copy2(filepath, file_destination_path)
-            print("Done!")
-
-        # create thumbnail
-        print("Creating thumbnail...", end="")
-        thumbnail_path = os.path.join(config.thumbnail_path, os.path.splitext(file_name)[0]) + ".webp"
-        thumbnail_size = 256, 256
-        with PIL.Image.open(filepath) as source_image:
-            source_image.thumbnail(thumbnail_size)
-            source_image.save(thumbnail_path, "webp")
-        print("Done!")
-
-        # finalize the dynamic board name if there is an APPVERSION token in it.
-        if converted_field is not None:
-            board_name = board_name_option.replace("APPVERSION", converted_field.imported_app_version or "NoVersion")
+                # a file with the same name found later in a recursive import is skipped as already existing
+                existing_files.add(file_name)
+                pending.append(filepath)
+
+        jobs = [(filepath, config.outputs_path, config.thumbnail_path) for filepath in pending]
+        batch: list[ImageRow] = []
+        executor: Optional[ProcessPoolExecutor]
+        results: Iterator[PreparedImage | str]
+        if self.workers > 1 and len(jobs) > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+            chunksize = max(1, min(16, len(jobs) // (self.workers * 4)))
+            results = executor.map(_prepare_image_or_error, jobs, chunksize=chunksize)
         else:
-            board_name = board_name_option.replace("APPVERSION", "Latest")
+            executor = None
+            results = map(_prepare_image_or_error, jobs)
 
-        # maintain a map of alrady created/looked up ids to avoid DB queries
-        print("Finding/Creating board...", end="")
-        if board_name in self.board_name_id_map:
-            board_id = self.board_name_id_map[board_name]
-        else:
-            board_id = db_mapper.get_board_id_with_create(board_name)
-            self.board_name_id_map[board_name] = board_id
-        print("Done!")
+        try:
+            for done, (filepath, prepared) in enumerate(zip(pending, results, strict=True), start=1):
+                if isinstance(prepared, str):
+                    print(f"Exception processing {filepath}, will continue to next file. ")
+                    print("Exception detail:")
+                    print(prepared)
+                    ImportStats.count_file_errors += 1
+                    continue
 
-        # add image to db
-        print("Adding image to database......", end="")
-        modified_time = datetime.datetime.utcfromtimestamp(os.path.getmtime(filepath))
-        db_mapper.add_new_image_to_database(file_name, png_width, png_height, latest_json_string, modified_time)
-        print("Done!")
+                for note in prepared.notes:
+                    print(f"{filepath}: {note}")
+                print(
+                    f"Imported {filepath} from Invoke AI Version {prepared.log_version_note} with dimensions {prepared.width} x {prepared.height}."
+                )
 
-        # add image to board
-        print("Adding image to board......", end="")
-        db_mapper.add_image_to_board(file_name, board_id)
-        print("Done!")
+                # finalize the dynamic board name if there is an APPVERSION token in it.
+                board_name = board_name_option.replace("APPVERSION", prepared.board_app_version)
+                # maintain a map of alrady created/looked up ids to avoid DB queries
+                if board_name not in self.board_name_id_map:
+                    self.board_name_id_map[board_name] = db_mapper.get_board_id_with_create(board_name)
+
+                batch.append(
+                    (
+                        prepared.file_name,
+                        prepared.width,
+                        prepared.height,
+                        prepared.metadata,
+                        prepared.modified_time,
+                        self.board_name_id_map[board_name],
+                    )
+                )
+                ImportStats.count_imported_by_version[prepared.log_version_note] = (
+                    ImportStats.count_imported_by_version.get(prepared.log_version_note, 0) + 1
+                )
+                if len(batch) >= self.DATABASE_BATCH_SIZE:
+                    self.write_batch(batch, db_mapper, config)
+                if done % self.DATABASE_BATCH_SIZE == 0:
+                    self.print_throughput(done, len(jobs))
+            self.write_batch(batch, db_mapper, config)
+        except BaseException:
+            # the images of the unwritten batch have no database records, remove their files so they can be imported again
+            for file_name, *_ in batch:
+                _remove_image_files(file_name, config.outputs_path, config.thumbnail_path)
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def write_batch(self, batch: list[ImageRow], db_mapper: DatabaseMapper, config: Config) -> None:
+        """Add a batch of prepared images to the database, and empty the batch.
+
+        If the batch cannot be added, the copies and thumbnails of its images are removed again. Otherwise a later
+        import would skip them because they already exist in the destination, leaving them without database records.
+        """
+        if not batch:
+            return
+        try:
+            db_mapper.add_new_images_to_database(batch)
+            ImportStats.count_imported += len(batch)
+        except sqlite3.Error as sql_ex:
+            assert db_mapper.connection is not None
+            db_mapper.connection.rollback()
+            for file_name, *_ in batch:
+                _remove_image_files(file_name, config.outputs_path, config.thumbnail_path)
+            print(
+                f"A database related exception was found adding {len(batch)} file(s), their copies were removed, will continue to next file. "
+            )
+            print("Exception detail:")
+            print(sql_ex)
+            ImportStats.count_file_errors += len(batch)
+        batch.clear()
 
-        ImportStats.count_imported += 1
-        if log_version_note in ImportStats.count_imported_by_version:
-            ImportStats.count_imported_by_version[log_version_note] += 1
-        else:
-            ImportStats.count_imported_by_version[log_version_note] = 1
-
-    def update_file_metadata_while_copying(self, filepath, file_destination_path, tag_name, tag_value):
-        """Perform a metadata update with save to a new destination which accomplishes a copy while updating metadata."""
-        with PIL.Image.open(filepath) as target_image:
-            existing_img_info = target_image.info
-            metadata = PIL.PngImagePlugin.PngInfo()
-            # re-add any existing invoke ai tags unless they are the one we are trying to add
-            for key in existing_img_info:
-                if key != tag_name and key in ("dream", "Dream", "sd-metadata", "invokeai", "invokeai_metadata"):
-                    metadata.add_text(key, existing_img_info[key])
-            metadata.add_text(tag_name, tag_value)
-            target_image.save(file_destination_path, pnginfo=metadata)
+    def print_throughput(self, done: int, total: int) -> None:
+        """Print the progress and rate of the import."""
+        elapsed = (datetime.datetime.utcnow() - ImportStats.time_start).total_seconds()
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"Progress: {done}/{total} file(s) processed, {rate:.1f} file(s)/second")
 
     def process(self):
         """Begin main processing."""
@@ -731,6 +730,9 @@ class MediaImportProcessor:
         print(
             "- The new 3.x InvokeAI outputs folder structure is flat so recursively found source imges will all be placed into the single outputs/images folder."
         )
+        print(
+            "- Files that need no metadata update are hard linked into the outputs folder when it is on the same filesystem, and copied otherwise."
+        )
 
         while True:
             should_continue = prompt("\nDo you wish to continue with the import [Yn] ? ").lower() or "y"
@@ -746,25 +748,15 @@ class MediaImportProcessor:
         print()
         ImportStats.time_start = datetime.datetime.utcnow()
 
-        for filepath in import_file_list:
-            try:
-                self.import_image(filepath, board_name_option, db_mapper, config)
-            except sqlite3.Error as sql_ex:
-                print(f"A database related exception was found processing {filepath}, will continue to next file. ")
-                print("Exception detail:")
-                print(sql_ex)
-                ImportStats.count_file_errors += 1
-            except Exception as ex:
-                print(f"Exception processing {filepath}, will continue to next file. ")
-                print("Exception detail:")
-                print(ex)
-                ImportStats.count_file_errors += 1
+        self.import_images(import_file_list, board_name_option, db_mapper, config)
 
+        elapsed = (datetime.datetime.utcnow() - ImportStats.time_start).total_seconds()
         print("\r\n===============================================================================")
         print(f"= Import Complete - Elpased Time: {ImportStats.get_elapsed_time_string()}")
         print()
         print(f"Source File(s)                          : {ImportStats.count_source_files}")
         print(f"Total Imported                          : {ImportStats.count_imported}")
+        print(f"Throughput (file(s)/second)             : {ImportStats.count_imported / max(elapsed, 1e-6):.1f}")
         print(f"Skipped b/c file already exists on disk : {ImportStats.count_skipped_file_exists}")
         print(f"Skipped b/c file already exists in db   : {ImportStats.count_skipped_db_exists}")
         print(f"Errors during import                    : {ImportStats.count_file_errors}")
@@ -774,9 +766,152 @@ class MediaImportProcessor:
                 print(f"  {key:20} : {version}")
 
 
+@dataclass
+class PreparedImage:
+    """DTO for an image that has been copied to the outputs folder and thumbnailed, but not yet added to the database."""
+
+    file_name: str
+    width: int
+    height: int
+    metadata: str
+    modified_time: str
+    log_version_note: str
+    board_app_version: str
+    notes: list[str] = field(default_factory=list)
+
+
+def prepare_image(filepath: str, outputs_path: str, thumbnail_path: str) -> PreparedImage:
+    """Copy an image to the outputs folder, converting its metadata, and create its thumbnail.
+
+    The image is decoded once, and then used for the metadata, the copy and the thumbnail. This runs in the import
+    worker processes, so it does not touch the database.
+    """
+    parser = InvokeAIMetadataParser()
+    file_name = os.path.basename(filepath)
+    file_destination_path = os.path.join(outputs_path, file_name)
+    notes: list[str] = []
+
+    with PIL.Image.open(filepath) as image:
+        image.load()
+        png_width, png_height = image.size
+        img_info = image.info
+
+        # parse metadata
+        destination_needs_meta_update = True
+        if "invokeai_metadata" in img_info:
+            # for the latest, we will just re-emit the same json, no need to parse/modify
+            converted_field = None
+            latest_json_string: str = img_info["invokeai_metadata"]
+            log_version_note = "3.0.0+"
+            destination_needs_meta_update = False
+        else:
+            if "sd-metadata" in img_info:
+                converted_field = parser.parse_meta_tag_sd_metadata(json.loads(img_info["sd-metadata"]))
+            elif "invokeai" in img_info:
+                converted_field = parser.parse_meta_tag_invokeai(json.loads(img_info["invokeai"]))
+            elif "dream" in img_info:
+                converted_field = parser.parse_meta_tag_dream(img_info.get("dream"))
+            elif "Dream" in img_info:
+                converted_field = parser.parse_meta_tag_dream(img_info.get("Dream"))
+            else:
+                converted_field = InvokeAIMetadata()
+                destination_needs_meta_update = False
+                notes.append("File does not have metadata from known Invoke AI versions, add only, no update!")
+
+            # use the loaded img dimensions if the metadata didnt have them
+            if converted_field.width is None:
+                converted_field.width = png_width
+            if converted_field.height is None:
+                converted_field.height = png_height
+
+            log_version_note = converted_field.imported_app_version or "NoVersion"
+            latest_json_string = converted_field.to_json()
+
+        # if metadata needs update, then update metdata and copy in one shot
+        if destination_needs_meta_update:
+            _save_with_metadata(image, file_destination_path, "invokeai_metadata", latest_json_string)
+        else:
+            _link_or_copy(filepath, file_destination_path)
+
+        # create thumbnail
+        thumbnail_file_path = _thumbnail_file_path(file_name, thumbnail_path)
+        thumbnail_size = 256, 256
+        image.thumbnail(thumbnail_size)
+        image.save(thumbnail_file_path, "webp")
+
+    if converted_field is not None:
+        board_app_version = converted_field.imported_app_version or "NoVersion"
+    else:
+        board_app_version = "Latest"
+
+    modified_time = datetime.datetime.utcfromtimestamp(os.path.getmtime(filepath))
+    return PreparedImage(
+        file_name=file_name,
+        width=png_width,
+        height=png_height,
+        metadata=latest_json_string,
+        modified_time=str(modified_time),
+        log_version_note=log_version_note,
+        board_app_version=board_app_version,
+        notes=notes,
+    )
+
+
+def _prepare_image_or_error(job: tuple[str, str, str]) -> PreparedImage | str:
+    """Process pool entry point. Returns the prepared image, or the error message."""
+    try:
+        return prepare_image(*job)
+    except Exception as ex:
+        # the destination was checked to be free, so anything written there before the error is a partial import
+        filepath, outputs_path, thumbnail_path = job
+        _remove_image_files(os.path.basename(filepath), outputs_path, thumbnail_path)
+        return str(ex)
+
+
+def _thumbnail_file_path(file_name: str, thumbnail_path: str) -> str:
+    """Get the path of the thumbnail of an image in the outputs folder."""
+    return os.path.join(thumbnail_path, os.path.splitext(file_name)[0]) + ".webp"
+
+
+def _remove_image_files(file_name: str, outputs_path: str, thumbnail_path: str) -> None:
+    """Remove the copy and the thumbnail of an image that could not be added to the database."""
+    for path in (os.path.join(outputs_path, file_name), _thumbnail_file_path(file_name, thumbnail_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_with_metadata(image: PIL.Image.Image, file_destination_path: str, tag_name: str, tag_value: str) -> None:
+    """Save an image to a new destination with updated metadata, which accomplishes a copy while updating metadata."""
+    metadata = PIL.PngImagePlugin.PngInfo()
+    # re-add any existing invoke ai tags unless they are the one we are trying to add
+    for key in image.info:
+        if key != tag_name and key in ("dream", "Dream", "sd-metadata", "invokeai", "invokeai_metadata"):
+            metadata.add_text(key, image.info[key])
+    metadata.add_text(tag_name, tag_value)
+    image.save(file_destination_path, pnginfo=metadata)
+
+
+def _link_or_copy(filepath: str, file_destination_path: str) -> None:
+    """Hard link a file to the destination if it is on the same filesystem, and copy it otherwise."""
+    try:
+        os.link(filepath, file_destination_path)
+    except OSError:
+        shutil.copy2(filepath, file_destination_path)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Import images generated by earlier versions of InvokeAI")
+    parser.add_argument(
+        "--workers",
+        default=os.cpu_count() or 1,
+        type=int,
+        help="Number of processes used to decode, convert and thumbnail images. Defaults to the number of CPUs.",
+    )
+    args = parser.parse_args()
     try:
-        processor = MediaImportProcessor()
+        processor = MediaImportProcessor(workers=args.workers)
         processor.process()
     except KeyboardInterrupt:
         print("\r\n\r\nUser cancelled execution.")
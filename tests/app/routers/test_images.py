@@ -74,6 +74,16 @@ def test_download_images_with_empty_image_list_and_no_board_id(
     assert response.status_code == 400
 
 
+def test_stream_images_download_with_empty_image_list_and_empty_board_id(
+    monkeypatch: Any, mock_invoker: Invoker, client: TestClient
+) -> None:
+    prepare_download_images_test(monkeypatch, mock_invoker)
+
+    response = client.post("/api/v1/images/download/stream", json={"image_names": [], "board_id": ""})
+
+    assert response.status_code == 400
+
+
 def test_get_bulk_download_image(tmp_path: Path, monkeypatch: Any, mock_invoker: Invoker, client: TestClient) -> None:
     mock_file: Path = tmp_path / "test.zip"
     mock_file.write_text("contents")
@@ -1,13 +1,17 @@
+import io
 import os
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Any
-from zipfile import ZipFile
+from zipfile import ZIP_STORED, ZipFile
 
 import pytest
 
 from invokeai.app.services.board_records.board_records_common import BoardRecord, BoardRecordNotFoundException
-from invokeai.app.services.bulk_download.bulk_download_common import BulkDownloadTargetException
+from invokeai.app.services.bulk_download.bulk_download_common import (
+    BulkDownloadParametersException,
+    BulkDownloadTargetException,
+)
 from invokeai.app.services.bulk_download.bulk_download_default import BulkDownloadService
 from invokeai.app.services.events.events_common import (
     BulkDownloadCompleteEvent,
@@ -19,9 +23,12 @@ from invokeai.app.services.image_records.image_records_common import (
     ImageRecordNotFoundException,
     ResourceOrigin,
 )
+from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
 from invokeai.app.services.images.images_common import ImageDTO
 from invokeai.app.services.invoker import Invoker
 from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.backend.util.logging import InvokeAILogger
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
 from tests.test_nodes import TestEventService
 
 
@@ -386,3 +393,63 @@ def test_stop(tmp_path: Path):
     bulk_download_service.stop()
 
     assert not (tmp_path / "bulk_downloads").exists()
+
+
+@pytest.fixture
+def image_records(mock_invoker: Invoker, monkeypatch: Any) -> SqliteImageRecordStorage:
+    """Use a real image record store."""
+    db = create_mock_sqlite_database(mock_invoker.services.configuration, InvokeAILogger.get_logger())
+    image_records = SqliteImageRecordStorage(db=db)
+    monkeypatch.setattr(mock_invoker.services, "image_records", image_records)
+    return image_records
+
+
+def test_stream_image_names(tmp_path: Path, monkeypatch: Any, mock_invoker: Invoker, image_records: Any):
+    """Test that stream produces a zip file of the images, in order, with stored entries."""
+    image_names = [f"image_{i}.png" for i in range(20)]
+    for i, image_name in enumerate(image_names):
+        category = ImageCategory.GENERAL if i % 2 == 0 else ImageCategory.MASK
+        image_records.save(image_name, ResourceOrigin.INTERNAL, category, 10, 10, has_workflow=False)
+        (tmp_path / image_name).write_bytes(os.urandom(1000 + i))
+    monkeypatch.setattr(mock_invoker.services.images, "get_path", lambda image_name: str(tmp_path / image_name))
+
+    bulk_download_service = BulkDownloadService()
+    bulk_download_service.start(mock_invoker)
+    chunks = list(bulk_download_service.stream(list(reversed(image_names)), None))
+
+    # One chunk per image, and one for the central directory
+    assert len(chunks) == len(image_names) + 1
+    with ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+        infos = zip_file.infolist()
+        assert [info.filename for info in infos] == [
+            f"{'general' if i % 2 == 0 else 'mask'}/{image_name}"
+            for i, image_name in reversed(list(enumerate(image_names)))
+        ]
+        assert all(info.compress_type == ZIP_STORED for info in infos)
+        for info in infos:
+            assert zip_file.read(info) == (tmp_path / Path(info.filename).name).read_bytes()
+
+
+def test_stream_board_id(tmp_path: Path, monkeypatch: Any, mock_invoker: Invoker, image_records: Any):
+    """Test that stream produces a zip file of the images on a board."""
+    image_records.save("image.png", ResourceOrigin.INTERNAL, ImageCategory.GENERAL, 10, 10, has_workflow=False)
+    (tmp_path / "image.png").write_bytes(b"Totally an image")
+    monkeypatch.setattr(mock_invoker.services.images, "get_path", lambda image_name: str(tmp_path / image_name))
+    monkeypatch.setattr(
+        mock_invoker.services.board_image_records, "get_all_board_image_names_for_board", lambda board_id: ["image.png"]
+    )
+
+    bulk_download_service = BulkDownloadService()
+    bulk_download_service.start(mock_invoker)
+    with ZipFile(io.BytesIO(b"".join(bulk_download_service.stream(None, "12345")))) as zip_file:
+        assert zip_file.read("general/image.png") == b"Totally an image"
+
+
+def test_stream_missing_image(mock_invoker: Invoker, image_records: Any):
+    """Test that stream raises before streaming when an image record is missing."""
+    bulk_download_service = BulkDownloadService()
+    bulk_download_service.start(mock_invoker)
+    with pytest.raises(ImageRecordNotFoundException):
+        bulk_download_service.stream(["missing.png"], None)
+    with pytest.raises(BulkDownloadParametersException):
+        bulk_download_service.stream([], None)
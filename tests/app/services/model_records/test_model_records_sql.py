@@ -299,3 +299,52 @@ def test_model_record_changes():
 
     changes = ModelRecordChanges.model_validate({"default_settings": {"vae": "value"}})
     assert isinstance(changes.default_settings, MainModelDefaultSettings)
+
+
+def _count_queries(store: ModelRecordServiceSQL) -> list[str]:
+    queries: list[str] = []
+    store.db.conn.set_trace_callback(queries.append)
+    return queries
+
+
+def test_get_model_is_cached(store: ModelRecordServiceSQL):
+    store.add_model(example_ti_config("key1"))
+    config1 = store.get_model("key1")
+    queries = _count_queries(store)
+
+    config2 = store.get_model("key1")
+    config3 = store.get_model_by_hash("ABC123")
+    config4 = store.get_model_by_hash("ABC123")
+
+    # Only the first lookup by hash queries the database.
+    assert len(queries) == 1
+    assert config1 == config2 == config3 == config4
+    # Callers get their own copies, so changing one does not change the cached config.
+    config2.name = "changed"
+    assert store.get_model("key1").name == "old name"
+
+
+def test_model_config_cache_is_invalidated_on_write(store: ModelRecordServiceSQL):
+    store.add_model(example_ti_config("key1"))
+    assert store.get_model("key1").name == "old name"
+    assert store.get_model_by_hash("ABC123").name == "old name"
+
+    store.update_model("key1", ModelRecordChanges(name="new name"))
+    assert store.get_model("key1").name == "new name"
+    assert store.get_model_by_hash("ABC123").name == "new name"
+
+    store.del_model("key1")
+    with pytest.raises(UnknownModelException):
+        store.get_model("key1")
+    with pytest.raises(UnknownModelException):
+        store.get_model_by_hash("ABC123")
+
+
+def test_model_config_cache_is_not_changed_by_failed_update(store: ModelRecordServiceSQL):
+    store.add_model(example_ti_config("key1"))
+    store.get_model("key1")
+
+    with pytest.raises(ValidationError):
+        store.update_model("key1", ModelRecordChanges(name="new name", upcast_attention=True))
+
+    assert store.get_model("key1").name == "old name"
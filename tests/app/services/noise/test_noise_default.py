@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from invokeai.app.invocations.noise import get_noise_spec
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.noise.noise_common import InvalidNoiseNameError, NoiseSpec
+from invokeai.app.services.noise.noise_default import NoiseService
+from invokeai.app.services.shared.invocation_context import build_invocation_context
+from invokeai.backend.util.philox import philox_randn
+
+
+@pytest.mark.parametrize("use_cpu", [True, False])
+def test_load_generates_noise_from_spec(use_cpu: bool):
+    service = NoiseService()
+    device = torch.device("cpu")
+    spec = get_noise_spec(width=512, height=768, device=device, seed=42, use_cpu=use_cpu)
+
+    name = service.save(spec)
+
+    assert service.is_noise(name)
+    assert NoiseSpec.from_name(name) == spec
+    noise = service.load(name)
+    assert noise.shape == (1, 4, 96, 64)
+    if use_cpu:
+        expected = torch.randn(spec.shape, dtype=spec.dtype, generator=torch.Generator(device="cpu").manual_seed(42))
+    else:
+        expected = philox_randn(spec.shape, seed=42, device=device, dtype=spec.dtype)
+    assert torch.equal(noise, expected)
+
+
+def test_noise_names():
+    spec = NoiseSpec(seed=7, channels=4, height=8, width=16, generator="philox", dtype=torch.float16)
+
+    assert spec.name == "noise_7_4x8x16_philox_float16"
+    assert NoiseSpec.from_name(spec.name) == spec
+    service = NoiseService()
+    assert not service.is_noise("4d7f2b8e-0c1a-4f3e-9b5d-2a6c8e0f1b3d")
+    assert not service.is_noise("noise_7_4x8x16_mt_float16")
+    with pytest.raises(InvalidNoiseNameError):
+        service.load("noise_7_4x8x16_philox_float99")
+
+
+def test_recent_noise_is_kept():
+    service = NoiseService(max_entries=2)
+    names = [
+        service.save(NoiseSpec(seed=seed, channels=4, height=8, width=8, generator="cpu", dtype=torch.float32))
+        for seed in range(3)
+    ]
+
+    first = service.load(names[0])
+    assert service.load(names[0]) is first
+    service.load(names[1])
+    service.load(names[2])
+    # The first noise was evicted, and is generated again identically.
+    again = service.load(names[0])
+    assert again is not first
+    assert torch.equal(again, first)
+
+    service.clear()
+    assert service.load(names[0]) is not again
+
+
+def test_invocation_context_loads_copies_of_noise(mock_services: InvocationServices):
+    mock_services.noise = NoiseService()
+    context = build_invocation_context(services=mock_services, data=None, is_canceled=None)  # type: ignore
+    name = context.tensors.save_noise(
+        NoiseSpec(seed=7, channels=4, height=8, width=8, generator="cpu", dtype=torch.float32)
+    )
+
+    noise = context.tensors.load(name)
+    expected = noise.clone()
+    noise.mul_(0)
+
+    # Modifying the loaded noise in place doesn't change the noise given to later loads.
+    assert torch.equal(context.tensors.load(name), expected)
+    assert torch.equal(context.tensors.load_noise(name), expected)
@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from threading import Event
+from typing import Iterator, Sequence
+
+from invokeai.app.invocations.baseinvocation import (
+    BaseInvocation,
+    BaseInvocationOutput,
+    invocation,
+    invocation_output,
+)
+from invokeai.app.invocations.fields import InputField, OutputField
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.session_processor.session_processor_common import CanceledException
+from invokeai.app.services.session_processor.session_processor_default import DefaultSessionRunner
+from invokeai.app.services.session_queue.session_queue_common import Batch, BatchDatum, SessionQueueItem
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Edge, EdgeConnection, Graph
+from invokeai.app.services.shared.invocation_context import InvocationContext
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+from tests.test_nodes import PromptTestInvocation
+
+fused_seeds: list[list[int]] = []
+cancel_event = Event()
+
+
+@invocation_output("test_seeded_output")
+class SeededTestInvocationOutput(BaseInvocationOutput):
+    value: str = OutputField()
+
+
+@invocation("test_seeded", version="1.0.0")
+class SeededTestInvocation(BaseInvocation):
+    seed: int = InputField(default=0)
+    prompt: str = InputField(default="")
+
+    def invoke(self, context: InvocationContext) -> SeededTestInvocationOutput:
+        return SeededTestInvocationOutput(value=f"{self.prompt} {self.seed}")
+
+    @classmethod
+    def can_fuse(cls, invocations: Sequence["SeededTestInvocation"], contexts: Sequence[InvocationContext]) -> bool:
+        return all(i.prompt == invocations[0].prompt for i in invocations)
+
+    @classmethod
+    def invoke_fused(
+        cls, invocations: Sequence["SeededTestInvocation"], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        fused_seeds.append([i.seed for i in invocations])
+        return [SeededTestInvocationOutput(value=f"{i.prompt} {i.seed}") for i in invocations]
+
+
+@invocation("test_canceling", version="1.0.0")
+class CancelingTestInvocation(BaseInvocation):
+    """Cancels the first session of its fused group while it runs, as the processor does when it is canceled."""
+
+    seed: int = InputField(default=0)
+
+    def invoke(self, context: InvocationContext) -> SeededTestInvocationOutput:
+        return SeededTestInvocationOutput(value=str(self.seed))
+
+    @classmethod
+    def can_fuse(cls, invocations: Sequence["CancelingTestInvocation"], contexts: Sequence[InvocationContext]) -> bool:
+        return True
+
+    @classmethod
+    def invoke_fused(
+        cls, invocations: Sequence["CancelingTestInvocation"], contexts: Sequence[InvocationContext]
+    ) -> list[BaseInvocationOutput]:
+        services = contexts[0]._services
+        services.session_queue.cancel_queue_item(contexts[0]._data.queue_item.item_id)
+        cancel_event.set()
+        raise CanceledException()
+
+
+class NoStatsService:
+    @contextmanager
+    def collect_stats(self, invocation: BaseInvocation, graph_execution_state_id: str) -> Iterator[None]:
+        yield None
+
+    def log_stats(self, graph_execution_state_id: str) -> None:
+        pass
+
+    def reset_stats(self, graph_execution_state_id: str) -> None:
+        pass
+
+
+def _dequeue_seed_variants(invoker: Invoker, first_node: BaseInvocation) -> list[SessionQueueItem]:
+    """Enqueues a graph of first_node and a prompt node with seeds 1, 2 and 3, and dequeues its sessions together."""
+    services = invoker.services
+    session_queue = SqliteSessionQueue(db=create_mock_sqlite_database(services.configuration, services.logger))
+    services.session_queue = session_queue
+    services.performance_statistics = NoStatsService()  # type: ignore
+    session_queue.start(invoker)
+
+    g = Graph()
+    g.add_node(first_node)
+    g.add_node(PromptTestInvocation(id="2"))
+    g.add_edge(
+        Edge(source=EdgeConnection(node_id="1", field="value"), destination=EdgeConnection(node_id="2", field="prompt"))
+    )
+    batch = Batch(graph=g, data=[[BatchDatum(node_path="1", field_name="seed", items=[1, 2, 3])]])
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    return [queue_item, *session_queue.dequeue_seed_variants(queue_item, max_items=2)]
+
+
+def test_run_fused(mock_invoker: Invoker):
+    queue_items = _dequeue_seed_variants(mock_invoker, SeededTestInvocation(id="1", prompt="Banana sushi"))
+    session_queue = mock_invoker.services.session_queue
+
+    runner = DefaultSessionRunner()
+    runner.start(services=mock_invoker.services, cancel_event=Event())
+    runner.run_fused(queue_items)
+
+    # The seeded node ran once for all sessions, and every session got its own outputs.
+    assert fused_seeds == [[1, 2, 3]]
+    for queue_item, seed in zip(queue_items, [1, 2, 3], strict=True):
+        completed = session_queue.get_queue_item(queue_item.item_id)
+        assert completed.status == "completed"
+        prompt_outputs = [o for o in completed.session.results.values() if o.type == "test_prompt_output"]
+        assert [o.prompt for o in prompt_outputs] == [f"Banana sushi {seed}"]
+
+
+def test_run_fused_cancels_unfinished_sessions(mock_invoker: Invoker):
+    queue_items = _dequeue_seed_variants(mock_invoker, CancelingTestInvocation(id="1"))
+    session_queue = mock_invoker.services.session_queue
+    cancel_event.clear()
+
+    runner = DefaultSessionRunner()
+    runner.start(services=mock_invoker.services, cancel_event=cancel_event)
+    runner.run_fused(queue_items)
+
+    # Only the first item was canceled, but the others were interrupted with it and did not produce any outputs.
+    for queue_item in queue_items:
+        canceled = session_queue.get_queue_item(queue_item.item_id)
+        assert canceled.status == "canceled"
+        assert not canceled.session.is_complete()
+        assert canceled.session.results == {}
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+import pytest
+import torch
+
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.shared.invocation_context import build_invocation_context
+from invokeai.app.services.tensor_cache.tensor_cache_common import calc_tensor_size
+from invokeai.app.services.tensor_cache.tensor_cache_memory import GIG, MemoryTensorCache
+
+
+@dataclass
+class Embeds:
+    embeds: torch.Tensor
+    pooled: torch.Tensor
+
+
+@pytest.fixture
+def cache() -> MemoryTensorCache:
+    # room for exactly two 1 KiB tensors
+    return MemoryTensorCache(max_cache_size=2048 / GIG)
+
+
+def kib_tensor(value: float = 0.0) -> torch.Tensor:
+    return torch.full((256,), value, dtype=torch.float32)
+
+
+def test_calc_tensor_size():
+    t = kib_tensor()
+    assert calc_tensor_size(t) == 1024
+    assert calc_tensor_size((t, None)) == 1024
+    assert calc_tensor_size({"a": t, "b": [t, t]}) == 3072
+    assert calc_tensor_size(Embeds(embeds=t, pooled=t)) == 2048
+    assert calc_tensor_size("not a tensor") == 0
+
+
+def test_get_and_put(cache: MemoryTensorCache):
+    assert cache.get("a") is None
+    t = kib_tensor(1.0)
+    cache.put("a", t)
+    assert cache.get("a") is t
+    status = cache.get_status()
+    assert status.hits == 1
+    assert status.misses == 1
+    assert status.size == 1
+    assert status.bytes == 1024
+
+
+def test_evicts_least_recently_used(cache: MemoryTensorCache):
+    cache.put("a", kib_tensor())
+    cache.put("b", kib_tensor())
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.put("c", kib_tensor())
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.get_status().bytes == 2048
+
+
+def test_oversized_values_are_not_cached(cache: MemoryTensorCache):
+    cache.put("a", kib_tensor())
+    cache.put("big", torch.zeros((1024,), dtype=torch.float32))
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+
+
+def test_delete_and_clear(cache: MemoryTensorCache):
+    cache.put("a", kib_tensor())
+    cache.put("b", kib_tensor())
+    cache.delete("a")
+    assert cache.get("a") is None
+    assert cache.get_status().bytes == 1024
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.get_status().size == 0
+
+
+def test_disabled_cache():
+    cache = MemoryTensorCache(max_cache_size=0)
+    cache.put("a", kib_tensor())
+    assert cache.get("a") is None
+    assert not cache.get_status().enabled
+
+
+def test_invocation_context_uses_the_tensor_cache(mock_services: InvocationServices, cache: MemoryTensorCache):
+    mock_services.tensor_cache = cache
+    context = build_invocation_context(services=mock_services, data=None, is_canceled=None)  # type: ignore
+    t = kib_tensor(1.0)
+    assert context.tensors.cache_get("a") is None
+    context.tensors.cache_put("a", t)
+    assert context.tensors.cache_get("a") is t
+    assert cache.get("a") is t
@@ -0,0 +1,135 @@
+from pathlib import Path
+
+import numpy as np
+import onnx
+import pytest
+import torch
+from onnx import TensorProto, helper, numpy_helper
+
+from invokeai.backend.image_util.dw_openpose.onnxpose import inference_pose
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GIG, ModelCache
+from invokeai.backend.model_manager.load.model_cache.onnx_session_cache import OnnxSessionCache
+
+NUM_KEYPOINTS = 5
+INPUT_H, INPUT_W = 8, 6
+
+
+def make_pose_model(path: Path, batch_size: int | str) -> Path:
+    """Write a tiny RTMPose-like model: (N, 3, H, W) crops to (N, K, 2W) and (N, K, 2H) SimCC outputs."""
+    rng = np.random.default_rng(0)
+    w_x = rng.standard_normal((3 * INPUT_H * INPUT_W, NUM_KEYPOINTS * INPUT_W * 2)).astype(np.float32)
+    w_y = rng.standard_normal((3 * INPUT_H * INPUT_W, NUM_KEYPOINTS * INPUT_H * 2)).astype(np.float32)
+    graph = helper.make_graph(
+        nodes=[
+            helper.make_node("Flatten", ["input"], ["flat"], axis=1),
+            helper.make_node("MatMul", ["flat", "w_x"], ["x"]),
+            helper.make_node("MatMul", ["flat", "w_y"], ["y"]),
+            helper.make_node("Reshape", ["x", "shape_x"], ["simcc_x"]),
+            helper.make_node("Reshape", ["y", "shape_y"], ["simcc_y"]),
+        ],
+        name="pose",
+        inputs=[helper.make_tensor_value_info("input", TensorProto.FLOAT, [batch_size, 3, INPUT_H, INPUT_W])],
+        outputs=[
+            helper.make_tensor_value_info("simcc_x", TensorProto.FLOAT, [batch_size, NUM_KEYPOINTS, INPUT_W * 2]),
+            helper.make_tensor_value_info("simcc_y", TensorProto.FLOAT, [batch_size, NUM_KEYPOINTS, INPUT_H * 2]),
+        ],
+        initializer=[
+            numpy_helper.from_array(w_x, "w_x"),
+            numpy_helper.from_array(w_y, "w_y"),
+            numpy_helper.from_array(np.array([0, NUM_KEYPOINTS, INPUT_W * 2], dtype=np.int64), "shape_x"),
+            numpy_helper.from_array(np.array([0, NUM_KEYPOINTS, INPUT_H * 2], dtype=np.int64), "shape_y"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+@pytest.fixture
+def image() -> np.ndarray:
+    return np.random.default_rng(1).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+
+
+def test_onnx_session_cache_reuses_sessions(tmp_path: Path):
+    model_a = make_pose_model(tmp_path / "a.onnx", "batch")
+    model_b = make_pose_model(tmp_path / "b.onnx", "batch")
+    cache = OnnxSessionCache()
+    cpu = torch.device("cpu")
+
+    session = cache.get(model_a, cpu)
+    assert cache.get(model_a, cpu) is session
+    assert cache.get(model_b, cpu) is not session
+    assert session.get_providers() == ["CPUExecutionProvider"]
+    assert len(cache) == 2
+
+    cache.clear(cpu)
+    assert len(cache) == 0
+    assert cache.get(model_a, cpu) is not session
+
+
+def test_onnx_session_cache_evicts_least_recently_used(tmp_path: Path):
+    models = [make_pose_model(tmp_path / f"{name}.onnx", "batch") for name in "abc"]
+    model_size = models[0].stat().st_size
+    cache = OnnxSessionCache(max_sessions=2)
+    cpu = torch.device("cpu")
+
+    session_a = cache.get(models[0], cpu)
+    cache.get(models[1], cpu)
+    assert cache.get(models[0], cpu) is session_a
+    cache.get(models[2], cpu)  # drops b
+    assert len(cache) == 2
+    assert cache.size("cpu") == 2 * model_size
+    assert cache.size("cuda") == 0
+    assert cache.get(models[0], cpu) is session_a
+
+    # a was used last, so c goes first
+    assert cache.evict(1, device=cpu) == model_size
+    assert cache.get(models[0], cpu) is session_a
+    assert cache.evict(10 * model_size) == model_size
+    assert len(cache) == 0
+
+
+def test_model_cache_counts_onnx_sessions(tmp_path: Path):
+    model = make_pose_model(tmp_path / "pose.onnx", "batch")
+    cache = ModelCache(max_cache_size=model.stat().st_size / GIG)
+    cache.onnx_sessions.get(model, torch.device("cpu"))
+
+    cache.make_room(1)
+    assert len(cache.onnx_sessions) == 0
+
+    # Sessions for other non-CUDA devices run on the CPU execution provider, and hold RAM as well.
+    cache.onnx_sessions.get(model, torch.device("mps"))
+    assert cache.onnx_sessions.size("cpu") == model.stat().st_size
+    cache.make_room(1)
+    assert len(cache.onnx_sessions) == 0
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+def test_inference_pose_batched_matches_fixed_batch(tmp_path: Path, image: np.ndarray, batch_size: int):
+    cache = OnnxSessionCache()
+    cpu = torch.device("cpu")
+    dynamic_session = cache.get(make_pose_model(tmp_path / "dynamic.onnx", "batch"), cpu)
+    fixed_session = cache.get(make_pose_model(tmp_path / "fixed.onnx", batch_size), cpu)
+    bboxes = np.array([[0, 0, 20, 30], [10, 5, 40, 60], [5, 20, 30, 50]], dtype=np.float64)
+
+    keypoints, scores = inference_pose(dynamic_session, bboxes, image)
+    fixed_keypoints, fixed_scores = inference_pose(fixed_session, bboxes, image)
+    single_keypoints, single_scores = inference_pose(dynamic_session, bboxes[1:2], image)
+
+    assert keypoints.shape == (3, NUM_KEYPOINTS, 2)
+    assert scores.shape == (3, NUM_KEYPOINTS)
+    np.testing.assert_allclose(keypoints, fixed_keypoints)
+    np.testing.assert_allclose(scores, fixed_scores, rtol=1e-5)
+    np.testing.assert_allclose(keypoints[1:2], single_keypoints)
+    np.testing.assert_allclose(scores[1:2], single_scores, rtol=1e-5)
+
+
+def test_inference_pose_without_detections_uses_whole_image(tmp_path: Path, image: np.ndarray):
+    session = OnnxSessionCache().get(make_pose_model(tmp_path / "pose.onnx", "batch"), torch.device("cpu"))
+
+    keypoints, scores = inference_pose(session, np.array([]), image)
+    whole_keypoints, whole_scores = inference_pose(session, [[0, 0, 48, 64]], image)
+
+    np.testing.assert_array_equal(keypoints, whole_keypoints)
+    np.testing.assert_array_equal(scores, whole_scores)
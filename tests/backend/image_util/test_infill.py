@@ -0,0 +1,191 @@
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from invokeai.backend.image_util.infill_methods.mosaic import infill_mosaic
+from invokeai.backend.image_util.infill_methods.tile import create_filled_image, create_tile_pool, infill_tile
+
+
+def _image_with_hole(width: int, height: int) -> Image.Image:
+    """A random RGBA image, with a transparent hole in the middle."""
+    rng = np.random.default_rng(0)
+    np_image = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    np_image[:, :, 3] = 255
+    np_image[height // 4 : 3 * height // 4, width // 4 : 3 * width // 4, 3] = 0
+    return Image.fromarray(np_image, "RGBA")
+
+
+def _reference_filled_image(
+    img_array: np.ndarray, tile_pool: list[np.ndarray], tile_size: tuple[int, int], seed: int
+) -> np.ndarray:
+    """Fill an image with random tiles from the pool, one tile at a time."""
+    rows, cols, _ = img_array.shape
+    tile_width, tile_height = tile_size
+    filled_img_array = np.zeros((rows, cols, 3), dtype=img_array.dtype)
+    rng = np.random.default_rng(seed)
+    for y in range(0, rows, tile_height):
+        for x in range(0, cols, tile_width):
+            tile = tile_pool[rng.integers(len(tile_pool))]
+            space_y = min(tile_height, rows - y)
+            space_x = min(tile_width, cols - x)
+            filled_img_array[y : y + space_y, x : x + space_x, :3] = tile[:space_y, :space_x, :3]
+    return filled_img_array
+
+
+def _reference_mosaic(np_image: np.ndarray, tile_shape: tuple[int, int]) -> np.ndarray:
+    """Fill an image with a mosaic of random colors from the image, painting a whole tile for every pixel."""
+    non_transparent_pixels = np_image[np_image[:, :, 3] != 0, :3]
+    tiles = [
+        np.full(
+            (tile_shape[1], tile_shape[0], 3), non_transparent_pixels[np.random.randint(len(non_transparent_pixels))]
+        )
+        for _ in range(256)
+    ]
+    filled_image = np.zeros((np_image.shape[0], np_image.shape[1], 3), dtype=np.uint8)
+    tile_width, tile_height = tile_shape
+    for x in range(np_image.shape[1]):
+        for y in range(np_image.shape[0]):
+            tile = tiles[np.random.randint(len(tiles))]
+            try:
+                filled_image[
+                    y - (y % tile_height) : y - (y % tile_height) + tile_height,
+                    x - (x % tile_width) : x - (x % tile_width) + tile_width,
+                ] = tile
+            except ValueError:
+                pass
+    return filled_image
+
+
+def _reference_tile_pool(img_array: np.ndarray, tile_size: tuple[int, int]) -> list[np.ndarray]:
+    """Collect the opaque tiles of an image, one tile at a time."""
+    rows, cols = img_array.shape[:2]
+    tile_width, tile_height = tile_size
+    tiles: list[np.ndarray] = []
+    for y in range(0, rows - tile_height + 1, tile_height):
+        for x in range(0, cols - tile_width + 1, tile_width):
+            tile = img_array[y : y + tile_height, x : x + tile_width]
+            if np.all(tile[:, :, 3] == 255):
+                tiles.append(tile)
+    return tiles
+
+
+@pytest.mark.parametrize("tile_size", [(32, 32), (24, 40), (7, 5)])
+def test_infill_tile_matches_reference(tile_size: tuple[int, int]):
+    """Test that the tile pool and the filled image match filling the image one tile at a time, for the same seed."""
+    np_image = np.array(_image_with_hole(160, 150))
+
+    tile_pool = create_tile_pool(np_image, tile_size)
+    reference_pool = _reference_tile_pool(np_image, tile_size)
+    assert len(tile_pool) == len(reference_pool)
+    for tile, reference_tile in zip(tile_pool, reference_pool, strict=True):
+        np.testing.assert_array_equal(tile, reference_tile)
+
+    np.testing.assert_array_equal(
+        create_filled_image(np_image, tile_pool, tile_size, seed=123),
+        _reference_filled_image(np_image, reference_pool, tile_size, seed=123),
+    )
+
+
+def test_infill_tile_is_reproducible():
+    image = _image_with_hole(100, 90)
+
+    a = infill_tile(image, seed=1, tile_size=16)
+    b = infill_tile(image, seed=1, tile_size=16)
+    c = infill_tile(image, seed=2, tile_size=16)
+
+    assert a.tile_image is not None and b.tile_image is not None and c.tile_image is not None
+    assert np.array_equal(np.array(a.infilled), np.array(b.infilled))
+    assert not np.array_equal(np.array(a.tile_image), np.array(c.tile_image))
+    # The opaque pixels are kept.
+    np.testing.assert_array_equal(np.array(a.infilled)[:10, :10], np.array(image)[:10, :10, :3])
+
+
+def test_infill_tile_not_enough_opaque_pixels():
+    with pytest.raises(ValueError):
+        create_tile_pool(np.array(_image_with_hole(100, 90)), (64, 64))
+
+
+def test_infill_mosaic():
+    image = _image_with_hole(100, 90)
+    tile_shape = (16, 12)
+
+    infilled = np.array(infill_mosaic(image, tile_shape, seed=1))
+
+    # The opaque pixels are kept.
+    np_image = np.array(image)
+    opaque = np_image[:, :, 3] == 255
+    np.testing.assert_array_equal(infilled[opaque, :3], np_image[opaque, :3])
+    # Every tile, including the partial tiles at the edges, is filled with a single color from the image.
+    opaque_colors = {tuple(c) for c in np_image[opaque, :3]}
+    for y in range(0, 90, tile_shape[1]):
+        for x in range(0, 100, tile_shape[0]):
+            tile = infilled[y : y + tile_shape[1], x : x + tile_shape[0], :3]
+            transparent = ~opaque[y : y + tile_shape[1], x : x + tile_shape[0]]
+            if transparent.any():
+                colors = np.unique(tile[transparent], axis=0)
+                assert len(colors) == 1
+                assert tuple(colors[0]) in opaque_colors
+
+
+def test_infill_mosaic_is_reproducible():
+    image = _image_with_hole(100, 90)
+
+    a = np.array(infill_mosaic(image, seed=1))
+    b = np.array(infill_mosaic(image, seed=1))
+    c = np.array(infill_mosaic(image, seed=2))
+
+    np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(a, c)
+
+
+def test_infill_mosaic_color_range():
+    infilled = np.array(infill_mosaic(_image_with_hole(100, 90), (8, 8), (50, 60, 70, 0), (100, 110, 120, 0), seed=1))
+
+    hole = infilled[30:60, 30:70]
+    assert hole[:, :, 0].min() >= 50 and hole[:, :, 0].max() <= 100
+    assert hole[:, :, 1].min() >= 60 and hole[:, :, 1].max() <= 110
+    assert hole[:, :, 2].min() >= 70 and hole[:, :, 2].max() <= 120
+
+
+@pytest.mark.slow
+def test_infill_benchmark():
+    """Benchmark the tile and mosaic infills against filling one tile at a time.
+
+    Run with `pytest -m slow -s tests/backend/image_util/test_infill.py`.
+    """
+    image = _image_with_hole(4096, 4096)
+    np_image = np.array(image)
+    tile_size = (32, 32)
+
+    start = time.perf_counter()
+    reference = _reference_filled_image(np_image, _reference_tile_pool(np_image, tile_size), tile_size, seed=0)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filled = create_filled_image(np_image, create_tile_pool(np_image, tile_size), tile_size, seed=0)
+    tile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    infill_mosaic(image, tile_size, seed=0)
+    mosaic_time = time.perf_counter() - start
+
+    # Painting a whole tile per pixel is too slow to run at full size.
+    small_image = _image_with_hole(512, 512)
+    start = time.perf_counter()
+    _reference_mosaic(np.array(small_image), tile_size)
+    reference_mosaic_time = time.perf_counter() - start
+    start = time.perf_counter()
+    infill_mosaic(small_image, tile_size, seed=0)
+    small_mosaic_time = time.perf_counter() - start
+
+    print(
+        f"\n4096x4096, 32px tiles: tile infill {tile_time:.3f} s vs {reference_time:.3f} s one tile at a time "
+        f"({reference_time / tile_time:.1f}x); mosaic infill {mosaic_time:.3f} s"
+        f"\n512x512, 32px tiles: mosaic infill {small_mosaic_time:.3f} s vs {reference_mosaic_time:.3f} s one tile "
+        f"per pixel ({reference_mosaic_time / small_mosaic_time:.1f}x)"
+    )
+    np.testing.assert_array_equal(filled, reference)
+    assert tile_time < reference_time
+    assert small_mosaic_time < reference_mosaic_time
@@ -0,0 +1,45 @@
+import pytest
+import torch
+from diffusers.pipelines.stable_diffusion.safety_checker import StableDiffusionSafetyChecker
+from PIL import Image
+from transformers import CLIPConfig, CLIPImageProcessor
+
+from invokeai.backend.image_util.safety_checker import SafetyChecker
+
+
+@pytest.fixture
+def checker(monkeypatch: pytest.MonkeyPatch) -> StableDiffusionSafetyChecker:
+    monkeypatch.setattr(SafetyChecker, "feature_extractor", CLIPImageProcessor())
+    config = CLIPConfig(
+        vision_config={
+            "hidden_size": 32,
+            "intermediate_size": 37,
+            "num_attention_heads": 4,
+            "num_hidden_layers": 2,
+            "image_size": 224,
+            "patch_size": 32,
+        },
+        projection_dim=16,
+    )
+    return StableDiffusionSafetyChecker(config).eval()
+
+
+def test_has_nsfw_concept(checker: StableDiffusionSafetyChecker):
+    image = Image.new("RGBA", (32, 96), (0, 255, 0, 128))
+    assert SafetyChecker.has_nsfw_concept(checker, image) is False
+
+    # Flag every image, by moving the concept thresholds below any cosine similarity.
+    with torch.no_grad():
+        checker.concept_embeds_weights.fill_(-2.0)
+    assert SafetyChecker.has_nsfw_concept(checker, image) is True
+
+
+def test_blur_if_nsfw(checker: StableDiffusionSafetyChecker):
+    image = Image.new("RGB", (256, 256), (255, 0, 0))
+    assert SafetyChecker.blur_if_nsfw(checker, image) is image
+
+    with torch.no_grad():
+        checker.concept_embeds_weights.fill_(-2.0)
+    blurred = SafetyChecker.blur_if_nsfw(checker, image)
+    assert blurred is not image
+    assert blurred.size == image.size
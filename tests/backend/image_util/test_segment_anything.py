@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import SamConfig, SamImageProcessor, SamModel, SamProcessor
+from transformers.models.sam.configuration_sam import (
+    SamMaskDecoderConfig,
+    SamPromptEncoderConfig,
+    SamVisionConfig,
+)
+
+from invokeai.backend.image_util.segment_anything.mask_refinement import (
+    mask_to_polygon,
+    polygon_to_mask,
+    refine_masks_with_polygons,
+)
+from invokeai.backend.image_util.segment_anything.segment_anything_pipeline import SegmentAnythingPipeline
+
+
+@pytest.fixture
+def sam_pipeline() -> SegmentAnythingPipeline:
+    """A tiny, randomly initialized SAM model."""
+    vision_config = SamVisionConfig(
+        hidden_size=32,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        image_size=64,
+        patch_size=16,
+        mlp_dim=64,
+        global_attn_indexes=[0],
+        num_pos_feats=128,
+    )
+    config = SamConfig(
+        vision_config=vision_config.to_dict(),
+        prompt_encoder_config=SamPromptEncoderConfig(image_size=64, patch_size=16).to_dict(),
+        mask_decoder_config=SamMaskDecoderConfig(num_hidden_layers=1, mlp_dim=64).to_dict(),
+    )
+    torch.manual_seed(0)
+    sam_model = SamModel(config).eval()
+    sam_processor = SamProcessor(SamImageProcessor(size={"longest_edge": 64}, pad_size={"height": 64, "width": 64}))
+    return SegmentAnythingPipeline(sam_model=sam_model, sam_processor=sam_processor)
+
+
+@torch.no_grad()
+def test_segment_with_image_embeddings(sam_pipeline: SegmentAnythingPipeline):
+    image = Image.fromarray(np.random.RandomState(0).randint(0, 256, (50, 60, 3), dtype=np.uint8))
+    bounding_boxes = [[1, 2, 30, 40], [10, 10, 50, 45]]
+
+    masks = sam_pipeline.segment(image=image, bounding_boxes=bounding_boxes)
+    image_embeddings = sam_pipeline.get_image_embeddings(image)
+    masks_from_embeddings = sam_pipeline.segment(
+        image=image, bounding_boxes=bounding_boxes, image_embeddings=image_embeddings
+    )
+
+    assert masks.shape == (2, 3, 50, 60)
+    assert torch.equal(masks, masks_from_embeddings)
+
+
+def test_refine_masks_with_polygons_matches_reference():
+    rng = np.random.default_rng(0)
+    masks = np.zeros((5, 120, 100), dtype=bool)
+    # Blobs with holes and stray pieces, including ones touching the image edges.
+    for i, (cy, cx, r) in enumerate([(60, 50, 30), (10, 10, 15), (110, 95, 20), (60, 0, 25)]):
+        y, x = np.ogrid[:120, :100]
+        masks[i] = (y - cy) ** 2 + (x - cx) ** 2 < r**2
+        masks[i] ^= rng.random((120, 100)) < 0.05
+    masks[3, 0:3, 90:93] = True
+    # masks[4] is left empty.
+
+    refined = refine_masks_with_polygons(masks)
+
+    assert refined.dtype == bool
+    for mask, refined_mask in zip(masks[:4], refined[:4], strict=True):
+        expected = polygon_to_mask(mask_to_polygon(mask.astype(np.uint8)), mask.shape)
+        np.testing.assert_array_equal(refined_mask, expected.astype(bool))
+    assert not refined[4].any()
+
+
+def test_refine_masks_with_polygons_keeps_largest_contour():
+    masks = np.zeros((1, 40, 40), dtype=np.uint8)
+    cv2.rectangle(masks[0], (2, 2), (10, 10), color=1, thickness=-1)
+    cv2.rectangle(masks[0], (15, 15), (35, 35), color=1, thickness=-1)
+    masks[0, 20:25, 20:25] = 0
+
+    refined = refine_masks_with_polygons(masks.astype(bool))
+
+    assert not refined[0, 2:11, 2:11].any()
+    assert refined[0, 15:36, 15:36].all()
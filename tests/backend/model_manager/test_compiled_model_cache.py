@@ -0,0 +1,75 @@
+import copy
+
+import pytest
+import torch
+from diffusers.models.unets.unet_2d_condition import UNet2DConditionModel
+
+from invokeai.app.services.config import get_config
+from invokeai.backend.model_manager.load import ModelCache
+from invokeai.backend.model_manager.load.model_cache.compiled_model_cache import CompiledModel
+from invokeai.backend.stable_diffusion.diffusers_pipeline import unet_graph_variant
+
+
+@pytest.fixture
+def unet() -> UNet2DConditionModel:
+    torch.manual_seed(0)
+    return UNet2DConditionModel(
+        sample_size=8,
+        block_out_channels=(8, 16),
+        layers_per_block=1,
+        down_block_types=("CrossAttnDownBlock2D", "DownBlock2D"),
+        up_block_types=("UpBlock2D", "CrossAttnUpBlock2D"),
+        cross_attention_dim=8,
+        norm_num_groups=4,
+        attention_head_dim=2,
+    ).eval()
+
+
+@torch.no_grad()
+def test_compiled_model_runs_bound_copies(unet: UNet2DConditionModel):
+    torch._dynamo.reset()
+    other = copy.deepcopy(unet)
+    for p in other.parameters():
+        p.add_(0.1)
+    compiled = CompiledModel(unet, backend="aot_eager")
+    latents = torch.randn(1, 4, 8, 8)
+    embeddings = torch.randn(1, 3, 8)
+
+    for model in (unet, other, unet):
+        with compiled.bind(model):
+            actual = compiled(latents, 5, embeddings).sample
+        assert torch.allclose(actual, model(latents, 5, embeddings).sample, atol=1e-5)
+
+    # The copies' weights are only borrowed while bound.
+    assert all(t.numel() == 0 for t in compiled._template.parameters())
+    assert unet.conv_in.weight.numel() > 0
+
+
+def test_compiled_model_signature_limit(unet: UNet2DConditionModel):
+    compiled = CompiledModel(unet, backend="eager", max_signatures=2)
+
+    assert compiled.accepts(((1, 4, 8, 8), ()))
+    assert compiled.accepts(((2, 4, 8, 8), ()))
+    assert not compiled.accepts(((1, 4, 16, 16), ()))
+    assert compiled.accepts(((1, 4, 8, 8), ()))
+
+
+def test_compiled_models_are_kept_per_variant(unet: UNet2DConditionModel, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(get_config(), "devices", ["cpu"])
+    cache = ModelCache(max_cache_size=1.0)
+    cache.put("unet", unet)
+    locker = cache.get("unet")
+
+    with cache.reserve_execution_device():
+        first = locker.get_compiled_model(locker.lock(), unet_graph_variant(unet))
+        second = locker.get_compiled_model(locker.lock(), unet_graph_variant(unet))
+        unet.set_attention_slice(1)
+        sliced = locker.get_compiled_model(locker.lock(), unet_graph_variant(unet))
+
+    assert first is second
+    assert sliced is not first
+    assert len(cache.compiled_models) == 2
+    cache.compiled_models.clear(torch.device("cuda"))
+    assert len(cache.compiled_models) == 2
+    cache.compiled_models.discard_model("unet")
+    assert len(cache.compiled_models) == 0
@@ -2,10 +2,16 @@
 
 # test that LoRA patching works on both CPU and CUDA
 
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pytest
 import torch
+from safetensors.torch import save_file
 
-from invokeai.backend.lora import LoRALayer, LoRAModelRaw
+from invokeai.backend.lora import FullLayer, LazyLoRALayers, LoRALayer, LoRAModelRaw
+from invokeai.backend.model_manager.load.model_cache.fused_weights_cache import FusedWeights, FusedWeightsCache
 from invokeai.backend.model_patcher import ModelPatcher
 
 
@@ -100,3 +106,155 @@ def test_apply_lora_change_device():
     # After unpatching, the original model weights should have been restored on the GPU.
     assert model["linear_layer_1"].weight.data.device.type == "cuda"
     torch.testing.assert_close(model["linear_layer_1"].weight.data, orig_linear_weight, check_device=False)
+
+
+def _make_lora_test_model(lora_dim: int = 2) -> tuple[torch.nn.ModuleDict, LoRAModelRaw]:
+    linear_in_features = 4
+    linear_out_features = 8
+    model = torch.nn.ModuleDict(
+        {"linear_layer_1": torch.nn.Linear(linear_in_features, linear_out_features, dtype=torch.float16)}
+    )
+    lora_layers = {
+        "linear_layer_1": LoRALayer(
+            layer_key="linear_layer_1",
+            values={
+                "lora_down.weight": torch.ones((lora_dim, linear_in_features), dtype=torch.float16),
+                "lora_up.weight": torch.ones((linear_out_features, lora_dim), dtype=torch.float16),
+            },
+        )
+    }
+    return model, LoRAModelRaw("lora_name", lora_layers)
+
+
+@torch.no_grad()
+def test_apply_lora_fused_weights():
+    """Test that the first application of a LoRA stack saves the fused weights, and that later applications copy them
+    in without consuming the LoRAs.
+    """
+    cache = FusedWeightsCache(max_size=0.01)
+    fused_weights = FusedWeights(cache=cache, key=("model", ("lora", 0.5)), device=torch.device("cpu"))
+
+    model, lora = _make_lora_test_model()
+    orig_linear_weight = model["linear_layer_1"].weight.data.detach().clone()
+    expected_patched_linear_weight = orig_linear_weight + 2 * 0.5
+
+    with ModelPatcher.apply_lora(model, [(lora, 0.5)], prefix="", fused_weights=fused_weights):
+        torch.testing.assert_close(model["linear_layer_1"].weight.data, expected_patched_linear_weight)
+    assert cache.cache_size(torch.device("cpu")) == orig_linear_weight.nelement() * orig_linear_weight.element_size()
+
+    # A fresh copy of the model is patched from the cache, without touching the LoRA iterator.
+    model["linear_layer_1"].weight.data.copy_(orig_linear_weight)
+
+    def _unused_loras():
+        raise AssertionError("The LoRAs should not be loaded when their fused weights are cached.")
+        yield
+
+    with ModelPatcher.apply_lora(model, _unused_loras(), prefix="", fused_weights=fused_weights):
+        torch.testing.assert_close(model["linear_layer_1"].weight.data, expected_patched_linear_weight)
+
+
+def test_fused_weights_cache_lru():
+    device = torch.device("cpu")
+    weights = {"w": torch.zeros(256)}  # 1 KiB
+    cache = FusedWeightsCache(max_size=2048 / 1073741824)
+
+    assert cache.put("a", device, weights)
+    assert cache.put("b", device, weights)
+    assert cache.get("a", device) is weights
+    assert cache.put("c", device, weights)
+
+    # "b" was the least recently used entry.
+    assert cache.get("b", device) is None
+    assert cache.get("a", device) is weights
+    assert cache.get("c", device) is weights
+    assert cache.get("a", torch.device("meta")) is None
+
+    # Weights larger than the whole budget are never stored.
+    assert not cache.put("d", device, {"w": torch.zeros(1024)})
+
+    cache.put(("model_key", "patches"), device, weights)
+    cache.discard_model("model_key")
+    assert cache.get(("model_key", "patches"), device) is None
+
+    assert cache.put("e", device, weights)
+    assert cache.evict(1, device) == 1024
+    assert cache.get("a", device) is None
+    assert cache.get("e", device) is weights
+
+    cache.clear()
+    assert cache.cache_size(device) == 0
+
+
+@torch.no_grad()
+def test_apply_lora_keeps_full_layer_weights():
+    """Test that patching a model with a LoRA that is already on the model's device in float32 does not scale the
+    LoRA's own tensors, which are shared through the model cache.
+    """
+    model = torch.nn.ModuleDict({"linear_layer_1": torch.nn.Linear(4, 8)})
+    diff = torch.ones((8, 4))
+    lora = LoRAModelRaw("lora_name", {"linear_layer_1": FullLayer("linear_layer_1", values={"diff": diff.clone()})})
+    orig_linear_weight = model["linear_layer_1"].weight.data.detach().clone()
+
+    for _ in range(2):
+        with ModelPatcher.apply_lora(model, [(lora, 0.5)], prefix=""):
+            torch.testing.assert_close(model["linear_layer_1"].weight.data, orig_linear_weight + 0.5)
+        torch.testing.assert_close(lora.layers["linear_layer_1"].weight, diff)
+
+
+@torch.no_grad()
+def test_lazy_lora_from_checkpoint(tmp_path: Path):
+    """Test that a lazily-loaded LoRA reads its layers from the file on demand and patches exactly like an eagerly
+    loaded one.
+    """
+    torch.manual_seed(0)
+    state_dict = {
+        "lora_unet_linear_layer_1.lora_down.weight": torch.randn((2, 4)),
+        "lora_unet_linear_layer_1.lora_up.weight": torch.randn((8, 2)),
+        "lora_unet_linear_layer_1.alpha": torch.tensor(1.0),
+        "lora_te_linear_layer_1.lora_down.weight": torch.randn((2, 4)),
+        "lora_te_linear_layer_1.lora_up.weight": torch.randn((8, 2)),
+    }
+    lora_path = tmp_path / "lora.safetensors"
+    save_file(state_dict, lora_path)
+
+    eager_lora = LoRAModelRaw.from_checkpoint(lora_path, dtype=torch.float16)
+    lazy_lora = LoRAModelRaw.from_checkpoint(lora_path, dtype=torch.float16, lazy=True)
+
+    assert lazy_lora.is_lazy and not eager_lora.is_lazy
+    assert set(lazy_lora.layers) == set(eager_lora.layers)
+    assert lazy_lora.calc_size() == lora_path.stat().st_size
+    assert eager_lora.calc_size() > 0
+
+    layers = lazy_lora.get_layers_on_device("lora_unet_", torch.device("cpu"))
+    assert list(layers) == ["lora_unet_linear_layer_1"]
+    layer = layers["lora_unet_linear_layer_1"]
+    assert isinstance(layer, LoRALayer)
+    assert layer.up.dtype == torch.float16
+    assert layer.alpha == 1.0
+
+    # On other devices, all of the layer tensors are moved together.
+    meta_layers = lazy_lora.get_layers_on_device("lora_te_", torch.device("meta"))
+    meta_layer = meta_layers["lora_te_linear_layer_1"]
+    assert isinstance(meta_layer, LoRALayer)
+    assert meta_layer.up.device.type == meta_layer.down.device.type == "meta"
+    assert meta_layer.up.shape == (8, 2)
+    assert meta_layer.down.shape == (2, 4)
+
+    eager_model = torch.nn.ModuleDict({"linear_layer_1": torch.nn.Linear(4, 8, dtype=torch.float16)})
+    lazy_model = copy.deepcopy(eager_model)
+    with (
+        ModelPatcher.apply_lora(eager_model, [(eager_lora, 0.7)], prefix="lora_unet_"),
+        ModelPatcher.apply_lora(lazy_model, [(lazy_lora, 0.7)], prefix="lora_unet_"),
+    ):
+        torch.testing.assert_close(lazy_model["linear_layer_1"].weight, eager_model["linear_layer_1"].weight)
+
+    # The layers can be read by several threads at once, and the file is only kept open while they are read.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        thread_layers = list(executor.map(lambda _: lazy_lora.get_layers_on_device("", torch.device("cpu")), range(8)))
+    for layers in thread_layers:
+        assert set(layers) == set(eager_lora.layers)
+    assert isinstance(lazy_lora.layers, LazyLoRALayers)
+    assert lazy_lora.layers._file is None
+
+    # The lazy LoRA can still be copied, e.g. by the model cache.
+    assert set(copy.deepcopy(lazy_lora).layers) == set(lazy_lora.layers)
@@ -0,0 +1,130 @@
+import pytest
+import torch
+from diffusers.models.autoencoders.autoencoder_kl import AutoencoderKL
+
+from invokeai.app.invocations.latents_to_image import get_vae_precision_variant
+from invokeai.app.services.config import get_config
+from invokeai.backend.model_manager.load import ModelCache
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GIG
+from invokeai.backend.model_manager.load.model_cache.precision_variant import PrecisionVariant
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> ModelCache:
+    monkeypatch.setattr(get_config(), "devices", ["cpu"])
+    return ModelCache(max_cache_size=1.0)
+
+
+def test_precision_variant_name():
+    variant = PrecisionVariant(torch.float32, overrides=(("decoder.mid_block", torch.float16),))
+    assert variant.name == "float32+decoder.mid_block:float16"
+    assert PrecisionVariant(torch.bfloat16).name == "bfloat16"
+
+
+def test_lock_precision_variant(cache: ModelCache):
+    model = torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.Linear(4, 4)).to(torch.float16)
+    cache.put("model", model)
+    locker = cache.get("model")
+    variant = PrecisionVariant(torch.float32, overrides=(("1", torch.float16),))
+
+    with cache.reserve_execution_device():
+        locked = locker.lock(variant)
+        locked_again = locker.lock(variant)
+        default = locker.lock()
+
+    # The variant is converted once, and locked without being converted back to the default dtype.
+    assert cache.exists(f"model@{variant.name}")
+    # 20 parameters per layer: two fp16 layers for the model, one fp32 and one fp16 layer for the variant.
+    assert cache.cache_size() == 2 * 20 * 2 + 20 * 4 + 20 * 2
+    assert locked is not locked_again
+    for m in (locked, locked_again):
+        assert m[0].weight.dtype == torch.float32
+        assert m[1].weight.dtype == torch.float16
+        assert torch.equal(m[0].weight, model[0].weight.float())
+    assert default[0].weight.dtype == torch.float32
+    assert model[0].weight.dtype == torch.float16
+
+
+def test_precision_variant_matches():
+    model = torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.Linear(4, 4))
+    model[1].to(torch.float16)
+    assert PrecisionVariant(torch.float32, overrides=(("1", torch.float16),)).matches(model)
+    assert not PrecisionVariant(torch.float32).matches(model)
+    assert not PrecisionVariant(torch.float16).matches(model)
+
+
+def test_precision_variant_of_matching_model_is_not_copied(cache: ModelCache):
+    model = torch.nn.Linear(4, 4)
+    cache.put("model", model)
+    variant = PrecisionVariant(torch.float32)
+
+    with cache.reserve_execution_device():
+        locked = cache.get("model").lock(variant)
+
+    # The model is already in float32, so it is locked as is instead of being held twice in RAM.
+    assert not cache.exists(f"model@{variant.name}")
+    assert cache.cache_size() == 20 * 4
+    assert locked is not model
+    assert locked.weight.dtype == torch.float32
+
+
+def test_precision_variant_keeps_base_model(cache: ModelCache):
+    # The fp16 model takes 40 bytes and its fp32 variant 80, so only one of them fits.
+    cache.max_cache_size = 100 / GIG
+    cache.put("model", torch.nn.Linear(4, 4).to(torch.float16))
+    variant = PrecisionVariant(torch.float32)
+
+    with cache.reserve_execution_device():
+        cache.get("model").lock(variant)
+
+    assert cache.exists("model")
+    assert cache.exists(f"model@{variant.name}")
+
+
+def test_make_room_evicts_variants_with_their_model(cache: ModelCache):
+    variant = PrecisionVariant(torch.float32)
+    cache.put("a", torch.nn.Linear(4, 4).to(torch.float16))
+    with cache.reserve_execution_device():
+        cache.get("a").lock(variant)
+    # Hold on to the variant, and make it less recently used than its model: [a@float32, a, c, d]
+    variant_model = cache.get(f"a@{variant.name}").model
+    cache.get("a")
+    cache.put("c", torch.nn.Linear(4, 4).to(torch.float16))
+    cache.put("d", torch.nn.Linear(4, 4).to(torch.float16))
+    assert cache.cache_size() == 200
+
+    cache.max_cache_size = 200 / GIG
+    cache.make_room(160)
+
+    # Evicting a frees its variant, too, so only c has to go next.
+    assert not cache.exists("a")
+    assert not cache.exists(f"a@{variant.name}")
+    assert not cache.exists("c")
+    assert cache.exists("d")
+    assert cache.cache_size() == 40
+    assert variant_model.weight.dtype == torch.float32
+
+
+def test_lock_on_idle_devices_without_idle_devices(cache: ModelCache):
+    cache.put("model", torch.nn.Linear(4, 4).to(torch.float16))
+    locker = cache.get("model")
+    variant = PrecisionVariant(torch.float32)
+
+    with cache.reserve_execution_device(), locker.lock_on_idle_devices(1, variant) as models:
+        # The only device is reserved by this thread, so there is nothing to borrow or convert.
+        assert models == []
+    assert not cache.exists(f"model@{variant.name}")
+
+
+def test_get_vae_precision_variant():
+    vae = AutoencoderKL()
+
+    assert get_vae_precision_variant(vae, fp32=False, attention_dtype=torch.float16) == PrecisionVariant(torch.float16)
+    assert get_vae_precision_variant(vae, fp32=True, attention_dtype=torch.float32) == PrecisionVariant(torch.float32)
+    upcast = get_vae_precision_variant(vae, fp32=True, attention_dtype=torch.float16)
+    assert upcast.dtype == torch.float32
+    assert dict(upcast.overrides) == {
+        "post_quant_conv": torch.float16,
+        "decoder.conv_in": torch.float16,
+        "decoder.mid_block": torch.float16,
+    }
@@ -0,0 +1,91 @@
+import torch
+from diffusers import DPMSolverMultistepScheduler, EulerDiscreteScheduler
+
+from invokeai.backend.model_manager.load import ModelCache
+from invokeai.backend.model_manager.load.model_cache.scheduler_cache import SchedulerCache
+
+
+def _build_counter(scheduler_class=DPMSolverMultistepScheduler, **config):
+    builds = []
+
+    def build():
+        builds.append(scheduler_class)
+        return scheduler_class.from_config({"num_train_timesteps": 1000, **config})
+
+    return build, builds
+
+
+def test_get_builds_once_and_returns_copies():
+    cache = SchedulerCache()
+    build, builds = _build_counter(use_karras_sigmas=True)
+
+    first = cache.get("key", build)
+    second = cache.get("key", build)
+
+    assert len(builds) == 1
+    assert first is not second
+    assert first.config == second.config
+
+
+def test_set_timesteps_restores_cached_schedule():
+    cache = SchedulerCache()
+    build, _ = _build_counter(use_karras_sigmas=True)
+    reference = build()
+    reference.set_timesteps(20, device="cpu")
+
+    first = cache.get("key", build)
+    cache.set_timesteps(first, 20, device="cpu")
+    # Stepping the first scheduler must not change the schedule given to the next one.
+    sample = torch.zeros(1, 4, 8, 8)
+    first.step(torch.ones_like(sample), first.timesteps[0], sample)
+
+    second = cache.get("key", build)
+    cache.set_timesteps(second, 20, device="cpu")
+
+    for scheduler in (first, second):
+        assert torch.equal(scheduler.timesteps, reference.timesteps)
+        assert torch.equal(scheduler.sigmas, reference.sigmas)
+    assert first.step_index == 1
+    assert second.step_index is None
+    assert second.model_outputs == reference.model_outputs
+
+
+def test_set_timesteps_is_keyed_by_config_and_steps():
+    cache = SchedulerCache()
+    euler = EulerDiscreteScheduler.from_config({"num_train_timesteps": 1000})
+    euler_karras = EulerDiscreteScheduler.from_config({"num_train_timesteps": 1000, "use_karras_sigmas": True})
+
+    cache.set_timesteps(euler, 10, device="cpu")
+    cache.set_timesteps(euler_karras, 10, device="cpu")
+    assert not torch.equal(euler.sigmas, euler_karras.sigmas)
+
+    cache.set_timesteps(euler, 15, device="cpu")
+    assert len(euler.timesteps) == 15
+
+
+def test_lru_eviction():
+    cache = SchedulerCache(max_entries=2)
+    build, builds = _build_counter()
+
+    cache.get("a", build)
+    cache.get("b", build)
+    cache.get("a", build)
+    cache.get("c", build)  # evicts "b"
+    cache.get("a", build)
+    assert len(builds) == 3
+    cache.get("b", build)
+    assert len(builds) == 4
+
+
+def test_model_cache_sizes_scheduler_cache():
+    build, builds = _build_counter()
+    cache = ModelCache(max_scheduler_cache_entries=0).schedulers
+
+    cache.get("a", build)
+    cache.get("a", build)
+    assert len(builds) == 2
+
+    cache = ModelCache().schedulers
+    cache.get("a", build)
+    cache.get("a", build)
+    assert len(builds) == 3
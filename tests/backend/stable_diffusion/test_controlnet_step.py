@@ -0,0 +1,101 @@
+from typing import Any
+
+import torch
+
+from invokeai.backend.stable_diffusion.diffusers_pipeline import ControlNetData
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import BasicConditioningInfo, TextConditioningData
+from invokeai.backend.stable_diffusion.diffusion.shared_invokeai_diffusion import InvokeAIDiffuserComponent
+
+
+class FakeControlNet:
+    """Returns residuals filled with `value * conditioning_scale`, with the batch size of the sample."""
+
+    def __init__(self, value: float):
+        self.value = value
+        self.calls: list[dict[str, Any]] = []
+
+    def __call__(self, sample: torch.Tensor, conditioning_scale: float, **kwargs: Any):
+        self.calls.append({"sample": sample, "conditioning_scale": conditioning_scale, **kwargs})
+        batch_size = sample.shape[0]
+        fill = self.value * conditioning_scale
+        return [torch.full((batch_size, 2, 4, 4), fill), torch.full((batch_size, 2, 2, 2), fill)], torch.full(
+            (batch_size, 2, 1, 1), fill
+        )
+
+
+def _control(
+    value: float,
+    control_mode: str = "balanced",
+    weight: float | list[float] = 1.0,
+    begin_step_percent: float = 0.0,
+) -> ControlNetData:
+    return ControlNetData(
+        model=FakeControlNet(value),  # type: ignore
+        image_tensor=torch.zeros(1, 3, 32, 32),
+        weight=weight,
+        begin_step_percent=begin_step_percent,
+        end_step_percent=1.0,
+        control_mode=control_mode,
+        resize_mode="just_resize",
+    )
+
+
+def _do_controlnet_step(control_data: list[ControlNetData], step_index: int = 0):
+    conditioning_data = TextConditioningData(
+        uncond_text=BasicConditioningInfo(embeds=torch.zeros(1, 77, 8)),
+        cond_text=BasicConditioningInfo(embeds=torch.ones(1, 77, 8)),
+        uncond_regions=None,
+        cond_regions=None,
+        guidance_scale=7.5,
+    )
+    diffuser = InvokeAIDiffuserComponent(model=None, model_forward_callback=None)  # type: ignore
+    return diffuser.do_controlnet_step(
+        control_data=control_data,
+        sample=torch.zeros(1, 4, 4, 4),
+        timestep=torch.tensor(10),
+        step_index=step_index,
+        total_step_count=10,
+        conditioning_data=conditioning_data,
+    )
+
+
+def test_controlnet_residuals_are_summed():
+    control_data = [_control(1.0), _control(2.0, weight=0.5), _control(4.0, control_mode="unbalanced")]
+
+    down, mid = _do_controlnet_step(control_data)
+
+    # The conditional-only residuals are only added to the conditional half of the batch.
+    for residual in [*down, mid]:
+        assert residual.shape[0] == 2
+        assert torch.all(residual[0] == 2.0)
+        assert torch.all(residual[1] == 6.0)
+    balanced_call = control_data[0].model.calls[0]
+    assert balanced_call["sample"].shape[0] == 2
+    assert torch.equal(balanced_call["encoder_hidden_states"][:, 0, 0], torch.tensor([0.0, 1.0]))
+    unbalanced_call = control_data[2].model.calls[0]
+    assert unbalanced_call["sample"].shape[0] == 1
+    assert torch.equal(unbalanced_call["encoder_hidden_states"][:, 0, 0], torch.tensor([1.0]))
+
+
+def test_conditional_only_controlnet_gets_zero_unconditional_residuals():
+    down, mid = _do_controlnet_step([_control(3.0, control_mode="more_control")])
+
+    for residual in [*down, mid]:
+        assert torch.all(residual[0] == 0.0)
+        assert torch.all(residual[1] == 3.0)
+
+
+def test_inactive_controlnets_are_skipped():
+    control_data = [
+        _control(1.0, weight=[0.0, 1.0]),
+        _control(2.0, begin_step_percent=0.5),
+        _control(4.0),
+    ]
+
+    down, mid = _do_controlnet_step(control_data, step_index=0)
+
+    assert control_data[0].model.calls == []
+    assert control_data[1].model.calls == []
+    assert torch.all(mid == 4.0)
+
+    assert _do_controlnet_step(control_data[:2], step_index=0) == (None, None)
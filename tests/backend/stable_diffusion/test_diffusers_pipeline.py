@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from invokeai.backend.stable_diffusion.diffusers_pipeline import (
+    image_resized_to_grid_as_tensor,
+    image_resized_to_grid_as_uint8,
+    uint8_image_to_tensor,
+)
+
+
+@pytest.mark.parametrize("size", [(64, 48), (70, 53)])
+@pytest.mark.parametrize("normalize", [True, False])
+def test_uint8_image_to_tensor_matches_float_path(size: tuple[int, int], normalize: bool):
+    image = Image.fromarray(np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+    expected = image_resized_to_grid_as_tensor(image, normalize=normalize)
+    image_tensor = image_resized_to_grid_as_uint8(image)
+    actual = uint8_image_to_tensor(image_tensor, device=torch.device("cpu"), normalize=normalize)
+
+    assert image_tensor.dtype == torch.uint8
+    assert image_tensor.shape == (1, 3, size[1] - size[1] % 8, size[0] - size[0] % 8)
+    assert actual.dtype == torch.float32
+    assert torch.equal(actual[0], expected)
+
+
+def test_uint8_image_to_tensor_casts_after_scaling():
+    image_tensor = torch.arange(256, dtype=torch.uint8).reshape(1, 1, 16, 16)
+
+    actual = uint8_image_to_tensor(image_tensor, dtype=torch.float16)
+
+    assert actual.dtype == torch.float16
+    assert torch.equal(actual, (image_tensor.float() / 255.0 * 2.0 - 1.0).half())
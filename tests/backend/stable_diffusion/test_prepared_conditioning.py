@@ -0,0 +1,224 @@
+import time
+from typing import Any, Optional
+
+import pytest
+import torch
+
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import (
+    ConditioningMode,
+    IPAdapterConditioningInfo,
+    IPAdapterData,
+    Range,
+    SDXLConditioningInfo,
+    TextConditioningData,
+    TextConditioningRegions,
+)
+from invokeai.backend.stable_diffusion.diffusion.prepared_conditioning import PreparedConditioning
+from invokeai.backend.stable_diffusion.diffusion.shared_invokeai_diffusion import InvokeAIDiffuserComponent
+
+
+def _sdxl_text(seq_len: int) -> SDXLConditioningInfo:
+    return SDXLConditioningInfo(
+        embeds=torch.randn(1, seq_len, 2048),
+        pooled_embeds=torch.randn(1, 1280),
+        add_time_ids=torch.randn(1, 6),
+    )
+
+
+def _conditioning_data(with_regions: bool = True) -> TextConditioningData:
+    cond_regions = None
+    if with_regions:
+        masks = torch.zeros(1, 2, 64, 64)
+        masks[:, 0, :, :32] = 1.0
+        masks[:, 1, :, 32:] = 1.0
+        cond_regions = TextConditioningRegions(masks=masks, ranges=[Range(start=0, end=77), Range(start=77, end=154)])
+    return TextConditioningData(
+        uncond_text=_sdxl_text(77),
+        cond_text=_sdxl_text(154),
+        uncond_regions=None,
+        cond_regions=cond_regions,
+        guidance_scale=7.5,
+    )
+
+
+def _ip_adapter_data(weight: float | list[float] = 1.0) -> list[IPAdapterData]:
+    return [
+        IPAdapterData(
+            ip_adapter_model=None,  # type: ignore
+            ip_adapter_conditioning=IPAdapterConditioningInfo(
+                cond_image_prompt_embeds=torch.randn(1, 4, 2048),
+                uncond_image_prompt_embeds=torch.zeros(1, 4, 2048),
+            ),
+            mask=torch.ones(1, 1, 64, 64),
+            target_blocks=[],
+            weight=weight,
+            begin_step_percent=0.0,
+            end_step_percent=1.0,
+        )
+    ]
+
+
+class _RecordingForward:
+    def __init__(self):
+        self.calls: list[dict[str, Any]] = []
+
+    def __call__(self, x: torch.Tensor, t: torch.Tensor, conditioning: torch.Tensor, **kwargs: Any) -> torch.Tensor:
+        self.calls.append({"conditioning": conditioning, **kwargs})
+        return torch.zeros_like(x)
+
+
+def _do_steps(sequential: bool, prepare_once: bool, num_steps: int = 2) -> _RecordingForward:
+    forward = _RecordingForward()
+    diffuser = InvokeAIDiffuserComponent(model=None, model_forward_callback=forward)
+    diffuser.sequential_guidance = sequential
+    conditioning_data = _conditioning_data()
+    ip_adapter_data = _ip_adapter_data(weight=[0.5, 1.0])
+    sample = torch.randn(1, 4, 64, 64)
+    prepared_conditioning: Optional[PreparedConditioning] = None
+    if prepare_once:
+        prepared_conditioning = PreparedConditioning.from_latents(conditioning_data, ip_adapter_data, sample)
+    for step_index in range(num_steps):
+        diffuser.do_unet_step(
+            sample=sample,
+            timestep=torch.tensor([999]),
+            conditioning_data=conditioning_data,
+            ip_adapter_data=ip_adapter_data,
+            step_index=step_index,
+            total_step_count=num_steps,
+            prepared_conditioning=prepared_conditioning,
+        )
+    return forward
+
+
+def test_prepared_conditioning_both():
+    prepared = PreparedConditioning.from_latents(_conditioning_data(), _ip_adapter_data(), torch.zeros(1, 4, 64, 64))
+    both = prepared.get(ConditioningMode.Both)
+
+    # The shorter negative prompt is zero-padded and masked out.
+    assert both.embeds.shape == (2, 154, 2048)
+    assert both.encoder_attention_mask is not None
+    assert both.encoder_attention_mask[0].sum() == 77
+    assert both.encoder_attention_mask[1].sum() == 154
+    assert both.added_cond_kwargs is not None
+    assert both.added_cond_kwargs["text_embeds"].shape == (2, 1280)
+    assert both.added_cond_kwargs["time_ids"].shape == (2, 6)
+    assert both.regional_ip_data is not None
+    assert both.regional_ip_data.image_prompt_embeds[0].shape == (2, 1, 4, 2048)
+
+    # The prepared conditioning is built once and reused.
+    assert prepared.get(ConditioningMode.Both) is both
+
+
+def test_prepared_conditioning_sequential_regions():
+    prepared = PreparedConditioning.from_latents(_conditioning_data(), None, torch.zeros(1, 4, 64, 64))
+
+    # Only the positive prompt has regions, so only the conditioned pass is masked when running sequentially.
+    assert prepared.get(ConditioningMode.Negative).regional_prompt_data is None
+    assert prepared.get(ConditioningMode.Positive).regional_prompt_data is not None
+    assert prepared.get(ConditioningMode.Positive).encoder_attention_mask is None
+    assert prepared.get(ConditioningMode.Positive).regional_ip_data is None
+
+
+def test_prepared_conditioning_cross_attention_kwargs_per_step():
+    prepared = PreparedConditioning.from_latents(
+        _conditioning_data(), _ip_adapter_data(weight=[0.5, 1.0]), torch.zeros(1, 4, 64, 64)
+    )
+
+    kwargs_0 = prepared.cross_attention_kwargs(ConditioningMode.Both, step_index=0, total_step_count=2)
+    kwargs_1 = prepared.cross_attention_kwargs(ConditioningMode.Both, step_index=1, total_step_count=2)
+
+    assert kwargs_0["regional_ip_data"].scales == [0.5]
+    assert kwargs_1["regional_ip_data"].scales == [1.0]
+    assert kwargs_0["percent_through"] == 0.0
+    assert kwargs_1["percent_through"] == 0.5
+    # The IP-Adapter embeddings and masks, and the regional prompt data, are shared between steps.
+    assert kwargs_0["regional_ip_data"].image_prompt_embeds is kwargs_1["regional_ip_data"].image_prompt_embeds
+    assert kwargs_0["regional_ip_data"].get_masks(4096) is kwargs_1["regional_ip_data"].get_masks(4096)
+    assert kwargs_0["regional_prompt_data"] is kwargs_1["regional_prompt_data"]
+
+
+def test_regional_prompt_data_cross_attn_mask_is_reused():
+    prepared = PreparedConditioning.from_latents(_conditioning_data(), None, torch.zeros(1, 4, 64, 64))
+    regional_prompt_data = prepared.get(ConditioningMode.Both).regional_prompt_data
+    assert regional_prompt_data is not None
+
+    mask = regional_prompt_data.get_cross_attn_mask(query_seq_len=1024, key_seq_len=154)
+    assert mask.shape == (2, 1024, 154)
+    assert regional_prompt_data.get_cross_attn_mask(query_seq_len=1024, key_seq_len=154) is mask
+
+
+@pytest.mark.parametrize("sequential", [False, True])
+def test_do_unet_step_matches_unprepared(sequential: bool):
+    """Passing a PreparedConditioning must produce the same UNet inputs as preparing the conditioning on every step."""
+    torch.manual_seed(0)
+    expected = _do_steps(sequential, prepare_once=False)
+    torch.manual_seed(0)
+    actual = _do_steps(sequential, prepare_once=True)
+
+    assert len(expected.calls) == len(actual.calls) == (4 if sequential else 2)
+    for e, a in zip(expected.calls, actual.calls, strict=True):
+        assert torch.equal(e["conditioning"], a["conditioning"])
+        assert torch.equal(e["added_cond_kwargs"]["text_embeds"], a["added_cond_kwargs"]["text_embeds"])
+        assert torch.equal(e["added_cond_kwargs"]["time_ids"], a["added_cond_kwargs"]["time_ids"])
+        if not sequential:
+            assert torch.equal(e["encoder_attention_mask"], a["encoder_attention_mask"])
+        e_ca, a_ca = e["cross_attention_kwargs"], a["cross_attention_kwargs"]
+        assert e_ca.keys() == a_ca.keys()
+        assert e_ca["regional_ip_data"].scales == a_ca["regional_ip_data"].scales
+        if "regional_prompt_data" in e_ca:
+            assert e_ca["percent_through"] == a_ca["percent_through"]
+            assert torch.equal(
+                e_ca["regional_prompt_data"].get_cross_attn_mask(4096, e["conditioning"].shape[1]),
+                a_ca["regional_prompt_data"].get_cross_attn_mask(4096, a["conditioning"].shape[1]),
+            )
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("sequential", [False, True])
+def test_prepared_conditioning_per_step_overhead(sequential: bool):
+    """Benchmark the per-step CPU overhead of preparing the conditioning, with a no-op UNet.
+
+    Run with `pytest -m slow -s tests/backend/stable_diffusion/test_prepared_conditioning.py`.
+    """
+    num_steps = 50
+    query_seq_lens = [4096, 1024, 256, 64]
+
+    def run(prepare_once: bool) -> float:
+        conditioning_data = _conditioning_data()
+        ip_adapter_data = _ip_adapter_data()
+        sample = torch.zeros(1, 4, 64, 64)
+
+        def forward(x: torch.Tensor, t: torch.Tensor, conditioning: torch.Tensor, **kwargs: Any) -> torch.Tensor:
+            # Mimic the attention processors, which request a regional mask in every cross-attention layer.
+            regional_prompt_data = kwargs["cross_attention_kwargs"].get("regional_prompt_data")
+            if regional_prompt_data is not None:
+                for query_seq_len in query_seq_lens:
+                    for _ in range(4):
+                        regional_prompt_data.get_cross_attn_mask(query_seq_len, conditioning.shape[1])
+            return x
+
+        diffuser = InvokeAIDiffuserComponent(model=None, model_forward_callback=forward)
+        diffuser.sequential_guidance = sequential
+        prepared = (
+            PreparedConditioning.from_latents(conditioning_data, ip_adapter_data, sample) if prepare_once else None
+        )
+        start = time.perf_counter()
+        for step_index in range(num_steps):
+            diffuser.do_unet_step(
+                sample=sample,
+                timestep=torch.tensor([999]),
+                conditioning_data=conditioning_data,
+                ip_adapter_data=ip_adapter_data,
+                step_index=step_index,
+                total_step_count=num_steps,
+                prepared_conditioning=prepared,
+            )
+        return (time.perf_counter() - start) / num_steps
+
+    per_step = run(prepare_once=False)
+    prepared_per_step = run(prepare_once=True)
+    print(
+        f"\nsequential={sequential}: per-step conditioning overhead {per_step * 1000:.3f} ms rebuilt, "
+        f"{prepared_per_step * 1000:.3f} ms prepared ({per_step / prepared_per_step:.1f}x)"
+    )
+    assert prepared_per_step < per_step
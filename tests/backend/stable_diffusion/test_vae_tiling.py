@@ -1,6 +1,17 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
 from diffusers.models.autoencoders.autoencoder_kl import AutoencoderKL
 
-from invokeai.backend.stable_diffusion.vae_tiling import patch_vae_tiling_params
+from invokeai.backend.stable_diffusion.vae_tiling import (
+    calc_vae_tile_size,
+    decode_latents_tiled,
+    encode_image_tiled,
+    patch_vae_tiling_params,
+    vae_output_to_uint8,
+)
 
 
 def test_patch_vae_tiling_params():
@@ -11,3 +22,98 @@ def test_patch_vae_tiling_params():
 
     with patch_vae_tiling_params(vae, 1, 2, 3):
         pass
+
+
+class _PointwiseVAE:
+    """A stand-in for a VAE whose output pixels each depend only on the latent they were upsampled from, so tiled
+    and untiled results only differ by the rounding of the blended overlaps."""
+
+    def __init__(self):
+        self.device = torch.device("cpu")
+        self.dtype = torch.float32
+        self.config = SimpleNamespace(scaling_factor=0.5)
+        self.batch_sizes: list[int] = []
+
+    def decode(self, latents: torch.Tensor, return_dict: bool = False) -> tuple[torch.Tensor]:
+        self.batch_sizes.append(latents.shape[0])
+        image = torch.tanh(latents[:, :3])
+        return (torch.nn.functional.interpolate(image, scale_factor=8, mode="nearest"),)
+
+    def encode(self, image: torch.Tensor) -> torch.Tensor:
+        self.batch_sizes.append(image.shape[0])
+        latents = torch.nn.functional.avg_pool2d(image, kernel_size=8)
+        return torch.cat([latents, latents.mean(dim=1, keepdim=True)], dim=1)
+
+
+def _small_vae() -> AutoencoderKL:
+    return AutoencoderKL(
+        down_block_types=("DownEncoderBlock2D",) * 4,
+        up_block_types=("UpDecoderBlock2D",) * 4,
+        block_out_channels=(8, 8, 8, 8),
+        norm_num_groups=4,
+        layers_per_block=1,
+    )
+
+
+def test_calc_vae_tile_size():
+    vae = AutoencoderKL(sample_size=256)
+    assert calc_vae_tile_size(vae) == (256, 64)
+    assert calc_vae_tile_size(vae, 100) == (96, 24)
+
+
+def test_decode_latents_tiled_single_tile_matches_untiled():
+    torch.manual_seed(0)
+    vae = _small_vae().eval()
+    latents = torch.randn(1, 4, 8, 12)
+
+    with torch.inference_mode():
+        expected = vae_output_to_uint8(vae.decode(latents / vae.config.scaling_factor, return_dict=False)[0])[0]
+    image = decode_latents_tiled([vae], latents, tile_size=128, overlap=32)
+
+    assert image.dtype == np.uint8
+    assert image.shape == (64, 96, 3)
+    np.testing.assert_array_equal(image, expected)
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_decode_latents_tiled(batch_size: int):
+    torch.manual_seed(0)
+    vae = _PointwiseVAE()
+    latents = torch.randn(1, 4, 40, 56)
+
+    expected = vae_output_to_uint8(vae.decode(latents / vae.config.scaling_factor)[0])[0]
+    vae.batch_sizes.clear()
+    image = decode_latents_tiled([vae], latents, tile_size=128, overlap=32, batch_size=batch_size)
+
+    assert image.dtype == np.uint8
+    assert image.shape == (320, 448, 3)
+    # Blended pixels may be truncated by one level each time the tiles and rows are written to uint8.
+    assert np.abs(image.astype(np.int16) - expected.astype(np.int16)).max() <= 2
+    # 3x5 tiles of 16x16 latents
+    assert sum(vae.batch_sizes) == 15
+    assert max(vae.batch_sizes) == batch_size
+
+
+def test_decode_latents_tiled_spreads_batches_over_vaes():
+    torch.manual_seed(0)
+    vaes = [_PointwiseVAE(), _PointwiseVAE()]
+    latents = torch.randn(1, 4, 40, 56)
+
+    image = decode_latents_tiled(vaes, latents, tile_size=128, overlap=32)
+
+    np.testing.assert_array_equal(image, decode_latents_tiled([_PointwiseVAE()], latents, tile_size=128, overlap=32))
+    assert sum(len(vae.batch_sizes) for vae in vaes) == 15
+
+
+def test_encode_image_tiled():
+    torch.manual_seed(0)
+    vae = _PointwiseVAE()
+    image = torch.rand(1, 3, 320, 448) * 2 - 1
+
+    def encode(vae: _PointwiseVAE, image_tiles: torch.Tensor) -> torch.Tensor:
+        return vae.encode(image_tiles)
+
+    latents = encode_image_tiled([vae], image, tile_size=128, overlap=32, encode=encode, batch_size=2)
+
+    assert latents.shape == (1, 4, 40, 56)
+    torch.testing.assert_close(latents, vae.encode(image), rtol=0, atol=1e-5)
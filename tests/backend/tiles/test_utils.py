@@ -1,7 +1,10 @@
+import math
+
+import cv2
 import numpy as np
 import pytest
 
-from invokeai.backend.tiles.utils import TBLR, paste
+from invokeai.backend.tiles.utils import TBLR, paste, seam_blend
 
 
 def test_paste_no_mask_success():
@@ -99,3 +102,53 @@ def test_paste_mask_does_not_match_src_image():
 
     with pytest.raises(ValueError):
         paste(dst_image=dst_image, src_image=src_image, box=box, mask=mask)
+
+
+def _reference_seam_mask(ia1: np.ndarray, ia2: np.ndarray, blend_amount: int, x_seam: bool) -> np.ndarray:
+    """The unblurred seam mask of seam_blend(...), computed row by row."""
+    ia = np.dot(ia2, [0.2989, 0.5870, 0.1140]) - np.dot(ia1, [0.2989, 0.5870, 0.1140])
+    if x_seam:
+        ia = np.rot90(ia, 1)
+    gutter = math.ceil(blend_amount / 2) if blend_amount > 0 else 0
+    max_y, max_x = ia.shape
+    max_x -= gutter
+    min_x = gutter
+    energy = np.abs(np.gradient(ia, axis=0)) + np.abs(np.gradient(ia, axis=1))
+
+    res = np.copy(energy)
+    for y in range(1, max_y):
+        row = res[y, :]
+        rowl = np.append(row[1:], 255.0)
+        rowr = np.insert(row[:-1], 0, 255.0)
+        res[y, :] = res[y - 1, :] + np.min([row, rowl, rowr], axis=0)
+
+    line = [0] * max_y
+    line[max_y - 1] = int(np.argmin(res[max_y - 1, min_x : max_x - 1]))
+    for ypos in range(max_y - 2, -1, -1):
+        lpos = int(np.clip(line[ypos + 1] - 1, min_x, max_x - 1))
+        rpos = int(np.clip(line[ypos + 1] + 1, min_x, max_x - 1))
+        line[ypos] = int(np.argmin(energy[ypos, lpos : rpos + 1])) + lpos
+
+    mask = np.zeros_like(ia)
+    for ypos in range(max_y):
+        mask[ypos, : line[ypos]] = 1
+    if x_seam:
+        mask = np.rot90(mask, 3)
+    return mask
+
+
+@pytest.mark.parametrize("x_seam", [True, False])
+@pytest.mark.parametrize("blend_amount", [0, 16])
+def test_seam_blend_matches_reference(x_seam: bool, blend_amount: int):
+    """Test that seam_blend(...) follows the lowest energy seam found by the row-by-row dynamic program."""
+    rng = np.random.default_rng(0)
+    ia1 = rng.integers(0, 256, (48, 64, 3)).astype(np.float64)
+    ia2 = rng.integers(0, 256, (48, 64, 3)).astype(np.float64)
+
+    mask = _reference_seam_mask(ia1, ia2, blend_amount, x_seam)
+    if blend_amount > 0:
+        mask = cv2.blur(mask, (blend_amount, blend_amount))
+    mask = np.expand_dims(mask, -1)
+    expected = ia1 * mask + ia2 * (1.0 - mask)
+
+    np.testing.assert_array_equal(seam_blend(ia1, ia2, blend_amount, x_seam), expected)
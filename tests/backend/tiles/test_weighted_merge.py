@@ -0,0 +1,154 @@
+import time
+from typing import Optional
+
+import numpy as np
+import pytest
+import torch
+
+from invokeai.backend.tiles.tiles import calc_tiles_with_overlap, merge_tiles_with_linear_blending
+from invokeai.backend.tiles.utils import TBLR, Tile
+from invokeai.backend.tiles.weighted_merge import merge_tiles_with_weighted_blending
+
+
+def _random_tile_images(tiles: list[Tile], dtype: type = np.uint8) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    return [
+        rng.integers(0, 256, (t.coords.bottom - t.coords.top, t.coords.right - t.coords.left, 3)).astype(dtype)
+        for t in tiles
+    ]
+
+
+@pytest.mark.parametrize("precision", ["float32", "uint16"])
+@pytest.mark.parametrize("device", [None, torch.device("cpu")])
+@pytest.mark.parametrize(
+    ["image_height", "image_width", "tile_size", "overlap", "blend_amount"],
+    [
+        (512, 512, 512, 0, 0),  # Single tile.
+        (700, 900, 256, 64, 0),  # Hard seams.
+        (700, 900, 256, 64, 64),
+        (1000, 1500, 512, 128, 64),
+    ],
+)
+def test_merge_tiles_with_weighted_blending_matches_linear_blending(
+    precision: str,
+    device: Optional[torch.device],
+    image_height: int,
+    image_width: int,
+    tile_size: int,
+    overlap: int,
+    blend_amount: int,
+):
+    """Test that merge_tiles_with_weighted_blending(...) produces the same blend as merge_tiles_with_linear_blending(...).
+    The exact blend is computed in float64 with merge_tiles_with_linear_blending(...).
+    """
+    tiles = calc_tiles_with_overlap(image_height, image_width, tile_size, tile_size, overlap)
+    tile_images = _random_tile_images(tiles)
+
+    expected = np.zeros((image_height, image_width, 3), dtype=np.float64)
+    merge_tiles_with_linear_blending(expected, tiles, [t.astype(np.float64) for t in tile_images], blend_amount)
+
+    dst_image = np.zeros((image_height, image_width, 3), dtype=np.uint8)
+    merge_tiles_with_weighted_blending(dst_image, tiles, tile_images, blend_amount, precision, device)  # type: ignore
+
+    # float32 rounds to the nearest level. Fixed point weights are quantized to 1/256, which costs about another level.
+    tolerance = 0.5 if precision == "float32" else 1.5
+    assert np.abs(dst_image - expected).max() <= tolerance
+
+
+def test_merge_tiles_with_weighted_blending_float_image():
+    """Test merging float tiles, as used for latents."""
+    tiles = calc_tiles_with_overlap(96, 160, 64, 64, 16)
+    tile_images = _random_tile_images(tiles, dtype=np.float32)
+
+    expected = np.zeros((96, 160, 3), dtype=np.float32)
+    merge_tiles_with_linear_blending(expected, tiles, tile_images, 8)
+    dst_image = np.zeros((96, 160, 3), dtype=np.float32)
+    merge_tiles_with_weighted_blending(dst_image, tiles, tile_images, 8)
+
+    np.testing.assert_allclose(dst_image, expected, atol=1e-3)
+
+
+def test_merge_tiles_with_weighted_blending_fixed_point_is_exact_for_flat_tiles():
+    """Test that the fixed point weights of the tiles covering each pixel sum to exactly 1."""
+    tiles = calc_tiles_with_overlap(700, 900, 256, 256, 64)
+    tile_images = [np.full((256, 256, 3), 255, dtype=np.uint8) for _ in tiles]
+
+    dst_image = np.zeros((700, 900, 3), dtype=np.uint8)
+    merge_tiles_with_weighted_blending(dst_image, tiles, tile_images, 32, precision="uint16")
+
+    assert (dst_image == 255).all()
+
+
+def test_merge_tiles_with_weighted_blending_fixed_point_requires_uint8():
+    """Test that uint16 fixed point merging raises an exception for non-uint8 images."""
+    tiles = [Tile(coords=TBLR(top=0, bottom=64, left=0, right=64), overlap=TBLR(top=0, bottom=0, left=0, right=0))]
+    dst_image = np.zeros((64, 64, 3), dtype=np.float32)
+
+    with pytest.raises(ValueError):
+        merge_tiles_with_weighted_blending(
+            dst_image, tiles, [np.zeros((64, 64, 3), dtype=np.float32)], 0, precision="uint16"
+        )
+
+
+def test_merge_tiles_with_weighted_blending_tiles_overflow_dst_image():
+    """Test that merge_tiles_with_weighted_blending(...) raises an exception if any of the tiles overflows the
+    dst_image.
+    """
+    tiles = [Tile(coords=TBLR(top=0, bottom=512, left=0, right=512), overlap=TBLR(top=0, bottom=0, left=0, right=0))]
+    dst_image = np.zeros((256, 512, 3), dtype=np.uint8)
+
+    with pytest.raises(ValueError):
+        merge_tiles_with_weighted_blending(dst_image, tiles, [np.zeros((512, 512, 3), dtype=np.uint8)], 0)
+
+
+def test_merge_tiles_with_weighted_blending_mismatched_list_lengths():
+    """Test that merge_tiles_with_weighted_blending(...) raises an exception if the lengths of 'tiles' and
+    'tile_images' do not match.
+    """
+    tiles = [Tile(coords=TBLR(top=0, bottom=512, left=0, right=512), overlap=TBLR(top=0, bottom=0, left=0, right=0))]
+    dst_image = np.zeros((512, 512, 3), dtype=np.uint8)
+    tile_images = [np.zeros((512, 512, 3), dtype=np.uint8), np.zeros((512, 512, 3), dtype=np.uint8)]
+
+    with pytest.raises(ValueError):
+        merge_tiles_with_weighted_blending(dst_image, tiles, tile_images, 0)
+
+
+def test_merge_tiles_with_weighted_blending_blend_amount_exceeds_overlap():
+    """Test that merge_tiles_with_weighted_blending(...) raises an exception if 'blend_amount' exceeds the overlap."""
+    tiles = calc_tiles_with_overlap(512, 960, 512, 512, 64)
+    dst_image = np.zeros((512, 960, 3), dtype=np.uint8)
+
+    with pytest.raises(AssertionError):
+        merge_tiles_with_weighted_blending(dst_image, tiles, _random_tile_images(tiles), 128)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("precision", ["float32", "uint16"])
+def test_merge_tiles_with_weighted_blending_16k_benchmark(precision: str):
+    """Benchmark merging 225 tiles into a 16K x 16K image.
+
+    Run with `pytest -m slow -s tests/backend/tiles/test_weighted_merge.py`.
+    """
+    image_size = 16384
+    tiles = calc_tiles_with_overlap(image_size, image_size, 1280, 1280, 128)
+    assert len(tiles) >= 200
+    # Reuse a few tile images to keep the memory use of the benchmark down.
+    pool = _random_tile_images(tiles[:4])
+    tile_images = [pool[i % len(pool)] for i in range(len(tiles))]
+    dst_image = np.zeros((image_size, image_size, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    merge_tiles_with_linear_blending(dst_image, tiles, tile_images, 64)
+    linear_time = time.perf_counter() - start
+    expected = dst_image[::97, ::97].copy()
+
+    start = time.perf_counter()
+    merge_tiles_with_weighted_blending(dst_image, tiles, tile_images, 64, precision)  # type: ignore
+    weighted_time = time.perf_counter() - start
+
+    print(
+        f"\n{len(tiles)} tiles, {image_size}x{image_size}: linear blending {linear_time:.2f} s, "
+        f"weighted blending ({precision}) {weighted_time:.2f} s ({linear_time / weighted_time:.1f}x)"
+    )
+    assert np.abs(dst_image[::97, ::97].astype(np.int16) - expected).max() <= 3
+    assert weighted_time < linear_time
@@ -0,0 +1,52 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from invokeai.backend.util.db_maintenance import InvokeAIDatabaseMaintenanceApp, MaintenanceOperation
+
+
+@pytest.fixture
+def invokeai_root(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    (tmp_path / "invokeai.yaml").write_text("InvokeAI:\n  Paths:\n    db_dir: databases\n    outdir: outputs\n")
+    (tmp_path / "databases").mkdir()
+    images_dir = tmp_path / "outputs" / "images"
+    (images_dir / "thumbnails").mkdir(parents=True)
+    with sqlite3.connect(tmp_path / "databases" / "invokeai.db") as conn:
+        conn.execute("CREATE TABLE images (image_name TEXT PRIMARY KEY)")
+        for i in range(6):
+            Image.new("RGB", (512, 384), (i * 40, 0, 0)).save(images_dir / f"image_{i}.png")
+            if i < 4:
+                conn.execute("INSERT INTO images (image_name) VALUES (?)", (f"image_{i}.png",))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_regenerate_thumbnails(invokeai_root: Path, workers: int):
+    thumbnails_dir = invokeai_root / "outputs" / "images" / "thumbnails"
+    # An existing thumbnail is kept, as when resuming an interrupted run.
+    Image.new("RGB", (1, 1)).save(thumbnails_dir / "image_0.webp")
+
+    InvokeAIDatabaseMaintenanceApp(MaintenanceOperation.ReGenerateThumbnails, workers=workers).main()
+
+    assert sorted(p.name for p in thumbnails_dir.iterdir()) == [f"image_{i}.webp" for i in range(6)]
+    with Image.open(thumbnails_dir / "image_0.webp") as thumbnail:
+        assert thumbnail.size == (1, 1)
+    with Image.open(thumbnails_dir / "image_1.webp") as thumbnail:
+        assert thumbnail.size == (256, 192)
+
+
+def test_archive_orphaned_disk_files(invokeai_root: Path):
+    images_dir = invokeai_root / "outputs" / "images"
+    Image.new("RGB", (1, 1)).save(images_dir / "thumbnails" / "image_5.webp")
+    Image.new("RGB", (1, 1)).save(images_dir / "thumbnails" / "deleted.webp")
+
+    InvokeAIDatabaseMaintenanceApp(MaintenanceOperation.CleanOrphanedDiskFiles).main()
+
+    archive_dir = invokeai_root / "outputs" / "images-archive"
+    assert sorted(p.name for p in images_dir.glob("*.png")) == [f"image_{i}.png" for i in range(4)]
+    assert sorted(p.name for p in archive_dir.glob("*.png")) == ["image_4.png", "image_5.png"]
+    assert sorted(p.name for p in (archive_dir / "thumbnails").iterdir()) == ["deleted.webp", "image_5.webp"]
+    assert list((images_dir / "thumbnails").iterdir()) == []
@@ -162,3 +162,19 @@ def test_multi_device_support_3():
     with cache.reserve_execution_device() as gpu:
         assert gpu in [torch.device(x) for x in config.devices]
         assert TorchDevice.choose_torch_device() == gpu
+
+
+def test_borrow_idle_execution_devices():
+    config = get_config()
+    config.devices = ["cuda:0", "cuda:1", "cuda:2"]
+    cache = ModelCache()
+    with cache.reserve_execution_device() as gpu:
+        with cache.borrow_idle_execution_devices(max_devices=5) as borrowed:
+            assert len(borrowed) == 2
+            assert gpu not in borrowed
+            # the borrowed devices do not replace the thread's own device
+            assert cache.get_execution_device() == gpu
+            with cache.borrow_idle_execution_devices(max_devices=1) as none_left:
+                assert none_left == []
+        with cache.borrow_idle_execution_devices(max_devices=1) as borrowed:
+            assert len(borrowed) == 1
@@ -0,0 +1,49 @@
+import pytest
+import torch
+
+from invokeai.backend.util.philox import philox4x32, philox_randn
+
+
+@pytest.mark.parametrize(
+    "counter,key,expected",
+    [
+        # Known-answer tests from the Random123 distribution.
+        ((0, 0, 0, 0), (0, 0), (0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8)),
+        ((0xFFFFFFFF,) * 4, (0xFFFFFFFF, 0xFFFFFFFF), (0x408F276D, 0x41C83B0E, 0xA20BC7C6, 0x6D5451FD)),
+        (
+            (0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344),
+            (0xA4093822, 0x299F31D0),
+            (0xD16CFE09, 0x94FDCCEB, 0x5001E420, 0x24126EA1),
+        ),
+    ],
+)
+def test_philox4x32(counter: tuple[int, ...], key: tuple[int, int], expected: tuple[int, ...]):
+    words = philox4x32([torch.tensor([c], dtype=torch.int64) for c in counter], key)
+    assert tuple(int(w) for w in words) == expected
+
+
+def test_philox_randn():
+    noise = philox_randn((1, 4, 64, 63), seed=123, device=torch.device("cpu"))
+
+    assert noise.shape == (1, 4, 64, 63)
+    assert noise.dtype == torch.float32
+    assert abs(noise.mean().item()) < 0.05
+    assert abs(noise.std().item() - 1.0) < 0.05
+    assert torch.equal(noise, philox_randn((1, 4, 64, 63), seed=123, device=torch.device("cpu")))
+    assert not torch.equal(noise, philox_randn((1, 4, 64, 63), seed=124, device=torch.device("cpu")))
+    # Noise of another shape uses the same stream of numbers.
+    assert torch.equal(noise.flatten()[:100], philox_randn((100,), seed=123, device=torch.device("cpu")))
+
+
+@pytest.mark.parametrize(
+    "device",
+    [
+        pytest.param("cuda", marks=pytest.mark.skipif(not torch.cuda.is_available(), reason="requires CUDA")),
+        pytest.param("mps", marks=pytest.mark.skipif(not torch.backends.mps.is_available(), reason="requires MPS")),
+    ],
+)
+def test_philox_randn_matches_across_devices(device: str):
+    cpu_noise = philox_randn((1, 4, 64, 64), seed=5, device=torch.device("cpu"))
+    device_noise = philox_randn((1, 4, 64, 64), seed=5, device=torch.device(device))
+    assert device_noise.device.type == device
+    assert torch.allclose(cpu_noise, device_noise.cpu(), rtol=0, atol=1e-6)
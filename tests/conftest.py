@@ -18,6 +18,8 @@ from invokeai.app.services.images.images_default import ImageService
 from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
 from invokeai.app.services.invocation_services import InvocationServices
 from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.noise.noise_default import NoiseService
+from invokeai.app.services.tensor_cache.tensor_cache_memory import MemoryTensorCache
 from invokeai.backend.util.logging import InvokeAILogger
 from tests.backend.model_manager.model_manager_fixtures import *  # noqa: F403
 from tests.fixtures.sqlite_database import create_mock_sqlite_database  # noqa: F401
@@ -55,6 +57,8 @@ def mock_services() -> InvocationServices:
         tensors=None,  # type: ignore
         conditioning=None,  # type: ignore
         performance_statistics=None,  # type: ignore
+        tensor_cache=MemoryTensorCache(max_cache_size=0),
+        noise=NoiseService(),
     )
 
 
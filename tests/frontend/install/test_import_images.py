@@ -0,0 +1,118 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from PIL import Image, PngImagePlugin
+
+from invokeai.frontend.install.import_images import Config, DatabaseMapper, ImportStats, MediaImportProcessor
+
+IMAGE_NAMES = [f"image_{i}.png" for i in range(5)]
+
+
+@pytest.fixture
+def config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Config:
+    for name in ("count_imported", "count_skipped_file_exists", "count_skipped_db_exists", "count_file_errors"):
+        monkeypatch.setattr(ImportStats, name, 0)
+    monkeypatch.setattr(ImportStats, "count_imported_by_version", {})
+
+    config = Config()
+    config.database_path = str(tmp_path / "invokeai.db")
+    config.outputs_path = str(tmp_path / "outputs" / "images")
+    config.thumbnail_path = str(tmp_path / "outputs" / "images" / "thumbnails")
+    Path(config.thumbnail_path).mkdir(parents=True)
+    with sqlite3.connect(config.database_path) as conn:
+        conn.execute(
+            "CREATE TABLE images (image_name TEXT PRIMARY KEY, image_origin TEXT, image_category TEXT, width INTEGER,"
+            " height INTEGER, session_id TEXT, node_id TEXT, metadata TEXT, is_intermediate BOOLEAN, created_at TEXT,"
+            " updated_at TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE boards (board_id TEXT PRIMARY KEY, board_name TEXT, created_at TEXT, updated_at TEXT)"
+        )
+        conn.execute("CREATE TABLE board_images (board_id TEXT, image_name TEXT, created_at TEXT, updated_at TEXT)")
+    return config
+
+
+@pytest.fixture
+def import_files(tmp_path: Path) -> list[str]:
+    import_dir = tmp_path / "import"
+    import_dir.mkdir()
+    for i, name in enumerate(IMAGE_NAMES):
+        info = PngImagePlugin.PngInfo()
+        if i % 2 == 0:
+            info.add_text("invokeai_metadata", '{"seed": 1}')
+        Image.new("RGB", (64, 48), (i * 40, 0, 0)).save(import_dir / name, pnginfo=info)
+    return [str(import_dir / name) for name in IMAGE_NAMES]
+
+
+def _run_import(import_files: list[str], config: Config, workers: int = 1) -> None:
+    db_mapper = DatabaseMapper(config.database_path, None)
+    db_mapper.connect()
+    processor = MediaImportProcessor(workers=workers)
+    processor.DATABASE_BATCH_SIZE = 2
+    processor.board_name_id_map = {}
+    try:
+        processor.import_images(import_files, "IMPORT", db_mapper, config)
+    finally:
+        db_mapper.disconnect()
+
+
+def _image_names(config: Config) -> list[str]:
+    with sqlite3.connect(config.database_path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT image_name FROM images"))
+
+
+def _output_files(config: Config) -> tuple[list[str], list[str]]:
+    return (
+        sorted(p.name for p in Path(config.outputs_path).glob("*.png")),
+        sorted(p.name for p in Path(config.thumbnail_path).iterdir()),
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_images_in_batches(import_files: list[str], config: Config, workers: int):
+    _run_import(import_files, config, workers)
+
+    assert _image_names(config) == IMAGE_NAMES
+    assert _output_files(config) == (IMAGE_NAMES, [name.replace(".png", ".webp") for name in IMAGE_NAMES])
+    with sqlite3.connect(config.database_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM board_images").fetchone()[0] == len(IMAGE_NAMES)
+        assert conn.execute("SELECT board_name FROM boards").fetchall() == [("IMPORT",)]
+    assert ImportStats.count_imported == len(IMAGE_NAMES)
+    assert ImportStats.count_file_errors == 0
+
+
+def test_import_images_removes_files_of_failed_batch(import_files: list[str], config: Config):
+    with sqlite3.connect(config.database_path) as conn:
+        conn.execute(
+            "CREATE TRIGGER fail_image_3 BEFORE INSERT ON board_images WHEN NEW.image_name = 'image_3.png'"
+            " BEGIN SELECT RAISE(ABORT, 'failed'); END"
+        )
+
+    _run_import(import_files, config)
+
+    # The second batch, image_2 and image_3, was rolled back, and its copies and thumbnails removed.
+    imported = ["image_0.png", "image_1.png", "image_4.png"]
+    assert _image_names(config) == imported
+    assert _output_files(config) == (imported, [name.replace(".png", ".webp") for name in imported])
+    assert ImportStats.count_imported == 3
+    assert ImportStats.count_file_errors == 2
+
+
+def test_import_images_again_imports_failed_batch(import_files: list[str], config: Config):
+    with sqlite3.connect(config.database_path) as conn:
+        conn.execute(
+            "CREATE TRIGGER fail_image_3 BEFORE INSERT ON board_images WHEN NEW.image_name = 'image_3.png'"
+            " BEGIN SELECT RAISE(ABORT, 'failed'); END"
+        )
+    _run_import(import_files, config)
+    with sqlite3.connect(config.database_path) as conn:
+        conn.execute("DROP TRIGGER fail_image_3")
+
+    _run_import(import_files, config)
+
+    # The images imported by the first run are skipped, and the failed ones imported.
+    assert _image_names(config) == IMAGE_NAMES
+    assert _output_files(config) == (IMAGE_NAMES, [name.replace(".png", ".webp") for name in IMAGE_NAMES])
+    assert ImportStats.count_imported == 5
+    assert ImportStats.count_skipped_file_exists == 3
@@ -0,0 +1,151 @@
+# pyright: reportPrivateUsage=false
+from pathlib import Path
+
+import pytest
+import torch
+
+from invokeai.app.invocations.fields import ImageField, LatentsField
+from invokeai.app.invocations.noise import NoiseInvocation, NoiseOutput
+from invokeai.app.invocations.primitives import ImageOutput, LatentsCollectionOutput, LatentsOutput
+from invokeai.app.services.invocation_cache.invocation_cache_disk import DiskInvocationCache
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+from invokeai.app.services.shared.invocation_context import build_invocation_context
+from invokeai.backend.stable_diffusion.diffusion.conditioning_data import ConditioningFieldData
+from invokeai.backend.util.devices import TorchDevice
+from tests.test_nodes import PromptTestInvocation
+
+
+@pytest.fixture
+def invoker(mock_services: InvocationServices, tmp_path: Path) -> Invoker:
+    mock_services.tensors = ObjectSerializerForwardCache(
+        ObjectSerializerDisk[torch.Tensor](tmp_path / "tensors", ephemeral=True)
+    )
+    mock_services.conditioning = ObjectSerializerForwardCache(
+        ObjectSerializerDisk[ConditioningFieldData](tmp_path / "conditioning", ephemeral=True)
+    )
+    return Invoker(services=mock_services)
+
+
+def _disk_cache(invoker: Invoker, cache_dir: Path, max_disk_size: float = 1.0) -> DiskInvocationCache:
+    cache = DiskInvocationCache(max_cache_size=5, cache_dir=cache_dir, max_disk_size=max_disk_size)
+    cache.start(invoker)
+    return cache
+
+
+def test_invocation_cache_disk_creates_stable_keys():
+    key1 = DiskInvocationCache.create_key(PromptTestInvocation(id="1", prompt="foo"))
+    key2 = DiskInvocationCache.create_key(PromptTestInvocation(id="2", prompt="foo"))
+    key3 = DiskInvocationCache.create_key(PromptTestInvocation(id="1", prompt="bar"))
+
+    assert key1 == key2
+    assert key1 != key3
+    # Unlike hash(), the key is a content hash that does not depend on the process.
+    assert len(key1) == 64 and int(key1, 16) >= 0
+
+
+def test_invocation_cache_disk_survives_restart(invoker: Invoker, tmp_path: Path):
+    latents = torch.randn(1, 4, 8, 8)
+    latents_name = invoker.services.tensors.save(latents)
+    output = LatentsOutput.build(latents_name=latents_name, latents=latents, seed=7)
+
+    cache = _disk_cache(invoker, tmp_path / "node_cache")
+    cache.save("key", output)
+    cache.stop(invoker)
+
+    restarted = _disk_cache(invoker, tmp_path / "node_cache")
+    cached = restarted.get("key")
+
+    assert isinstance(cached, LatentsOutput)
+    assert cached.width == output.width and cached.latents.seed == 7
+    # The tensor was saved to the tensors service again, under a new name.
+    assert cached.latents.latents_name != latents_name
+    assert torch.equal(invoker.services.tensors.load(cached.latents.latents_name), latents)
+    assert restarted._hits == 1 and restarted._misses == 0
+    # The output is now also in memory.
+    assert restarted.get("key") is cached
+
+
+def test_invocation_cache_disk_copies_referenced_objects(invoker: Invoker, tmp_path: Path):
+    tensors = [torch.full((1, 4, 2, 2), float(i)) for i in range(3)]
+    output = LatentsCollectionOutput(
+        collection=[LatentsField(latents_name=invoker.services.tensors.save(t)) for t in tensors]
+    )
+    cache = _disk_cache(invoker, tmp_path / "node_cache")
+    cache.save("key", output)
+
+    # Deleting the original tensors does not invalidate the disk cache.
+    for latents in output.collection:
+        invoker.services.tensors.delete(latents.latents_name)
+    cache._cache.clear()
+    cached = cache.get("key")
+
+    assert isinstance(cached, LatentsCollectionOutput)
+    for latents, t in zip(cached.collection, tensors, strict=True):
+        assert torch.equal(invoker.services.tensors.load(latents.latents_name), t)
+
+
+def test_invocation_cache_disk_keeps_noise_names(invoker: Invoker, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # Model caches built by other tests register themselves for device selection.
+    monkeypatch.setattr(TorchDevice, "_model_cache", None)
+    context = build_invocation_context(services=invoker.services, data=None, is_canceled=None)  # type: ignore
+    output = NoiseInvocation(id="1", seed=3, width=64, height=64).invoke(context)
+    cache = _disk_cache(invoker, tmp_path / "node_cache")
+    cache.save("key", output)
+
+    assert cache.disk_size() > 0
+    cache._cache.clear()
+    cached = cache.get("key")
+
+    assert isinstance(cached, NoiseOutput)
+    assert cached.noise.latents_name == output.noise.latents_name
+    assert cached.noise.seed == 3 and cached.width == 64
+
+
+def test_invocation_cache_disk_deletes_by_image_name(invoker: Invoker, tmp_path: Path):
+    cache = _disk_cache(invoker, tmp_path / "node_cache")
+    cache.save("foo", ImageOutput(image=ImageField(image_name="foo.png"), width=512, height=512))
+    cache.save("bar", ImageOutput(image=ImageField(image_name="bar.png"), width=512, height=512))
+
+    cache._delete_by_match("foo.png")
+
+    assert cache._conn.execute("SELECT key FROM invocation_cache;").fetchall() == [("bar",)]
+
+
+def test_invocation_cache_disk_evicts_least_recently_used(invoker: Invoker, tmp_path: Path):
+    tensor_size = 64 * 1024
+    # Room for about three entries.
+    cache = _disk_cache(invoker, tmp_path / "node_cache", max_disk_size=3.5 * tensor_size / 1073741824)
+    for i in range(3):
+        latents = torch.zeros(tensor_size // 4)
+        cache.save(
+            str(i),
+            LatentsOutput(latents=LatentsField(latents_name=invoker.services.tensors.save(latents)), width=8, height=8),
+        )
+    assert cache.disk_size() > 2 * tensor_size
+    cache._cache.clear()
+    # Use entry 0, so that entry 1 is the least recently used.
+    assert cache.get("0") is not None
+
+    latents = torch.zeros(tensor_size // 4)
+    cache.save(
+        "3", LatentsOutput(latents=LatentsField(latents_name=invoker.services.tensors.save(latents)), width=8, height=8)
+    )
+
+    keys = {row[0] for row in cache._conn.execute("SELECT key FROM invocation_cache;")}
+    assert keys == {"0", "2", "3"}
+    assert cache.disk_size() <= 3.5 * tensor_size
+    assert not (tmp_path / "node_cache" / "entries" / "1").exists()
+
+
+def test_invocation_cache_disk_clears(invoker: Invoker, tmp_path: Path):
+    cache = _disk_cache(invoker, tmp_path / "node_cache")
+    cache.save("foo", ImageOutput(image=ImageField(image_name="foo.png"), width=512, height=512))
+
+    cache.clear()
+
+    assert cache.disk_size() == 0
+    assert cache.get("foo") is None
+    assert list((tmp_path / "node_cache" / "entries").iterdir()) == []
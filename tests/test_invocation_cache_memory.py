@@ -1,10 +1,14 @@
 # pyright: reportPrivateUsage=false
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 
+import pytest
+
 from invokeai.app.invocations.fields import ImageField
 from invokeai.app.invocations.primitives import ImageOutput
 from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
-from tests.test_nodes import PromptTestInvocation
+from tests.test_nodes import PromptTestInvocation, PromptTestInvocationOutput
 
 
 def test_invocation_cache_memory_max_cache_size():
@@ -181,3 +185,97 @@ def test_invocation_cache_memory_status():
     assert status.hits == 0
     assert status.misses == 0
     assert status.max_size == 0
+
+
+def test_invocation_cache_memory_tracks_in_flight_invocations():
+    output_1 = ImageOutput(image=ImageField(image_name="foo"), width=512, height=512)
+    cache = MemoryInvocationCache(max_cache_size=5)
+
+    # The first caller runs the invocation, later callers get its future.
+    assert cache.begin_invocation(1) is None
+    in_flight = cache.begin_invocation(1)
+    assert in_flight is not None
+    assert not in_flight.done()
+
+    cache.save(1, output_1)
+    cache.end_invocation(1, output_1)
+    assert in_flight.result() == output_1
+
+    # Once saved, the cached output is returned.
+    cached = cache.begin_invocation(1)
+    assert cached is not None
+    assert cached.result() == output_1
+
+
+def test_invocation_cache_memory_in_flight_invocation_fails():
+    cache = MemoryInvocationCache(max_cache_size=5)
+
+    assert cache.begin_invocation(1) is None
+    in_flight = cache.begin_invocation(1)
+    assert in_flight is not None
+    cache.end_invocation(1, None)
+
+    # Waiters are told to try again, and the next caller runs the invocation.
+    assert in_flight.result() is None
+    assert cache.begin_invocation(1) is None
+
+
+def test_invocation_cache_memory_does_not_track_in_flight_invocations_when_disabled():
+    assert MemoryInvocationCache(max_cache_size=0).begin_invocation(1) is None
+    cache = MemoryInvocationCache(max_cache_size=5)
+    cache.disable()
+    assert cache.begin_invocation(1) is None
+    assert cache.begin_invocation(1) is None
+
+
+def test_invoke_internal_deduplicates_concurrent_invocations(mock_services, monkeypatch):
+    mock_services.configuration.node_cache_size = 5
+    mock_services.invocation_cache = MemoryInvocationCache(max_cache_size=5)
+    num_workers = 4
+    calls: list[str] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_invoke(self, context):
+        calls.append(self.id)
+        started.set()
+        release.wait(timeout=10)
+        return PromptTestInvocationOutput(prompt=self.prompt)
+
+    monkeypatch.setattr(PromptTestInvocation, "invoke", slow_invoke)
+    invocations = [PromptTestInvocation(id=str(i), prompt="foo") for i in range(num_workers)]
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        first = executor.submit(invocations[0].invoke_internal, None, mock_services)
+        assert started.wait(timeout=10)
+        others = [executor.submit(i.invoke_internal, None, mock_services) for i in invocations[1:]]
+        release.set()
+        outputs = [first.result()] + [f.result() for f in others]
+
+    assert calls == ["0"]
+    assert all(o is outputs[0] for o in outputs)
+
+
+def test_invoke_internal_retries_after_failed_in_flight_invocation(mock_services, monkeypatch):
+    mock_services.configuration.node_cache_size = 5
+    mock_services.invocation_cache = MemoryInvocationCache(max_cache_size=5)
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_then_ok_invoke(self, context):
+        if self.id == "0":
+            started.set()
+            release.wait(timeout=10)
+            raise RuntimeError("first invocation fails")
+        return PromptTestInvocationOutput(prompt=self.prompt)
+
+    monkeypatch.setattr(PromptTestInvocation, "invoke", failing_then_ok_invoke)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(PromptTestInvocation(id="0", prompt="foo").invoke_internal, None, mock_services)
+        assert started.wait(timeout=10)
+        second = executor.submit(PromptTestInvocation(id="1", prompt="foo").invoke_internal, None, mock_services)
+        release.set()
+        with pytest.raises(RuntimeError):
+            first.result()
+        assert second.result().prompt == "foo"
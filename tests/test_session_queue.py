@@ -1,6 +1,8 @@
 import pytest
 from pydantic import TypeAdapter, ValidationError
 
+from invokeai.app.invocations.noise import NoiseInvocation
+from invokeai.app.services.invoker import Invoker
 from invokeai.app.services.session_queue.session_queue_common import (
     Batch,
     BatchDataCollection,
@@ -8,9 +10,12 @@ from invokeai.app.services.session_queue.session_queue_common import (
     NodeFieldValue,
     calc_session_count,
     create_session_nfv_tuples,
+    differ_only_by_seed,
     prepare_values_to_insert,
 )
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
 from invokeai.app.services.shared.graph import Graph, GraphExecutionState
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
 from tests.test_nodes import PromptTestInvocation
 
 
@@ -230,3 +235,55 @@ def test_cannot_create_bad_batch_fields_exist(
                 ],
             ],
         )
+
+
+def test_differ_only_by_seed():
+    values = [
+        NodeFieldValue(node_path="1", field_name="seed", value=1),
+        NodeFieldValue(node_path="2", field_name="prompt", value="Banana sushi"),
+    ]
+    other_seed = [
+        NodeFieldValue(node_path="1", field_name="seed", value=2),
+        NodeFieldValue(node_path="2", field_name="prompt", value="Banana sushi"),
+    ]
+    other_prompt = [
+        NodeFieldValue(node_path="1", field_name="seed", value=1),
+        NodeFieldValue(node_path="2", field_name="prompt", value="Grape sushi"),
+    ]
+    assert differ_only_by_seed(values, other_seed)
+    assert not differ_only_by_seed(values, other_prompt)
+    assert not differ_only_by_seed(values, values[:1])
+    assert differ_only_by_seed(None, [])
+
+
+def test_dequeue_seed_variants(mock_invoker: Invoker):
+    configuration = mock_invoker.services.configuration
+    db = create_mock_sqlite_database(configuration, mock_invoker.services.logger)
+    session_queue = SqliteSessionQueue(db=db)
+    session_queue.start(mock_invoker)
+
+    g = Graph()
+    g.add_node(NoiseInvocation(id="1"))
+    g.add_node(PromptTestInvocation(id="2", prompt="Chevy"))
+    batch = Batch(
+        graph=g,
+        data=[
+            [BatchDatum(node_path="2", field_name="prompt", items=["Banana sushi", "Grape sushi"])],
+            [BatchDatum(node_path="1", field_name="seed", items=[1, 2, 3])],
+        ],
+    )
+    session_queue.enqueue_batch("default", batch, prepend=False)
+
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    variants = session_queue.dequeue_seed_variants(queue_item, max_items=10)
+
+    # Only the following items with the same prompt are taken, and they are now in progress.
+    assert [v.item_id for v in variants] == [queue_item.item_id + 1, queue_item.item_id + 2]
+    assert all(v.status == "in_progress" for v in variants)
+    assert len({v.session.graph.get_node("1").seed for v in [queue_item, *variants]}) == 3
+    assert {v.session.graph.get_node("2").prompt for v in [queue_item, *variants]} == {"Banana sushi"}
+    assert session_queue.dequeue_seed_variants(queue_item, max_items=10) == []
+    next_item = session_queue.dequeue()
+    assert next_item is not None
+    assert next_item.session.graph.get_node("2").prompt == "Grape sushi"